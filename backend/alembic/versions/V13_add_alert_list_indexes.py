@@ -0,0 +1,64 @@
+"""add indexes to support alert list pagination and filtering
+
+Revision ID: V13
+Revises: V12
+Create Date: 2026-10-18 09:12:41.118304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "V13"
+down_revision: Union[str, None] = "V12"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_alerts_alert_updated_alert_id",
+        "alerts",
+        ["alert_updated", "alert_id"],
+        unique=False,
+        schema="py_api",
+    )
+    op.create_index(
+        "ix_alerts_alert_status_alert_updated",
+        "alerts",
+        ["alert_status", "alert_updated", "alert_id"],
+        unique=False,
+        schema="py_api",
+    )
+    op.create_index(
+        "ix_alert_areas_basin_id_alert_id",
+        "alert_areas",
+        ["basin_id", "alert_id"],
+        unique=False,
+        schema="py_api",
+    )
+    op.create_index(
+        "ix_alert_areas_alert_level_id_alert_id",
+        "alert_areas",
+        ["alert_level_id", "alert_id"],
+        unique=False,
+        schema="py_api",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_alert_areas_alert_level_id_alert_id",
+        table_name="alert_areas",
+        schema="py_api",
+    )
+    op.drop_index(
+        "ix_alert_areas_basin_id_alert_id", table_name="alert_areas", schema="py_api"
+    )
+    op.drop_index(
+        "ix_alerts_alert_status_alert_updated", table_name="alerts", schema="py_api"
+    )
+    op.drop_index(
+        "ix_alerts_alert_updated_alert_id", table_name="alerts", schema="py_api"
+    )
@@ -0,0 +1,155 @@
+"""add the alert read model table, a denormalized copy of each alert with its
+basins, alert levels and cap events, and populate it for the existing alerts
+
+Revision ID: V14
+Revises: V13
+Create Date: 2026-10-18 16:58:12.402117
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "V14"
+down_revision: Union[str, None] = "V13"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# builds the same documents as crud_read_model.serialize_alert, after this
+# migration the rows are maintained by the api
+POPULATE_READ_MODEL = """
+INSERT INTO py_api.alert_read_model
+    (alert_id, alert_status, alert_updated, alert, cap_events)
+SELECT
+    a.alert_id,
+    a.alert_status,
+    a.alert_updated,
+    jsonb_build_object(
+        'alert_description', a.alert_description,
+        'alert_hydro_conditions', a.alert_hydro_conditions,
+        'alert_meteorological_conditions', a.alert_meteorological_conditions,
+        'additional_information', a.additional_information,
+        'author_name', a.author_name,
+        'alert_status', a.alert_status,
+        'alert_id', a.alert_id,
+        'alert_created', a.alert_created,
+        'alert_updated', a.alert_updated,
+        'alert_links', COALESCE(
+            (
+                SELECT jsonb_agg(
+                    jsonb_build_object(
+                        'basin', jsonb_build_object(
+                            'basin_id', b.basin_id,
+                            'basin_name', b.basin_name
+                        ),
+                        'alert_level', jsonb_build_object(
+                            'alert_level', l.alert_level,
+                            'alert_level_id', l.alert_level_id
+                        )
+                    )
+                    ORDER BY l.alert_level_id, b.basin_id
+                )
+                FROM py_api.alert_areas aa
+                JOIN py_api.basins b ON b.basin_id = aa.basin_id
+                JOIN py_api.alert_levels l ON l.alert_level_id = aa.alert_level_id
+                WHERE aa.alert_id = a.alert_id
+            ),
+            '[]'::jsonb
+        )
+    ),
+    COALESCE(
+        (
+            SELECT jsonb_agg(
+                jsonb_build_object(
+                    'alert_id', c.alert_id,
+                    'cap_event_status_id', c.cap_event_status_id,
+                    'cap_event_created_date', c.cap_event_created_date,
+                    'cap_event_updated_date', c.cap_event_updated_date,
+                    'cap_event_id', c.cap_event_id,
+                    'alert_level', jsonb_build_object(
+                        'alert_level', l.alert_level,
+                        'alert_level_id', l.alert_level_id
+                    ),
+                    'event_areas', COALESCE(
+                        (
+                            SELECT jsonb_agg(
+                                jsonb_build_object(
+                                    'cap_event_area_id', ca.cap_event_area_id,
+                                    'cap_area_basin', jsonb_build_object(
+                                        'basin_id', b.basin_id,
+                                        'basin_name', b.basin_name,
+                                        'subbasins_id', b.subbasins_id
+                                    )
+                                )
+                                ORDER BY ca.cap_event_area_id
+                            )
+                            FROM py_api.cap_event_areas ca
+                            JOIN py_api.basins b ON b.basin_id = ca.basin_id
+                            WHERE ca.cap_event_id = c.cap_event_id
+                        ),
+                        '[]'::jsonb
+                    )
+                )
+                ORDER BY c.cap_event_id
+            )
+            FROM py_api.cap_event c
+            JOIN py_api.alert_levels l ON l.alert_level_id = c.alert_level_id
+            WHERE c.alert_id = a.alert_id
+        ),
+        '[]'::jsonb
+    )
+FROM py_api.alerts a
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "alert_read_model",
+        sa.Column("alert_id", sa.Integer(), nullable=False),
+        sa.Column("alert_status", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("alert_updated", sa.DateTime(), nullable=False),
+        sa.Column("alert", postgresql.JSONB(), nullable=False),
+        sa.Column("cap_events", postgresql.JSONB(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["alert_id"],
+            ["py_api.alerts.alert_id"],
+        ),
+        sa.PrimaryKeyConstraint("alert_id"),
+        schema="py_api",
+        comment="Denormalized alerts with their basins, alert levels and cap "
+        + "events, maintained by the api",
+    )
+    op.create_index(
+        "ix_alert_read_model_alert_updated_alert_id",
+        "alert_read_model",
+        ["alert_updated", "alert_id"],
+        unique=False,
+        schema="py_api",
+    )
+    op.create_index(
+        "ix_alert_read_model_alert_status_alert_updated",
+        "alert_read_model",
+        ["alert_status", "alert_updated", "alert_id"],
+        unique=False,
+        schema="py_api",
+    )
+    op.execute(POPULATE_READ_MODEL)
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_alert_read_model_alert_status_alert_updated",
+        table_name="alert_read_model",
+        schema="py_api",
+    )
+    op.drop_index(
+        "ix_alert_read_model_alert_updated_alert_id",
+        table_name="alert_read_model",
+        schema="py_api",
+    )
+    op.drop_table("alert_read_model", schema="py_api")
@@ -0,0 +1,46 @@
+"""add indexes to support the alert / cap event history timelines
+
+Revision ID: V15
+Revises: V14
+Create Date: 2026-10-18 17:21:06.533871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "V15"
+down_revision: Union[str, None] = "V14"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_alert_history_alert_id_alert_history_created",
+        "alert_history",
+        ["alert_id", "alert_history_created"],
+        unique=False,
+        schema="py_api",
+    )
+    op.create_index(
+        "ix_cap_event_history_alert_id_cap_event_hist_created_date",
+        "cap_event_history",
+        ["alert_id", "cap_event_hist_created_date"],
+        unique=False,
+        schema="py_api",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_cap_event_history_alert_id_cap_event_hist_created_date",
+        table_name="cap_event_history",
+        schema="py_api",
+    )
+    op.drop_index(
+        "ix_alert_history_alert_id_alert_history_created",
+        table_name="alert_history",
+        schema="py_api",
+    )
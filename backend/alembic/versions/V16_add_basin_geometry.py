@@ -0,0 +1,85 @@
+"""add the basin boundary tables, and load the boundaries from a GeoJSON file
+if one is available
+
+The boundaries are read from alembic/data/basin_boundaries.geojson, or the file
+in the BASIN_GEOMETRY_FILE environment variable, a FeatureCollection with a
+basin_name property on each feature.  When there isn't a file the tables are
+created empty, run the migration again (downgrade / upgrade) once a file is
+available.
+
+Revision ID: V16
+Revises: V15
+Create Date: 2026-10-18 18:42:51.204317
+
+"""
+import logging
+import os
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+import sqlmodel
+from src.v1.crud import crud_geometry
+
+from alembic import op
+
+LOGGER = logging.getLogger(__name__)
+
+# revision identifiers, used by Alembic.
+revision: str = "V16"
+down_revision: Union[str, None] = "V15"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+schema = "py_api"
+basin_geometry_file = os.getenv(
+    "BASIN_GEOMETRY_FILE",
+    os.path.join(os.path.dirname(__file__), "..", "data", "basin_boundaries.geojson"),
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "basin_geometry",
+        sa.Column("basin_id", sa.Integer(), nullable=False),
+        sa.Column("geometry", sa.LargeBinary(), nullable=False),
+        sa.Column("min_x", sa.Float(), nullable=False),
+        sa.Column("min_y", sa.Float(), nullable=False),
+        sa.Column("max_x", sa.Float(), nullable=False),
+        sa.Column("max_y", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["basin_id"],
+            [f"{schema}.basins.basin_id"],
+        ),
+        sa.PrimaryKeyConstraint("basin_id"),
+        schema=schema,
+        comment="Full resolution basin boundaries (WKB, EPSG:4326)",
+    )
+    op.create_table(
+        "basin_geometry_simplified",
+        sa.Column("basin_id", sa.Integer(), nullable=False),
+        sa.Column("tolerance", sa.Float(), nullable=False),
+        sa.Column("geometry", sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["basin_id"],
+            [f"{schema}.basin_geometry.basin_id"],
+        ),
+        sa.PrimaryKeyConstraint("basin_id", "tolerance"),
+        schema=schema,
+        comment="Basin boundaries pre-simplified at several tolerances",
+    )
+
+    if not os.path.exists(basin_geometry_file):
+        LOGGER.warning(
+            f"no basin boundary file at {basin_geometry_file}, "
+            + "the basin geometry tables are empty"
+        )
+        return
+    session = sqlmodel.Session(bind=op.get_bind())
+    crud_geometry.load_geojson_file(session, basin_geometry_file)
+    session.commit()
+    session.close()
+
+
+def downgrade() -> None:
+    op.drop_table("basin_geometry_simplified", schema=schema)
+    op.drop_table("basin_geometry", schema=schema)
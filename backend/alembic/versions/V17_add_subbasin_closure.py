@@ -0,0 +1,100 @@
+"""nest the subbasins, and add the closure table of the subbasin hierarchy
+
+Adds subbasins.parent_subbasin_id and the subbasin_closure table, with a
+record for every subbasin and each of its ancestors, then builds the closure
+from the existing subbasins.  The closure is rebuilt from the parent links by
+crud_subbasins.rebuild_closure, which has to be run again whenever the
+subbasins change.
+
+Revision ID: V17
+Revises: V16
+Create Date: 2026-10-18 20:05:37.618290
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+import sqlmodel
+from src.v1.crud import crud_subbasins
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "V17"
+down_revision: Union[str, None] = "V16"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+schema = "py_api"
+
+
+def upgrade() -> None:
+    op.add_column(
+        "subbasins",
+        sa.Column("parent_subbasin_id", sa.Integer(), nullable=True),
+        schema=schema,
+    )
+    op.create_foreign_key(
+        "fk_subbasins_parent_subbasin_id",
+        "subbasins",
+        "subbasins",
+        ["parent_subbasin_id"],
+        ["subbasin_id"],
+        source_schema=schema,
+        referent_schema=schema,
+    )
+    op.create_table(
+        "subbasin_closure",
+        sa.Column("ancestor_id", sa.Integer(), nullable=False),
+        sa.Column("descendant_id", sa.Integer(), nullable=False),
+        sa.Column("depth", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["ancestor_id"],
+            [f"{schema}.subbasins.subbasin_id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["descendant_id"],
+            [f"{schema}.subbasins.subbasin_id"],
+        ),
+        sa.PrimaryKeyConstraint("ancestor_id", "descendant_id"),
+        schema=schema,
+        comment="Every ancestor / descendant pair of the subbasin hierarchy",
+    )
+    op.create_index(
+        "ix_subbasin_closure_descendant_id",
+        "subbasin_closure",
+        ["descendant_id"],
+        unique=False,
+        schema=schema,
+    )
+    # basins are expanded / rolled up by joining basins.subbasins_id to the
+    # closure
+    op.create_index(
+        "ix_basins_subbasins_id",
+        "basins",
+        ["subbasins_id"],
+        unique=False,
+        schema=schema,
+    )
+
+    session = sqlmodel.Session(bind=op.get_bind())
+    crud_subbasins.rebuild_closure(session)
+    session.commit()
+    session.close()
+
+
+def downgrade() -> None:
+    op.drop_index("ix_basins_subbasins_id", table_name="basins", schema=schema)
+    op.drop_index(
+        "ix_subbasin_closure_descendant_id",
+        table_name="subbasin_closure",
+        schema=schema,
+    )
+    op.drop_table("subbasin_closure", schema=schema)
+    op.drop_constraint(
+        "fk_subbasins_parent_subbasin_id",
+        "subbasins",
+        schema=schema,
+        type_="foreignkey",
+    )
+    op.drop_column("subbasins", "parent_subbasin_id", schema=schema)
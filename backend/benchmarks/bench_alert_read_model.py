@@ -0,0 +1,142 @@
+"""
+Benchmark for the alert read model.  Creates alerts with cap events in an in
+memory sqlite database, then retrieves and serializes a page of the alert list
+and a single alert, both from the normalized tables (crud_alerts, as the
+routes did before the read model) and from the read model (crud_read_model).
+Reports the number of sql statements and the time taken.
+
+The read model is maintained when the alerts are written, the cost of that is
+reported per alert written.
+
+usage (from the backend directory):
+    python benchmarks/bench_alert_read_model.py [alerts] [iterations]
+"""
+
+import os
+import sys
+import time
+
+import sqlmodel
+from sqlalchemy import event
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_reconcile_caps import build_alert, build_engine, load_json  # noqa: E402
+from src.v1.crud import crud_alerts, crud_cap, crud_read_model  # noqa: E402
+from src.v1.models import alerts as alerts_models  # noqa: E402
+
+PAGE_SIZE = 100
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _record(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *args):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+
+def serialize_alerts(alerts: list[alerts_models.Alerts]) -> list[dict]:
+    # what the response_model does with the orm records
+    return [
+        alerts_models.Alert_Basins.model_validate(alert).model_dump(mode="json")
+        for alert in alerts
+    ]
+
+
+def serialize_read_models(read_models: list[alerts_models.Alert_Read_Model]):
+    return [
+        alerts_models.Alert_Basins.model_validate(read_model.alert).model_dump(
+            mode="json"
+        )
+        for read_model in read_models
+    ]
+
+
+def time_reads(engine, label: str, read, iterations: int):
+    elapsed = 0
+    for _ in range(iterations):
+        # a new session for each read, like a request
+        with sqlmodel.Session(engine) as session:
+            with StatementCounter(engine) as counter:
+                start = time.perf_counter()
+                read(session)
+                elapsed += time.perf_counter() - start
+    print(
+        f"{label:<32} {counter.count:>3} statements, "
+        + f"{elapsed / iterations * 1000:8.2f} ms"
+    )
+
+
+def run(alert_count: int, iterations: int):
+    engine = build_engine()
+    basin_names = [basin["basin_name"] for basin in load_json("basins.json")]
+    alert_levels = [level["alert_level"] for level in load_json("alert_levels.json")]
+
+    start = time.perf_counter()
+    with sqlmodel.Session(engine) as session:
+        for cnt in range(alert_count):
+            # each alert covers a third of the basins, across the alert levels
+            basins = basin_names[cnt % 3 :: 3]
+            basin_levels = {
+                alert_level: basins[level_cnt :: len(alert_levels)]
+                for level_cnt, alert_level in enumerate(alert_levels)
+            }
+            alert = crud_alerts.create_alert(session, build_alert(basin_levels))
+            crud_cap.create_cap_event(session, alert)
+            session.commit()
+    print(
+        f"created {alert_count} alerts, "
+        + f"{(time.perf_counter() - start) / alert_count * 1000:.2f} ms/alert "
+        + "including the read model"
+    )
+    with sqlmodel.Session(engine) as session:
+        alert_id = crud_alerts.get_alerts(session, limit=1)[0].alert_id
+
+    time_reads(
+        engine,
+        f"list {PAGE_SIZE}, normalized",
+        lambda session: serialize_alerts(
+            crud_alerts.get_alerts(session, limit=PAGE_SIZE)
+        ),
+        iterations,
+    )
+    time_reads(
+        engine,
+        f"list {PAGE_SIZE}, read model",
+        lambda session: serialize_read_models(
+            crud_read_model.get_alerts(session, limit=PAGE_SIZE)
+        ),
+        iterations,
+    )
+    time_reads(
+        engine,
+        "single alert + caps, normalized",
+        lambda session: (
+            serialize_alerts([crud_alerts.get_alert(session, alert_id)]),
+            crud_cap.get_cap_events_for_alert(session, alert_id),
+        ),
+        iterations,
+    )
+    time_reads(
+        engine,
+        "single alert + caps, read model",
+        lambda session: serialize_read_models(
+            [crud_read_model.get_alert(session, alert_id)]
+        ),
+        iterations,
+    )
+
+
+if __name__ == "__main__":
+    alert_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    run(alert_count, iterations)
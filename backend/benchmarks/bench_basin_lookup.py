@@ -0,0 +1,116 @@
+"""
+Benchmark for finding the basins at a point / in a bounding box.  Builds a
+boundary snapshot of synthetic basins, detailed polygons laid out on a grid,
+then compares:
+
+    * scan  - checking every boundary, what a query without the index costs
+    * index - the STRtree / prepared boundaries of the geometry cache snapshot
+
+Reports the time per lookup for random points and bounding boxes.
+
+usage (from the backend directory):
+    python benchmarks/bench_basin_lookup.py [basins] [vertices] [lookups]
+"""
+
+import gc
+import math
+import os
+import random
+import sys
+import time
+
+import shapely
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.v1.crud.geometry_cache import (  # noqa: E402
+    FULL_RESOLUTION,
+    BasinGeometries,
+)
+
+GRID_SPACING = 1.0
+
+
+def build_snapshot(basin_count: int, vertices: int) -> BasinGeometries:
+    columns = math.ceil(math.sqrt(basin_count))
+    geometries = {}
+    for basin_id in range(1, basin_count + 1):
+        lon = -139 + ((basin_id - 1) % columns) * GRID_SPACING
+        lat = 48 + ((basin_id - 1) // columns) * GRID_SPACING
+        # a wobbly circle, so the boundaries have plenty of vertices
+        angles = [2 * math.pi * cnt / vertices for cnt in range(vertices)]
+        radii = [0.45 + 0.03 * math.sin(angle * 17) for angle in angles]
+        boundary = shapely.Polygon(
+            [
+                (lon + radius * math.cos(angle), lat + radius * math.sin(angle))
+                for angle, radius in zip(angles, radii)
+            ]
+        )
+        geometries[basin_id] = {FULL_RESOLUTION: boundary}
+    return BasinGeometries(
+        version=1,
+        schema_version=None,
+        basin_names={basin_id: f"basin {basin_id}" for basin_id in geometries},
+        geometries=geometries,
+        cap_tolerance=0,
+    )
+
+
+def scan(snapshot: BasinGeometries, geometry) -> list[int]:
+    return sorted(
+        basin_id
+        for basin_id, shapes in snapshot.geometries.items()
+        if shapes[FULL_RESOLUTION].intersects(geometry)
+    )
+
+
+def time_lookups(label: str, lookup, queries):
+    # warm up, the first lookups in a process are slower
+    for query in queries[:100]:
+        lookup(query)
+    # like timeit, keep garbage collection pauses out of the timings
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        found = sum(len(lookup(query)) for query in queries)
+        elapsed = time.perf_counter() - start
+    finally:
+        gc.enable()
+    print(
+        f"{label:<12} {elapsed / len(queries) * 1_000_000:10.1f} us/lookup, "
+        + f"{found / len(queries):5.2f} basins/lookup"
+    )
+
+
+def run(basin_count: int, vertices: int, lookup_count: int):
+    start = time.perf_counter()
+    snapshot = build_snapshot(basin_count, vertices)
+    print(
+        f"{basin_count} basins, {vertices} vertices each, snapshot built in "
+        + f"{(time.perf_counter() - start) * 1000:.0f} ms"
+    )
+    min_x, min_y, max_x, max_y = shapely.total_bounds(
+        [shapes[FULL_RESOLUTION] for shapes in snapshot.geometries.values()]
+    )
+    rand = random.Random(42)
+    points = [
+        (rand.uniform(min_x, max_x), rand.uniform(min_y, max_y))
+        for _ in range(lookup_count)
+    ]
+    bboxes = [(lon, lat, lon + 1.5, lat + 1.5) for lon, lat in points]
+
+    time_lookups(
+        "scan point", lambda point: scan(snapshot, shapely.Point(*point)), points
+    )
+    time_lookups(
+        "index point", lambda point: snapshot.basins_at_point(*point), points
+    )
+    time_lookups("scan bbox", lambda bbox: scan(snapshot, shapely.box(*bbox)), bboxes)
+    time_lookups("index bbox", snapshot.basins_in_bbox, bboxes)
+
+
+if __name__ == "__main__":
+    basin_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    vertices = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    lookup_count = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    run(basin_count, vertices, lookup_count)
@@ -0,0 +1,80 @@
+"""
+Microbenchmark for crud_cap.CapDelta.
+
+Builds synthetic existing / new cap states for alerts with hundreds of basins
+spread over 4 alert levels, where the new state has the basins in a different
+order and a few basins moved between levels, then times the calculation of the
+delta and the creates / updates / cancels accessors.  No database is required.
+
+usage (from the backend directory):
+    python benchmarks/bench_cap_delta.py [iterations]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.v1.crud import crud_cap  # noqa: E402
+from src.v1.models import alerts as alerts_models  # noqa: E402
+from src.v1.models import basins as basins_models  # noqa: E402
+from src.v1.models import cap as cap_models  # noqa: E402
+
+ALERT_LEVELS = ["Level1", "Level2", "Level3", "Level4"]
+
+
+def build_cap_struct(levels: dict[str, list[str]]) -> list[cap_models.Cap_Comparison]:
+    return [
+        cap_models.Cap_Comparison(
+            alert_level=alerts_models.Alert_Levels_Base(alert_level=alert_level),
+            basins=[basins_models.BasinBase(basin_name=name) for name in basin_names],
+        )
+        for alert_level, basin_names in levels.items()
+    ]
+
+
+def build_states(
+    basin_count: int, moved: int, rand: random.Random
+) -> tuple[list[cap_models.Cap_Comparison], list[cap_models.Cap_Comparison]]:
+    basin_names = [f"basin{num}" for num in range(basin_count)]
+    existing = {alert_level: [] for alert_level in ALERT_LEVELS}
+    for basin_name in basin_names:
+        existing[rand.choice(ALERT_LEVELS)].append(basin_name)
+
+    new = {alert_level: list(names) for alert_level, names in existing.items()}
+    for basin_name in rand.sample(basin_names, moved):
+        for names in new.values():
+            if basin_name in names:
+                names.remove(basin_name)
+        new[rand.choice(ALERT_LEVELS)].append(basin_name)
+    for names in new.values():
+        rand.shuffle(names)
+    return build_cap_struct(existing), build_cap_struct(new)
+
+
+def run(iterations: int):
+    rand = random.Random(42)
+    for basin_count in [100, 300, 1000]:
+        existing, new = build_states(basin_count, moved=5, rand=rand)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            delta = crud_cap.CapDelta(
+                existing_cap_struct=existing,
+                new_cap_struct=new,
+                incomming_alert_status=alerts_models.AlertStatus.active,
+            )
+            delta.getCreates()
+            delta.getUpdates()
+            delta.getCancels()
+        elapsed = time.perf_counter() - start
+        print(
+            f"{basin_count:>5} basins: {elapsed / iterations * 1e6:10.1f} us/delta, "
+            + f"updates: {len(delta.getUpdates())}"
+        )
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    run(iterations)
@@ -0,0 +1,119 @@
+"""
+Benchmark for polling the feed of active cap events.  Creates alerts with cap
+events in an in memory sqlite database, then compares:
+
+    * query  - listing every cap event with crud_cap.get_cap_events and
+      serializing it, what a poll costs without the feed
+    * poll   - serving the pre-rendered feed
+    * change - serving the feed after one alert has been updated, only the
+      entries of that alert's cap events are rendered again
+
+Reports the number of sql statements and the time taken for each poll.
+
+usage (from the backend directory):
+    python benchmarks/bench_cap_feed.py [alerts] [iterations]
+"""
+
+import datetime
+import os
+import sys
+import time
+
+import sqlmodel
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_alert_read_model import StatementCounter  # noqa: E402
+from bench_reconcile_caps import build_alert, build_engine, load_json  # noqa: E402
+from src.v1.crud import crud_alerts, crud_cap  # noqa: E402
+from src.v1.models import alerts as alerts_models  # noqa: E402
+from src.v1.renderers import cap_feed  # noqa: E402
+from src.v1.routes.serializers import (  # noqa: E402
+    cap_event_list_adapter,
+    validated_json_response,
+)
+
+
+def query_caps(session) -> bytes:
+    return validated_json_response(
+        cap_event_list_adapter, crud_cap.get_cap_events(session)
+    ).body
+
+
+def poll_feed(session, feed: cap_feed.CapFeed) -> bytes:
+    body, etag = feed.get(session)
+    return body
+
+
+def touch_alert(engine, alert_id: int):
+    with sqlmodel.Session(engine) as session:
+        alert = session.get(alerts_models.Alerts, alert_id)
+        alert.alert_description = f"{alert.alert_description}."
+        alert.alert_updated = datetime.datetime.now(datetime.timezone.utc)
+        session.commit()
+
+
+def time_poll(engine, label: str, poll, iterations: int, before=None):
+    elapsed = 0
+    statements = 0
+    for cnt in range(iterations):
+        if before:
+            before(cnt)
+        with sqlmodel.Session(engine) as session:
+            with StatementCounter(engine) as counter:
+                start = time.perf_counter()
+                body = poll(session)
+                elapsed += time.perf_counter() - start
+            statements += counter.count
+    print(
+        f"{label:<8} {statements / iterations:>5.1f} statements, "
+        + f"{elapsed / iterations * 1000:8.2f} ms/poll, {len(body) / 1024:8.1f} KiB"
+    )
+
+
+def run(alert_count: int, iterations: int):
+    engine = build_engine()
+    basin_names = [basin["basin_name"] for basin in load_json("basins.json")]
+    alert_levels = [level["alert_level"] for level in load_json("alert_levels.json")]
+
+    alert_ids = []
+    with sqlmodel.Session(engine) as session:
+        for cnt in range(alert_count):
+            # each alert covers a third of the basins, across the alert levels
+            basins = basin_names[cnt % 3 :: 3]
+            basin_levels = {
+                alert_level: basins[level_cnt :: len(alert_levels)]
+                for level_cnt, alert_level in enumerate(alert_levels)
+            }
+            alert = crud_alerts.create_alert(session, build_alert(basin_levels))
+            crud_cap.create_cap_event(session, alert)
+            session.commit()
+            alert_ids.append(alert.alert_id)
+        cap_event_count = len(crud_cap.get_active_cap_event_versions(session))
+    print(f"{alert_count} alerts, {cap_event_count} active cap events")
+
+    feed = cap_feed.CapFeed(revalidate_interval=3600)
+    with sqlmodel.Session(engine) as session:
+        feed.get(session)
+
+    time_poll(engine, "query", query_caps, iterations)
+    time_poll(engine, "poll", lambda session: poll_feed(session, feed), iterations)
+
+    def change(cnt):
+        touch_alert(engine, alert_ids[cnt % len(alert_ids)])
+        # the global feed is invalidated by the commit, this one by hand
+        feed.invalidate()
+
+    time_poll(
+        engine,
+        "change",
+        lambda session: poll_feed(session, feed),
+        iterations,
+        before=change,
+    )
+
+
+if __name__ == "__main__":
+    alert_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    run(alert_count, iterations)
@@ -0,0 +1,80 @@
+"""
+Benchmark for rendering the CAP 1.2 messages of every active cap event, as one
+feed would.  Creates alerts with cap events in an in memory sqlite database,
+then renders the messages for all the cap events that haven't been cancelled:
+
+    * cold - the document cache is empty, every message is rendered
+    * warm - the messages are served from the document cache, only the ids /
+      updated dates of the cap events and alerts are queried to work out the
+      document keys
+
+Reports the number of sql statements and the time taken for each feed.
+
+usage (from the backend directory):
+    python benchmarks/bench_cap_xml.py [alerts] [iterations]
+"""
+
+import os
+import sys
+import time
+
+import sqlmodel
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_alert_read_model import StatementCounter  # noqa: E402
+from bench_reconcile_caps import build_alert, build_engine, load_json  # noqa: E402
+from src.v1.crud import crud_alerts, crud_cap  # noqa: E402
+from src.v1.renderers import cap_xml  # noqa: E402
+
+
+def render_feed(session, cache: cap_xml.CapDocumentCache) -> bytes:
+    versions = crud_cap.get_active_cap_event_versions(session)
+    documents = cap_xml.render_cap_messages(session, versions, cache=cache)
+    return b"".join(body for key, body in documents)
+
+
+def time_feed(engine, label: str, cache, iterations: int, clear: bool):
+    elapsed = 0
+    for _ in range(iterations):
+        if clear:
+            cache.clear()
+        with sqlmodel.Session(engine) as session:
+            with StatementCounter(engine) as counter:
+                start = time.perf_counter()
+                feed = render_feed(session, cache)
+                elapsed += time.perf_counter() - start
+    print(
+        f"{label:<8} {counter.count:>3} statements, "
+        + f"{elapsed / iterations * 1000:8.2f} ms/feed, {len(feed) / 1024:8.1f} KiB"
+    )
+
+
+def run(alert_count: int, iterations: int):
+    engine = build_engine()
+    basin_names = [basin["basin_name"] for basin in load_json("basins.json")]
+    alert_levels = [level["alert_level"] for level in load_json("alert_levels.json")]
+
+    with sqlmodel.Session(engine) as session:
+        for cnt in range(alert_count):
+            # each alert covers a third of the basins, across the alert levels
+            basins = basin_names[cnt % 3 :: 3]
+            basin_levels = {
+                alert_level: basins[level_cnt :: len(alert_levels)]
+                for level_cnt, alert_level in enumerate(alert_levels)
+            }
+            alert = crud_alerts.create_alert(session, build_alert(basin_levels))
+            crud_cap.create_cap_event(session, alert)
+            session.commit()
+        cap_event_count = len(crud_cap.get_active_cap_event_versions(session))
+    print(f"{alert_count} alerts, {cap_event_count} active cap events")
+
+    cache = cap_xml.CapDocumentCache(maxsize=cap_event_count)
+    time_feed(engine, "cold", cache, iterations, clear=True)
+    time_feed(engine, "warm", cache, iterations, clear=False)
+
+
+if __name__ == "__main__":
+    alert_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    run(alert_count, iterations)
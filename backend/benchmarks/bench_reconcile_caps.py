@@ -0,0 +1,138 @@
+"""
+Benchmark for the cap event reconciliation that runs when an alert is edited.
+
+Creates an alert with cap events in an in memory sqlite database, edits the
+alert so that one alert level has basins added / removed (UPDATE), one alert
+level is removed (CANCEL) and one is added (ALERT), then reconciles the cap
+events.  Reports the number of sql statements (database round trips) and the
+time taken by the reconciliation.
+
+usage (from the backend directory):
+    python benchmarks/bench_reconcile_caps.py [iterations]
+"""
+
+import datetime
+import json
+import os
+import sys
+import time
+
+import sqlmodel
+from sqlalchemy import create_engine, event
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.v1.crud import crud_alerts, crud_cap  # noqa: E402
+from src.v1.models import alerts as alerts_models  # noqa: E402
+from src.v1.models import basins as basins_model  # noqa: E402
+from src.v1.models import cap as cap_models  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "alembic", "data")
+
+
+def load_json(file_name: str) -> list[dict]:
+    with open(os.path.join(DATA_DIR, file_name)) as json_fh:
+        return json.load(json_fh)
+
+
+def build_engine():
+    engine = create_engine(
+        "sqlite://", execution_options={"schema_translate_map": {"py_api": None}}
+    )
+    sqlmodel.SQLModel.metadata.create_all(engine)
+    with sqlmodel.Session(engine) as session:
+        for basin in load_json("basins.json"):
+            session.add(basins_model.Basins(basin_name=basin["basin_name"]))
+        for alert_level in load_json("alert_levels.json"):
+            session.add(alerts_models.Alert_Levels(alert_level=alert_level["alert_level"]))
+        for cap_status in load_json("cap_statuses.json"):
+            session.add(
+                cap_models.Cap_Event_Status(
+                    cap_event_status=cap_status["cap_event_status"]
+                )
+            )
+        session.commit()
+    return engine
+
+
+def build_alert(basin_levels: dict[str, list[str]]) -> alerts_models.Alert_Basins_Write:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return alerts_models.Alert_Basins_Write(
+        alert_description="benchmark alert",
+        alert_hydro_conditions="hydro conditions",
+        alert_meteorological_conditions="met conditions",
+        additional_information="additional information",
+        author_name="benchmark",
+        alert_status=alerts_models.AlertStatus.active.value,
+        alert_created=now,
+        alert_updated=now,
+        alert_links=[
+            alerts_models.Alert_Areas_Write(
+                basin=basins_model.BasinBase(basin_name=basin_name),
+                alert_level=alerts_models.Alert_Levels_Base(alert_level=alert_level),
+            )
+            for alert_level, basin_names in basin_levels.items()
+            for basin_name in basin_names
+        ],
+    )
+
+
+def run(iterations: int):
+    engine = build_engine()
+    basin_names = [basin["basin_name"] for basin in load_json("basins.json")]
+    advisory, watch, warning = [
+        level["alert_level"] for level in load_json("alert_levels.json")
+    ]
+    third = len(basin_names) // 3
+    initial_basin_levels = {
+        advisory: basin_names[: third * 2],
+        watch: basin_names[third * 2 :],
+    }
+    # advisory basins change, watch is cancelled, warning is new
+    updated_basin_levels = {
+        advisory: basin_names[third:],
+        warning: basin_names[:third],
+    }
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    elapsed = 0
+    for _ in range(iterations):
+        with sqlmodel.Session(engine) as session:
+            alert = crud_alerts.create_alert(session, build_alert(initial_basin_levels))
+            crud_cap.create_cap_event(session, alert)
+            session.commit()
+            alert_id = alert.alert_id
+
+            alert = crud_alerts.update_alert(
+                session, alert_id, build_alert(updated_basin_levels)
+            )
+            session.flush()
+
+            statements.clear()
+            event.listen(engine, "before_cursor_execute", count)
+            start = time.perf_counter()
+            crud_cap.reconcile_caps(session, alert)
+            session.flush()
+            elapsed += time.perf_counter() - start
+            event.remove(engine, "before_cursor_execute", count)
+
+            cap_events = crud_cap.get_cap_events_for_alert(session, alert_id)
+            statuses = sorted(
+                cap_event.cap_event_status.cap_event_status for cap_event in cap_events
+            )
+            assert statuses == ["ALERT", "CANCEL", "UPDATE"], statuses
+            session.commit()
+
+    print(
+        f"round trips per reconciliation: {len(statements)}, "
+        + f"{elapsed / iterations * 1000:8.2f} ms/reconciliation"
+    )
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    run(iterations)
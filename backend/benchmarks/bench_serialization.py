@@ -0,0 +1,137 @@
+"""
+Benchmark for the serialization of the list responses.  Builds synthetic alerts
+(orm objects, no database) that each cover a few basins at a few alert levels,
+then serializes them the ways the list routes can:
+
+    * response_model, json - what FastAPI does when a route returns the orm
+      records, validate against the response model, dump to python and encode
+      with json.dumps (JSONResponse)
+    * response_model, orjson - the same, encoded with orjson (ORJSONResponse,
+      the app's default response class)
+    * type adapter - serializers.validated_json_response, validated once and
+      dumped straight to json by pydantic (GET /cap/)
+    * trusted documents - serializers.trusted_json_response, documents that
+      already match the response model encoded with orjson (GET /alerts/ from
+      the alert read model)
+
+usage (from the backend directory):
+    python benchmarks/bench_serialization.py [alerts] [iterations]
+"""
+
+import datetime
+import json
+import os
+import sys
+import time
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_reconcile_caps import load_json  # noqa: E402
+from src.v1.models import alerts as alerts_models  # noqa: E402
+from src.v1.models import basins as basins_model  # noqa: E402
+from src.v1.routes import serializers  # noqa: E402
+
+BASINS_PER_LEVEL = 4
+
+
+def build_alerts(alert_count: int) -> list[alerts_models.Alerts]:
+    basins = [
+        basins_model.Basins(basin_id=basin_id, basin_name=basin["basin_name"])
+        for basin_id, basin in enumerate(load_json("basins.json"), start=1)
+    ]
+    alert_levels = [
+        alerts_models.Alert_Levels(
+            alert_level_id=alert_level_id, alert_level=alert_level["alert_level"]
+        )
+        for alert_level_id, alert_level in enumerate(
+            load_json("alert_levels.json"), start=1
+        )
+    ]
+    now = datetime.datetime.now(datetime.timezone.utc)
+    alerts = []
+    for alert_id in range(1, alert_count + 1):
+        alert = alerts_models.Alerts(
+            alert_id=alert_id,
+            alert_description=f"benchmark alert {alert_id}",
+            alert_hydro_conditions="hydro conditions",
+            alert_meteorological_conditions="met conditions",
+            additional_information="additional information",
+            author_name="benchmark",
+            alert_status=alerts_models.AlertStatus.active.value,
+            alert_created=now,
+            alert_updated=now,
+        )
+        alert.alert_links = [
+            alerts_models.Alert_Areas(
+                basin=basins[(alert_id + offset) % len(basins)],
+                alert_level=alert_level,
+            )
+            for level_index, alert_level in enumerate(alert_levels)
+            for offset in range(
+                level_index * BASINS_PER_LEVEL, (level_index + 1) * BASINS_PER_LEVEL
+            )
+        ]
+        alerts.append(alert)
+    return alerts
+
+
+def response_model_json(alerts):
+    adapter = serializers.alert_list_adapter
+    validated = adapter.validate_python(alerts, from_attributes=True)
+    return JSONResponse(adapter.dump_python(validated, mode="json")).body
+
+
+def response_model_orjson(alerts):
+    adapter = serializers.alert_list_adapter
+    validated = adapter.validate_python(alerts, from_attributes=True)
+    return ORJSONResponse(adapter.dump_python(validated, mode="json")).body
+
+
+def type_adapter(alerts):
+    return serializers.validated_json_response(
+        serializers.alert_list_adapter, alerts
+    ).body
+
+
+def trusted_documents(documents):
+    return serializers.trusted_json_response(documents).body
+
+
+def run(alert_count: int, iterations: int):
+    alerts = build_alerts(alert_count)
+    # the documents stored in the alert read model
+    documents = [
+        alerts_models.Alert_Basins.model_validate(alert).model_dump(mode="json")
+        for alert in alerts
+    ]
+    print(f"{alert_count} alerts, {BASINS_PER_LEVEL} basins per alert level")
+
+    expected = None
+    for label, serialize, content in [
+        ("response_model, json", response_model_json, alerts),
+        ("response_model, orjson", response_model_orjson, alerts),
+        ("type adapter", type_adapter, alerts),
+        ("trusted documents", trusted_documents, documents),
+    ]:
+        body = serialize(content)
+        # all the ways produce the same response
+        if expected is None:
+            expected = json.loads(body)
+        assert json.loads(body) == expected, label
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            serialize(content)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{label:<24} {elapsed / iterations * 1000:8.2f} ms, "
+            + f"{len(body) / 1024:8.1f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    alert_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    run(alert_count, iterations)
@@ -0,0 +1,138 @@
+"""
+Benchmark for expanding a subbasin to all the basins below it.  Builds a
+nested subbasin hierarchy in an in memory sqlite database, with basins in the
+lowest subbasins, then compares:
+
+    * walk    - following the parent links / basin relationships down from
+      the subbasin, a query per subbasin
+    * closure - a single join on the subbasin_closure table
+    * cache   - the basins below each subbasin in the cached hierarchy
+
+Reports the number of sql statements and the time taken to expand the top
+level subbasin and one of the subbasins below it.
+
+usage (from the backend directory):
+    python benchmarks/bench_subbasin_expansion.py [depth] [fanout] [iterations]
+"""
+
+import os
+import sys
+import time
+
+import sqlmodel
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_alert_read_model import StatementCounter  # noqa: E402
+from bench_reconcile_caps import build_engine  # noqa: E402
+from src.v1.crud import crud_subbasins  # noqa: E402
+from src.v1.crud.hierarchy_cache import BasinHierarchyCache  # noqa: E402
+from src.v1.models import basins as basins_models  # noqa: E402
+
+BASINS_PER_SUBBASIN = 4
+
+
+def build_hierarchy(engine, depth: int, fanout: int) -> list[int]:
+    """
+    :return: the id of the first subbasin at each level, top level first
+    """
+    first_ids = []
+    with sqlmodel.Session(engine) as session:
+        parents = [None]
+        for level in range(depth):
+            children = []
+            for parent_id in parents:
+                for _ in range(1 if level == 0 else fanout):
+                    subbasin = basins_models.Subbasins(
+                        sub_basin_name=f"subbasin {level}.{len(children)}",
+                        parent_subbasin_id=parent_id,
+                    )
+                    session.add(subbasin)
+                    session.flush()
+                    children.append(subbasin.subbasin_id)
+            first_ids.append(children[0])
+            parents = children
+        for subbasin_id in parents:
+            for cnt in range(BASINS_PER_SUBBASIN):
+                session.add(
+                    basins_models.Basins(
+                        basin_name=f"basin {subbasin_id}.{cnt}",
+                        subbasins_id=subbasin_id,
+                    )
+                )
+        crud_subbasins.rebuild_closure(session)
+        session.commit()
+    return first_ids
+
+
+def walk(session, subbasin_id: int) -> list[int]:
+    basin_ids = []
+    pending = [subbasin_id]
+    while pending:
+        subbasin = session.get(basins_models.Subbasins, pending.pop())
+        basin_ids.extend(basin.basin_id for basin in subbasin.basins)
+        pending.extend(
+            session.exec(
+                sqlmodel.select(basins_models.Subbasins.subbasin_id).where(
+                    basins_models.Subbasins.parent_subbasin_id == subbasin.subbasin_id
+                )
+            ).all()
+        )
+    return sorted(basin_ids)
+
+
+def closure(session, subbasin_id: int) -> list[int]:
+    return [
+        basin.basin_id
+        for basin in crud_subbasins.get_basins_in_subbasins(session, [subbasin_id])
+    ]
+
+
+def time_expansion(engine, label: str, expand, subbasin_id: int, iterations: int):
+    elapsed = 0
+    statements = 0
+    for _ in range(iterations):
+        with sqlmodel.Session(engine) as session:
+            with StatementCounter(engine) as counter:
+                start = time.perf_counter()
+                basin_ids = expand(session, subbasin_id)
+                elapsed += time.perf_counter() - start
+            statements += counter.count
+    print(
+        f"{label:<16} {statements / iterations:>7.1f} statements, "
+        + f"{elapsed / iterations * 1000:8.3f} ms/expansion, "
+        + f"{len(basin_ids):>6} basins"
+    )
+
+
+def run(depth: int, fanout: int, iterations: int):
+    engine = build_engine()
+    first_ids = build_hierarchy(engine, depth, fanout)
+    cache = BasinHierarchyCache()
+    with sqlmodel.Session(engine) as session:
+        start = time.perf_counter()
+        cache.get(session)
+        print(
+            f"depth {depth}, fanout {fanout}, hierarchy cached in "
+            + f"{(time.perf_counter() - start) * 1000:.0f} ms"
+        )
+
+    for level, subbasin_id in enumerate(first_ids[:2]):
+        time_expansion(engine, f"walk level {level}", walk, subbasin_id, iterations)
+        time_expansion(
+            engine, f"closure level {level}", closure, subbasin_id, iterations
+        )
+        time_expansion(
+            engine,
+            f"cache level {level}",
+            lambda session, subbasin_id: cache.get(session).expand([subbasin_id]),
+            subbasin_id,
+            iterations,
+        )
+
+
+if __name__ == "__main__":
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    fanout = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    iterations = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    run(depth, fanout, iterations)
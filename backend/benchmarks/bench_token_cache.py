@@ -0,0 +1,81 @@
+"""
+Microbenchmark for the verified token cache.
+
+Measures how many requests per second can have their bearer token verified
+through oidcAuthorize.verify_token with the token cache enabled and disabled.
+The signing keys are preloaded into the jwks cache so no http calls are made,
+the numbers only reflect the cost of the jwt decode / signature verification.
+
+usage (from the backend directory):
+    python benchmarks/bench_token_cache.py [iterations]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.core.config import Configuration  # noqa: E402
+from src.oidc import oidcAuthorize  # noqa: E402
+from src.oidc.token_cache import VerifiedTokenCache  # noqa: E402
+
+KID = "bench-key"
+
+
+def build_token() -> str:
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    public_jwk = jwk.construct(public_pem, algorithm="RS256").to_dict()
+    public_jwk["kid"] = KID
+
+    # preload the jwks cache so the benchmark never makes http calls
+    oidcAuthorize.jwks_cache.keys = {KID: public_jwk}
+    oidcAuthorize.jwks_cache.fetched_at = time.monotonic()
+
+    now = int(time.time())
+    claims = {
+        "exp": now + 3600,
+        "iat": now,
+        "aud": Configuration.OIDC_CLIENT_ID,
+        "client_roles": ["editor"],
+        "display_name": "benchmark",
+    }
+    return jwt.encode(claims, private_pem, algorithm="RS256", headers={"kid": KID})
+
+
+async def verify(token: str, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await oidcAuthorize.verify_token(f"Bearer {token}")
+    return time.perf_counter() - start
+
+
+def run(iterations: int):
+    token = build_token()
+    for label, maxsize in [("cache off", 0), ("cache on", 1024)]:
+        oidcAuthorize.token_cache = VerifiedTokenCache(maxsize=maxsize)
+        elapsed = asyncio.run(verify(token, iterations))
+        print(
+            f"{label:>10}: {iterations / elapsed:12.1f} verified requests/sec "
+            + f"({elapsed / iterations * 1e6:8.2f} us/request) "
+            + f"stats: {oidcAuthorize.token_cache.stats()}"
+        )
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    run(iterations)
@@ -0,0 +1,131 @@
+"""
+Benchmark for crud_alerts.update_alert.
+
+Creates an alert in an in memory sqlite database that covers every basin, with
+half of the basins at every alert level, then updates it so the other half of
+the basins are at every alert level.  Reports the number of sql statements
+(database round trips) and the time taken by the update.
+
+usage (from the backend directory):
+    python benchmarks/bench_update_alert.py [iterations]
+"""
+
+import datetime
+import json
+import os
+import sys
+import time
+
+import sqlmodel
+from sqlalchemy import create_engine, event
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.v1.crud import crud_alerts  # noqa: E402
+from src.v1.models import alerts as alerts_models  # noqa: E402
+from src.v1.models import basins as basins_model  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "alembic", "data")
+
+
+def load_json(file_name: str) -> list[dict]:
+    with open(os.path.join(DATA_DIR, file_name)) as json_fh:
+        return json.load(json_fh)
+
+
+def build_engine():
+    engine = create_engine(
+        "sqlite://", execution_options={"schema_translate_map": {"py_api": None}}
+    )
+    sqlmodel.SQLModel.metadata.create_all(engine)
+    with sqlmodel.Session(engine) as session:
+        for basin in load_json("basins.json"):
+            session.add(basins_model.Basins(basin_name=basin["basin_name"]))
+        for alert_level in load_json("alert_levels.json"):
+            session.add(alerts_models.Alert_Levels(alert_level=alert_level["alert_level"]))
+        session.commit()
+    return engine
+
+
+def build_alert(basin_levels: list[tuple[str, str]]) -> alerts_models.Alert_Basins_Write:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return alerts_models.Alert_Basins_Write(
+        alert_description="benchmark alert",
+        alert_hydro_conditions="hydro conditions",
+        alert_meteorological_conditions="met conditions",
+        additional_information="additional information",
+        author_name="benchmark",
+        alert_status=alerts_models.AlertStatus.active.value,
+        alert_created=now,
+        alert_updated=now,
+        alert_links=[
+            alerts_models.Alert_Areas_Write(
+                basin=basins_model.BasinBase(basin_name=basin_name),
+                alert_level=alerts_models.Alert_Levels_Base(alert_level=alert_level),
+            )
+            for basin_name, alert_level in basin_levels
+        ],
+    )
+
+
+def run(iterations: int):
+    engine = build_engine()
+    basin_names = [basin["basin_name"] for basin in load_json("basins.json")]
+    alert_levels = [level["alert_level"] for level in load_json("alert_levels.json")]
+    # half the basins are at every alert level, the other half only at the
+    # first level.  The update swaps the halves so it has deletes, inserts and
+    # unchanged links
+    half = len(basin_names) // 2
+
+    def basin_levels(at_every_level: list[str]) -> list[tuple[str, str]]:
+        return [
+            (basin_name, alert_level)
+            for basin_name in basin_names
+            for alert_level in (
+                alert_levels if basin_name in at_every_level else alert_levels[:1]
+            )
+        ]
+
+    initial_basin_levels = basin_levels(basin_names[:half])
+    updated_basin_levels = basin_levels(basin_names[half:])
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    elapsed = 0
+    for _ in range(iterations):
+        with sqlmodel.Session(engine) as session:
+            alert = crud_alerts.create_alert(session, build_alert(initial_basin_levels))
+            session.commit()
+            alert_id = alert.alert_id
+            session.expire_all()
+
+            updated_alert = build_alert(updated_basin_levels)
+            updated_alert.alert_description = "updated benchmark alert"
+
+            statements.clear()
+            event.listen(engine, "before_cursor_execute", count)
+            start = time.perf_counter()
+            alert = crud_alerts.update_alert(session, alert_id, updated_alert)
+            session.flush()
+            elapsed += time.perf_counter() - start
+            event.remove(engine, "before_cursor_execute", count)
+
+            assert len(alert.alert_links) == len(updated_basin_levels)
+            session.commit()
+
+    print(
+        f"links before update: {len(initial_basin_levels)}, "
+        + f"after update: {len(updated_basin_levels)}"
+    )
+    print(
+        f"round trips per update: {len(statements)}, "
+        + f"{elapsed / iterations * 1000:8.2f} ms/update"
+    )
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    run(iterations)
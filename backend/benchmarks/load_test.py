@@ -0,0 +1,87 @@
+"""
+Load test for the read only routes, used to compare the sync database layer
+with the asyncio one (DB_ASYNC_ENABLED=true).
+
+Sends GET requests to a running instance of the api from a number of
+concurrent clients, and reports the requests / second and latency
+percentiles for each concurrency level.
+
+start a local postgres container and apply the migrations:
+    docker compose up -d database migrations
+
+run the api with either database layer (from the backend directory):
+    DB_ASYNC_ENABLED=false uvicorn src.main:app --port 3000 --workers 1
+    DB_ASYNC_ENABLED=true uvicorn src.main:app --port 3000 --workers 1
+
+then, in another terminal:
+    python benchmarks/load_test.py [base_url] [requests_per_client]
+
+base_url defaults to http://localhost:3000/api/v1
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+CONCURRENCY_LEVELS = [50, 200]
+PATHS = ["/alerts/?limit=20", "/cap/?limit=20", "/basins/", "/alert_levels/"]
+
+
+async def client_worker(
+    client: httpx.AsyncClient, requests_per_client: int, latencies: list, errors: list
+):
+    for cnt in range(requests_per_client):
+        path = PATHS[cnt % len(PATHS)]
+        start = time.perf_counter()
+        try:
+            response = await client.get(path)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+        except httpx.HTTPError as err:
+            errors.append(type(err).__name__)
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_level(base_url: str, concurrency: int, requests_per_client: int):
+    latencies = []
+    errors = []
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+        # warm up the connections / caches
+        await client.get(PATHS[0])
+        start = time.perf_counter()
+        await asyncio.gather(
+            *[
+                client_worker(client, requests_per_client, latencies, errors)
+                for _ in range(concurrency)
+            ]
+        )
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{concurrency:>4} clients: {len(latencies) / elapsed:8.1f} req/s, "
+        + f"p50 {percentiles[49] * 1000:7.1f} ms, "
+        + f"p95 {percentiles[94] * 1000:7.1f} ms, "
+        + f"p99 {percentiles[98] * 1000:7.1f} ms, "
+        + f"errors: {len(errors)}"
+    )
+
+
+async def main(base_url: str, requests_per_client: int):
+    for concurrency in CONCURRENCY_LEVELS:
+        await run_level(base_url, concurrency, requests_per_client)
+
+
+if __name__ == "__main__":
+    base_url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:3000/api/v1"
+    requests_per_client = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    asyncio.run(main(base_url, requests_per_client))
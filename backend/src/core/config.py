@@ -30,6 +30,27 @@ class Settings:
         path=os.getenv("POSTGRES_DATABASE", "postgres"),
         port=int(os.getenv("POSTGRES_PORT", 5432)),
     )
+    # optional read only replica, GET requests are sent to it when the host is
+    # set.  Uses the same credentials / database name as the primary.
+    POSTGRES_REPLICA_HOST: str | None = os.getenv("POSTGRES_REPLICA_HOST") or None
+    SQLALCHEMY_REPLICA_DATABASE_URI: Optional[PostgresDsn] = (
+        PostgresDsn.build(
+            scheme="postgresql",
+            username=os.getenv("POSTGRES_USER", "postgres"),
+            password=os.getenv("POSTGRES_PASSWORD", "postgres"),
+            host=POSTGRES_REPLICA_HOST,
+            path=os.getenv("POSTGRES_DATABASE", "postgres"),
+            port=int(
+                os.getenv("POSTGRES_REPLICA_PORT", os.getenv("POSTGRES_PORT", 5432))
+            ),
+        )
+        if POSTGRES_REPLICA_HOST
+        else None
+    )
+    # number of seconds after a write that GET requests from the same client
+    # are sent to the primary rather than the replica, so the client sees its
+    # own changes.  Should be longer than the replication lag.
+    READ_YOUR_WRITES_WINDOW = int(os.getenv("READ_YOUR_WRITES_WINDOW", 10))
     DEFAULT_SCHEMA: str = "py_api"
 
     LOGGER.debug(f"SQLALCHEMY_DATABASE_URI: {SQLALCHEMY_DATABASE_URI}")
@@ -42,6 +63,58 @@ class Settings:
         "https://dev.loginproxy.gov.bc.ca/auth/realms/standard/.well-known/openid-configuration",
     )
     OIDC_REQUIRED_ROLES = os.getenv("OIDC_REQUIRED_ROLES", "editor")
+    # number of seconds the discovery document / signing keys are cached for
+    OIDC_JWKS_CACHE_TTL = int(os.getenv("OIDC_JWKS_CACHE_TTL", 3600))
+    # minimum number of seconds between key refreshes triggered by an unknown kid
+    OIDC_JWKS_MIN_REFRESH_INTERVAL = int(
+        os.getenv("OIDC_JWKS_MIN_REFRESH_INTERVAL", 30)
+    )
+    # maximum number of verified tokens to cache, 0 disables the cache
+    OIDC_TOKEN_CACHE_SIZE = int(os.getenv("OIDC_TOKEN_CACHE_SIZE", 1024))
+    # maximum number of rendered alert / cap responses to cache, 0 disables
+    # the cache, see src/v1/routes/response_cache.py
+    ALERT_RESPONSE_CACHE_SIZE = int(os.getenv("ALERT_RESPONSE_CACHE_SIZE", 1024))
+    # identifies the sender of the cap messages, see src/v1/renderers/cap_xml.py
+    CAP_SENDER = os.getenv("CAP_SENDER", "bc-river-forecast-centre")
+    CAP_SENDER_NAME = os.getenv("CAP_SENDER_NAME", "BC River Forecast Centre")
+    # maximum number of rendered cap messages to cache, 0 disables the cache
+    CAP_DOCUMENT_CACHE_SIZE = int(os.getenv("CAP_DOCUMENT_CACHE_SIZE", 1024))
+    # number of seconds between checks of the database for cap events changed by
+    # other replicas, see src/v1/renderers/cap_feed.py
+    CAP_FEED_REVALIDATE_INTERVAL = int(os.getenv("CAP_FEED_REVALIDATE_INTERVAL", 30))
+    # tolerances (degrees) the basin boundaries are pre-simplified at when they
+    # are loaded, see src/v1/crud/crud_geometry.py.  The full resolution
+    # boundary is always kept.
+    BASIN_GEOMETRY_TOLERANCES = [
+        float(tolerance)
+        for tolerance in os.getenv(
+            "BASIN_GEOMETRY_TOLERANCES", "0.001,0.005,0.02"
+        ).split(",")
+    ]
+    # tolerance of the basin polygons included in the cap message areas, cap
+    # consumers don't need the full resolution boundaries
+    CAP_AREA_TOLERANCE = float(os.getenv("CAP_AREA_TOLERANCE", 0.005))
+    # number of seconds between checks for migrations that may have changed the
+    # cached basins / alert levels / cap event statuses
+    REFERENCE_DATA_REVALIDATE_INTERVAL = int(
+        os.getenv("REFERENCE_DATA_REVALIDATE_INTERVAL", 300)
+    )
+    # connection pool for each replica, the pool is instrumented, see
+    # src/db/metrics.py and the /metrics/db_pool route.  A pool size of 0
+    # disables the pooling (NullPool), leaving it to PgBouncer.
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 5))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 120))
+    # checks connections are alive before they're used, costs a round trip
+    # on every checkout
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    # connecting through PgBouncer in transaction pooling mode, disables the
+    # prepared statements used by asyncpg
+    DB_PGBOUNCER_MODE = os.getenv("DB_PGBOUNCER_MODE", "false").lower() == "true"
+    # serve the read only routes with an asyncio engine / session, requires the
+    # optional asyncpg dependency, see src/db/async_session.py
+    DB_ASYNC_ENABLED = os.getenv("DB_ASYNC_ENABLED", "false").lower() == "true"
 
 
 # @validator("SQLALCHEMY_DATABASE_URI", pre=True)
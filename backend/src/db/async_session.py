@@ -0,0 +1,104 @@
+"""
+Optional asyncio database layer, used by the read only routes when
+DB_ASYNC_ENABLED is set.  The engine uses the asyncpg driver, which is an
+optional dependency (poetry install -E async), so nothing is imported or
+connected until the first request that needs it.
+"""
+
+import logging
+import uuid
+from typing import AsyncGenerator
+
+from fastapi import Request
+from sqlalchemy.engine import make_url
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..core.config import Configuration
+from .metrics import InstrumentedAsyncAdaptedQueuePool, instrument
+from .session import pool_options, use_replica
+
+LOGGER = logging.getLogger(__name__)
+
+ASYNC_DRIVER = "postgresql+asyncpg"
+
+# the async engines, keyed by the name they're instrumented with
+async_engines = {}
+
+
+def get_async_db_url(replica: bool = False) -> str:
+    """
+    :param replica: return the url of the read only replica rather than the
+        primary
+    :type replica: bool
+    :return: the database url with the driver swapped to asyncpg
+    :rtype: str
+    """
+    db_uri = (
+        Configuration.SQLALCHEMY_REPLICA_DATABASE_URI
+        if replica
+        else Configuration.SQLALCHEMY_DATABASE_URI
+    )
+    db_url = make_url(db_uri.unicode_string())
+    return db_url.set(drivername=ASYNC_DRIVER).render_as_string(hide_password=False)
+
+
+def pgbouncer_connect_args() -> dict:
+    """
+    PgBouncer in transaction pooling mode can send each transaction to a
+    different server connection, so prepared statements created by asyncpg
+    on one connection may not exist (or may clash) on the next.  Disables the
+    statement caches and gives every prepared statement a unique name.
+
+    :return: asyncpg connect args
+    :rtype: dict
+    """
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+    }
+
+
+def get_async_engine(replica: bool = False):
+    """
+    creates the async engine the first time it is requested
+
+    :param replica: return the engine for the read only replica
+    :type replica: bool
+    :raises RuntimeError: if asyncpg is not installed
+    :return: the async engine
+    :rtype: sqlalchemy.ext.asyncio.AsyncEngine
+    """
+    name = "async_replica" if replica else "async"
+    if name not in async_engines:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        engine_options = pool_options(InstrumentedAsyncAdaptedQueuePool)
+        if Configuration.DB_PGBOUNCER_MODE:
+            engine_options["connect_args"] = pgbouncer_connect_args()
+        try:
+            async_engine = create_async_engine(
+                get_async_db_url(replica), **engine_options
+            )
+        except ModuleNotFoundError as err:
+            raise RuntimeError(
+                "DB_ASYNC_ENABLED is set but the async database driver is not "
+                + "installed, install it with: poetry install -E async"
+            ) from err
+        instrument(async_engine.sync_engine, name)
+        async_engines[name] = async_engine
+        LOGGER.info(f"created the {name} database engine")
+    return async_engines[name]
+
+
+async def get_async_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    # the async routes are read only, nothing is committed and the
+    # transaction is rolled back when the session is closed
+    replica = (
+        Configuration.SQLALCHEMY_REPLICA_DATABASE_URI is not None
+        and use_replica(request)
+    )
+    async with AsyncSession(
+        get_async_engine(replica), expire_on_commit=False
+    ) as session:
+        yield session
@@ -0,0 +1,260 @@
+"""
+Connection pool instrumentation.  The metrics are exposed through the
+/metrics/db_pool route, and are used to size the pool for each replica:
+
+    * checkout wait time - how long requests wait for a connection, includes
+      the time to open a new connection when the pool creates one
+    * connections in use / overflow - compared with the DB_POOL_SIZE /
+      DB_MAX_OVERFLOW settings
+    * checkout timeouts - requests that gave up waiting (pool_timeout)
+    * pre-ping failures / invalidations - stale connections that were
+      discarded
+
+The duration of the request transactions for each route are also recorded
+here (TransactionMetrics), exposed through /metrics/transactions.
+"""
+
+import collections
+import logging
+import math
+import threading
+import time
+
+import sqlalchemy
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+LOGGER = logging.getLogger(__name__)
+
+
+class PoolMetrics:
+    """
+    Thread safe counters for a connection pool, see instrument() for how
+    they're attached to an engine.
+    """
+
+    def __init__(self, name: str, sample_size: int = 1000):
+        """
+        :param name: name of the engine / pool, used in the stats
+        :type name: str
+        :param sample_size: number of the most recent checkout wait times that
+            are kept to calculate the percentiles
+        :type sample_size: int
+        """
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+        self._wait_samples = collections.deque(maxlen=sample_size)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.checkout_waits = 0
+            self.checkout_timeouts = 0
+            self.checkout_wait_total = 0.0
+            self.checkout_wait_max = 0.0
+            self.connects = 0
+            self.pre_ping_failures = 0
+            self.invalidations = 0
+            self._wait_samples.clear()
+
+    def record_checkout_wait(self, seconds: float, timed_out: bool = False):
+        """
+        :param seconds: time spent waiting for a connection from the pool
+        :type seconds: float
+        :param timed_out: True if no connection was available within the
+            pool_timeout
+        :type timed_out: bool
+        """
+        with self._lock:
+            if timed_out:
+                self.checkout_timeouts += 1
+            else:
+                self.checkout_waits += 1
+            self.checkout_wait_total += seconds
+            self.checkout_wait_max = max(self.checkout_wait_max, seconds)
+            self._wait_samples.append(seconds)
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def on_invalidate(self, dbapi_connection, connection_record, exception):
+        # connections that fail the pre-ping are invalidated with a
+        # DisconnectionError, other invalidations are caused by errors
+        # raised while the connection was in use
+        with self._lock:
+            if isinstance(exception, sqlalchemy.exc.DisconnectionError):
+                self.pre_ping_failures += 1
+            else:
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        """
+        :return: the current state of the pool and the counters, wait times
+            are in milliseconds
+        :rtype: dict
+        """
+        with self._lock:
+            samples = sorted(self._wait_samples)
+            waits = self.checkout_waits + self.checkout_timeouts
+            stats = {
+                "name": self.name,
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "checkout_wait_avg_ms": (
+                    round(self.checkout_wait_total / waits * 1000, 3) if waits else 0
+                ),
+                "checkout_wait_p95_ms": (
+                    round(samples[math.ceil(len(samples) * 0.95) - 1] * 1000, 3)
+                    if samples
+                    else 0
+                ),
+                "checkout_wait_max_ms": round(self.checkout_wait_max * 1000, 3),
+                "connects": self.connects,
+                "pre_ping_failures": self.pre_ping_failures,
+                "invalidations": self.invalidations,
+            }
+        pool = self.pool
+        if isinstance(pool, QueuePool):
+            stats.update(
+                {
+                    "pool_size": pool.size(),
+                    "in_use": pool.checkedout(),
+                    "idle": pool.checkedin(),
+                    "overflow": max(pool.overflow(), 0),
+                }
+            )
+        return stats
+
+
+class InstrumentedPoolMixin:
+    """
+    Times how long each checkout waits for a connection.  The checkout event
+    fires after a connection has been obtained, so the wait is measured around
+    connect().
+    """
+
+    metrics: PoolMetrics | None = None
+
+    def connect(self):
+        if self.metrics is None:
+            return super().connect()
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except sqlalchemy.exc.TimeoutError:
+            self.metrics.record_checkout_wait(
+                time.perf_counter() - start, timed_out=True
+            )
+            raise
+        self.metrics.record_checkout_wait(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        # the pool is recreated when the engine is disposed / all connections
+        # are invalidated, the new pool reports to the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        if self.metrics is not None:
+            self.metrics.pool = pool
+        return pool
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+# the metrics for each engine, keyed by name
+pool_metrics: dict[str, PoolMetrics] = {}
+
+
+def instrument(engine: sqlalchemy.Engine, name: str) -> PoolMetrics:
+    """
+    attaches metrics to the engine's pool.  Engines that don't use one of the
+    instrumented pools (ex: NullPool with PgBouncer) still report checkouts /
+    connects / invalidations, but not checkout wait times or pool usage.
+
+    :param engine: the engine to instrument, for async engines pass the
+        sync_engine
+    :type engine: sqlalchemy.Engine
+    :param name: name used to identify the engine in the stats
+    :type name: str
+    :return: the metrics for the engine
+    :rtype: PoolMetrics
+    """
+    metrics = PoolMetrics(name)
+    metrics.pool = engine.pool
+    if isinstance(engine.pool, InstrumentedPoolMixin):
+        engine.pool.metrics = metrics
+    sqlalchemy.event.listen(engine, "checkout", metrics.on_checkout)
+    sqlalchemy.event.listen(engine, "connect", metrics.on_connect)
+    sqlalchemy.event.listen(engine, "invalidate", metrics.on_invalidate)
+    pool_metrics[name] = metrics
+    return metrics
+
+
+class TransactionMetrics:
+    """
+    Thread safe count / duration of the request transactions for each route,
+    recorded by the session.get_db unit of work.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route: str, seconds: float, rolled_back: bool = False):
+        """
+        :param route: the method and path of the route, ex: GET /alerts/
+        :type route: str
+        :param seconds: time from the start of the transaction until it was
+            committed / rolled back
+        :type seconds: float
+        :param rolled_back: True if the transaction was rolled back
+        :type rolled_back: bool
+        """
+        with self._lock:
+            route_stats = self._routes.setdefault(
+                route,
+                {"count": 0, "rolled_back": 0, "total": 0.0, "max": 0.0},
+            )
+            route_stats["count"] += 1
+            route_stats["rolled_back"] += int(rolled_back)
+            route_stats["total"] += seconds
+            route_stats["max"] = max(route_stats["max"], seconds)
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+    def stats(self) -> list[dict]:
+        """
+        :return: the transaction counts / durations for each route, durations
+            are in milliseconds
+        :rtype: list[dict]
+        """
+        with self._lock:
+            return [
+                {
+                    "route": route,
+                    "count": route_stats["count"],
+                    "rolled_back": route_stats["rolled_back"],
+                    "avg_ms": round(
+                        route_stats["total"] / route_stats["count"] * 1000, 3
+                    ),
+                    "max_ms": round(route_stats["max"] * 1000, 3),
+                }
+                for route, route_stats in sorted(self._routes.items())
+            ]
+
+
+transaction_metrics = TransactionMetrics()
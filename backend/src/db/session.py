@@ -1,34 +1,164 @@
+import time
 from typing import Generator
 
 # from sqlalchemy import create_engine
 # from sqlalchemy.orm import sessionmaker
+from fastapi import Request, Response
+from sqlalchemy.pool import NullPool
 from sqlmodel import Session, create_engine
 
 from ..core.config import Configuration
+from .metrics import InstrumentedQueuePool, instrument, transaction_metrics
+
+
+def pool_options(pool_class=InstrumentedQueuePool) -> dict:
+    """
+    :param pool_class: the pool class used when pooling is enabled
+    :type pool_class: type[sqlalchemy.pool.Pool]
+    :return: the create_engine connection pool arguments, from the DB_POOL_*
+        settings
+    :rtype: dict
+    """
+    if Configuration.DB_POOL_SIZE <= 0:
+        # PgBouncer does the pooling, a connection is opened for each checkout
+        return {"poolclass": NullPool, "pool_pre_ping": False}
+    return {
+        "poolclass": pool_class,
+        "pool_pre_ping": Configuration.DB_POOL_PRE_PING,
+        "pool_size": Configuration.DB_POOL_SIZE,
+        "max_overflow": Configuration.DB_MAX_OVERFLOW,
+        "pool_recycle": Configuration.DB_POOL_RECYCLE,
+        "pool_timeout": Configuration.DB_POOL_TIMEOUT,
+    }
+
 
 db_url = Configuration.SQLALCHEMY_DATABASE_URI.unicode_string()
-engine = create_engine(
-    db_url,
-    pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=5,
-    pool_recycle=120,
-    pool_timeout=30,
-)
+# psycopg2 doesn't use server side prepared statements, so the sync engine
+# works unchanged with PgBouncer's transaction pooling
+engine = create_engine(db_url, **pool_options())
+instrument(engine, "sync")
+
+# GET requests are sent to the read only replica when one is configured
+replica_engine = None
+if Configuration.SQLALCHEMY_REPLICA_DATABASE_URI is not None:
+    replica_engine = create_engine(
+        Configuration.SQLALCHEMY_REPLICA_DATABASE_URI.unicode_string(),
+        **pool_options(),
+    )
+    instrument(replica_engine, "replica")
+
+READ_ONLY_METHODS = frozenset(["GET", "HEAD", "OPTIONS"])
+# set on the response to a write, the client's reads are sent to the primary
+# until the time (epoch seconds) in the cookie so it sees its own changes
+# rather than a replica that hasn't caught up yet
+READ_PRIMARY_COOKIE = "read_primary_until"
 # SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
-def get_db() -> Generator:
-    session = None
-    try:
-        # connection = SessionLocal()
-        # yield connection
-        with Session(engine) as session:
+def route_name(request: Request) -> str:
+    """
+    :return: the method and path template of the route that is handling the
+        request, ex: PATCH /api/v1/alerts/{alert_id}/
+    :rtype: str
+    """
+    route = request.scope.get("route")
+    path = route.path_format if route is not None else request.url.path
+    return f"{request.method} {path}"
+
+
+def unit_of_work(db_engine, route: str) -> Generator[Session, None, None]:
+    """
+    A session that spans the request.  The transaction is committed when the
+    route returns, or rolled back if the route / commit raises, in which case
+    the error is re-raised so it is reported with the correct status code (see
+    the exception handlers in main.py).
+
+    The commit happens before the response is sent.  Routes that write can
+    call session.commit() themselves, before the response is serialized, to
+    return the connection to the pool sooner.  Records are not expired on
+    commit so they can still be serialized afterwards without another query.
+
+    :param db_engine: the engine to create the session with
+    :type db_engine: sqlalchemy.Engine
+    :param route: name of the route, used to record the transaction duration
+    :type route: str
+    """
+    start = time.perf_counter()
+    rolled_back = False
+    with Session(db_engine, expire_on_commit=False) as session:
+        try:
             yield session
             session.commit()
-    except:
-        if session:
+        except BaseException:
+            rolled_back = True
             session.rollback()
-    finally:
-        if session is not None:
-            session.close()
+            raise
+        finally:
+            transaction_metrics.record(
+                route, time.perf_counter() - start, rolled_back=rolled_back
+            )
+
+
+def use_replica(request: Request) -> bool:
+    """
+    :return: True if the request can be served by the read only replica, it
+        is a read and the client hasn't written anything within the
+        READ_YOUR_WRITES_WINDOW
+    :rtype: bool
+    """
+    if request.method not in READ_ONLY_METHODS:
+        return False
+    try:
+        read_primary_until = float(request.cookies.get(READ_PRIMARY_COOKIE, 0))
+    except ValueError:
+        read_primary_until = 0
+    return read_primary_until <= time.time()
+
+
+def get_db(request: Request, response: Response) -> Generator[Session, None, None]:
+    if replica_engine is not None and use_replica(request):
+        yield from unit_of_work(replica_engine, route_name(request))
+        return
+
+    if (
+        replica_engine is not None
+        and request.method not in READ_ONLY_METHODS
+        and Configuration.READ_YOUR_WRITES_WINDOW > 0
+    ):
+        # the headers of the dependency's response are copied to the route's
+        # response before the commit, so the cookie is set up front. A write
+        # that fails only costs the client a few reads from the primary.
+        window = Configuration.READ_YOUR_WRITES_WINDOW
+        response.set_cookie(
+            READ_PRIMARY_COOKIE,
+            str(int(time.time()) + window),
+            max_age=window,
+            httponly=True,
+            samesite="lax",
+        )
+    yield from unit_of_work(engine, route_name(request))
+
+
+def get_primary_db(request: Request) -> Generator[Session, None, None]:
+    """
+    For read only routes that have to see the latest writes even when the
+    request could be served by the replica, ex: the cap feed, which is cached
+    until a write marks it stale and would otherwise be rebuilt from a replica
+    that hasn't caught up.
+    """
+    yield from unit_of_work(engine, route_name(request))
+
+
+def get_read_engine(request: Request):
+    """
+    For read only routes that manage their own session, ex: the streaming
+    history export, which reads from the database while the response is being
+    sent, after get_db's session has been closed.
+
+    :return: the replica engine if the request can be served by it, otherwise
+        the primary
+    :rtype: sqlalchemy.Engine
+    """
+    if replica_engine is not None and use_replica(request):
+        return replica_engine
+    return engine
@@ -1,17 +1,30 @@
 import logging
+from contextlib import asynccontextmanager
 
 # from authlib.integrations.starlette_client import OAuth, OAuthError
-from fastapi import Depends, FastAPI
+import sqlalchemy
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
+from sqlmodel import Session
 
+import src.db.session
 import src.oidc.oidcAuthorize as oidcAuthorize
+from src.v1.crud.reference_cache import reference_cache
 
 from .core.config import Configuration
 from .v1.models import auth_model
 from .v1.routes.alert_levels import router as alert_levels_router
+from .v1.routes.alert_routes import async_read_router as alert_async_read_router
+from .v1.routes.alert_routes import read_router as alert_read_router
 from .v1.routes.alert_routes import router as alert_routes
 from .v1.routes.basin_routes import router as basin_router
+from .v1.routes.cap_routes import async_read_router as cap_async_read_router
+from .v1.routes.cap_routes import read_router as cap_read_router
 from .v1.routes.cap_routes import router as cap_router
+from .v1.routes.history_routes import router as history_router
+from .v1.routes.metrics_routes import router as metrics_router
+from .v1.routes.subbasin_routes import router as subbasin_router
 
 logging.getLogger("uvicorn").handlers.clear()  # removes duplicated logs
 LOGGER = logging.getLogger()
@@ -31,7 +44,23 @@ tags_metadata = [
     },
 ]
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # warm the reference data cache, if the database isn't available yet the
+    # cache will be loaded by the first request that needs it
+    try:
+        with Session(src.db.session.engine) as session:
+            reference_cache.get(session)
+    except Exception as err:
+        LOGGER.warning(f"unable to load the reference data at startup: {err}")
+    yield
+
+
 app = FastAPI(
+    lifespan=lifespan,
+    # responses are encoded with orjson, see also src/v1/routes/serializers.py
+    default_response_class=ORJSONResponse,
     title=OpenAPIInfo["title"],
     version=OpenAPIInfo["version"],
     openapi_tags=tags_metadata,
@@ -62,8 +91,34 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+@app.exception_handler(sqlalchemy.exc.IntegrityError)
+async def integrity_error_handler(request: Request, exc: sqlalchemy.exc.IntegrityError):
+    # the transaction has already been rolled back by session.get_db
+    LOGGER.warning(f"integrity error for {request.method} {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=409,
+        content={"detail": "the request conflicts with the existing data"},
+    )
+
+
+@app.exception_handler(sqlalchemy.exc.OperationalError)
+@app.exception_handler(sqlalchemy.exc.TimeoutError)
+async def operational_error_handler(
+    request: Request, exc: sqlalchemy.exc.SQLAlchemyError
+):
+    # database unavailable / connection lost / no connection available from
+    # the pool, the client can retry
+    LOGGER.error(f"database error for {request.method} {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "the database is unavailable, try again later"},
+        headers={"Retry-After": "5"},
+    )
+
+
 @app.get("/")
 async def root():
     return {"message": "Route verification endpoints"}
@@ -77,9 +132,20 @@ async def authorized(is_authZ=Depends(oidcAuthorize.authorize)):
     return is_authZ
 
 app.include_router(basin_router, prefix=api_prefix_v1 + "/basins", tags=["Basins"])
+app.include_router(subbasin_router, prefix=api_prefix_v1 + "/subbasins", tags=["Subbasins"])
 app.include_router(alert_routes, prefix=api_prefix_v1 + "/alerts", tags=["Alerts"])
 app.include_router(alert_levels_router, prefix=api_prefix_v1 + "/alert_levels", tags=["Alert Levels"])
 app.include_router(cap_router, prefix=api_prefix_v1 + "/cap", tags=["Common Alerting Protocol Events"])
+# the read only alert / cap routes are served by the asyncio database layer
+# when DB_ASYNC_ENABLED is set
+if Configuration.DB_ASYNC_ENABLED:
+    app.include_router(alert_async_read_router, prefix=api_prefix_v1 + "/alerts", tags=["Alerts"])
+    app.include_router(cap_async_read_router, prefix=api_prefix_v1 + "/cap", tags=["Common Alerting Protocol Events"])
+else:
+    app.include_router(alert_read_router, prefix=api_prefix_v1 + "/alerts", tags=["Alerts"])
+    app.include_router(cap_read_router, prefix=api_prefix_v1 + "/cap", tags=["Common Alerting Protocol Events"])
+app.include_router(history_router, prefix=api_prefix_v1 + "/history", tags=["History"])
+app.include_router(metrics_router, prefix=api_prefix_v1 + "/metrics", tags=["Metrics"])
 
 # Define the filter
 class EndpointFilter(logging.Filter):
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import time
+
+import httpx
+
+LOGGER = logging.getLogger(__name__)
+
+
+class JWKSCache:
+    """
+    Caches the OIDC discovery (well-known) document and the JSON web key set
+    that it points to, so that validating a bearer token does not require a
+    round trip to the login proxy for every request.
+
+    * keys are looked up by their key id (kid)
+    * the cache is refreshed when the ttl expires, or when a token is presented
+      that was signed with a kid that is not in the cache (key rotation)
+    * refreshes are single flight, concurrent requests that need a refresh
+      will wait on and share the result of a single fetch.
+    """
+
+    def __init__(
+        self,
+        wellknown_url: str,
+        ttl: int = 3600,
+        min_refresh_interval: int = 30,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        """
+        :param wellknown_url: url to the openid-configuration document
+        :type wellknown_url: str
+        :param ttl: number of seconds the keys are considered fresh
+        :type ttl: int
+        :param min_refresh_interval: minimum number of seconds between refreshes
+            that are triggered by an unknown kid.  Stops a stream of tokens with
+            a bogus kid from hammering the login proxy.
+        :type min_refresh_interval: int
+        :param transport: optional httpx transport, used by the tests to point
+            the cache at a stub server
+        :type transport: httpx.AsyncBaseTransport, optional
+        """
+        self.wellknown_url = wellknown_url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.transport = transport
+
+        self.jwks_uri = None
+        self.keys = {}
+        self.fetched_at = None
+        self.fetch_count = 0
+        self.rotation_listeners = []
+
+        self._lock = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        # created lazily so that the lock is bound to the running event loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def is_fresh(self) -> bool:
+        """
+        :return: True if the keys have been retrieved and the ttl has not expired
+        :rtype: bool
+        """
+        return (
+            self.fetched_at is not None
+            and (time.monotonic() - self.fetched_at) < self.ttl
+        )
+
+    def add_rotation_listener(self, listener):
+        """
+        registers a callable that is called with the set of kids that have been
+        removed from the key set whenever a refresh drops keys.
+
+        :param listener: callable that accepts a set of kid strings
+        :type listener: callable
+        """
+        self.rotation_listeners.append(listener)
+
+    async def get_key(self, kid: str | None) -> dict:
+        """
+        returns the json web key that corresponds with the supplied kid.
+
+        :param kid: the key id from the header of the token
+        :type kid: str
+        :raises KeyError: if the kid cannot be found after a refresh
+        :return: the json web key
+        :rtype: dict
+        """
+        if not self.is_fresh():
+            await self.refresh()
+        elif kid not in self.keys and self._can_force_refresh():
+            # unknown kid, the keys may have been rotated
+            LOGGER.debug(f"kid {kid} not in cached key set, refreshing")
+            await self.refresh(force=True)
+
+        if kid is None and len(self.keys) == 1:
+            # tokens without a kid are only acceptable if there is no ambiguity
+            # about which key to use
+            return next(iter(self.keys.values()))
+        if kid not in self.keys:
+            raise KeyError(f"unable to find a signing key with the kid: {kid}")
+        return self.keys[kid]
+
+    def _can_force_refresh(self) -> bool:
+        return (
+            self.fetched_at is None
+            or (time.monotonic() - self.fetched_at) >= self.min_refresh_interval
+        )
+
+    async def refresh(self, force: bool = False):
+        """
+        retrieves the well known document and the key set.  Only one refresh
+        runs at a time, coroutines that are waiting on the lock when a refresh
+        completes will use the keys that were just retrieved instead of
+        fetching them again.
+
+        :param force: refresh even if the cache is still fresh, defaults to False
+        :type force: bool, optional
+        """
+        fetched_at_before = self.fetched_at
+        async with self._get_lock():
+            if self.fetched_at != fetched_at_before:
+                # another coroutine completed a refresh while this one waited
+                LOGGER.debug("key set refreshed by another request")
+                return
+            if not force and self.is_fresh():
+                return
+
+            async with httpx.AsyncClient(transport=self.transport) as client:
+                well_knowns = await client.get(self.wellknown_url)
+                well_knowns.raise_for_status()
+                self.jwks_uri = well_knowns.json()["jwks_uri"]
+                LOGGER.debug(f"jwks_url: {self.jwks_uri}")
+
+                jwks_resp = await client.get(self.jwks_uri)
+                jwks_resp.raise_for_status()
+                jwks = jwks_resp.json()
+
+            new_keys = {key.get("kid"): key for key in jwks.get("keys", [])}
+            removed_kids = set(self.keys.keys()) - set(new_keys.keys())
+            self.keys = new_keys
+            self.fetched_at = time.monotonic()
+            self.fetch_count += 1
+            LOGGER.debug(f"cached kids: {list(self.keys.keys())}")
+
+            if removed_kids:
+                LOGGER.info(f"signing keys removed from the key set: {removed_kids}")
+                for listener in self.rotation_listeners:
+                    listener(removed_kids)
+
+    def clear(self):
+        """
+        empties the cache, next call to get_key will fetch the keys again
+        """
+        self.jwks_uri = None
+        self.keys = {}
+        self.fetched_at = None
@@ -1,12 +1,14 @@
 import logging
 import re
+import time
 
-import httpx
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OpenIdConnect
 from jose import jwt
 
 from src.core.config import Configuration
+from src.oidc.jwks_cache import JWKSCache
+from src.oidc.token_cache import VerifiedTokenCache
 from src.v1.models import auth_model
 
 LOGGER = logging.getLogger(__name__)
@@ -19,37 +21,51 @@ oidc = OpenIdConnect(
     scheme_name=Configuration.OIDC_CLIENT_ID,
 )
 
+# shared by all requests, caches the well known document and the signing keys
+jwks_cache = JWKSCache(
+    wellknown_url=Configuration.OIDC_WELLKNOWN,
+    ttl=Configuration.OIDC_JWKS_CACHE_TTL,
+    min_refresh_interval=Configuration.OIDC_JWKS_MIN_REFRESH_INTERVAL,
+)
+
+# tokens that have already been verified, avoids re-running the signature
+# verification every time the frontend presents the same token
+token_cache = VerifiedTokenCache(maxsize=Configuration.OIDC_TOKEN_CACHE_SIZE)
+jwks_cache.add_rotation_listener(token_cache.evict_kids)
+
 
-async def get_current_user(bearerToken: str = Depends(oidc)) -> auth_model.User:
+async def verify_token(bearerToken: str) -> dict:
     """
-    Consumes the access token if it exists, validates it and extracts the user
-    information from it, returning that.
+    Validates the bearer token, ie decodes the jwt and verifies the signature
+    against the cached signing keys, returning the payload.  Tokens that have
+    already been verified are served from the token cache until they expire.
 
     :param bearerToken: The bearer token from the header
-    :type bearerToken: str, optional
-    :raises InvalidAuthorization: _description_
-    :return: The user information that was extracted from the bearer token
-    :rtype: auth_model.User
+    :type bearerToken: str
+    :raises InvalidAuthorization: if the token cannot be validated
+    :return: the payload extracted from the token
+    :rtype: dict
     """
-    authorize(bearerToken)
-    # make sure the authorization information is correctg
     try:
         # extract the token, ie remove Bearer string
         token = bearerToken.replace("Bearer ", "")
 
-        # # getting the jwks_uri
-        well_knowns = httpx.get(url=Configuration.OIDC_WELLKNOWN)
-        well_knowns_data = well_knowns.json()
-        jwks_url = well_knowns_data["jwks_uri"]
-        LOGGER.debug(f"jwks_url: {jwks_url}")
+        payload = token_cache.get(token)
+        if payload is not None:
+            LOGGER.debug("token verification served from cache")
+            return payload
 
-        # # get the public key
-        jwks_resp = httpx.get(url=jwks_url)
-        jwks_key = jwks_resp.json()
-
-        algorithm = jwt.get_unverified_header(token).get("alg")
+        header = jwt.get_unverified_header(token)
+        algorithm = header.get("alg")
         LOGGER.debug(f"algorithm: {algorithm}")
 
+        # get the public key from the cached key set, only goes to the login
+        # proxy when the cache has expired or the kid is unknown
+        try:
+            jwks_key = await jwks_cache.get_key(header.get("kid"))
+        except KeyError as e:
+            raise InvalidAuthorization(detail=f"Could not validate credentials: {e}")
+
         decode_options = {"verify_signature": True}
         LOGGER.debug(f"client id: {Configuration.OIDC_CLIENT_ID}")
         payload = jwt.decode(
@@ -60,56 +76,99 @@ async def get_current_user(bearerToken: str = Depends(oidc)) -> auth_model.User:
             options=decode_options,
         )
         LOGGER.debug(f"payload: {payload}")
+        token_cache.put(token, payload, header.get("kid"))
     except jwt.JWTError as e:
         raise InvalidAuthorization(detail=f"Could not validate credentials: {e}")
+    except InvalidAuthorization:
+        raise
     except Exception as e:
         LOGGER.error(f"Error: {e}")
         raise
-
-    print(f"token is: {token}")
-    LOGGER.debug(f"oidc: {oidc}  {oidc.__call__}")
     return payload
 
 
-async def authorize(user_payload: auth_model.User = Depends(get_current_user)) -> bool:
+def get_required_roles() -> set:
     """
-    having successfully authenticated and retrieved a valid access token, this
-    method will ensure that required roles are defined in the access token.
+    :return: the roles, one of which must be granted to the user for them to be
+        authorized, as defined by the OIDC_REQUIRED_ROLES config
+    :rtype: set
+    """
+    return set(re.split(r"\s+", Configuration.OIDC_REQUIRED_ROLES.strip()))
 
 
-    :param user_payload: the user information extracted from the bearer token
-    :type user_payload: auth_model.User, optional
-    :raises HTTPException: _description_
-    :raises InvalidAuthorization: _description_
+async def get_verified_principal(
+    request: Request, bearerToken: str = Depends(oidc)
+) -> auth_model.Principal:
     """
-    is_authorized = False
-    roles = re.split("\s+", Configuration.OIDC_REQUIRED_ROLES)
-    roles_set = set(roles)
-    LOGGER.debug(f"required roles: {roles_set}")
-    LOGGER.debug(f"user_payload: {user_payload}")
-    try:
-        if user_payload is None:
-            # Not authenticated with oauth2_scheme, maybe with other scheme?
-            # Raise here, or check for other options, or allow a simpler version for the anonymous users
-            raise HTTPException(status_code=403, detail="Not authenticated")
-        LOGGER.debug(f"user_payload: {user_payload['client_roles']}")
-        # user_roles = re.split("\s+", user_payload["client_roles"])
-        user_roles_set = set(user_payload["client_roles"])
-        LOGGER.debug(f"granted roles: {user_roles_set}")
-        intersected = list(roles_set.intersection(user_roles_set))
-        if intersected:
-            is_authorized = True
-        if not is_authorized:
-            raise InvalidAuthorization(
-                detail=f"User does not have the required roles: {roles}"
-            )
+    Validates the token and checks its roles exactly once per request.  The
+    resulting principal is stored on the request state, and fastapi caches
+    the dependency, so every other dependency / route that requires the user
+    or the authorization status reuses this object.
 
-    except jwt.JWTError as e:
-        raise InvalidAuthorization(detail=f"Could not validate credentials: {e}")
-    except Exception as e:
-        LOGGER.error(f"Error: {e}")
-        raise
-    return is_authorized
+    :param request: the incomming request
+    :type request: Request
+    :param bearerToken: The bearer token from the header
+    :type bearerToken: str, optional
+    :return: the verified principal for the request
+    :rtype: auth_model.Principal
+    """
+    principal = getattr(request.state, "principal", None)
+    if principal is not None:
+        return principal
+
+    start_time = time.perf_counter()
+    payload = await verify_token(bearerToken)
+
+    user_roles = payload.get("client_roles") or []
+    required_roles = get_required_roles()
+    LOGGER.debug(f"required roles: {required_roles}")
+    LOGGER.debug(f"granted roles: {user_roles}")
+
+    principal = auth_model.Principal(
+        user=payload,
+        roles=user_roles,
+        is_authorized=bool(required_roles.intersection(user_roles)),
+        verification_seconds=time.perf_counter() - start_time,
+    )
+    LOGGER.debug(
+        f"token verified in {principal.verification_seconds * 1000:.3f}ms, "
+        + f"authorized: {principal.is_authorized}"
+    )
+    request.state.principal = principal
+    return principal
+
+
+async def get_current_user(
+    principal: auth_model.Principal = Depends(get_verified_principal),
+) -> auth_model.User:
+    """
+    Consumes the access token if it exists, validates it and extracts the user
+    information from it, returning that.
+
+    :param principal: the verified principal for the request
+    :type principal: auth_model.Principal, optional
+    :return: The user information that was extracted from the bearer token
+    :rtype: auth_model.User
+    """
+    return principal.user
+
+
+async def authorize(
+    principal: auth_model.Principal = Depends(get_verified_principal),
+) -> bool:
+    """
+    having successfully authenticated and retrieved a valid access token, this
+    method will ensure that required roles are defined in the access token.
+
+    :param principal: the verified principal for the request
+    :type principal: auth_model.Principal, optional
+    :raises InvalidAuthorization: if the user does not have the required roles
+    """
+    if not principal.is_authorized:
+        raise InvalidAuthorization(
+            detail=f"User does not have the required roles: {list(get_required_roles())}"
+        )
+    return principal.is_authorized
 
 
 class InvalidAuthorization(HTTPException):
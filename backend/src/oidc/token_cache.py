@@ -0,0 +1,126 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+LOGGER = logging.getLogger(__name__)
+
+
+class VerifiedTokenCache:
+    """
+    A bounded, thread safe, least recently used cache of tokens that have
+    already been verified.  Tokens are keyed by a sha256 digest of the token
+    so the raw tokens are never held in memory by the cache, and the value is
+    the decoded payload.
+
+    Entries are dropped when:
+        * the token expires (exp claim)
+        * the kid the token was signed with is removed from the key set
+        * the cache is full and the entry is the least recently used
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        """
+        :param maxsize: the maximum number of tokens to cache, 0 disables the
+            cache
+        :type maxsize: int
+        """
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> dict | None:
+        """
+        :param token: the raw token (without the Bearer prefix)
+        :type token: str
+        :return: the cached payload, or None if the token has not been verified
+            or has expired
+        :rtype: dict | None
+        """
+        if not self.maxsize:
+            return None
+        key = self.digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, _kid, exp = entry
+            if exp is None or exp <= time.time():
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, token: str, payload: dict, kid: str | None):
+        """
+        adds a verified token to the cache
+
+        :param token: the raw token (without the Bearer prefix)
+        :type token: str
+        :param payload: the decoded payload of the token
+        :type payload: dict
+        :param kid: the id of the key that was used to verify the token
+        :type kid: str | None
+        """
+        if not self.maxsize:
+            return
+        exp = payload.get("exp")
+        if exp is None or exp <= time.time():
+            # never cache a token that can't expire or already has
+            return
+        key = self.digest(token)
+        with self._lock:
+            self._entries[key] = (payload, kid, exp)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def evict_kids(self, kids: set):
+        """
+        removes all the tokens that were verified with any of the supplied kids,
+        used as a rotation listener on the jwks cache.
+
+        :param kids: the kids that are no longer in the key set
+        :type kids: set
+        """
+        with self._lock:
+            stale = [
+                key for key, (_payload, kid, _exp) in self._entries.items()
+                if kid in kids
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.evictions += len(stale)
+        LOGGER.debug(f"evicted {len(stale)} tokens signed with rotated kids {kids}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        :return: the size of the cache and the hit / miss / eviction counters
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
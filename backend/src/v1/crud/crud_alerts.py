@@ -1,17 +1,248 @@
+import base64
 import datetime
+import json
 import logging
+from typing import Any, Callable, Iterable
 
 import sqlalchemy
+from sqlalchemy.orm import selectinload
 from sqlmodel import Session, select
 
 import src.db.session
 import src.types
+import src.v1.crud.crud_read_model as crud_read_model
 import src.v1.models.alerts as alerts_models
 import src.v1.models.basins as basins_model
+from src.v1.crud.geometry_cache import geometry_cache
+from src.v1.crud.hierarchy_cache import hierarchy_cache
+from src.v1.crud.reference_cache import attach, reference_cache
 
 LOGGER = logging.getLogger(__name__)
 
 
+class UnknownReferenceDataError(LookupError):
+    """
+    Raised when an alert references basin names, subbasin names or alert
+    levels that do not exist in the database.
+    """
+
+    def __init__(
+        self,
+        basin_names: Iterable[str],
+        alert_levels: Iterable[str],
+        subbasin_names: Iterable[str] = (),
+    ):
+        self.basin_names = sorted(basin_names)
+        self.alert_levels = sorted(alert_levels)
+        self.subbasin_names = sorted(subbasin_names)
+        msg = "alert references unknown"
+        if self.basin_names:
+            msg += f" basins: {self.basin_names}"
+        if self.subbasin_names:
+            msg += f" subbasins: {self.subbasin_names}"
+        if self.alert_levels:
+            msg += f" alert levels: {self.alert_levels}"
+        super().__init__(msg)
+
+
+def resolve_basins_and_levels(
+    session: Session, basin_names: Iterable[str], alert_levels: Iterable[str]
+) -> tuple[dict[str, basins_model.Basins], dict[str, alerts_models.Alert_Levels]]:
+    """
+    Resolves basin names and alert level strings to their database records
+    using one IN (...) query per table, rather than a query per name.
+
+    :param session: a SQLModel database session
+    :type session: Session
+    :param basin_names: the basin names to resolve
+    :type basin_names: Iterable[str]
+    :param alert_levels: the alert level strings to resolve
+    :type alert_levels: Iterable[str]
+    :raises UnknownReferenceDataError: if any of the names can't be found, lists
+        all the names that could not be found
+    :return: a dictionary of basin records keyed by basin name, and a dictionary
+        of alert level records keyed by alert level string
+    :rtype: tuple[dict[str, Basins], dict[str, Alert_Levels]]
+    """
+    basin_names = set(basin_names)
+    alert_levels = set(alert_levels)
+
+    basin_lookup = {}
+    if basin_names:
+        basin_query = (
+            select(basins_model.Basins)
+            .where(basins_model.Basins.basin_name.in_(basin_names))
+            .order_by(basins_model.Basins.basin_id)
+        )
+        for basin in session.exec(basin_query).all():
+            basin_lookup.setdefault(basin.basin_name, basin)
+
+    alert_level_lookup = {}
+    if alert_levels:
+        alert_level_query = (
+            select(alerts_models.Alert_Levels)
+            .where(alerts_models.Alert_Levels.alert_level.in_(alert_levels))
+            .order_by(alerts_models.Alert_Levels.alert_level_id)
+        )
+        for alert_level in session.exec(alert_level_query).all():
+            alert_level_lookup.setdefault(alert_level.alert_level, alert_level)
+
+    unknown_basins = basin_names - basin_lookup.keys()
+    unknown_levels = alert_levels - alert_level_lookup.keys()
+    if unknown_basins or unknown_levels:
+        raise UnknownReferenceDataError(unknown_basins, unknown_levels)
+    return basin_lookup, alert_level_lookup
+
+
+def resolve_alert_links(
+    session: Session, alert: alerts_models.Alert_Basins_Write
+) -> tuple[dict[str, basins_model.Basins], dict[str, alerts_models.Alert_Levels]]:
+    """
+    collects all the basin names and alert levels referenced by the alert links
+    of an incomming alert and resolves them, see resolve_basins_and_levels
+
+    :param session: a SQLModel database session
+    :type session: Session
+    :param alert: the incomming alert
+    :type alert: alerts_models.Alert_Basins_Write
+    :return: basin records keyed by name, alert level records keyed by level
+    :rtype: tuple[dict[str, Basins], dict[str, Alert_Levels]]
+    """
+    basin_names = set()
+    alert_levels = set()
+    for alert_link in alert.alert_links:
+        # blank links are ignored when the alert is written
+        if alert_link.basin.basin_name and alert_link.alert_level.alert_level:
+            basin_names.add(alert_link.basin.basin_name)
+            alert_levels.add(alert_link.alert_level.alert_level)
+    return resolve_basins_and_levels(session, basin_names, alert_levels)
+
+
+def _expand_links(
+    alert_links: list[alerts_models.Alert_Areas_Write],
+    areas: Iterable[Any],
+    expand: Callable[[Any], Iterable[str]],
+) -> list[alerts_models.Alert_Areas_Write]:
+    """
+    adds an alert link for every basin in a list of areas, used to expand the
+    bounding boxes / subbasin links of an incomming alert.  Basins that are
+    already linked keep their alert level, when a basin is in more than one
+    area the first area wins.
+
+    :param alert_links: the alert links of the incomming alert
+    :type alert_links: list[alerts_models.Alert_Areas_Write]
+    :param areas: the areas to expand, each has an alert_level
+    :type areas: Iterable[Any]
+    :param expand: returns the names of the basins in an area
+    :type expand: Callable[[Any], Iterable[str]]
+    :return: the alert links followed by the links for the basins in the areas
+    :rtype: list[alerts_models.Alert_Areas_Write]
+    """
+    alert_links = list(alert_links)
+    linked = {alert_link.basin.basin_name for alert_link in alert_links}
+    for area in areas:
+        for basin_name in expand(area):
+            if basin_name not in linked:
+                linked.add(basin_name)
+                alert_links.append(
+                    alerts_models.Alert_Areas_Write(
+                        basin=basins_model.BasinBase(basin_name=basin_name),
+                        alert_level=area.alert_level,
+                    )
+                )
+    return alert_links
+
+
+def expand_area_bboxes(
+    session: Session, alert: alerts_models.Alert_Basins_Write
+) -> alerts_models.Alert_Basins_Write:
+    """
+    converts the bounding boxes of an incomming alert into alert links, one
+    for every basin whose boundary overlaps a box, using the spatial index of
+    the basin boundaries (see geometry_cache).  Basins that are already linked
+    keep their alert level, when a basin overlaps more than one box the first
+    box wins.
+
+    :param session: a SQLModel database session, only used if the boundaries
+        haven't been cached
+    :type session: Session
+    :param alert: the incomming alert
+    :type alert: alerts_models.Alert_Basins_Write
+    :return: the alert with the boxes replaced by alert links
+    :rtype: alerts_models.Alert_Basins_Write
+    """
+    if not alert.alert_area_bboxes:
+        return alert
+
+    geometries = geometry_cache.get(session)
+    alert_links = _expand_links(
+        alert.alert_links,
+        alert.alert_area_bboxes,
+        lambda area: (
+            geometries.basin_names[basin_id]
+            for basin_id in geometries.basins_in_bbox(area.bbox)
+        ),
+    )
+    LOGGER.debug(
+        f"{len(alert.alert_area_bboxes)} bounding boxes expanded to "
+        + f"{len(alert_links) - len(alert.alert_links)} basins"
+    )
+    return alert.model_copy(
+        update={"alert_links": alert_links, "alert_area_bboxes": []}
+    )
+
+
+def expand_subbasin_links(
+    session: Session, alert: alerts_models.Alert_Basins_Write
+) -> alerts_models.Alert_Basins_Write:
+    """
+    converts the subbasin links of an incomming alert into alert links, one
+    for every basin in the subbasin or any of its nested subbasins, using the
+    cached subbasin hierarchy (see hierarchy_cache).  Basins that are already
+    linked keep their alert level, when a basin is in more than one of the
+    subbasins the first subbasin wins.
+
+    :param session: a SQLModel database session, only used if the hierarchy
+        hasn't been cached
+    :type session: Session
+    :param alert: the incomming alert
+    :type alert: alerts_models.Alert_Basins_Write
+    :raises UnknownReferenceDataError: if a subbasin name can't be found
+    :return: the alert with the subbasins replaced by alert links
+    :rtype: alerts_models.Alert_Basins_Write
+    """
+    if not alert.alert_subbasin_links:
+        return alert
+
+    hierarchy = hierarchy_cache.get(session)
+    unknown_subbasins = {
+        subbasin_link.subbasin.sub_basin_name
+        for subbasin_link in alert.alert_subbasin_links
+        if subbasin_link.subbasin.sub_basin_name
+        not in hierarchy.subbasin_name_to_id
+    }
+    if unknown_subbasins:
+        raise UnknownReferenceDataError([], [], unknown_subbasins)
+
+    alert_links = _expand_links(
+        alert.alert_links,
+        alert.alert_subbasin_links,
+        lambda subbasin_link: (
+            hierarchy.basin_names[basin_id]
+            for basin_id in hierarchy.expand(
+                [hierarchy.subbasin_name_to_id[subbasin_link.subbasin.sub_basin_name]]
+            )
+        ),
+    )
+    LOGGER.debug(
+        f"{len(alert.alert_subbasin_links)} subbasins expanded to "
+        + f"{len(alert_links) - len(alert.alert_links)} basins"
+    )
+    return alert.model_copy(
+        update={"alert_links": alert_links, "alert_subbasin_links": []}
+    )
+
+
 def create_alert_with_basins_and_level(
     session: Session,
     alert: alerts_models.Alerts,
@@ -36,22 +267,18 @@ def create_alert_with_basins_and_level(
     :return: _description_
     :rtype: _type_
     """
+    basin_lookup, alert_level_lookup = resolve_basins_and_levels(
+        session,
+        basin_names=[basin_level["basin"] for basin_level in basin_levels],
+        alert_levels=[basin_level["alert_level"] for basin_level in basin_levels],
+    )
+
     session.add(alert)
     session.flush()  # flush to populate the primary key
 
     for basin_level in basin_levels:
-        basin_query = select(alerts_models.Basins).where(
-            alerts_models.Basins.basin_name == basin_level["basin"]
-        )
-        basin_data = session.exec(basin_query).one()
-
-        # alert_level_select = select(alerts_models.Alert_Levels).where(
-        #     alerts_models.Alert_Levels.alert_level == basin_level["alert_level"]
-        # )
-        # alert_level_data = session.exec(alert_level_select).one()
-        alert_level_data = get_alert_level(
-            session=session, alert_lvl_str=basin_level["alert_level"]
-        )
+        basin_data = basin_lookup[basin_level["basin"]]
+        alert_level_data = alert_level_lookup[basin_level["alert_level"]]
 
         junction_table = alerts_models.Alert_Areas(
             alert=alert,
@@ -92,6 +319,10 @@ def convert_to_alert(
     """
     LOGGER.debug(f"session type: {type(session)}, {type(session)}")
 
+    # resolve all the basin / alert level names up front, fails before anything
+    # is written if any of them are unknown
+    basin_lookup, alert_level_lookup = resolve_alert_links(session, alert)
+
     alert_write: alerts_models.Alerts = alerts_models.Alerts(
         alert_description=alert.alert_description,
         alert_hydro_conditions=alert.alert_hydro_conditions,
@@ -108,25 +339,8 @@ def convert_to_alert(
             alert_area_level.basin.basin_name
             and alert_area_level.alert_level.alert_level
         ):
-            # get the basin object
-            basin_sql = select(basins_model.Basins).where(
-                basins_model.Basins.basin_name == alert_area_level.basin.basin_name
-            )
-            LOGGER.debug(
-                f"basin_sql: {basin_sql}, {session}, {alert_area_level.basin.basin_name}"
-            )
-            results = session.exec(basin_sql)
-            basin = results.first()
-
-            # get the alert level object
-            # alert_lvl_sql = select(alerts_models.Alert_Levels).where(
-            #     alerts_models.Alert_Levels.alert_level
-            #     == alert_area_level.alert_level.alert_level
-            # )
-            # alert_lvl = session.exec(alert_lvl_sql).first()
-            alert_lvl = get_alert_level(
-                session=session, alert_lvl_str=alert_area_level.alert_level.alert_level
-            )
+            basin = basin_lookup[alert_area_level.basin.basin_name]
+            alert_lvl = alert_level_lookup[alert_area_level.alert_level.alert_level]
 
             LOGGER.debug(f"basin: {basin}")
             LOGGER.debug(f"alert level: {alert_lvl}")
@@ -140,52 +354,75 @@ def convert_to_alert(
     return alert_write
 
 
-def create_history_record(session: Session, alert: alerts_models.Alerts):
+# alert columns that are copied to the alert_history table
+ALERT_HISTORY_COLUMNS = [
+    "alert_id",
+    "alert_updated",
+    "alert_description",
+    "alert_hydro_conditions",
+    "alert_meteorological_conditions",
+    "additional_information",
+    "author_name",
+    "alert_status",
+]
+
+
+def create_history_record(session: Session, alert: alerts_models.Alerts) -> int:
     """
-    Writes the incomming alert to a history record.  This includes writing the
-    history of the related alert level and basin records.
+    Writes the current state of the alert to a history record.  This includes
+    writing the history of the related alert level and basin records.
+
+    The snapshot is copied from the database rows with two set based
+    statements, regardless of the number of basins associated with the alert:
+
+        * INSERT INTO alert_history ... SELECT ... FROM alerts ... RETURNING
+        * INSERT INTO alert_area_history ... SELECT ... FROM alert_areas
 
     This method should be called before changes are made to the alert database
-    record
+    record.  The session is flushed first so any pending changes to the alert
+    are included in the snapshot.
 
     :param session: database session to use to communicate with the db
     :type session: Session
     :param alert: Incomming alert record that should be written as a history
         record
     :type alert: alerts_models.Alerts
+    :return: the primary key of the history record that was written
+    :rtype: int
     """
-    history_record = alerts_models.Alert_History(
-        alert_id=alert.alert_id,
-        alert_created=alert.alert_created,
-        alert_updated=alert.alert_updated,
-        alert_description=alert.alert_description,
-        alert_hydro_conditions=alert.alert_hydro_conditions,
-        alert_meteorological_conditions=alert.alert_meteorological_conditions,
-        additional_information=alert.additional_information,
-        author_name=alert.author_name,
-        alert_status=alert.alert_status,
-        alert_history_created=datetime.datetime.now(datetime.timezone.utc),
-    )
-
-    LOGGER.debug(f"recording alert history: {history_record}")
-
-    # session.add(history_record)
-    # session.flush()  # flush to populate the primary key
-
-    # now handle the relationships to the alert_area_history table
-    #             alert_history_id=history_record.alert_history_id,
+    session.flush()
 
-    for alert_area in alert.alert_links:
-        alert_area_history = alerts_models.Alert_Area_History(
-            basin_id=alert_area.basin_id,
-            alert_level_id=alert_area.alert_level_id,
-            alert_history=history_record,
+    alerts_table = alerts_models.Alerts.__table__
+    alert_areas_table = alerts_models.Alert_Areas.__table__
+    history_table = alerts_models.Alert_History.__table__
+    area_history_table = alerts_models.Alert_Area_History.__table__
+
+    history_created = datetime.datetime.now(datetime.timezone.utc)
+    history_select = sqlalchemy.select(
+        *[alerts_table.c[column] for column in ALERT_HISTORY_COLUMNS],
+        sqlalchemy.literal(
+            history_created, history_table.c.alert_history_created.type
+        ),
+    ).where(alerts_table.c.alert_id == alert.alert_id)
+    history_insert = (
+        sqlalchemy.insert(history_table)
+        .from_select(ALERT_HISTORY_COLUMNS + ["alert_history_created"], history_select)
+        .returning(history_table.c.alert_history_id)
+    )
+    history_id = session.exec(history_insert).scalar_one()
+    LOGGER.debug(f"recorded alert history: {history_id} for alert: {alert.alert_id}")
+
+    area_history_select = sqlalchemy.select(
+        sqlalchemy.literal(history_id, area_history_table.c.alert_history_id.type),
+        alert_areas_table.c.basin_id,
+        alert_areas_table.c.alert_level_id,
+    ).where(alert_areas_table.c.alert_id == alert.alert_id)
+    session.exec(
+        sqlalchemy.insert(area_history_table).from_select(
+            ["alert_history_id", "basin_id", "alert_level_id"], area_history_select
         )
-        session.add(alert_area_history)
-        history_record.alert_history_links.append(alert_area_history)
-    session.add(history_record)
-    session.flush()
-    return history_record
+    )
+    return history_id
 
 
 def create_alert(
@@ -204,22 +441,217 @@ def create_alert(
 
     session.flush()
     session.refresh(alert_write)
+    crud_read_model.mark_alert_stale(session, alert_write.alert_id)
     return alert_write
 
 
-def get_alerts(session: Session):
+def alert_graph_load_options() -> list:
+    """
+    loader options that eagerly load the alert -> alert_areas -> basin /
+    alert_level graph.  The alert areas are loaded with one additional
+    SELECT ... IN query, and the basins / alert levels are joined into that
+    query, so the number of queries does not grow with the number of alerts
+    or alert areas.
+
+    :return: loader options to pass to select(...).options()
+    :rtype: list
+    """
+    alert_links = selectinload(alerts_models.Alerts.alert_links)
+    return [
+        alert_links.joinedload(alerts_models.Alert_Areas.basin),
+        alert_links.joinedload(alerts_models.Alert_Areas.alert_level),
+    ]
+
+
+def encode_alert_cursor(alert: alerts_models.Alerts) -> str:
+    """
+    creates an opaque cursor that identifies the position of the alert in the
+    alert list (ordered by alert_updated, alert_id, newest first)
+
+    :param alert: the last alert in the current page
+    :type alert: alerts_models.Alerts
+    :return: url safe cursor string
+    :rtype: str
+    """
+    cursor_data = {"u": alert.alert_updated.isoformat(), "id": alert.alert_id}
+    return base64.urlsafe_b64encode(json.dumps(cursor_data).encode("utf-8")).decode(
+        "ascii"
+    )
+
+
+def decode_alert_cursor(cursor: str) -> tuple[datetime.datetime, int]:
+    """
+    inverse of encode_alert_cursor
+
+    :param cursor: the cursor string
+    :type cursor: str
+    :raises ValueError: if the cursor is not valid
+    :return: the alert_updated and alert_id the cursor points to
+    :rtype: tuple[datetime.datetime, int]
+    """
+    try:
+        cursor_data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return (
+            datetime.datetime.fromisoformat(cursor_data["u"]),
+            int(cursor_data["id"]),
+        )
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"invalid cursor: {cursor}") from e
+
+
+def build_alerts_query(
+    limit: int | None = None,
+    cursor: str | None = None,
+    alert_status: list[str] | None = None,
+    basin_names: list[str] | None = None,
+    alert_levels: list[str] | None = None,
+    updated_after: datetime.datetime | None = None,
+    updated_before: datetime.datetime | None = None,
+):
+    """
+    builds the query for the alert records, newest first, with their basins
+    and alert levels eagerly loaded.
+
+    Uses keyset pagination, the cursor identifies the last alert of the
+    previous page and the next page starts after it.  The ordering / filters
+    are backed by the indexes on alerts (alert_updated, alert_id) /
+    (alert_status, alert_updated, alert_id) and alert_areas (basin_id, alert_id)
+    / (alert_level_id, alert_id)
+
+    :param limit: maximum number of alerts to return, defaults to all
+    :type limit: int, optional
+    :param cursor: cursor returned by encode_alert_cursor for the last alert
+        of the previous page
+    :type cursor: str, optional
+    :param alert_status: only return alerts with these statuses
+    :type alert_status: list[str], optional
+    :param basin_names: only return alerts that include any of these basins
+    :type basin_names: list[str], optional
+    :param alert_levels: only return alerts that include any of these alert
+        levels
+    :type alert_levels: list[str], optional
+    :param updated_after: only return alerts updated at or after this time
+    :type updated_after: datetime.datetime, optional
+    :param updated_before: only return alerts updated before this time
+    :type updated_before: datetime.datetime, optional
+    :raises ValueError: if the cursor is not valid
+    :return: the alerts query
+    :rtype: sqlmodel.sql.expression.SelectOfScalar
+    """
+    alerts_query = select(alerts_models.Alerts).options(*alert_graph_load_options())
+    return filter_alert_list(
+        alerts_query,
+        alerts_models.Alerts,
+        limit=limit,
+        cursor=cursor,
+        alert_status=alert_status,
+        basin_names=basin_names,
+        alert_levels=alert_levels,
+        updated_after=updated_after,
+        updated_before=updated_before,
+    )
+
+
+def filter_alert_list(
+    alerts_query,
+    alerts_table,
+    limit: int | None = None,
+    cursor: str | None = None,
+    alert_status: list[str] | None = None,
+    basin_names: list[str] | None = None,
+    alert_levels: list[str] | None = None,
+    updated_after: datetime.datetime | None = None,
+    updated_before: datetime.datetime | None = None,
+):
+    """
+    adds the filters, keyset pagination and ordering described in
+    build_alerts_query to a query.  The table only needs alert_id,
+    alert_status and alert_updated columns, so the same filters apply to the
+    alerts table and the alert read model.
+
+    :param alerts_query: the query to add the filters to
+    :type alerts_query: sqlmodel.sql.expression.SelectOfScalar
+    :param alerts_table: the model the query selects, Alerts or
+        Alert_Read_Model
+    :type alerts_table: type[SQLModel]
+    :raises ValueError: if the cursor is not valid
+    :return: the filtered query
+    :rtype: sqlmodel.sql.expression.SelectOfScalar
+    """
+    areas_table = alerts_models.Alert_Areas
+
+    if alert_status:
+        alerts_query = alerts_query.where(alerts_table.alert_status.in_(alert_status))
+    if basin_names:
+        basin_alerts = (
+            select(areas_table.alert_id)
+            .join(basins_model.Basins)
+            .where(basins_model.Basins.basin_name.in_(basin_names))
+        )
+        alerts_query = alerts_query.where(alerts_table.alert_id.in_(basin_alerts))
+    if alert_levels:
+        level_alerts = (
+            select(areas_table.alert_id)
+            .join(alerts_models.Alert_Levels)
+            .where(alerts_models.Alert_Levels.alert_level.in_(alert_levels))
+        )
+        alerts_query = alerts_query.where(alerts_table.alert_id.in_(level_alerts))
+    if updated_after:
+        alerts_query = alerts_query.where(alerts_table.alert_updated >= updated_after)
+    if updated_before:
+        alerts_query = alerts_query.where(alerts_table.alert_updated < updated_before)
+    if cursor:
+        cursor_updated, cursor_id = decode_alert_cursor(cursor)
+        alerts_query = alerts_query.where(
+            sqlalchemy.or_(
+                alerts_table.alert_updated < cursor_updated,
+                sqlalchemy.and_(
+                    alerts_table.alert_updated == cursor_updated,
+                    alerts_table.alert_id < cursor_id,
+                ),
+            )
+        )
+
+    alerts_query = alerts_query.order_by(
+        alerts_table.alert_updated.desc(), alerts_table.alert_id.desc()
+    )
+    if limit is not None:
+        alerts_query = alerts_query.limit(limit)
+    return alerts_query
+
+
+def get_alerts(session: Session, **filters) -> list[alerts_models.Alerts]:
     """
-    retrieves all the alert records
+    retrieves the alert records, newest first, with their basins and alert
+    levels eagerly loaded.
 
     :param session: a SQLModel database session
     :type session: SQLModel.Session
+    :param filters: the limit / cursor / filters described in
+        build_alerts_query
+    :raises ValueError: if the cursor is not valid
     :return: a list of alert records
     :rtype: list[model.Alerts]
     """
-    alerts = session.exec(select(alerts_models.Alerts)).all()
+    alerts = session.exec(build_alerts_query(**filters)).all()
     return alerts
 
 
+def build_alert_query(alert_id: int):
+    """
+    :param alert_id: the primary key of the alert record to retrieve
+    :type alert_id: int
+    :return: query for the alert record with its basins / alert levels eagerly
+        loaded
+    :rtype: sqlmodel.sql.expression.SelectOfScalar
+    """
+    return (
+        select(alerts_models.Alerts)
+        .where(alerts_models.Alerts.alert_id == alert_id)
+        .options(*alert_graph_load_options())
+    )
+
+
 def get_alert(session: Session, alert_id: int) -> alerts_models.Alerts:
     """
     retrieves an alert record by the primary key
@@ -231,9 +663,7 @@ def get_alert(session: Session, alert_id: int) -> alerts_models.Alerts:
     :return: the alert record
     :rtype: model.Alerts
     """
-    alert_query = select(alerts_models.Alerts).where(
-        alerts_models.Alerts.alert_id == alert_id
-    )
+    alert_query = build_alert_query(alert_id)
     LOGGER.debug(f"stmt: {alert_query}")
     # returns with relationships... something wrong here
     # alert_record = session.execute(alert_query).scalars().first()
@@ -248,7 +678,11 @@ def get_alert(session: Session, alert_id: int) -> alerts_models.Alerts:
 
 # multiple join example: https://stackoverflow.com/questions/74397846/how-to-join-multiple-tables-in-sql-join-using-sqlmodel-and-fastapi
 def update_alert(
-    session: Session, alert_id: int, updated_alert: alerts_models.Alert_Basins_Write
+    session: Session,
+    alert_id: int,
+    updated_alert: alerts_models.Alert_Basins_Write,
+    basin_lookup: dict[str, basins_model.Basins] | None = None,
+    alert_level_lookup: dict[str, alerts_models.Alert_Levels] | None = None,
 ) -> alerts_models.Alerts:
     """
     updates an alert record,
@@ -263,6 +697,15 @@ def update_alert(
     :type session: SQLModel.Session
     :param alert: the alert record to update
     :type alert: model.Alerts
+    :param basin_lookup: basin records keyed by name for the basins referenced
+        by the updated alert, as returned by resolve_alert_links.  Resolved
+        from the database if not provided.
+    :type basin_lookup: dict[str, Basins], optional
+    :param alert_level_lookup: alert level records keyed by level, as
+        returned by resolve_alert_links
+    :type alert_level_lookup: dict[str, Alert_Levels], optional
+    :raises UnknownReferenceDataError: if the updated alert references basins
+        or alert levels that don't exist
     :return: the updated alert record
     :rtype: model.Alerts
     """
@@ -274,6 +717,13 @@ def update_alert(
     LOGGER.debug(f"current alert: {current_alert}")
     LOGGER.debug(f"current alert: {current_alert.alert_description}")
 
+    # resolve the basin / alert level names before anything is modified so
+    # unknown names fail before the alert is changed
+    if basin_lookup is None or alert_level_lookup is None:
+        basin_lookup, alert_level_lookup = resolve_alert_links(
+            session, updated_alert
+        )
+
     # need to implement my own comparison
     if not is_alert_equal(current_alert, updated_alert):
         # write the history record
@@ -296,66 +746,72 @@ def update_alert(
             if getattr(current_alert, atrib) != update_value:
                 LOGGER.debug(f"updating the atrib: {atrib} with {update_value}")
                 setattr(current_alert, atrib, update_value)
-                session.add(current_alert)
-                session.flush()
-
-        # update the basins and alert levels
-        #   determining what needs to be updated
-        #   -- get the alert areas / levels incomming
-        basin_levels_incomming = []
-        for alert_link in updated_alert.alert_links:
-            basin_levels_incomming.append(
-                [alert_link.basin.basin_name, alert_link.alert_level.alert_level]
+
+        # update the last updated timestamp
+        current_alert.alert_updated = datetime.datetime.now(datetime.timezone.utc)
+        session.add(current_alert)
+        session.flush()
+        crud_read_model.mark_alert_stale(session, current_alert.alert_id)
+
+        # update the basins and alert levels, working with sets of
+        # (basin_id, alert_level_id) to determine what needs to change
+        alert_areas_existing = frozenset(
+            (alert_link.basin_id, alert_link.alert_level_id)
+            for alert_link in current_alert.alert_links
+        )
+        alert_areas_incomming = frozenset(
+            (
+                basin_lookup[alert_link.basin.basin_name].basin_id,
+                alert_level_lookup[alert_link.alert_level.alert_level].alert_level_id,
             )
+            for alert_link in updated_alert.alert_links
+            if alert_link.basin.basin_name and alert_link.alert_level.alert_level
+        )
+        alert_areas_to_delete = alert_areas_existing - alert_areas_incomming
+        alert_areas_to_add = alert_areas_incomming - alert_areas_existing
+        LOGGER.info(
+            f"alert areas to delete: {sorted(alert_areas_to_delete)}, "
+            + f"to add: {sorted(alert_areas_to_add)}"
+        )
 
-        #   -- remove the alert areas that are not in the incomming alert but are in existing
-        basin_levels_existing = []
-        for alert_link in current_alert.alert_links:
-            cur_bas_lvl = [
-                alert_link.basin.basin_name,
-                alert_link.alert_level.alert_level,
-            ]
-            basin_levels_existing.append(cur_bas_lvl)
-            if cur_bas_lvl not in basin_levels_incomming:
-                LOGGER.info(
-                    f"deleting the alert area: {alert_link.basin.basin_name} {alert_link.alert_level.alert_level}"
+        if alert_areas_to_delete:
+            # the deleted records are removed from the session so they don't
+            # linger in the identity map
+            for alert_link in current_alert.alert_links:
+                if (
+                    alert_link.basin_id,
+                    alert_link.alert_level_id,
+                ) in alert_areas_to_delete:
+                    session.expunge(alert_link)
+            delete_areas = (
+                sqlalchemy.delete(alerts_models.Alert_Areas)
+                .where(alerts_models.Alert_Areas.alert_id == current_alert.alert_id)
+                .where(
+                    sqlalchemy.tuple_(
+                        alerts_models.Alert_Areas.basin_id,
+                        alerts_models.Alert_Areas.alert_level_id,
+                    ).in_(sorted(alert_areas_to_delete))
                 )
-                session.delete(alert_link)
-                session.flush()  # have to flush or won't update the orm relationship
-        session.refresh(current_alert)
-
-        # determine alert levels / basins that need to be added to the alert
-        alert_area_to_add = []
-        for alert_link in updated_alert.alert_links:
-            cur_bas_lvl = [
-                alert_link.basin.basin_name,
-                alert_link.alert_level.alert_level,
-            ]
-
-            if cur_bas_lvl not in basin_levels_existing:
-                LOGGER.info(
-                    "adding the alert area: "
-                    + f"{alert_link.basin.basin_name} {alert_link.alert_level.alert_level}"
-                )
-                alert_area_to_add.append(cur_bas_lvl)
-
-        # Having determined what needs to be added to the alert, doing the actual
-        # add in the database
-        for alert_link in alert_area_to_add:
-            basin_name = alert_link[0]
-            alert_level = alert_link[1]
-            alert_area = create_area_alert_record(
-                session=session,
-                basin_name=basin_name,
-                alert_level=alert_level,
-                alert=current_alert,
+                .execution_options(synchronize_session=False)
+            )
+            session.exec(delete_areas)
+
+        if alert_areas_to_add:
+            session.exec(
+                sqlalchemy.insert(alerts_models.Alert_Areas),
+                params=[
+                    {
+                        "alert_id": current_alert.alert_id,
+                        "basin_id": basin_id,
+                        "alert_level_id": alert_level_id,
+                    }
+                    for basin_id, alert_level_id in sorted(alert_areas_to_add)
+                ],
             )
-            current_alert.alert_links.append(alert_area)
-            session.flush()
-            session.refresh(current_alert)
 
-        # update the last updated timestamp
-        current_alert.alert_updated = datetime.datetime.now(datetime.timezone.utc)
+        if alert_areas_to_delete or alert_areas_to_add:
+            # reloaded the next time they are accessed
+            session.expire(current_alert, ["alert_links"])
 
     LOGGER.debug(f"current alert before send: {current_alert}")
     return current_alert
@@ -366,6 +822,8 @@ def create_area_alert_record(
     basin_name: str,
     alert_level: str,
     alert: alerts_models.Alerts | alerts_models.Alert_Basins_Write,
+    basin_lookup: dict[str, basins_model.Basins] | None = None,
+    alert_level_lookup: dict[str, alerts_models.Alert_Levels] | None = None,
 ) -> alerts_models.Alert_Areas | alerts_models.Alert_Areas_Write:
     """
     helper / utility record that generates a Alert_Areas record
@@ -375,18 +833,22 @@ def create_area_alert_record(
     :type basin_name: str
     :param alert_level: input alert level string
     :type alert_level: str
+    :param basin_lookup: basin records keyed by name, as returned by
+        resolve_basins_and_levels. If not provided the basin is resolved
+        from the database
+    :type basin_lookup: dict[str, Basins], optional
+    :param alert_level_lookup: alert level records keyed by level, as
+        returned by resolve_basins_and_levels
+    :type alert_level_lookup: dict[str, Alert_Levels], optional
     """
 
     if isinstance(alert, alerts_models.Alerts):
-        basin_sql = select(basins_model.Basins).where(
-            basins_model.Basins.basin_name == basin_name
-        )
-        basin_data = session.exec(basin_sql).first()
-
-        alert_lvl_sql = select(alerts_models.Alert_Levels).where(
-            alerts_models.Alert_Levels.alert_level == alert_level
-        )
-        alert_lvl = session.exec(alert_lvl_sql).first()
+        if basin_lookup is None or alert_level_lookup is None:
+            basin_lookup, alert_level_lookup = resolve_basins_and_levels(
+                session, basin_names=[basin_name], alert_levels=[alert_level]
+            )
+        basin_data = basin_lookup[basin_name]
+        alert_lvl = alert_level_lookup[alert_level]
 
         alert_area = alerts_models.Alert_Areas(
             alert_level=alert_lvl, basin=basin_data, alert=alert
@@ -510,11 +972,16 @@ def get_latest_history(session: Session, alert_id: int):
     :return: the most recent history record
     :rtype: model.Alert_History
     """
-    # find the last history id, then use that to get the last history record
+    # the first snapshot of the alert's history timeline, read through the
+    # (alert_id, alert_history_created) index
     history_id_query = (
         select(alerts_models.Alert_History)
         .where(alerts_models.Alert_History.alert_id == alert_id)
-        .order_by(alerts_models.Alert_History.alert_history_id.desc())
+        .order_by(
+            alerts_models.Alert_History.alert_history_created.desc(),
+            alerts_models.Alert_History.alert_history_id.desc(),
+        )
+        .limit(1)
     )
     history_record = session.exec(history_id_query).first()
     LOGGER.debug(f"history_rec: {history_record}")
@@ -549,25 +1016,54 @@ def get_latest_history(session: Session, alert_id: int):
     return history_record
 
 
-def get_alert_levels(session: Session) -> list[alerts_models.Alert_Levels]:
+def get_alert_levels(
+    session: Session, skip: int = 0, limit: int | None = None
+) -> list[alerts_models.Alert_Levels]:
     """
     retrieves all the valid alert levels as defined in the database
     alert levels table
 
     :param session: a SQLModel database session
     :type session: SQLModel.Session
+    :param skip: number of records to skip, defaults to 0
+    :type skip: int, optional
+    :param limit: maximum number of records to return, defaults to all
+    :type limit: int, optional
     :return: a list of alert level records
     :rtype: list[model.Alert_Levels]
     """
     LOGGER.debug("get_alert_levels")
-    alert_levels = session.exec(select(alerts_models.Alert_Levels)).all()
+    alert_levels_query = (
+        select(alerts_models.Alert_Levels)
+        .order_by(alerts_models.Alert_Levels.alert_level_id)
+        .offset(skip)
+        .limit(limit)
+    )
+    alert_levels = session.exec(alert_levels_query).all()
     LOGGER.debug(f"alert_levels: {alert_levels}")
     return alert_levels
 
 
 def get_alert_level(session: Session, alert_lvl_str: str) -> alerts_models.Alert_Levels:
-    alert_lvl_sql = select(alerts_models.Alert_Levels).where(
-        alerts_models.Alert_Levels.alert_level == alert_lvl_str
+    """
+    returns the alert level record for the supplied alert level string, the id
+    is resolved from the reference data cache instead of querying the database
+
+    :param session: a SQLModel database session
+    :type session: SQLModel.Session
+    :param alert_lvl_str: the alert level, example 'Flood Watch'
+    :type alert_lvl_str: str
+    :return: the alert level record, attached to the session, or None if the
+        alert level doesn't exist
+    :rtype: alerts_models.Alert_Levels
+    """
+    reference_data = reference_cache.get(session)
+    alert_level_id = reference_data.alert_level_to_id.get(alert_lvl_str)
+    if alert_level_id is None:
+        return None
+    return attach(
+        session,
+        alerts_models.Alert_Levels,
+        alert_level_id=alert_level_id,
+        alert_level=alert_lvl_str,
     )
-    alert_lvl = session.exec(alert_lvl_sql).first()
-    return alert_lvl
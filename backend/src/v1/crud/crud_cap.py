@@ -1,21 +1,28 @@
 import datetime
+import hashlib
+import json
 import logging
 from typing import List
 
+import sqlalchemy
+from sqlalchemy.orm import joinedload, selectinload
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 import src.v1.crud.crud_alerts as crud_alerts
+import src.v1.crud.crud_read_model as crud_read_model
 import src.v1.models.alerts as alerts_models
 import src.v1.models.basins as basins_models
 import src.v1.models.cap as cap_models
+from src.v1.crud.reference_cache import attach, reference_cache
 
 LOGGER = logging.getLogger(__name__)
 
 
 def get_cap_event_status(session: Session, status: str) -> cap_models.Cap_Event_Status:
     """
-    queries the cap event status lookup table for the record that corresponds
-    with the supplied status string
+    returns the cap event status lookup table record that corresponds with the
+    supplied status string, the id is resolved from the reference data cache
 
     :param session: database sqlmodel session
     :type session: sqlmodel.Session
@@ -25,17 +32,20 @@ def get_cap_event_status(session: Session, status: str) -> cap_models.Cap_Event_
     :return: a cap event status record for the status that was queried
     :rtype: cap_models.Cap_Event_Status
     """
-    select_cap_status = select(cap_models.Cap_Event_Status).where(
-        cap_models.Cap_Event_Status.cap_event_status == status
-    )
-    LOGGER.debug(f"select_cap_status: {select_cap_status}")
-    cap_status_create_record = session.exec(select_cap_status).first()
-    if not cap_status_create_record:
+    reference_data = reference_cache.get(session)
+    cap_event_status_id = reference_data.cap_event_status_to_id.get(status)
+    if cap_event_status_id is None:
         msg = (
             f"trying to retrieve the record for status={status}, however there"
             + " is no record with that value in the database."
         )
         raise LookupError(msg)
+    cap_status_create_record = attach(
+        session,
+        cap_models.Cap_Event_Status,
+        cap_event_status_id=cap_event_status_id,
+        cap_event_status=status,
+    )
     LOGGER.debug(f"cap_status_create_record: {cap_status_create_record}")
     return cap_status_create_record
 
@@ -84,25 +94,227 @@ def get_cap_events_for_alert(session: Session, alert_id: int):
     """
     LOGGER.debug(f"getting the cap events for alert id: {alert_id}")
     cap_event = session.exec(
-        select(cap_models.Cap_Event).where(cap_models.Cap_Event.alert_id == alert_id)
+        select(cap_models.Cap_Event)
+        .where(cap_models.Cap_Event.alert_id == alert_id)
+        .order_by(cap_models.Cap_Event.cap_event_id)
+        .options(*cap_event_load_options())
     ).all()
     return cap_event
 
 
-def get_cap_events(session: Session):
+def cap_event_load_options() -> list:
+    """
+    loader options that retrieve a cap event along with its areas, the basins
+    for those areas, its alert level and status in a fixed number of queries,
+    rather than lazy loading them one cap event / area at a time.
+
+    :return: a list of loader options to pass to select().options()
+    :rtype: list
+    """
+    return [
+        selectinload(cap_models.Cap_Event.event_areas).joinedload(
+            cap_models.Cap_Event_Areas.cap_area_basin
+        ),
+        joinedload(cap_models.Cap_Event.alert_level),
+        joinedload(cap_models.Cap_Event.cap_event_status),
+    ]
+
+
+def get_cap_events_by_level(
+    cap_events: List[cap_models.Cap_Event],
+) -> dict[str, cap_models.Cap_Event]:
+    """
+    :param cap_events: the cap events for an alert
+    :type cap_events: List[cap_models.Cap_Event]
+    :raises LookupError: if there is more than one cap event for an alert level
+    :return: the cap events keyed by their alert level string
+    :rtype: dict[str, cap_models.Cap_Event]
+    """
+    cap_events_by_level = {}
+    for cap_event in cap_events:
+        alert_level = cap_event.alert_level.alert_level
+        if alert_level in cap_events_by_level:
+            msg = (
+                f"more than one cap event found for the alert id: {cap_event.alert_id}"
+                + f" and alert level: {alert_level}.  There should "
+                + "only ever be one cap event for a given alert level."
+            )
+            raise LookupError(msg)
+        cap_events_by_level[alert_level] = cap_event
+    return cap_events_by_level
+
+
+def build_cap_events_query(skip: int = 0, limit: int | None = None):
+    """
+    :param skip: number of records to skip, defaults to 0
+    :type skip: int, optional
+    :param limit: maximum number of records to return, defaults to all
+    :type limit: int, optional
+    :return: query for the cap events, newest first, with their areas, alert
+        level and status eagerly loaded
+    :rtype: sqlmodel.sql.expression.SelectOfScalar
     """
-    retrieves all the cap events in the database
+    return (
+        select(cap_models.Cap_Event)
+        .order_by(cap_models.Cap_Event.cap_event_id.desc())
+        .offset(skip)
+        .limit(limit)
+        .options(*cap_event_load_options())
+    )
+
+
+def get_cap_events(session: Session, skip: int = 0, limit: int | None = None):
+    """
+    retrieves all the cap events in the database, newest first
 
     :param session: _description_
     :type session: Session
+    :param skip: number of records to skip, defaults to 0
+    :type skip: int, optional
+    :param limit: maximum number of records to return, defaults to all
+    :type limit: int, optional
     """
-    cap_events_query = select(cap_models.Cap_Event)
+    cap_events_query = build_cap_events_query(skip=skip, limit=limit)
     LOGGER.debug(f"cap query: {cap_events_query}")
     cap_events = session.exec(cap_events_query).all()
     # LOGGER.debug(f"cap_events: {cap_events}")
     return cap_events
 
 
+async def get_cap_events_async(
+    session: AsyncSession, skip: int = 0, limit: int | None = None
+) -> List[cap_models.Cap_Event]:
+    """
+    async version of get_cap_events, used when DB_ASYNC_ENABLED is set
+
+    :param session: an async database session
+    :type session: AsyncSession
+    :param skip: number of records to skip, defaults to 0
+    :type skip: int, optional
+    :param limit: maximum number of records to return, defaults to all
+    :type limit: int, optional
+    :return: the cap events, newest first
+    :rtype: List[cap_models.Cap_Event]
+    """
+    result = await session.exec(build_cap_events_query(skip=skip, limit=limit))
+    return result.all()
+
+
+def build_cap_versions_query():
+    """
+    :return: query for the id of each cap event along with when it and its
+        alert were last updated, everything in the cap message for the event
+        depends on one or the other.  Ordered by the cap event id.
+    :rtype: sqlmodel.sql.expression.Select
+    """
+    return (
+        select(
+            cap_models.Cap_Event.cap_event_id,
+            cap_models.Cap_Event.cap_event_updated_date,
+            alerts_models.Alerts.alert_updated,
+        )
+        .join(
+            alerts_models.Alerts,
+            alerts_models.Alerts.alert_id == cap_models.Cap_Event.alert_id,
+        )
+        .order_by(cap_models.Cap_Event.cap_event_id)
+    )
+
+
+def get_cap_event_version(
+    session: Session, cap_event_id: int
+) -> tuple[int, datetime.datetime, datetime.datetime] | None:
+    """
+    :param session: a database session
+    :type session: Session
+    :param cap_event_id: the id of the cap event
+    :type cap_event_id: int
+    :return: the cap event id and when the cap event and its alert were last
+        updated, None if the cap event doesn't exist
+    :rtype: tuple[int, datetime.datetime, datetime.datetime] | None
+    """
+    return session.exec(
+        build_cap_versions_query().where(
+            cap_models.Cap_Event.cap_event_id == cap_event_id
+        )
+    ).first()
+
+
+def get_active_cap_event_versions(
+    session: Session,
+) -> List[tuple[int, datetime.datetime, datetime.datetime]]:
+    """
+    :param session: a database session
+    :type session: Session
+    :return: the id / updated dates of the cap events that haven't been
+        cancelled, see get_cap_event_version
+    :rtype: List[tuple[int, datetime.datetime, datetime.datetime]]
+    """
+    cancel_status_id = get_cap_event_status(session, "CANCEL").cap_event_status_id
+    return session.exec(
+        build_cap_versions_query().where(
+            cap_models.Cap_Event.cap_event_status_id != cancel_status_id
+        )
+    ).all()
+
+
+def get_cap_messages(
+    session: Session, cap_event_ids: List[int]
+) -> List[tuple[cap_models.Cap_Event, alerts_models.Alerts]]:
+    """
+    :param session: a database session
+    :type session: Session
+    :param cap_event_ids: ids of the cap events
+    :type cap_event_ids: List[int]
+    :return: the cap events along with their alert, everything that is needed
+        to render the cap messages for the events.  The cap events have their
+        areas, alert level and status eagerly loaded.
+    :rtype: List[tuple[cap_models.Cap_Event, alerts_models.Alerts]]
+    """
+    return session.exec(
+        select(cap_models.Cap_Event, alerts_models.Alerts)
+        .join(
+            alerts_models.Alerts,
+            alerts_models.Alerts.alert_id == cap_models.Cap_Event.alert_id,
+        )
+        .where(cap_models.Cap_Event.cap_event_id.in_(cap_event_ids))
+        .order_by(cap_models.Cap_Event.cap_event_id)
+        .options(*cap_event_load_options())
+    ).all()
+
+
+def get_previous_cap_versions(
+    session: Session, cap_event_ids: List[int]
+) -> dict[int, List[datetime.datetime]]:
+    """
+    The cap event history records the state of a cap event before each
+    update / cancel, including when the replaced version was last updated.
+    Those are the cap messages that the current message for the event
+    references.
+
+    :param session: a database session
+    :type session: Session
+    :param cap_event_ids: ids of the cap events
+    :type cap_event_ids: List[int]
+    :return: the updated dates of the previous versions of each cap event,
+        oldest first, keyed by cap event id
+    :rtype: dict[int, List[datetime.datetime]]
+    """
+    history = cap_models.Cap_Event_History
+    versions = {cap_event_id: [] for cap_event_id in cap_event_ids}
+    if not cap_event_ids:
+        return versions
+    rows = session.exec(
+        select(history.cap_event_id, history.cap_event_updated_date)
+        .where(history.cap_event_id.in_(cap_event_ids))
+        .distinct()
+        .order_by(history.cap_event_id, history.cap_event_updated_date)
+    ).all()
+    for cap_event_id, cap_event_updated_date in rows:
+        versions[cap_event_id].append(cap_event_updated_date)
+    return versions
+
+
 def update_cap_event(session: Session, alert: alerts_models.Alerts):
     """
     This method will handle the various operations that need to take place when
@@ -113,30 +325,84 @@ def update_cap_event(session: Session, alert: alerts_models.Alerts):
         - query for existing cap events in the database for the current alert
         - calculate the differences between the two sets of caps and determine
             which caps need to be updated and how
-        - write existing state of caps that are to be changed to the cap history
-            tables
         - write updates to the caps that have changed
 
-    See docs/
+    History records are not written by this method, see record_history, or
+    reconcile_caps which does both with a single comparison.
 
     :param session: input database session
     :type session: sqlmodel.Session
     :param alert: The updated state to an alert object
     :type alert: alerts_models.Alerts
     """
-    # 1. generate caps for the current the alert
+    session.flush()
+    cap_events = get_cap_events_for_alert(session, alert.alert_id)
+    cap_comp = CapCompare(session, alert, cap_events=cap_events)
+    cap_delta = cap_comp.get_delta()
+    apply_cap_delta(session, alert, cap_delta, cap_events)
+
+
+def reconcile_caps(session: Session, alert: alerts_models.Alerts) -> "CapDelta":
+    """
+    Brings the cap events for an alert in line with the alert after it has been
+    edited.  The existing cap events are loaded once, and the comparison with
+    the alert is calculated once, that comparison is then used to:
+
+        - write the history records for the cap events that will change
+        - create cap events for new alert levels
+        - update cap events for alert levels whose basins have changed
+        - cancel cap events for alert levels that have been removed, or all of
+          them if the alert has been cancelled
 
-    # caps = get_cap_events_for_alert(session, alert_id: int):
-    # existing_caps = get_cap_events_for_alert(session, alert.alert_id)
-    cap_comp = CapCompare(session, alert)
+    :param session: input database session
+    :type session: sqlmodel.Session
+    :param alert: The updated state to an alert object
+    :type alert: alerts_models.Alerts
+    :return: the delta that was applied
+    :rtype: CapDelta
+    """
+    # ensures the alert's relationships are written before they're compared
+    session.flush()
+    cap_events = get_cap_events_for_alert(session, alert.alert_id)
+    cap_comp = CapCompare(session, alert, cap_events=cap_events)
     cap_delta = cap_comp.get_delta()
 
+    # history is written first, it records the state of the caps before they
+    # are modified
+    __write_history_for_cap_comp(
+        session=session,
+        cap_comps=cap_delta.getUpdates() + cap_delta.getCancels(),
+        caps_for_alert=cap_events,
+        alert_id=alert.alert_id,
+    )
+    apply_cap_delta(session, alert, cap_delta, cap_events)
+    return cap_delta
+
+
+def apply_cap_delta(
+    session: Session,
+    alert: alerts_models.Alerts,
+    cap_delta: "CapDelta",
+    cap_events: List[cap_models.Cap_Event],
+):
+    """
+    writes the creates / updates / cancels described by a cap delta
+
+    :param session: input database session
+    :type session: sqlmodel.Session
+    :param alert: The updated state to an alert object
+    :type alert: alerts_models.Alerts
+    :param cap_delta: the delta between the existing cap events and the alert
+    :type cap_delta: CapDelta
+    :param cap_events: the existing cap events for the alert, that the delta was
+        calculated from
+    :type cap_events: List[cap_models.Cap_Event]
+    """
     # from the delta we can retrieve the CREATE / UPDATE / CANCEL caps
     creates = cap_delta.getCreates()
     updates = cap_delta.getUpdates()
     cancels = cap_delta.getCancels()
 
-    # only write history records if there are changes
     if creates or updates or cancels:
 
         LOGGER.debug(f"creates: {creates}")
@@ -145,14 +411,21 @@ def update_cap_event(session: Session, alert: alerts_models.Alerts):
 
         # create new caps for new alert levels
         new_cap_for_alert(session=session, alert=alert, cap_comps=creates)
-        # need a method to update existing cap - update
-        update_cap_for_alert(session=session, alert=alert, cap_comps=updates)
-        # need a method to cancel existing cap - cancel
-        cancel_cap_for_alert(session=session, alert=alert, cap_comps=cancels)
+        # update existing caps whose basins have changed
+        update_cap_for_alert(
+            session=session, alert=alert, cap_comps=updates, cap_events=cap_events
+        )
+        # cancel existing caps
+        cancel_cap_for_alert(
+            session=session, alert=alert, cap_comps=cancels, cap_events=cap_events
+        )
 
 
 def cancel_cap_for_alert(
-    session: Session, alert: alerts_models.Alerts, cap_comps: cap_models.Cap_Comparison
+    session: Session,
+    alert: alerts_models.Alerts,
+    cap_comps: cap_models.Cap_Comparison,
+    cap_events: List[cap_models.Cap_Event] | None = None,
 ):
     """
     Updates the status of existing caps to cancel when the basins associated with
@@ -169,54 +442,42 @@ def cancel_cap_for_alert(
     :param cap_comps: a cap comparison object that describes the cancels that need
         to be issued.
     :type cap_comps: cap_models.Cap_Comparison
+    :param cap_events: the existing cap events for the alert, queried if not
+        provided
+    :type cap_events: List[cap_models.Cap_Event], optional
     """
     LOGGER.debug(f"cap_comps: {cap_comps}")
+    if not cap_comps:
+        return
     cap_cancel_event_status = get_cap_event_status(session, "CANCEL")
-    for cap_comp in cap_comps:
-        # getting the related alert level record, can retrieve the fk / pk relation
-        # from this record.
-        alert_level_record = crud_alerts.get_alert_level(
-            session, alert_lvl_str=cap_comp.alert_level.alert_level
-        )
-        LOGGER.debug(f"alert_level_record: {alert_level_record}")
-
-        # retrieve the cap event for the alert level and cap
-        cap_query = (
-            select(cap_models.Cap_Event)
-            .where(cap_models.Cap_Event.alert_id == alert.alert_id)
-            .where(
-                cap_models.Cap_Event.alert_level_id == alert_level_record.alert_level_id
-            )
-        )
-        LOGGER.debug(f"cap_query: {cap_query}")
-        cur_cap_event = session.exec(cap_query).all()
-        if len(cur_cap_event) > 1:
-            msg = (
-                f"more than one cap event found for the alert id: {alert.alert_id}"
-                + f" and alert level: {alert_level_record.alert_level}.  There should "
-                + "only ever be one cap event for a given alert level."
-            )
-            raise LookupError(msg)
+    if cap_events is None:
+        cap_events = get_cap_events_for_alert(session, alert.alert_id)
+    cap_events_by_level = get_cap_events_by_level(cap_events)
 
+    for cap_comp in cap_comps:
+        cur_cap_event = cap_events_by_level[cap_comp.alert_level.alert_level]
         LOGGER.debug(f"cap: {cur_cap_event}")
 
-        # now just update the status of the alert to 'CANCEL'
-        cur_cap_event = cur_cap_event[0]
-
-        # update the cap status to 'CANCEL'
+        # update the cap status to 'CANCEL'.  Sets the fk rather than the
+        # relationship, Cap_Event_Status.cap_event_status_lnk is single valued so
+        # assigning the relationship would detach other cap events with the same
+        # status.  The relationship is expired so it reflects the new fk.
         cur_cap_event.cap_event_status_id = cap_cancel_event_status.cap_event_status_id
-        # cur_cap_event.cap_event_status = cap_cancel_event_status
+        cur_cap_event.cap_event_updated_date = datetime.datetime.now(
+            datetime.timezone.utc
+        )
+        session.expire(cur_cap_event, ["cap_event_status"])
         session.add(cur_cap_event)
-        session.flush()  # without the flush here the changes seem to be getting overwritten
-        session.refresh(
-            cur_cap_event
-        )  # update the related attributes after update of fk
         LOGGER.debug(f"{cur_cap_event=}")
     session.flush()
+    crud_read_model.mark_alert_stale(session, alert.alert_id)
 
 
 def update_cap_for_alert(
-    session: Session, alert: alerts_models.Alerts, cap_comps: cap_models.Cap_Comparison
+    session: Session,
+    alert: alerts_models.Alerts,
+    cap_comps: cap_models.Cap_Comparison,
+    cap_events: List[cap_models.Cap_Event] | None = None,
 ):
     """
     This method will modify existing caps who's associated basins have been
@@ -230,70 +491,59 @@ def update_cap_for_alert(
     :param cap_comps: a cap comparison object that describes the updates that
         need to be made to existing caps.
     :type cap_comps: cap_models.Cap_Comparison
+    :param cap_events: the existing cap events for the alert, queried if not
+        provided
+    :type cap_events: List[cap_models.Cap_Event], optional
     """
+    if not cap_comps:
+        return
     # TODO: should create an enumeration for cap event status references
     # - retrieve the cap status record for an update, later attach to cap event
     cap_event_status = get_cap_event_status(session, "UPDATE")
+    if cap_events is None:
+        cap_events = get_cap_events_for_alert(session, alert.alert_id)
+    cap_events_by_level = get_cap_events_by_level(cap_events)
 
     # iterate over the caps comps that describe the alert levels and basins
     # for updates
     for cap_comp in cap_comps:
-        # get the alert level record for the cap alert level defined in
-        # cap_comp
-        alert_level_record = crud_alerts.get_alert_level(
-            session, alert_lvl_str=cap_comp.alert_level.alert_level
-        )
-        LOGGER.debug(f"alert_level_record: {alert_level_record}")
-
-        # retrieve the cap event for the alert level and cap
-        cap_query = (
-            select(cap_models.Cap_Event)
-            .where(cap_models.Cap_Event.alert_id == alert.alert_id)
-            .where(
-                cap_models.Cap_Event.alert_level_id == alert_level_record.alert_level_id
-            )
-        )
-        LOGGER.debug(f"cap_query: {cap_query}")
-        cur_cap_event = session.exec(cap_query).all()
-        if len(cur_cap_event) > 1:
-            msg = (
-                f"more than one cap event found for the alert id: {alert.alert_id}"
-                + f" and alert level: {alert_level_record.alert_level}.  There should "
-                + "only ever be one cap event for a given alert level."
-            )
-            raise LookupError(msg)
-
+        cur_cap_event = cap_events_by_level[cap_comp.alert_level.alert_level]
         LOGGER.debug(f"cap: {cur_cap_event}")
-        # grab the record from the result set
-        cur_cap_event = cur_cap_event[0]
-        for relation in cur_cap_event.event_areas:
-            LOGGER.debug(f"relation: {relation}")
-            session.delete(relation)
-
-        # update the cap status to 'UPDATE'
-        cur_cap_event.cap_event_status_id = cap_event_status.cap_event_status_id
-        session.flush()  # without the flush here the changes seem to be getting overwritten
-        # ^ which is really weird as the session is flushed before it gets returned.
 
-        # session.refresh(cur_cap_event)
-        LOGGER.debug(
-            f"status after update: {cur_cap_event.cap_event_status.cap_event_status}"
-        )
-        LOGGER.debug(f"the fk: {cap_event_status.cap_event_status_id}")
-        for basin in cap_comp.basins:
-
-            basin_inst = basins_models.Basins(basin_name=basin.basin_name)
-            session.add(basin_inst)
-            cap_event_area = cap_models.Cap_Event_Areas(
-                cap_area_basin=basin_inst, cap_event_id=cur_cap_event.cap_event_id
+        # only the areas that have been added / removed are modified
+        new_basin_ids = set(cap_comp.basin_ids)
+        existing_basin_ids = set()
+        for event_area in cur_cap_event.event_areas:
+            if event_area.basin_id in new_basin_ids:
+                existing_basin_ids.add(event_area.basin_id)
+            else:
+                LOGGER.debug(f"removing area: {event_area}")
+                session.delete(event_area)
+        # the removed areas are flushed before the new ones are added, so the
+        # identity map no longer holds them when their ids are reused.  The
+        # collection is reloaded without them the next time it is accessed
+        session.flush()
+        session.expire(cur_cap_event, ["event_areas"])
+
+        # the new areas are appended to the collection rather than only added
+        # to the session, so they stay referenced by the cap event until the
+        # transaction ends
+        for basin_id in sorted(new_basin_ids - existing_basin_ids):
+            cur_cap_event.event_areas.append(
+                cap_models.Cap_Event_Areas(basin_id=basin_id)
             )
-            session.add(cap_event_area)
-            cur_cap_event.event_areas.append(cap_event_area)
 
-        session.refresh(cur_cap_event)
+        # update the cap status to 'UPDATE', see cancel_cap_for_alert for why
+        # the fk is set instead of the relationship
+        cur_cap_event.cap_event_status_id = cap_event_status.cap_event_status_id
+        cur_cap_event.cap_event_updated_date = datetime.datetime.now(
+            datetime.timezone.utc
+        )
+        session.expire(cur_cap_event, ["cap_event_status"])
+        session.add(cur_cap_event)
         LOGGER.debug(f"areas after update: {cur_cap_event.event_areas}")
-        LOGGER.debug(f"cur_cap_event: {cur_cap_event}")
     session.flush()
+    crud_read_model.mark_alert_stale(session, alert.alert_id)
 
 
 def new_cap_for_alert(
@@ -327,20 +577,15 @@ def new_cap_for_alert(
             cap_event_created_date=datetime.datetime.now(datetime.timezone.utc),
             cap_event_updated_date=datetime.datetime.now(datetime.timezone.utc),
         )
-        cap_areas_list = []
-        for basin in cap_comp.basins:
-            # basin_inst = basins_models.Basins(basin_name=basin.basin_name)
-            basin_query = select(basins_models.Basins).where(
-                basins_models.Basins.basin_name == basin.basin_name
-            )
-            basin_inst = session.exec(basin_query).first()
-
-            cap_event_area = cap_models.Cap_Event_Areas(cap_area_basin=basin_inst)
-            cap_areas_list.append(cap_event_area)
-        cur_cap_event.event_areas = cap_areas_list
+        cur_cap_event.event_areas = [
+            cap_models.Cap_Event_Areas(basin_id=basin_id)
+            for basin_id in cap_comp.basin_ids
+        ]
         session.add(cur_cap_event)
         caps_created.append(cur_cap_event)
     session.flush()
+    if caps_created:
+        crud_read_model.mark_alert_stale(session, alert.alert_id)
     return caps_created
 
 
@@ -365,26 +610,18 @@ def record_history(session: Session, alert: alerts_models.Alerts):
     """
     # retrieve the caps associated with the incomming alert, need this later to figure
     # out attributes from the actual cap event, for the history records
+    session.flush()
     cap_events = get_cap_events_for_alert(session, alert.alert_id)
     LOGGER.debug(f"cap_events: {cap_events}")
 
     # looks at the existing alert in the database and compare with the incomming
     # alert to identify how the caps should be updated
-    cap_comp = CapCompare(session=session, alert_incomming=alert)
+    cap_comp = CapCompare(session=session, alert_incomming=alert, cap_events=cap_events)
     cap_delta = cap_comp.get_delta()
-    updates = cap_delta.getUpdates()
-    cancels = cap_delta.getCancels()
-
-    __write_history_for_cap_comp(
-        session=session,
-        cap_comps=updates,
-        caps_for_alert=cap_events,
-        alert_id=alert.alert_id,
-    )
 
     __write_history_for_cap_comp(
         session=session,
-        cap_comps=cancels,
+        cap_comps=cap_delta.getUpdates() + cap_delta.getCancels(),
         caps_for_alert=cap_events,
         alert_id=alert.alert_id,
     )
@@ -399,39 +636,92 @@ def __write_history_for_cap_comp(
     """
     writes a history record for a cap comparison object
 
+    The cap events and their areas are copied from the database rows with two
+    set based statements, regardless of the number of cap events or basins:
+
+        * INSERT INTO cap_event_history ... SELECT ... FROM cap_event ... RETURNING
+        * INSERT INTO cap_event_areas_history ... SELECT ... FROM cap_event_areas
+
     :param session: input database session
     :type session: sqlmodel.Session
     :param cap_comps: a list of cap comparison objects that are used to
+        identify the cap events that require a history record
+    :type cap_comps: list[cap_models.Cap_Comparison]
+    :param caps_for_alert: the existing cap events for the alert
+    :type caps_for_alert: List[cap_models.Cap_Event]
+    :param alert_id: the alert that the cap events are associated with
+    :type alert_id: int
+    :return: the primary keys of the history records that were written
+    :rtype: list[int]
     """
-    # write a history record for each cap event that is going to be updated
-    for update in cap_comps:
-        # extracts the cap event that is associated with the current alert level in
-        # the update cap comp object
-        cur_cap_event = __get_cap_event(caps_for_alert, update.alert_level.alert_level)
-
-        # creating the history record
-        # TODO: Should only update
-        cap_event_history = cap_models.Cap_Event_History(
-            alert_id=alert_id,
-            cap_event_id=cur_cap_event.cap_event_id,
-            cap_event_updated_date=cur_cap_event.cap_event_updated_date,
-            cap_event_hist_created_date=datetime.datetime.now(datetime.timezone.utc),
-            alert_level=cur_cap_event.alert_level.alert_level_id,
-            cap_event_status_id=cur_cap_event.cap_event_status.cap_event_status_id,
-        )
-        session.add(cap_event_history)
-        session.flush()
+    # extracts the cap events that are associated with the alert levels in the
+    # cap comp objects
+    cap_event_ids = []
+    for cap_comp in cap_comps:
+        cur_cap_event = __get_cap_event(caps_for_alert, cap_comp.alert_level.alert_level)
+        cap_event_ids.append(cur_cap_event.cap_event_id)
+    if not cap_event_ids:
+        return []
 
-        # now create the basin relationships
-        for basin in cur_cap_event.event_areas:
-            LOGGER.debug(f"basin: {basin}")
-            cap_event_area_hist = cap_models.Cap_Event_Areas_History(
-                cap_event_history_id=cap_event_history.cap_event_history_id,
-                basin_id=basin.basin_id,
-            )
-            session.add(cap_event_area_hist)
-            LOGGER.debug(f"cap_event_area_hist: {cap_event_area_hist}")
-        session.flush()
+    # the rows are copied from the database, make sure it reflects the session
+    session.flush()
+
+    cap_event_table = cap_models.Cap_Event.__table__
+    cap_areas_table = cap_models.Cap_Event_Areas.__table__
+    history_table = cap_models.Cap_Event_History.__table__
+    areas_history_table = cap_models.Cap_Event_Areas_History.__table__
+
+    history_created = datetime.datetime.now(datetime.timezone.utc)
+    history_select = sqlalchemy.select(
+        cap_event_table.c.alert_id,
+        cap_event_table.c.cap_event_id,
+        cap_event_table.c.cap_event_updated_date,
+        sqlalchemy.literal(
+            history_created, history_table.c.cap_event_hist_created_date.type
+        ),
+        cap_event_table.c.alert_level_id,
+        cap_event_table.c.cap_event_status_id,
+    ).where(
+        cap_event_table.c.alert_id == alert_id,
+        cap_event_table.c.cap_event_id.in_(cap_event_ids),
+    )
+    history_insert = (
+        sqlalchemy.insert(history_table)
+        .from_select(
+            [
+                "alert_id",
+                "cap_event_id",
+                "cap_event_updated_date",
+                "cap_event_hist_created_date",
+                "alert_level",
+                "cap_event_status_id",
+            ],
+            history_select,
+        )
+        .returning(history_table.c.cap_event_history_id)
+    )
+    history_ids = session.exec(history_insert).scalars().all()
+    LOGGER.debug(f"recorded cap event history: {history_ids} for alert: {alert_id}")
+
+    # join the new history records back to the cap event areas through the
+    # cap_event_id they were copied from
+    areas_history_select = (
+        sqlalchemy.select(
+            history_table.c.cap_event_history_id,
+            cap_areas_table.c.basin_id,
+        )
+        .join(
+            cap_areas_table,
+            cap_areas_table.c.cap_event_id == history_table.c.cap_event_id,
+        )
+        .where(history_table.c.cap_event_history_id.in_(history_ids))
+    )
+    session.exec(
+        sqlalchemy.insert(areas_history_table).from_select(
+            ["cap_event_history_id", "basin_id"], areas_history_select
+        )
+    )
+    return history_ids
 
 
 def __get_cap_event(cap_events: List[cap_models.Cap_Event], alert_level: str):
@@ -461,9 +751,24 @@ class CapCompare:
         * areas impacted by the alert
     """
 
-    def __init__(self, session: Session, alert_incomming: alerts_models.Alerts):
+    def __init__(
+        self,
+        session: Session,
+        alert_incomming: alerts_models.Alerts,
+        cap_events: List[cap_models.Cap_Event] | None = None,
+    ):
+        """
+        :param session: database session
+        :type session: Session
+        :param alert_incomming: the alert in its new state
+        :type alert_incomming: alerts_models.Alerts
+        :param cap_events: the existing cap events for the alert, if they have
+            already been loaded.  Queried if not provided.
+        :type cap_events: List[cap_models.Cap_Event], optional
+        """
         self.session = session
         self.alert = alert_incomming
+        self.cap_events = cap_events
         # ensures the input alert relationships through sqlmodel work. Without
         # this wind up with a valid basin_id but when request the data get None
         session.flush()
@@ -505,10 +810,15 @@ class CapCompare:
                     alert_level=current_level_str
                 )
                 levels[current_level_str] = cap_models.Cap_Comparison(
-                    alert_level=alert_lvl, basins=[basinBase]
+                    alert_level=alert_lvl,
+                    basins=[basinBase],
+                    basin_ids=[alert_level_area.basin.basin_id],
                 )
             else:
                 levels[current_level_str].basins.append(basinBase)
+                levels[current_level_str].basin_ids.append(
+                    alert_level_area.basin.basin_id
+                )
         LOGGER.debug(f"levels: {levels}")
         self.new_alert_cap_comp = list(levels.values())
 
@@ -518,11 +828,10 @@ class CapCompare:
         existing caps associated with that alert, and structure the data for
         those caps into a cap comparison object
         """
-        # query for existing caps.
-        query = select(cap_models.Cap_Event).where(
-            cap_models.Cap_Event.alert_id == self.alert.alert_id
-        )
-        results = self.session.exec(query).all()
+        # query for existing caps, unless they have already been loaded
+        results = self.cap_events
+        if results is None:
+            results = get_cap_events_for_alert(self.session, self.alert.alert_id)
         levels = (
             {}
         )  # used to keep track of which events are associated with what alert level
@@ -572,7 +881,55 @@ class CapCompare:
         return capDelta
 
 
+def canonical_cap_levels(
+    cap_struct: List[cap_models.Cap_Comparison],
+) -> dict[str, frozenset[str]]:
+    """
+    Converts a list of cap comparison objects into their canonical form, a
+    dictionary that maps the alert level to the set of basin names at that
+    level.  The order of the basins, or of the alert levels, does not matter in
+    the canonical form.
+
+    :param cap_struct: a list of cap comparison objects
+    :type cap_struct: List[cap_models.Cap_Comparison]
+    :return: the basin names for each alert level
+    :rtype: dict[str, frozenset[str]]
+    """
+    return {
+        cap_comp.alert_level.alert_level: frozenset(
+            basin.basin_name for basin in cap_comp.basins
+        )
+        for cap_comp in cap_struct
+    }
+
+
+def cap_levels_digest(cap_levels: dict[str, frozenset[str]]) -> str:
+    """
+    :param cap_levels: canonical cap levels, see canonical_cap_levels
+    :type cap_levels: dict[str, frozenset[str]]
+    :return: a digest that is the same for any two equal sets of cap levels
+    :rtype: str
+    """
+    content = json.dumps(
+        sorted(
+            (alert_level, sorted(basin_names))
+            for alert_level, basin_names in cap_levels.items()
+        )
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
 class CapDelta:
+    """
+    The differences between the existing cap events for an alert, and the cap
+    events that the current state of the alert requires.
+
+    Both states are reduced to their canonical form, alert level -> frozenset
+    of basin names, the differences are then calculated once with set / dict
+    lookups and the results are kept for the getCreates / getUpdates /
+    getCancels accessors.
+    """
+
     def __init__(
         self,
         existing_cap_struct: List[cap_models.Cap_Comparison],
@@ -583,39 +940,78 @@ class CapDelta:
         self.new_cap_struct = new_cap_struct
         self.incomming_alert_status = incomming_alert_status
 
-        self.deltas = (
-            []
-        )  # records the level in here so we know later which levels have changed
+        # cap comparison objects indexed by their alert levels.
+        self.existing_cap_lvl_dict = self.__get_cap_comp_dict(existing_cap_struct)
+        self.new_cap_lvl_dict = self.__get_cap_comp_dict(new_cap_struct)
+
+        self.existing_levels = canonical_cap_levels(
+            self.existing_cap_lvl_dict.values()
+        )
+        self.new_levels = canonical_cap_levels(self.new_cap_lvl_dict.values())
+        self.existing_digest = cap_levels_digest(self.existing_levels)
+        self.new_digest = cap_levels_digest(self.new_levels)
+
+        # records the level in here so we know later which levels have changed
+        self.deltas = []
+        self.creates = []
+        self.updates = []
+        self.cancels = []
         self.__calcDeltas()
 
     def __calcDeltas(self):
         """
-        Adds the alert level string to the self.deltas list if a an alert level exists
-        in either existing or new cap structs, but not in both.
+        Adds the alert level string to the self.deltas list if an alert level
+        exists in either existing or new cap structs but not in both, or exists
+        in both with different basins.  Then sorts the changed levels into
+        creates / updates / cancels.
         """
-        # identify caps in self.new_cap_struct and not in self.existing_cap_struct
-        for existing_cap in self.existing_cap_struct:
-            if existing_cap in self.new_cap_struct:
-                # identifies that existing_cap exists in self.new_cap_struct
-                # which identifies that it has not changed.
-                LOGGER.debug(f"cap in both: {existing_cap}")
-            else:
-                # identifies something is different
-                LOGGER.debug("cap not in both:")
-                self.log_cap(existing_cap)  # utility to log whats going on
-                LOGGER.debug("\ncomparison cap...")
-                self.deltas.append(existing_cap.alert_level.alert_level)
-        for new_cap in self.new_cap_struct:
-            if new_cap in self.existing_cap_struct:
-                LOGGER.debug(f"cap in both: {existing_cap}")
-            else:
-                # in new and not in existing
-                LOGGER.debug("cap in new, but not existing")
-                self.log_cap(new_cap)
-                if new_cap.alert_level.alert_level not in self.deltas:
-                    self.deltas.append(new_cap.alert_level.alert_level)
+        if self.existing_digest != self.new_digest:
+            self.deltas = [
+                alert_level
+                for alert_level, basin_names in self.existing_levels.items()
+                if self.new_levels.get(alert_level) != basin_names
+            ] + [
+                alert_level
+                for alert_level in self.new_levels
+                if alert_level not in self.existing_levels
+            ]
         LOGGER.debug(f"deltas: {self.deltas}")
 
+        # creates are identified by alert levels that are in the new_cap_struct
+        # and not in the existing_cap_struct.
+        self.creates = [
+            self.new_cap_lvl_dict[alert_level]
+            for alert_level in self.deltas
+            if alert_level not in self.existing_levels
+        ]
+
+        # if the original alert from which the caps are generated has been
+        # set to 'cancelled', then regardless of any other changes, all related
+        # caps should be set to cancel, and there are no updates.
+        if (
+            self.incomming_alert_status.value
+            == alerts_models.AlertStatus.cancelled.value
+        ):
+            LOGGER.debug("alert is cancelled, all caps should be cancelled")
+            self.cancels = list(self.existing_cap_lvl_dict.values())
+        else:
+            # updates are issued when the alert level is the same in existing
+            # and new cap structs, but the basins are different.  The update
+            # carries the new state of the cap event
+            self.updates = [
+                self.new_cap_lvl_dict[alert_level]
+                for alert_level in self.deltas
+                if alert_level in self.existing_levels
+                and alert_level in self.new_levels
+            ]
+            # cancels are alert levels that are in the existing_cap_struct and
+            # not in the new_cap_struct
+            self.cancels = [
+                self.existing_cap_lvl_dict[alert_level]
+                for alert_level in self.deltas
+                if alert_level not in self.new_levels
+            ]
+
     def __get_cap_comp_dict(self, cap_comp: List[cap_models.Cap_Comparison]):
         """
         returns a dictionary representing the List of cap comparison objects where
@@ -648,18 +1044,7 @@ class CapDelta:
         creates are identified by alert levels that are in the new_cap_struct and
         not in the existing_cap_struct.
         """
-        cap_creates = []
-
-        # create a dict of caps, indexed by their alert levels.
-        existing_cap_lvl_dict = self.__get_cap_comp_dict(self.existing_cap_struct)
-        new_cap_lvl_dict = self.__get_cap_comp_dict(self.new_cap_struct)
-
-        if self.deltas:
-            # creates are identified by alert levels that are in the new_cap_struct
-            for alert_level in self.deltas:
-                if alert_level not in existing_cap_lvl_dict:
-                    cap_creates.append(new_cap_lvl_dict[alert_level])
-        return cap_creates
+        return list(self.creates)
 
     def getUpdates(self):
         """
@@ -671,89 +1056,17 @@ class CapDelta:
         What gets returned is a list of objects that define the changes that
         have been detected between the existing and new state of the cap
         """
-        existing_cap_lvl_dict = self.__get_cap_comp_dict(self.existing_cap_struct)
-        new_cap_lvl_dict = self.__get_cap_comp_dict(self.new_cap_struct)
-
-        # updates are issued when the alert level is the same in existing and
-        # new cap structs, but the basins are different
-
-        # the updates struct will return the new state of the cap event with either
-        # added basins or removed basins
-        updates = []
-
-        # if the original alert from which the caps are generated has been
-        # set to 'cancelled', then regardless of any other changes, all related
-        # caps should be set to cancel.
-        # active / cancelled
-        if (
-            self.incomming_alert_status.value
-            == alerts_models.AlertStatus.cancelled.value
-        ):
-            # don't do anything here, just need to detect that the alert has been
-            # cancelled.  The method getCancels will provide the data to issue the
-            # cancel.  Will return an empty updates list in this situation.
-            LOGGER.debug("alert is cancelled, all caps should be cancelled")
-        elif self.deltas:
-
-            #
-
-            for alert_level in self.deltas:
-                # alert level must exist in both structs
-                if (
-                    alert_level in existing_cap_lvl_dict
-                    and alert_level in new_cap_lvl_dict
-                ):
-                    existing_cap = existing_cap_lvl_dict[alert_level]
-                    new_cap = new_cap_lvl_dict[alert_level]
-                    LOGGER.debug(f"existing cap: {existing_cap}")
-                    LOGGER.debug(f"new cap: {new_cap}")
-
-                    if existing_cap.basins != new_cap.basins:
-                        # the alert level is the same, but the basins are different
-                        # so we need to update the cap event
-                        existing_basin_names = []
-                        for basin in existing_cap.basins:
-                            existing_basin_names.append(basin.basin_name)
-                        new_basin_names = []
-                        for basin in new_cap.basins:
-                            new_basin_names.append(basin.basin_name)
-
-                        LOGGER.debug(
-                            f"basins are not equal! existing: {existing_basin_names}, new: {new_basin_names}"
-                        )
-                        updates.append(new_cap)
-        return updates
+        return list(self.updates)
 
     def getCancels(self):
         """
         returns a list of objects to send to cancel_cap_event method.
 
         cancels are identified by alert levels that are in the existing_cap_struct
-        and not in the new_cap_struct.
+        and not in the new_cap_struct, or all the existing caps if the alert has
+        been cancelled.
         """
-        cap_cancels = []
-
-        # create a dict of caps, indexed by their alert levels.
-        existing_cap_lvl_dict = self.__get_cap_comp_dict(self.existing_cap_struct)
-        new_cap_lvl_dict = self.__get_cap_comp_dict(self.new_cap_struct)
-
-        LOGGER.debug(f"differences: {self.deltas}")
-        if (
-            self.incomming_alert_status.value
-            == alerts_models.AlertStatus.cancelled.value
-        ):
-            # goint to iterate over ALL the existing cap structs, and add them
-            # to the cancel list
-            for alert_level in existing_cap_lvl_dict.keys():
-                cap_cancels.append(existing_cap_lvl_dict[alert_level])
-        elif self.deltas:
-            LOGGER.debug("deltas exist")
-            # creates are identified by alert levels that are in the new_cap_struct
-            for alert_level in self.deltas:
-                if alert_level not in new_cap_lvl_dict:
-                    cap_cancels.append(existing_cap_lvl_dict[alert_level])
-                    # LOGGER.debug("")
-        return cap_cancels
+        return list(self.cancels)
 
     def is_cap_comp_equal(
         self,
@@ -761,43 +1074,12 @@ class CapDelta:
         cap_comp2: List[cap_models.Cap_Comparison],
     ):
         """
-        compares two lists of cap comparison objects to determine if they are equal
+        compares two lists of cap comparison objects to determine if they are
+        equal, ignoring the order of the alert levels and basins
         """
-        equal = True
         if len(cap_comp1) != len(cap_comp2):
-            equal = False
-        else:
-            # organize by alert level
-            cap_comp1_dict = {}
-            for cap in cap_comp1:
-                basins = []
-                for basin in cap.basins:
-                    basins.append(basin.basin_name)
-                basins.sort()
-                cap_comp1_dict[cap.alert_level.alert_level] = basins
-
-            cap_comp2_dict = {}
-            for cap in cap_comp2:
-                basins = []
-                for basin in cap.basins:
-                    basins.append(basin.basin_name)
-                basins.sort()
-                cap_comp2_dict[cap.alert_level.alert_level] = basins
-
-            # ensure each struct has the same alert levels
-            alert_lvls_1 = list(cap_comp1_dict.keys())
-            alert_lvls_1.sort()
-            alert_lvls_2 = list(cap_comp2_dict.keys())
-            alert_lvls_2.sort()
-            if alert_lvls_1 != alert_lvls_2:
-                equal = False
-
-            if equal:
-                # now make sure for each alert level they have the same basins
-                for lvl in alert_lvls_1:
-                    if cap_comp1_dict[lvl] != cap_comp2_dict[lvl]:
-                        equal = False
-        return equal
+            return False
+        return canonical_cap_levels(cap_comp1) == canonical_cap_levels(cap_comp2)
 
     def is_alert_level_in_cap_comp(
         self, cap_comps: List[cap_models.Cap_Comparison], alert_level: str
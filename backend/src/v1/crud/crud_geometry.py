@@ -0,0 +1,194 @@
+"""
+Loads / reads the basin boundaries.
+
+The boundaries come from a GeoJSON FeatureCollection (lon / lat, EPSG:4326)
+with a feature for each basin, matched to the basins table by the basin_name
+property.  Each boundary is stored as WKB at full resolution and simplified at
+every one of the configured tolerances, so the boundaries are only simplified
+when they are loaded.  The api reads them through the geometry cache, see
+geometry_cache.py.
+"""
+
+import json
+import logging
+from typing import List
+
+import shapely
+import shapely.geometry
+import sqlalchemy
+from shapely.geometry.base import BaseGeometry
+from sqlmodel import Session, select
+
+from src.core.config import Configuration
+from src.v1.models import basins as basins_models
+
+LOGGER = logging.getLogger(__name__)
+
+# the feature property with the name of the basin
+BASIN_NAME_PROPERTY = "basin_name"
+
+
+def simplify_geometry(geometry: BaseGeometry, tolerance: float) -> BaseGeometry:
+    """
+    :param geometry: a basin boundary
+    :type geometry: BaseGeometry
+    :param tolerance: the maximum distance (degrees) the simplified boundary
+        can be from the original
+    :type tolerance: float
+    :return: the simplified boundary, simplified without creating invalid /
+        collapsed polygons
+    :rtype: BaseGeometry
+    """
+    return geometry.simplify(tolerance, preserve_topology=True)
+
+
+def build_geometry_records(
+    basin_id: int, geometry: BaseGeometry, tolerances: List[float]
+) -> tuple[
+    basins_models.Basin_Geometry, List[basins_models.Basin_Geometry_Simplified]
+]:
+    """
+    :param basin_id: the id of the basin
+    :type basin_id: int
+    :param geometry: the full resolution boundary of the basin
+    :type geometry: BaseGeometry
+    :param tolerances: the tolerances to simplify the boundary at
+    :type tolerances: List[float]
+    :return: the boundary record and a simplified record for each tolerance
+    :rtype: tuple[Basin_Geometry, List[Basin_Geometry_Simplified]]
+    """
+    min_x, min_y, max_x, max_y = geometry.bounds
+    boundary = basins_models.Basin_Geometry(
+        basin_id=basin_id,
+        geometry=shapely.to_wkb(geometry),
+        min_x=min_x,
+        min_y=min_y,
+        max_x=max_x,
+        max_y=max_y,
+    )
+    simplified = [
+        basins_models.Basin_Geometry_Simplified(
+            basin_id=basin_id,
+            tolerance=tolerance,
+            geometry=shapely.to_wkb(simplify_geometry(geometry, tolerance)),
+        )
+        for tolerance in sorted(set(tolerances))
+        if tolerance > 0
+    ]
+    return boundary, simplified
+
+
+def load_geojson(
+    session: Session,
+    feature_collection: dict,
+    tolerances: List[float] | None = None,
+) -> int:
+    """
+    loads / replaces the boundaries of the basins in a GeoJSON feature
+    collection.  The changes are flushed, not committed.
+
+    :param session: a database session
+    :type session: Session
+    :param feature_collection: the parsed GeoJSON, each feature needs a
+        basin_name property that matches a basin in the basins table
+    :type feature_collection: dict
+    :param tolerances: the tolerances to simplify the boundaries at, defaults
+        to the BASIN_GEOMETRY_TOLERANCES
+    :type tolerances: List[float], optional
+    :return: the number of basin boundaries loaded
+    :rtype: int
+    """
+    if tolerances is None:
+        tolerances = Configuration.BASIN_GEOMETRY_TOLERANCES
+    # when names are duplicated the lowest id wins, same as the basin lookups
+    basin_ids = {
+        basin.basin_name: basin.basin_id
+        for basin in session.exec(
+            select(basins_models.Basins).order_by(
+                basins_models.Basins.basin_id.desc()
+            )
+        ).all()
+    }
+
+    geometries = {}
+    for feature in feature_collection.get("features", []):
+        basin_name = (feature.get("properties") or {}).get(BASIN_NAME_PROPERTY)
+        if basin_name not in basin_ids:
+            LOGGER.warning(f"no basin named {basin_name}, feature skipped")
+            continue
+        geometry = shapely.geometry.shape(feature["geometry"])
+        if not geometry.is_valid:
+            LOGGER.info(f"repairing the invalid boundary of {basin_name}")
+            geometry = shapely.make_valid(geometry)
+        geometries[basin_ids[basin_name]] = geometry
+
+    if geometries:
+        session.exec(
+            sqlalchemy.delete(basins_models.Basin_Geometry_Simplified).where(
+                basins_models.Basin_Geometry_Simplified.basin_id.in_(geometries)
+            )
+        )
+        session.exec(
+            sqlalchemy.delete(basins_models.Basin_Geometry).where(
+                basins_models.Basin_Geometry.basin_id.in_(geometries)
+            )
+        )
+        session.flush()
+    for basin_id, geometry in geometries.items():
+        boundary, simplified = build_geometry_records(basin_id, geometry, tolerances)
+        session.add(boundary)
+        session.add_all(simplified)
+    session.flush()
+    LOGGER.info(f"loaded the boundaries of {len(geometries)} basins")
+    return len(geometries)
+
+
+def load_geojson_file(
+    session: Session, file_path: str, tolerances: List[float] | None = None
+) -> int:
+    """
+    :param file_path: path to a GeoJSON file, see load_geojson
+    :type file_path: str
+    :return: the number of basin boundaries loaded
+    :rtype: int
+    """
+    with open(file_path, "r") as geojson_file:
+        feature_collection = json.load(geojson_file)
+    return load_geojson(session, feature_collection, tolerances=tolerances)
+
+
+def get_basin_geometries(
+    session: Session,
+) -> List[tuple[basins_models.Basin_Geometry, str]]:
+    """
+    :param session: a database session
+    :type session: Session
+    :return: the full resolution boundaries along with the name of the basin,
+        ordered by basin id
+    :rtype: List[tuple[Basin_Geometry, str]]
+    """
+    return session.exec(
+        select(basins_models.Basin_Geometry, basins_models.Basins.basin_name)
+        .join(
+            basins_models.Basins,
+            basins_models.Basins.basin_id == basins_models.Basin_Geometry.basin_id,
+        )
+        .order_by(basins_models.Basin_Geometry.basin_id)
+    ).all()
+
+
+def get_simplified_geometries(
+    session: Session,
+) -> List[basins_models.Basin_Geometry_Simplified]:
+    """
+    :param session: a database session
+    :type session: Session
+    :return: the simplified boundaries of every basin, at every tolerance
+    :rtype: List[Basin_Geometry_Simplified]
+    """
+    return session.exec(
+        select(basins_models.Basin_Geometry_Simplified).order_by(
+            basins_models.Basin_Geometry_Simplified.basin_id,
+            basins_models.Basin_Geometry_Simplified.tolerance,
+        )
+    ).all()
@@ -0,0 +1,346 @@
+"""
+Queries for the alert / cap event history tables.
+
+The timeline queries return the history snapshots of a single alert, newest
+first, a page at a time with their basins / alert levels eagerly loaded.  They
+use the (alert_id, created) indexes on the history tables.
+
+The export queries join each history snapshot with its basins and alert
+levels, one row per snapshot / basin, so the full history can be written out
+as a flat file.  They're read with stream_history, which fetches the rows in
+batches (server side cursor on postgres) so the memory used doesn't grow with
+the size of the history.
+"""
+
+import base64
+import datetime
+import json
+import logging
+from typing import Generator
+
+from sqlalchemy import RowMapping, Select, and_, or_
+from sqlalchemy.orm import joinedload, selectinload
+from sqlmodel import Session, select
+
+from src.v1.models import alerts as alerts_models
+from src.v1.models import basins as basins_models
+from src.v1.models import cap as cap_models
+
+LOGGER = logging.getLogger(__name__)
+
+# number of rows fetched from the database at a time by stream_history
+EXPORT_BATCH_SIZE = 1000
+
+
+def encode_history_cursor(created: datetime.datetime, history_id: int) -> str:
+    """
+    creates an opaque cursor that identifies the position of a history
+    snapshot in an alert's timeline (ordered by created, id, newest first)
+
+    :param created: when the last snapshot in the current page was created
+    :type created: datetime.datetime
+    :param history_id: the id of the last snapshot in the current page
+    :type history_id: int
+    :return: url safe cursor string
+    :rtype: str
+    """
+    cursor_data = {"c": created.isoformat(), "id": history_id}
+    return base64.urlsafe_b64encode(json.dumps(cursor_data).encode("utf-8")).decode(
+        "ascii"
+    )
+
+
+def decode_history_cursor(cursor: str) -> tuple[datetime.datetime, int]:
+    """
+    inverse of encode_history_cursor
+
+    :param cursor: the cursor string
+    :type cursor: str
+    :raises ValueError: if the cursor is not valid
+    :return: the created time and id of the snapshot the cursor points to
+    :rtype: tuple[datetime.datetime, int]
+    """
+    try:
+        cursor_data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return (
+            datetime.datetime.fromisoformat(cursor_data["c"]),
+            int(cursor_data["id"]),
+        )
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"invalid cursor: {cursor}") from e
+
+
+def timeline_page(
+    query: Select, created_column, id_column, limit: int, cursor: str | None
+) -> Select:
+    """
+    orders a timeline query newest first and limits it to the page after the
+    cursor
+
+    :param query: query for the history snapshots of an alert
+    :type query: Select
+    :param created_column: the column with when the snapshots were created
+    :param id_column: the primary key of the snapshots, breaks ties
+    :param limit: maximum number of snapshots to return
+    :type limit: int
+    :param cursor: the cursor of the last snapshot of the previous page
+    :type cursor: str | None
+    :raises ValueError: if the cursor is not valid
+    :rtype: Select
+    """
+    if cursor:
+        cursor_created, cursor_id = decode_history_cursor(cursor)
+        query = query.where(
+            or_(
+                created_column < cursor_created,
+                and_(created_column == cursor_created, id_column < cursor_id),
+            )
+        )
+    return query.order_by(created_column.desc(), id_column.desc()).limit(limit)
+
+
+def build_alert_history_query(
+    alert_id: int, limit: int = 100, cursor: str | None = None
+) -> Select:
+    """
+    :param alert_id: the id of the alert
+    :type alert_id: int
+    :param limit: maximum number of snapshots to return
+    :type limit: int
+    :param cursor: cursor returned by encode_history_cursor for the last
+        snapshot of the previous page
+    :type cursor: str, optional
+    :raises ValueError: if the cursor is not valid
+    :return: query for the alert's history snapshots, newest first, with their
+        basins / alert levels eagerly loaded
+    :rtype: Select
+    """
+    history = alerts_models.Alert_History
+    area_history = alerts_models.Alert_Area_History
+    query = (
+        select(history)
+        .where(history.alert_id == alert_id)
+        .options(
+            selectinload(history.alert_history_links).options(
+                joinedload(area_history.basins),
+                joinedload(area_history.alert_levels),
+            )
+        )
+    )
+    return timeline_page(
+        query, history.alert_history_created, history.alert_history_id, limit, cursor
+    )
+
+
+def get_alert_history(
+    session: Session, alert_id: int, limit: int = 100, cursor: str | None = None
+) -> list[alerts_models.Alert_History]:
+    """
+    :param session: a database session
+    :type session: Session
+    :return: a page of the alert's history snapshots, see
+        build_alert_history_query for the parameters
+    :rtype: list[alerts_models.Alert_History]
+    """
+    return session.exec(
+        build_alert_history_query(alert_id, limit=limit, cursor=cursor)
+    ).all()
+
+
+def build_cap_history_query(
+    alert_id: int, limit: int = 100, cursor: str | None = None
+) -> Select:
+    """
+    :param alert_id: the id of the alert
+    :type alert_id: int
+    :param limit: maximum number of snapshots to return
+    :type limit: int
+    :param cursor: cursor returned by encode_history_cursor for the last
+        snapshot of the previous page
+    :type cursor: str, optional
+    :raises ValueError: if the cursor is not valid
+    :return: query for the history snapshots of the alert's cap events, newest
+        first, with their status, alert level and basins eagerly loaded
+    :rtype: Select
+    """
+    history = cap_models.Cap_Event_History
+    query = (
+        select(history)
+        .where(history.alert_id == alert_id)
+        .options(
+            joinedload(history.cap_event_status),
+            joinedload(history.alert_levels),
+            selectinload(history.cap_event_areas_hist).joinedload(
+                cap_models.Cap_Event_Areas_History.basins
+            ),
+        )
+    )
+    return timeline_page(
+        query,
+        history.cap_event_hist_created_date,
+        history.cap_event_history_id,
+        limit,
+        cursor,
+    )
+
+
+def get_cap_history(
+    session: Session, alert_id: int, limit: int = 100, cursor: str | None = None
+) -> list[cap_models.Cap_Event_History]:
+    """
+    :param session: a database session
+    :type session: Session
+    :return: a page of the history snapshots of the alert's cap events, see
+        build_cap_history_query for the parameters
+    :rtype: list[cap_models.Cap_Event_History]
+    """
+    return session.exec(
+        build_cap_history_query(alert_id, limit=limit, cursor=cursor)
+    ).all()
+
+
+def build_alert_history_export_query(
+    alert_id: int | None = None,
+    created_after: datetime.datetime | None = None,
+    created_before: datetime.datetime | None = None,
+) -> Select:
+    """
+    :param alert_id: only export the history of this alert
+    :type alert_id: int, optional
+    :param created_after: only export history records created at or after
+        this time
+    :type created_after: datetime.datetime, optional
+    :param created_before: only export history records created before this time
+    :type created_before: datetime.datetime, optional
+    :return: query for the alert history snapshots joined with their basins and
+        alert levels, one row per snapshot / basin, oldest first.  Snapshots
+        without any basins are returned as a single row with null basin /
+        alert level columns
+    :rtype: Select
+    """
+    history = alerts_models.Alert_History
+    area_history = alerts_models.Alert_Area_History
+    query = (
+        select(
+            history.alert_history_id,
+            history.alert_id,
+            history.alert_description,
+            history.alert_hydro_conditions,
+            history.alert_meteorological_conditions,
+            history.additional_information,
+            history.author_name,
+            history.alert_status,
+            history.alert_updated,
+            history.alert_history_created,
+            basins_models.Basins.basin_id,
+            basins_models.Basins.basin_name,
+            alerts_models.Alert_Levels.alert_level_id,
+            alerts_models.Alert_Levels.alert_level,
+        )
+        .outerjoin(
+            area_history,
+            area_history.alert_history_id == history.alert_history_id,
+        )
+        .outerjoin(
+            basins_models.Basins,
+            basins_models.Basins.basin_id == area_history.basin_id,
+        )
+        .outerjoin(
+            alerts_models.Alert_Levels,
+            alerts_models.Alert_Levels.alert_level_id == area_history.alert_level_id,
+        )
+    )
+    if alert_id is not None:
+        query = query.where(history.alert_id == alert_id)
+    if created_after is not None:
+        query = query.where(history.alert_history_created >= created_after)
+    if created_before is not None:
+        query = query.where(history.alert_history_created < created_before)
+    return query.order_by(history.alert_history_id, area_history.basin_id)
+
+
+def build_cap_history_export_query(
+    alert_id: int | None = None,
+    created_after: datetime.datetime | None = None,
+    created_before: datetime.datetime | None = None,
+) -> Select:
+    """
+    :param alert_id: only export the cap event history of this alert
+    :type alert_id: int, optional
+    :param created_after: only export history records created at or after
+        this time
+    :type created_after: datetime.datetime, optional
+    :param created_before: only export history records created before this time
+    :type created_before: datetime.datetime, optional
+    :return: query for the cap event history snapshots joined with their
+        status, alert level and basins, one row per snapshot / basin, oldest
+        first
+    :rtype: Select
+    """
+    history = cap_models.Cap_Event_History
+    area_history = cap_models.Cap_Event_Areas_History
+    query = (
+        select(
+            history.cap_event_history_id,
+            history.cap_event_id,
+            history.alert_id,
+            cap_models.Cap_Event_Status.cap_event_status,
+            alerts_models.Alert_Levels.alert_level_id,
+            alerts_models.Alert_Levels.alert_level,
+            history.cap_event_updated_date,
+            history.cap_event_hist_created_date,
+            basins_models.Basins.basin_id,
+            basins_models.Basins.basin_name,
+        )
+        .outerjoin(
+            cap_models.Cap_Event_Status,
+            cap_models.Cap_Event_Status.cap_event_status_id
+            == history.cap_event_status_id,
+        )
+        .outerjoin(
+            alerts_models.Alert_Levels,
+            alerts_models.Alert_Levels.alert_level_id == history.alert_level,
+        )
+        .outerjoin(
+            area_history,
+            area_history.cap_event_history_id == history.cap_event_history_id,
+        )
+        .outerjoin(
+            basins_models.Basins,
+            basins_models.Basins.basin_id == area_history.basin_id,
+        )
+    )
+    if alert_id is not None:
+        query = query.where(history.alert_id == alert_id)
+    if created_after is not None:
+        query = query.where(history.cap_event_hist_created_date >= created_after)
+    if created_before is not None:
+        query = query.where(history.cap_event_hist_created_date < created_before)
+    return query.order_by(
+        history.cap_event_history_id, area_history.cap_event_area_history_id
+    )
+
+
+def stream_history(
+    session: Session, query: Select, batch_size: int = EXPORT_BATCH_SIZE
+) -> Generator[RowMapping, None, None]:
+    """
+    executes one of the export queries, fetching the rows from the database in
+    batches rather than loading them all into memory
+
+    :param session: the session to execute the query with, must stay open
+        while the rows are consumed
+    :type session: Session
+    :param query: one of the build_*_export_query queries
+    :type query: Select
+    :param batch_size: number of rows fetched at a time
+    :type batch_size: int
+    :yield: the rows, as mappings of column name to value
+    :rtype: Generator[RowMapping, None, None]
+    """
+    # yield_per implies stream_results, a server side cursor on postgres
+    result = session.exec(query, execution_options={"yield_per": batch_size})
+    try:
+        yield from result.mappings()
+    finally:
+        result.close()
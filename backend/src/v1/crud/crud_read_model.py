@@ -0,0 +1,238 @@
+"""
+Maintains / reads the alert read model (alerts_models.Alert_Read_Model), a
+denormalized row per alert with the alert and its cap events serialized the
+way the api returns them.
+
+The crud write paths don't write the read model themselves, they call
+mark_alert_stale with the alerts they've modified.  When the session is
+committed the rows for those alerts are rebuilt, once per alert no matter how
+many write paths touched it, in the same transaction as the changes.  The
+sync read functions rebuild any stale rows before they query, so a session
+that has modified an alert reads its own changes before it commits.
+"""
+
+import logging
+from typing import Iterable
+
+import sqlalchemy
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import src.v1.crud.crud_alerts as crud_alerts
+import src.v1.crud.crud_cap as crud_cap
+import src.v1.models.alerts as alerts_models
+import src.v1.models.cap as cap_models
+
+LOGGER = logging.getLogger(__name__)
+
+# session.info key, the ids of the alerts modified in the current transaction
+STALE_ALERTS_KEY = "stale_alert_ids"
+
+
+def mark_alert_stale(session: Session, alert_id: int):
+    """
+    records that an alert, or its cap events, have been modified.  The read
+    model for the alert is rebuilt when the session is committed.
+
+    :param session: the session the alert was modified in
+    :type session: Session
+    :param alert_id: the id of the alert
+    :type alert_id: int
+    """
+    session.info.setdefault(STALE_ALERTS_KEY, set()).add(alert_id)
+
+
+def serialize_alert(
+    alert: alerts_models.Alerts, cap_events: list[cap_models.Cap_Event]
+) -> dict:
+    """
+    :param alert: an alert with its basins / alert levels loaded
+    :type alert: alerts_models.Alerts
+    :param cap_events: the alert's cap events with their areas / alert level
+        loaded
+    :type cap_events: list[cap_models.Cap_Event]
+    :return: the values for the alert's read model row
+    :rtype: dict
+    """
+    return {
+        "alert_status": alert.alert_status,
+        "alert_updated": alert.alert_updated,
+        "alert": alerts_models.Alert_Basins.model_validate(alert).model_dump(
+            mode="json"
+        ),
+        "cap_events": [
+            cap_models.Cap_Event_And_Areas.model_validate(cap_event).model_dump(
+                mode="json"
+            )
+            for cap_event in cap_events
+        ],
+    }
+
+
+def refresh_alert_read_models(session: Session, alert_ids: Iterable[int]):
+    """
+    rebuilds the read model rows for the alerts from the normalized tables,
+    with a fixed number of queries regardless of the number of alerts.  Rows
+    for alerts that no longer exist are deleted.
+
+    :param session: a database session
+    :type session: Session
+    :param alert_ids: the ids of the alerts to rebuild
+    :type alert_ids: Iterable[int]
+    """
+    alert_ids = sorted(alert_ids)
+    # populate_existing, the alerts / cap events are usually already in the
+    # session and some of their relationships may have been loaded before
+    # they were modified
+    alerts = session.exec(
+        select(alerts_models.Alerts)
+        .where(alerts_models.Alerts.alert_id.in_(alert_ids))
+        .options(*crud_alerts.alert_graph_load_options())
+        .execution_options(populate_existing=True)
+    ).all()
+    cap_events = session.exec(
+        select(cap_models.Cap_Event)
+        .where(cap_models.Cap_Event.alert_id.in_(alert_ids))
+        .order_by(cap_models.Cap_Event.cap_event_id)
+        .options(*crud_cap.cap_event_load_options())
+        .execution_options(populate_existing=True)
+    ).all()
+    cap_events_by_alert = {}
+    for cap_event in cap_events:
+        cap_events_by_alert.setdefault(cap_event.alert_id, []).append(cap_event)
+
+    read_models = {
+        read_model.alert_id: read_model
+        for read_model in session.exec(
+            select(alerts_models.Alert_Read_Model).where(
+                alerts_models.Alert_Read_Model.alert_id.in_(alert_ids)
+            )
+        )
+    }
+    for alert in alerts:
+        values = serialize_alert(alert, cap_events_by_alert.get(alert.alert_id, []))
+        read_model = read_models.pop(alert.alert_id, None)
+        if read_model is None:
+            read_model = alerts_models.Alert_Read_Model(alert_id=alert.alert_id)
+        for column, value in values.items():
+            setattr(read_model, column, value)
+        session.add(read_model)
+    for read_model in read_models.values():
+        session.delete(read_model)
+    session.flush()
+    LOGGER.debug(f"refreshed the read model for the alerts: {alert_ids}")
+
+
+@sqlalchemy.event.listens_for(Session, "before_commit")
+def refresh_stale_alerts(session: Session):
+    """
+    rebuilds the read model for the alerts marked stale in the session, if
+    there are any
+    """
+    alert_ids = session.info.pop(STALE_ALERTS_KEY, None)
+    if alert_ids:
+        refresh_alert_read_models(session, alert_ids)
+
+
+@sqlalchemy.event.listens_for(Session, "after_soft_rollback")
+def discard_stale_alerts(session: Session, previous_transaction):
+    session.info.pop(STALE_ALERTS_KEY, None)
+
+
+def build_alerts_query(**filters):
+    """
+    :param filters: the limit / cursor / filters described in
+        crud_alerts.build_alerts_query
+    :raises ValueError: if the cursor is not valid
+    :return: query for the alert read model rows, newest first
+    :rtype: sqlmodel.sql.expression.SelectOfScalar
+    """
+    return crud_alerts.filter_alert_list(
+        select(alerts_models.Alert_Read_Model),
+        alerts_models.Alert_Read_Model,
+        **filters,
+    )
+
+
+def get_alerts(
+    session: Session, **filters
+) -> list[alerts_models.Alert_Read_Model]:
+    """
+    :param session: a database session
+    :type session: Session
+    :param filters: the limit / cursor / filters described in
+        crud_alerts.build_alerts_query
+    :raises ValueError: if the cursor is not valid
+    :return: the read model rows for the alerts, newest first
+    :rtype: list[alerts_models.Alert_Read_Model]
+    """
+    refresh_stale_alerts(session)
+    return session.exec(build_alerts_query(**filters)).all()
+
+
+async def get_alerts_async(
+    session: AsyncSession, **filters
+) -> list[alerts_models.Alert_Read_Model]:
+    """
+    async version of get_alerts, used when DB_ASYNC_ENABLED is set
+    """
+    result = await session.exec(build_alerts_query(**filters))
+    return result.all()
+
+
+def get_alert(
+    session: Session, alert_id: int
+) -> alerts_models.Alert_Read_Model | None:
+    """
+    :param session: a database session
+    :type session: Session
+    :param alert_id: the id of the alert
+    :type alert_id: int
+    :return: the read model row for the alert, None if it doesn't exist
+    :rtype: alerts_models.Alert_Read_Model | None
+    """
+    refresh_stale_alerts(session)
+    return session.get(alerts_models.Alert_Read_Model, alert_id)
+
+
+async def get_alert_async(
+    session: AsyncSession, alert_id: int
+) -> alerts_models.Alert_Read_Model | None:
+    """
+    async version of get_alert, used when DB_ASYNC_ENABLED is set
+    """
+    return await session.get(alerts_models.Alert_Read_Model, alert_id)
+
+
+def build_alert_updated_query(alert_id: int):
+    """
+    :param alert_id: the id of the alert
+    :type alert_id: int
+    :return: query for when the alert was last updated, a primary key lookup
+        that doesn't read the serialized alert
+    :rtype: sqlmodel.sql.expression.SelectOfScalar
+    """
+    return select(alerts_models.Alert_Read_Model.alert_updated).where(
+        alerts_models.Alert_Read_Model.alert_id == alert_id
+    )
+
+
+def get_alert_updated(session: Session, alert_id: int):
+    """
+    :param session: a database session
+    :type session: Session
+    :param alert_id: the id of the alert
+    :type alert_id: int
+    :return: when the alert was last updated, None if it doesn't exist
+    :rtype: datetime.datetime | None
+    """
+    refresh_stale_alerts(session)
+    return session.exec(build_alert_updated_query(alert_id)).first()
+
+
+async def get_alert_updated_async(session: AsyncSession, alert_id: int):
+    """
+    async version of get_alert_updated, used when DB_ASYNC_ENABLED is set
+    """
+    result = await session.exec(build_alert_updated_query(alert_id))
+    return result.first()
@@ -0,0 +1,155 @@
+"""
+Maintains / reads the subbasin hierarchy.
+
+Subbasins are nested using subbasins.parent_subbasin_id, and basins belong to
+a subbasin through basins.subbasins_id.  Every ancestor / descendant pair of
+the hierarchy is stored in the subbasin_closure table, so expanding a subbasin
+to its basins or rolling basins up to their subbasins never walks the parent
+links.  The closure is rebuilt from the parent links by rebuild_closure, which
+is run by the migration that adds the table and has to be run again whenever
+the subbasins change.  The api reads the hierarchy through the hierarchy
+cache, see hierarchy_cache.py.
+"""
+
+import logging
+from typing import Iterable, List
+
+import sqlalchemy
+from sqlmodel import Session, select
+
+from src.v1.models import basins as basins_models
+
+LOGGER = logging.getLogger(__name__)
+
+
+def build_closure(parents: dict[int, int | None]) -> List[tuple[int, int, int]]:
+    """
+    :param parents: subbasin id -> the id of its parent subbasin, None for the
+        top level subbasins
+    :type parents: dict[int, int | None]
+    :raises ValueError: if the parent links contain a cycle, or refer to a
+        subbasin that doesn't exist
+    :return: an (ancestor id, descendant id, depth) tuple for every subbasin
+        and each of its ancestors, including the subbasin itself at depth 0
+    :rtype: List[tuple[int, int, int]]
+    """
+    closure = []
+    for subbasin_id in sorted(parents):
+        ancestor_id = subbasin_id
+        depth = 0
+        visited = set()
+        while ancestor_id is not None:
+            if ancestor_id in visited:
+                raise ValueError(f"the parents of subbasin {subbasin_id} are a cycle")
+            if ancestor_id not in parents:
+                raise ValueError(
+                    f"subbasin {subbasin_id} has an unknown ancestor {ancestor_id}"
+                )
+            visited.add(ancestor_id)
+            closure.append((ancestor_id, subbasin_id, depth))
+            ancestor_id = parents[ancestor_id]
+            depth += 1
+    return closure
+
+
+def rebuild_closure(session: Session) -> int:
+    """
+    replaces the subbasin_closure records with the closure of the current
+    parent links.  Doesn't commit.
+
+    :param session: a SQLModel database session
+    :type session: Session
+    :raises ValueError: if the parent links contain a cycle
+    :return: the number of closure records written
+    :rtype: int
+    """
+    parents = dict(
+        session.exec(
+            select(
+                basins_models.Subbasins.subbasin_id,
+                basins_models.Subbasins.parent_subbasin_id,
+            )
+        ).all()
+    )
+    closure = build_closure(parents)
+    session.exec(sqlalchemy.delete(basins_models.Subbasin_Closure))
+    session.add_all(
+        basins_models.Subbasin_Closure(
+            ancestor_id=ancestor_id, descendant_id=descendant_id, depth=depth
+        )
+        for ancestor_id, descendant_id, depth in closure
+    )
+    session.flush()
+    LOGGER.info(
+        f"rebuilt the subbasin closure, {len(parents)} subbasins, "
+        + f"{len(closure)} records"
+    )
+    return len(closure)
+
+
+def get_subbasins(session: Session) -> List[basins_models.Subbasins]:
+    """
+    :param session: a SQLModel database session
+    :type session: Session
+    :return: all the subbasins, ordered by id
+    :rtype: List[basins_models.Subbasins]
+    """
+    return session.exec(
+        select(basins_models.Subbasins).order_by(basins_models.Subbasins.subbasin_id)
+    ).all()
+
+
+def get_closure(session: Session) -> List[basins_models.Subbasin_Closure]:
+    """
+    :param session: a SQLModel database session
+    :type session: Session
+    :return: every ancestor / descendant record of the subbasin hierarchy
+    :rtype: List[basins_models.Subbasin_Closure]
+    """
+    return session.exec(select(basins_models.Subbasin_Closure)).all()
+
+
+def get_subbasin_basins(session: Session) -> List[tuple[int, str, int]]:
+    """
+    :param session: a SQLModel database session
+    :type session: Session
+    :return: the id, name and subbasin id of every basin that is in a
+        subbasin, ordered by basin id
+    :rtype: List[tuple[int, str, int]]
+    """
+    return session.exec(
+        select(
+            basins_models.Basins.basin_id,
+            basins_models.Basins.basin_name,
+            basins_models.Basins.subbasins_id,
+        )
+        .where(basins_models.Basins.subbasins_id.is_not(None))
+        .order_by(basins_models.Basins.basin_id)
+    ).all()
+
+
+def get_basins_in_subbasins(
+    session: Session, subbasin_ids: Iterable[int]
+) -> List[basins_models.Basins]:
+    """
+    expands subbasins to the basins they contain, including the basins of all
+    the nested subbasins, with a single join on the closure table.
+
+    :param session: a SQLModel database session
+    :type session: Session
+    :param subbasin_ids: the ids of the subbasins to expand
+    :type subbasin_ids: Iterable[int]
+    :return: the basins, ordered by basin id
+    :rtype: List[basins_models.Basins]
+    """
+    return session.exec(
+        select(basins_models.Basins)
+        .join(
+            basins_models.Subbasin_Closure,
+            basins_models.Subbasin_Closure.descendant_id
+            == basins_models.Basins.subbasins_id,
+        )
+        .where(basins_models.Subbasin_Closure.ancestor_id.in_(list(subbasin_ids)))
+        .order_by(basins_models.Basins.basin_id)
+        .distinct()
+    ).all()
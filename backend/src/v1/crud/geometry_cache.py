@@ -0,0 +1,329 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import List
+
+import orjson
+import shapely
+import shapely.geometry
+import sqlalchemy
+import sqlalchemy.orm
+from shapely.geometry.base import BaseGeometry
+from shapely.strtree import STRtree
+from sqlmodel import Session
+
+from src.core.config import Configuration
+from src.v1.crud import crud_geometry
+from src.v1.crud.reference_cache import get_schema_version
+from src.v1.models import basins as basins_models
+
+LOGGER = logging.getLogger(__name__)
+
+# the boundary tables, changes to either through the orm invalidate the cache
+GEOMETRY_MODELS = (
+    basins_models.Basin_Geometry,
+    basins_models.Basin_Geometry_Simplified,
+)
+# the tolerance of the full resolution boundaries
+FULL_RESOLUTION = 0.0
+# decimal places of the coordinates in the cap polygons, ~1m
+CAP_COORDINATE_PRECISION = 5
+
+
+def cap_polygons(geometry: BaseGeometry) -> List[str]:
+    """
+    :param geometry: a basin boundary, a polygon or multi polygon
+    :type geometry: BaseGeometry
+    :return: the boundary as cap <polygon> values, one per polygon, each a
+        space delimited list of lat,lon pairs with the first and last pairs
+        the same.  Cap polygons can't have holes, only the exteriors are used.
+    :rtype: List[str]
+    """
+    polygons = [
+        part
+        for part in getattr(geometry, "geoms", [geometry])
+        if part.geom_type == "Polygon" and not part.is_empty
+    ]
+    return [
+        " ".join(
+            f"{lat:.{CAP_COORDINATE_PRECISION}f},{lon:.{CAP_COORDINATE_PRECISION}f}"
+            for lon, lat in polygon.exterior.coords
+        )
+        for polygon in polygons
+    ]
+
+
+class BasinGeometries:
+    """
+    An immutable snapshot of the basin boundaries, at full resolution and
+    every simplification tolerance, with the GeoJSON for each basin /
+    tolerance and the cap polygons rendered when the snapshot is created.
+
+    The full resolution boundaries are indexed by an STRtree, so the basins
+    at a point / in an area are found by checking only the boundaries whose
+    bounding boxes intersect it.  The boundaries are prepared, so checking a
+    detailed boundary doesn't mean walking all of its vertices.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        schema_version: str | None,
+        basin_names: dict[int, str],
+        geometries: dict[int, dict[float, BaseGeometry]],
+        cap_tolerance: float,
+    ):
+        """
+        :param version: incremented every time the cache is reloaded
+        :type version: int
+        :param schema_version: the alembic revision of the database when the
+            snapshot was loaded
+        :type schema_version: str | None
+        :param basin_names: basin id -> name, for the basins with boundaries
+        :type basin_names: dict[int, str]
+        :param geometries: basin id -> tolerance -> boundary, the full
+            resolution boundary has a tolerance of 0
+        :type geometries: dict[int, dict[float, BaseGeometry]]
+        :param cap_tolerance: the tolerance of the cap polygons
+        :type cap_tolerance: float
+        """
+        self.version = version
+        self.schema_version = schema_version
+        self.basin_names = basin_names
+        self.geometries = geometries
+        self.tolerances = sorted(
+            {tolerance for shapes in geometries.values() for tolerance in shapes}
+            | {FULL_RESOLUTION}
+        )
+
+        digest = hashlib.sha256()
+        self.geojson: dict[tuple[int, float], bytes] = {}
+        for basin_id in geometries:
+            for tolerance in self.tolerances:
+                geometry = self.geometry(basin_id, tolerance)
+                digest.update(shapely.to_wkb(geometry))
+                self.geojson[(basin_id, tolerance)] = orjson.dumps(
+                    {
+                        "type": "Feature",
+                        "id": basin_id,
+                        "properties": {
+                            "basin_id": basin_id,
+                            "basin_name": basin_names[basin_id],
+                            "tolerance": tolerance,
+                        },
+                        "geometry": shapely.geometry.mapping(geometry),
+                    }
+                )
+        self.digest = digest.hexdigest()[:32]
+
+        cap_tolerance = self.resolve_tolerance(cap_tolerance)
+        self.cap_polygons: dict[int, List[str]] = {
+            basin_id: cap_polygons(self.geometry(basin_id, cap_tolerance))
+            for basin_id in geometries
+        }
+
+        self._index_basin_ids = list(geometries)
+        self._index = STRtree(
+            [shapes[FULL_RESOLUTION] for shapes in geometries.values()]
+        )
+        shapely.prepare(self._index.geometries)
+        # geos only builds the point in polygon indexes of the prepared
+        # boundaries once they've been used more than once, build them now
+        # rather than during the first lookups
+        centroids = shapely.centroid(self._index.geometries)
+        for _ in range(2):
+            shapely.intersects(self._index.geometries, centroids)
+
+    def basins_intersecting(self, geometry: BaseGeometry) -> List[int]:
+        """
+        :param geometry: a point / area in lon / lat
+        :type geometry: BaseGeometry
+        :return: the ids of the basins whose boundaries intersect the geometry,
+            in id order.  Basins without a boundary are never returned.
+        :rtype: List[int]
+        """
+        candidates = self._index.query(geometry)
+        hits = shapely.intersects(self._index.geometries[candidates], geometry)
+        return sorted(
+            self._index_basin_ids[index] for index in candidates[hits].tolist()
+        )
+
+    def basins_at_point(self, lon: float, lat: float) -> List[int]:
+        """
+        :return: the ids of the basins that contain the point, or have it on
+            their boundary
+        :rtype: List[int]
+        """
+        return self.basins_intersecting(shapely.Point(lon, lat))
+
+    def basins_in_bbox(self, bbox: tuple[float, float, float, float]) -> List[int]:
+        """
+        :param bbox: min lon, min lat, max lon, max lat
+        :type bbox: tuple[float, float, float, float]
+        :return: the ids of the basins that overlap the bounding box
+        :rtype: List[int]
+        """
+        return self.basins_intersecting(shapely.box(*bbox))
+
+    def resolve_tolerance(self, tolerance: float | None) -> float:
+        """
+        :param tolerance: the requested tolerance, None for full resolution
+        :type tolerance: float | None
+        :return: the largest of the pre-simplified tolerances that is no more
+            than the requested tolerance, the boundaries are never simplified
+            on request
+        :rtype: float
+        """
+        if not tolerance:
+            return FULL_RESOLUTION
+        return max(
+            available for available in self.tolerances if available <= tolerance
+        )
+
+    def geometry(self, basin_id: int, tolerance: float) -> BaseGeometry | None:
+        """
+        :param basin_id: the id of the basin
+        :type basin_id: int
+        :param tolerance: one of the tolerances, see resolve_tolerance
+        :type tolerance: float
+        :return: the boundary of the basin, None if it doesn't have one
+        :rtype: BaseGeometry | None
+        """
+        shapes = self.geometries.get(basin_id)
+        if shapes is None:
+            return None
+        # a tolerance that wasn't loaded for this basin falls back to the
+        # full resolution boundary
+        return shapes.get(tolerance, shapes[FULL_RESOLUTION])
+
+
+class BasinGeometryCache:
+    """
+    In process cache of the basin boundaries, which only change when a new
+    boundary file is loaded.  Reloaded when a session that has written to the
+    boundary tables commits, or when the alembic revision of the database
+    changes (checked every revalidate_interval seconds), the same as the
+    reference data cache.
+    """
+
+    def __init__(
+        self,
+        revalidate_interval: int = 300,
+        cap_tolerance: float = 0.005,
+    ):
+        """
+        :param revalidate_interval: number of seconds between checks of the
+            alembic revision, 0 checks on every access
+        :type revalidate_interval: int
+        :param cap_tolerance: tolerance of the boundaries used for the cap
+            polygons
+        :type cap_tolerance: float
+        """
+        self.revalidate_interval = revalidate_interval
+        self.cap_tolerance = cap_tolerance
+        self.snapshot: BasinGeometries | None = None
+        self.version = 0
+        self.load_count = 0
+        self.checked_at = None
+        self._lock = threading.Lock()
+
+    def get(self, session: Session) -> BasinGeometries:
+        """
+        returns the current snapshot of the boundaries, loading it using the
+        supplied session if the cache is empty or has been invalidated.
+
+        :param session: database session used if the data needs to be loaded
+        :type session: Session
+        :return: the boundaries snapshot
+        :rtype: BasinGeometries
+        """
+        snapshot = self.snapshot
+        if snapshot is not None and not self._revalidate_due():
+            return snapshot
+
+        with self._lock:
+            snapshot = self.snapshot
+            if snapshot is not None and self._revalidate_due():
+                schema_version = get_schema_version(session)
+                self.checked_at = time.monotonic()
+                if schema_version != snapshot.schema_version:
+                    LOGGER.info(
+                        "database revision changed from "
+                        + f"{snapshot.schema_version} to {schema_version}, "
+                        + "reloading the basin boundaries"
+                    )
+                    snapshot = None
+            if snapshot is None:
+                snapshot = self._load(session)
+            return snapshot
+
+    def _revalidate_due(self) -> bool:
+        return (
+            self.checked_at is None
+            or (time.monotonic() - self.checked_at) >= self.revalidate_interval
+        )
+
+    def _load(self, session: Session) -> BasinGeometries:
+        basin_names = {}
+        geometries: dict[int, dict[float, BaseGeometry]] = {}
+        for boundary, basin_name in crud_geometry.get_basin_geometries(session):
+            basin_names[boundary.basin_id] = basin_name
+            geometries[boundary.basin_id] = {
+                FULL_RESOLUTION: shapely.from_wkb(boundary.geometry)
+            }
+        for simplified in crud_geometry.get_simplified_geometries(session):
+            if simplified.basin_id in geometries:
+                geometries[simplified.basin_id][simplified.tolerance] = (
+                    shapely.from_wkb(simplified.geometry)
+                )
+
+        self.version += 1
+        snapshot = BasinGeometries(
+            version=self.version,
+            schema_version=get_schema_version(session),
+            basin_names=basin_names,
+            geometries=geometries,
+            cap_tolerance=self.cap_tolerance,
+        )
+        self.snapshot = snapshot
+        self.checked_at = time.monotonic()
+        self.load_count += 1
+        LOGGER.debug(
+            f"loaded basin boundaries version {snapshot.version}: "
+            + f"{len(geometries)} basins, tolerances {snapshot.tolerances}"
+        )
+        return snapshot
+
+    def invalidate(self):
+        """
+        drops the current snapshot, the next call to get will reload the data
+        """
+        with self._lock:
+            self.snapshot = None
+        LOGGER.debug("basin geometry cache invalidated")
+
+
+geometry_cache = BasinGeometryCache(
+    revalidate_interval=Configuration.REFERENCE_DATA_REVALIDATE_INTERVAL,
+    cap_tolerance=Configuration.CAP_AREA_TOLERANCE,
+)
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_flush")
+def flag_geometry_changes(session, flush_context):
+    for record in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(record, GEOMETRY_MODELS):
+            session.info["basin_geometry_changed"] = True
+            return
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_commit")
+def invalidate_on_commit(session):
+    if session.info.pop("basin_geometry_changed", False):
+        geometry_cache.invalidate()
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_rollback")
+def clear_flag_on_rollback(session):
+    session.info.pop("basin_geometry_changed", None)
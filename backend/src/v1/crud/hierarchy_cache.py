@@ -0,0 +1,274 @@
+import logging
+import threading
+import time
+from typing import Iterable, List
+
+import sqlalchemy
+import sqlalchemy.orm
+from sqlmodel import Session
+
+from src.core.config import Configuration
+from src.v1.crud import crud_subbasins
+from src.v1.crud.reference_cache import calculate_digest, get_schema_version
+from src.v1.models import basins as basins_models
+
+LOGGER = logging.getLogger(__name__)
+
+# the hierarchy tables, changes to any of these through the orm invalidate the
+# cache
+HIERARCHY_MODELS = (
+    basins_models.Subbasins,
+    basins_models.Subbasin_Closure,
+    basins_models.Basins,
+)
+
+
+class BasinHierarchy:
+    """
+    An immutable snapshot of the subbasin hierarchy, built from the closure
+    table.  The basins below every subbasin (including the basins of the
+    nested subbasins) are calculated when the snapshot is created, so
+    expanding subbasins to basins, or rolling basins up to the subbasins they
+    complete, is only dictionary / set lookups.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        schema_version: str | None,
+        subbasins: List[dict],
+        closure: List[tuple[int, int, int]],
+        basins: List[tuple[int, str, int]],
+    ):
+        """
+        :param version: incremented every time the cache is reloaded
+        :type version: int
+        :param schema_version: the alembic revision of the database when the
+            snapshot was loaded
+        :type schema_version: str | None
+        :param subbasins: subbasin rows, ordered by subbasin_id
+        :type subbasins: List[dict]
+        :param closure: (ancestor id, descendant id, depth) for every record
+            of the closure table
+        :type closure: List[tuple[int, int, int]]
+        :param basins: (basin id, basin name, subbasin id) for every basin that
+            is in a subbasin
+        :type basins: List[tuple[int, str, int]]
+        """
+        self.version = version
+        self.schema_version = schema_version
+        self.subbasins = subbasins
+
+        # when names are duplicated the lowest id wins, same as the basins
+        self.subbasin_name_to_id = {}
+        for subbasin in subbasins:
+            self.subbasin_name_to_id.setdefault(
+                subbasin["sub_basin_name"], subbasin["subbasin_id"]
+            )
+        self.subbasin_id_to_name = {
+            subbasin["subbasin_id"]: subbasin["sub_basin_name"]
+            for subbasin in subbasins
+        }
+        self.basin_names = {basin_id: name for basin_id, name, _ in basins}
+        self.basin_subbasin = {
+            basin_id: subbasin_id for basin_id, _, subbasin_id in basins
+        }
+
+        # subbasin id -> its ancestors, nearest first, starting with itself
+        ancestors: dict[int, List[tuple[int, int]]] = {}
+        for ancestor_id, descendant_id, depth in closure:
+            ancestors.setdefault(descendant_id, []).append((depth, ancestor_id))
+        self.ancestors = {
+            subbasin_id: [ancestor_id for _, ancestor_id in sorted(pairs)]
+            for subbasin_id, pairs in ancestors.items()
+        }
+
+        basins_under: dict[int, set[int]] = {
+            subbasin["subbasin_id"]: set() for subbasin in subbasins
+        }
+        for basin_id, subbasin_id in self.basin_subbasin.items():
+            for ancestor_id in self.ancestors.get(subbasin_id, [subbasin_id]):
+                basins_under.setdefault(ancestor_id, set()).add(basin_id)
+        self.basins_under = {
+            subbasin_id: frozenset(basin_ids)
+            for subbasin_id, basin_ids in basins_under.items()
+        }
+
+        self.digest = calculate_digest(
+            [subbasins, sorted(closure), sorted(self.basin_subbasin.items())]
+        )
+
+    def expand(self, subbasin_ids: Iterable[int]) -> List[int]:
+        """
+        :param subbasin_ids: the ids of subbasins
+        :type subbasin_ids: Iterable[int]
+        :return: the ids of all the basins in the subbasins, including the
+            basins of the nested subbasins, in id order
+        :rtype: List[int]
+        """
+        basin_ids = set()
+        for subbasin_id in subbasin_ids:
+            basin_ids |= self.basins_under.get(subbasin_id, frozenset())
+        return sorted(basin_ids)
+
+    def subbasins_of(self, basin_id: int) -> List[int]:
+        """
+        :param basin_id: the id of a basin
+        :type basin_id: int
+        :return: the ids of the subbasins the basin is in, the basin's own
+            subbasin first then its ancestors, empty if the basin isn't in a
+            subbasin
+        :rtype: List[int]
+        """
+        subbasin_id = self.basin_subbasin.get(basin_id)
+        if subbasin_id is None:
+            return []
+        return self.ancestors.get(subbasin_id, [subbasin_id])
+
+    def roll_up(self, basin_ids: Iterable[int]) -> tuple[List[int], List[int]]:
+        """
+        :param basin_ids: the ids of basins, for example the basins of one
+            alert level of an alert
+        :type basin_ids: Iterable[int]
+        :return: the ids of the largest subbasins whose basins are all in
+            basin_ids, and the ids of the basins that aren't in one of those
+            subbasins, both in id order
+        :rtype: tuple[List[int], List[int]]
+        """
+        basin_ids = set(basin_ids)
+        candidates = {
+            subbasin_id
+            for basin_id in basin_ids
+            for subbasin_id in self.subbasins_of(basin_id)
+        }
+        complete = {
+            subbasin_id
+            for subbasin_id in candidates
+            if self.basins_under[subbasin_id] <= basin_ids
+        }
+        # a complete subbasin inside another complete subbasin is rolled up
+        # into the outer one
+        largest = sorted(
+            subbasin_id
+            for subbasin_id in complete
+            if not complete.intersection(self.ancestors.get(subbasin_id, [])[1:])
+        )
+        remaining = basin_ids.difference(*(self.basins_under[s] for s in largest))
+        return largest, sorted(remaining)
+
+
+class BasinHierarchyCache:
+    """
+    In process cache of the subbasin hierarchy.  Reloaded when a session that
+    has written to the subbasins, closure or basins tables commits, or when
+    the alembic revision of the database changes (checked every
+    revalidate_interval seconds), the same as the reference data cache.
+    """
+
+    def __init__(self, revalidate_interval: int = 300):
+        """
+        :param revalidate_interval: number of seconds between checks of the
+            alembic revision, 0 checks on every access
+        :type revalidate_interval: int
+        """
+        self.revalidate_interval = revalidate_interval
+        self.snapshot: BasinHierarchy | None = None
+        self.version = 0
+        self.load_count = 0
+        self.checked_at = None
+        self._lock = threading.Lock()
+
+    def get(self, session: Session) -> BasinHierarchy:
+        """
+        returns the current snapshot of the hierarchy, loading it using the
+        supplied session if the cache is empty or has been invalidated.
+
+        :param session: database session used if the data needs to be loaded
+        :type session: Session
+        :return: the hierarchy snapshot
+        :rtype: BasinHierarchy
+        """
+        snapshot = self.snapshot
+        if snapshot is not None and not self._revalidate_due():
+            return snapshot
+
+        with self._lock:
+            snapshot = self.snapshot
+            if snapshot is not None and self._revalidate_due():
+                schema_version = get_schema_version(session)
+                self.checked_at = time.monotonic()
+                if schema_version != snapshot.schema_version:
+                    LOGGER.info(
+                        "database revision changed from "
+                        + f"{snapshot.schema_version} to {schema_version}, "
+                        + "reloading the subbasin hierarchy"
+                    )
+                    snapshot = None
+            if snapshot is None:
+                snapshot = self._load(session)
+            return snapshot
+
+    def _revalidate_due(self) -> bool:
+        return (
+            self.checked_at is None
+            or (time.monotonic() - self.checked_at) >= self.revalidate_interval
+        )
+
+    def _load(self, session: Session) -> BasinHierarchy:
+        self.version += 1
+        snapshot = BasinHierarchy(
+            version=self.version,
+            schema_version=get_schema_version(session),
+            subbasins=[
+                subbasin.model_dump(
+                    include={"subbasin_id", "sub_basin_name", "parent_subbasin_id"}
+                )
+                for subbasin in crud_subbasins.get_subbasins(session)
+            ],
+            closure=[
+                (record.ancestor_id, record.descendant_id, record.depth)
+                for record in crud_subbasins.get_closure(session)
+            ],
+            basins=[tuple(row) for row in crud_subbasins.get_subbasin_basins(session)],
+        )
+        self.snapshot = snapshot
+        self.checked_at = time.monotonic()
+        self.load_count += 1
+        LOGGER.debug(
+            f"loaded subbasin hierarchy version {snapshot.version}: "
+            + f"{len(snapshot.subbasins)} subbasins, "
+            + f"{len(snapshot.basin_subbasin)} basins"
+        )
+        return snapshot
+
+    def invalidate(self):
+        """
+        drops the current snapshot, the next call to get will reload the data
+        """
+        with self._lock:
+            self.snapshot = None
+        LOGGER.debug("subbasin hierarchy cache invalidated")
+
+
+hierarchy_cache = BasinHierarchyCache(
+    revalidate_interval=Configuration.REFERENCE_DATA_REVALIDATE_INTERVAL
+)
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_flush")
+def flag_hierarchy_changes(session, flush_context):
+    for record in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(record, HIERARCHY_MODELS):
+            session.info["basin_hierarchy_changed"] = True
+            return
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_commit")
+def invalidate_on_commit(session):
+    if session.info.pop("basin_hierarchy_changed", False):
+        hierarchy_cache.invalidate()
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_rollback")
+def clear_flag_on_rollback(session):
+    session.info.pop("basin_hierarchy_changed", None)
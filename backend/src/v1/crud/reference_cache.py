@@ -0,0 +1,274 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+
+import sqlalchemy
+import sqlalchemy.orm
+from sqlmodel import Session, SQLModel, select
+
+import src.v1.models.alerts as alerts_models
+import src.v1.models.basins as basins_model
+import src.v1.models.cap as cap_models
+from src.core.config import Configuration
+
+LOGGER = logging.getLogger(__name__)
+
+# the lookup tables that are cached, changes to any of these through the orm
+# invalidate the cache
+REFERENCE_MODELS = (
+    basins_model.Basins,
+    alerts_models.Alert_Levels,
+    cap_models.Cap_Event_Status,
+)
+
+alembic_version_table = sqlalchemy.table(
+    "alembic_version",
+    sqlalchemy.column("version_num"),
+    schema=Configuration.DEFAULT_SCHEMA,
+)
+
+
+def calculate_digest(rows: list[dict]) -> str:
+    """
+    :param rows: the rows of a table
+    :type rows: list[dict]
+    :return: a digest of the content of the rows, used to build etags
+    :rtype: str
+    """
+    content = json.dumps(rows, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(content).hexdigest()[:32]
+
+
+class ReferenceData:
+    """
+    An immutable snapshot of the reference / lookup tables.  A new snapshot is
+    created every time the cache is reloaded, snapshots are never modified so
+    they can be shared between threads without locking.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        schema_version: str | None,
+        basins: list[dict],
+        alert_levels: list[dict],
+        cap_event_statuses: list[dict],
+    ):
+        """
+        :param version: incremented every time the cache is reloaded
+        :type version: int
+        :param schema_version: the alembic revision of the database when the
+            snapshot was loaded
+        :type schema_version: str | None
+        :param basins: basin rows, ordered by basin_id
+        :type basins: list[dict]
+        :param alert_levels: alert level rows, ordered by alert_level_id
+        :type alert_levels: list[dict]
+        :param cap_event_statuses: cap event status rows
+        :type cap_event_statuses: list[dict]
+        """
+        self.version = version
+        self.schema_version = schema_version
+        self.basins = basins
+        self.alert_levels = alert_levels
+        self.cap_event_statuses = cap_event_statuses
+
+        # when names are duplicated the lowest id wins, same as the queries
+        # ordered by id that these maps replace
+        self.basin_name_to_id = {}
+        for basin in basins:
+            self.basin_name_to_id.setdefault(basin["basin_name"], basin["basin_id"])
+        self.basin_id_to_name = {
+            basin["basin_id"]: basin["basin_name"] for basin in basins
+        }
+
+        self.alert_level_to_id = {}
+        for alert_level in alert_levels:
+            self.alert_level_to_id.setdefault(
+                alert_level["alert_level"], alert_level["alert_level_id"]
+            )
+        self.alert_level_id_to_name = {
+            alert_level["alert_level_id"]: alert_level["alert_level"]
+            for alert_level in alert_levels
+        }
+
+        self.cap_event_status_to_id = {}
+        for cap_status in cap_event_statuses:
+            self.cap_event_status_to_id.setdefault(
+                cap_status["cap_event_status"], cap_status["cap_event_status_id"]
+            )
+        self.cap_event_status_id_to_name = {
+            cap_status["cap_event_status_id"]: cap_status["cap_event_status"]
+            for cap_status in cap_event_statuses
+        }
+
+        self.basins_digest = calculate_digest(basins)
+        self.alert_levels_digest = calculate_digest(alert_levels)
+
+
+class ReferenceDataCache:
+    """
+    In process cache of the basins, alert levels and cap event status lookup
+    tables, which almost never change.
+
+    * the tables are loaded once (at startup, or the first time they are
+      needed) into a versioned ReferenceData snapshot
+    * the snapshot is dropped when a session that has written to any of the
+      tables commits (see the session event listeners below)
+    * every revalidate_interval seconds the alembic revision of the database
+      is checked, and the snapshot is reloaded if a migration has been run.
+      This also picks up changes made by other processes.
+    """
+
+    def __init__(self, revalidate_interval: int = 300):
+        """
+        :param revalidate_interval: number of seconds between checks of the
+            alembic revision, 0 checks on every access
+        :type revalidate_interval: int
+        """
+        self.revalidate_interval = revalidate_interval
+        self.snapshot: ReferenceData | None = None
+        self.version = 0
+        self.load_count = 0
+        self.checked_at = None
+        self._lock = threading.Lock()
+
+    def get(self, session: Session) -> ReferenceData:
+        """
+        returns the current snapshot of the reference data, loading it using
+        the supplied session if the cache is empty or has been invalidated.
+
+        :param session: database session used if the data needs to be loaded
+        :type session: Session
+        :return: the reference data snapshot
+        :rtype: ReferenceData
+        """
+        snapshot = self.snapshot
+        if snapshot is not None and not self._revalidate_due():
+            return snapshot
+
+        with self._lock:
+            snapshot = self.snapshot
+            if snapshot is not None and self._revalidate_due():
+                schema_version = get_schema_version(session)
+                self.checked_at = time.monotonic()
+                if schema_version != snapshot.schema_version:
+                    LOGGER.info(
+                        "database revision changed from "
+                        + f"{snapshot.schema_version} to {schema_version}, "
+                        + "reloading reference data"
+                    )
+                    snapshot = None
+            if snapshot is None:
+                snapshot = self._load(session)
+            return snapshot
+
+    def _revalidate_due(self) -> bool:
+        return (
+            self.checked_at is None
+            or (time.monotonic() - self.checked_at) >= self.revalidate_interval
+        )
+
+    def _load(self, session: Session) -> ReferenceData:
+        def rows(model: type[SQLModel], order_by) -> list[dict]:
+            records = session.exec(select(model).order_by(order_by)).all()
+            return [record.model_dump() for record in records]
+
+        self.version += 1
+        snapshot = ReferenceData(
+            version=self.version,
+            schema_version=get_schema_version(session),
+            basins=rows(basins_model.Basins, basins_model.Basins.basin_id),
+            alert_levels=rows(
+                alerts_models.Alert_Levels, alerts_models.Alert_Levels.alert_level_id
+            ),
+            cap_event_statuses=rows(
+                cap_models.Cap_Event_Status,
+                cap_models.Cap_Event_Status.cap_event_status_id,
+            ),
+        )
+        self.snapshot = snapshot
+        self.checked_at = time.monotonic()
+        self.load_count += 1
+        LOGGER.debug(
+            f"loaded reference data version {snapshot.version}: "
+            + f"{len(snapshot.basins)} basins, "
+            + f"{len(snapshot.alert_levels)} alert levels, "
+            + f"{len(snapshot.cap_event_statuses)} cap event statuses"
+        )
+        return snapshot
+
+    def invalidate(self):
+        """
+        drops the current snapshot, the next call to get will reload the data
+        """
+        with self._lock:
+            self.snapshot = None
+        LOGGER.debug("reference data cache invalidated")
+
+
+def get_schema_version(session: Session) -> str | None:
+    """
+    :param session: a database session, the version is read on the session's
+        connection inside a savepoint so a missing version table doesn't break
+        the session's transaction.  The savepoint is taken on the connection
+        rather than the session, so nothing the caller has pending is flushed.
+    :type session: Session
+    :return: the current alembic revision of the database, None if the
+        database isn't managed by alembic (unit test databases)
+    :rtype: str | None
+    """
+    connection = session.connection()
+    try:
+        with connection.begin_nested():
+            return connection.execute(
+                sqlalchemy.select(alembic_version_table.c.version_num)
+            ).scalar()
+    except (sqlalchemy.exc.ProgrammingError, sqlalchemy.exc.OperationalError) as err:
+        # the version table doesn't exist
+        LOGGER.debug(f"unable to read the alembic version: {err}")
+        return None
+
+
+def attach(session: Session, model: type[SQLModel], **values) -> SQLModel:
+    """
+    returns an instance of a lookup table record that is attached to the
+    session, built from the cached values rather than querying the database.
+
+    :param session: the session to attach the record to
+    :type session: Session
+    :param model: the lookup table model
+    :type model: type[SQLModel]
+    :return: the persistent record, if the record is already in the session's
+        identity map that record is returned
+    :rtype: SQLModel
+    """
+    record = model(**values)
+    sqlalchemy.orm.make_transient_to_detached(record)
+    return session.merge(record, load=False)
+
+
+reference_cache = ReferenceDataCache(
+    revalidate_interval=Configuration.REFERENCE_DATA_REVALIDATE_INTERVAL
+)
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_flush")
+def flag_reference_data_changes(session, flush_context):
+    for record in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(record, REFERENCE_MODELS):
+            session.info["reference_data_changed"] = True
+            return
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_commit")
+def invalidate_on_commit(session):
+    if session.info.pop("reference_data_changed", False):
+        reference_cache.invalidate()
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_rollback")
+def clear_flag_on_rollback(session):
+    session.info.pop("reference_data_changed", None)
@@ -3,13 +3,14 @@ import datetime
 from enum import Enum
 from typing import List, Optional
 
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import JSON, Column, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB
 
 # from sqlalchemy import MetaData
 from sqlmodel import Field, Relationship, SQLModel
 
 from src.core.config import Settings
-from src.v1.models.basins import BasinBase, Basins, BasinsRead
+from src.v1.models.basins import BasinBase, Basins, BasinsRead, SubbasinBase
 from src.v1.models.cap import Cap_Event
 
 default_schema = Settings.DEFAULT_SCHEMA
@@ -89,6 +90,9 @@ class Alert_Areas(Alert_Areas_Read, table=True):
 
     __table_args__ = (
         UniqueConstraint("alert_id", "basin_id", "alert_level_id"),
+        # support filtering alerts by basin / alert level
+        Index("ix_alert_areas_basin_id_alert_id", "basin_id", "alert_id"),
+        Index("ix_alert_areas_alert_level_id_alert_id", "alert_level_id", "alert_id"),
         {"schema": default_schema},
     )
 
@@ -108,7 +112,18 @@ class Alerts(AlertsRead, table=True):
     :type table: bool, optional
     """
 
-    __table_args__ = {"schema": default_schema}
+    __table_args__ = (
+        # keyset pagination of the alert list, newest first
+        Index("ix_alerts_alert_updated_alert_id", "alert_updated", "alert_id"),
+        # filtering the alert list by status
+        Index(
+            "ix_alerts_alert_status_alert_updated",
+            "alert_status",
+            "alert_updated",
+            "alert_id",
+        ),
+        {"schema": default_schema},
+    )
 
     alert_links: List["Alert_Areas"] = Relationship(back_populates="alert")
 
@@ -162,9 +177,32 @@ class Alert_Basins(AlertsRead):
     alert_links: List[Alert_Areas_Read]
 
 
+class Alert_Area_Bbox_Write(SQLModel):
+    """
+    an alert level for every basin whose boundary overlaps a bounding box,
+    see crud_alerts.expand_area_bboxes
+    """
+
+    # min lon, min lat, max lon, max lat
+    bbox: tuple[float, float, float, float]
+    alert_level: Alert_Levels_Base
+
+
+class Alert_Subbasin_Write(SQLModel):
+    """
+    an alert level for every basin in a subbasin, including the basins of its
+    nested subbasins, see crud_alerts.expand_subbasin_links
+    """
+
+    subbasin: SubbasinBase
+    alert_level: Alert_Levels_Base
+
+
 class Alert_Basins_Write(AlertsBase):
     alert_links: List[Alert_Areas_Write]
     # alert_links: List[Alert_Areas]
+    alert_area_bboxes: List[Alert_Area_Bbox_Write] = []
+    alert_subbasin_links: List[Alert_Subbasin_Write] = []
 
 
 class Alert_History_Base(AlertsBase):
@@ -174,10 +212,18 @@ class Alert_History_Base(AlertsBase):
 
 
 class Alert_History(Alert_History_Base, table=True):
-    __table_args__ = {
-        "schema": default_schema,
-        "comment": "This table is used to track the changes over time of alerts",
-    }
+    __table_args__ = (
+        # the history timeline of an alert, newest first
+        Index(
+            "ix_alert_history_alert_id_alert_history_created",
+            "alert_id",
+            "alert_history_created",
+        ),
+        {
+            "schema": default_schema,
+            "comment": "This table is used to track the changes over time of alerts",
+        },
+    )
 
     alert_history_id: Optional[int] = Field(
         default=None,
@@ -239,8 +285,74 @@ class Alert_Area_History(SQLModel, table=True):
     alert_levels: "Alert_Levels" = Relationship(back_populates="alert_hist_level_link")
 
 
-from .cap import Cap_Comparison, Cap_Event_And_Areas, Cap_Event_History  # noqa: E402
+class Alert_Area_History_Read(SQLModel):
+    basins: BasinsRead
+    alert_levels: Alert_Levels_Read
+
+
+class Alert_History_Read(Alert_History_Base):
+    """
+    a snapshot of an alert, as it was before it was updated, with the basins
+    and alert levels it had at the time
+    """
+
+    alert_history_id: int
+    alert_history_links: List[Alert_Area_History_Read]
+
+
+# JSONB on postgres, JSON (text) on sqlite for the tests
+json_type = JSON().with_variant(JSONB(), "postgresql")
+
+
+class Alert_Read_Model(SQLModel, table=True):
+    """
+    Denormalized copy of each alert, as it is returned by the api, so the alert
+    routes can read an alert with a single row lookup rather than joining
+    alerts / alert_areas / basins / alert_levels and the cap tables.
+
+    The rows are not written directly, the crud write paths mark the alerts
+    they modify and the rows are rebuilt in the same transaction when it is
+    committed, see crud_read_model.
+    """
+
+    __tablename__ = "alert_read_model"
+    __table_args__ = (
+        # same ordering / filtering as the alerts table indexes
+        Index(
+            "ix_alert_read_model_alert_updated_alert_id", "alert_updated", "alert_id"
+        ),
+        Index(
+            "ix_alert_read_model_alert_status_alert_updated",
+            "alert_status",
+            "alert_updated",
+            "alert_id",
+        ),
+        {
+            "schema": default_schema,
+            "comment": "Denormalized alerts with their basins, alert levels and "
+            + "cap events, maintained by the api",
+        },
+    )
+
+    alert_id: int = Field(
+        foreign_key=f"{default_schema}.alerts.alert_id", primary_key=True
+    )
+    alert_status: str = Field(nullable=False)
+    alert_updated: datetime.datetime = Field(nullable=False)
+    # the alert serialized as Alert_Basins
+    alert: dict = Field(sa_column=Column(json_type, nullable=False))
+    # the alert's cap events serialized as Cap_Event_And_Areas
+    cap_events: list = Field(sa_column=Column(json_type, nullable=False))
+
+
+from .cap import (  # noqa: E402
+    Cap_Comparison,
+    Cap_Event_And_Areas,
+    Cap_Event_History,
+    Cap_Event_History_Read,
+)
 
 Cap_Event_And_Areas.model_rebuild()
 Cap_Event_History.model_rebuild()
+Cap_Event_History_Read.model_rebuild()
 Cap_Comparison.model_rebuild()
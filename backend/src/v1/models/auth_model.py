@@ -62,3 +62,19 @@ class User(SQLModel):
     given_name: str = Field(description="Given name(s) or first name(s)")
     family_name: str = Field(description="Surname(s) or last name(s)")
     email: EmailStr = Field(description="Preferred e-mail address of the user")
+
+
+class Principal(SQLModel):
+    """
+    The result of verifying the bearer token for a request.  Computed once per
+    request and shared by the authorization dependencies.
+    """
+
+    user: dict = Field(description="The payload extracted from the access token")
+    roles: List[str] = Field(description="The client roles granted to the user")
+    is_authorized: bool = Field(
+        description="True if the user has one of the required roles"
+    )
+    verification_seconds: float = Field(
+        description="Time taken to verify the token and check its roles"
+    )
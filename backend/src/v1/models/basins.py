@@ -1,5 +1,6 @@
 from typing import TYPE_CHECKING, List, Optional
 
+from sqlalchemy import Column, Index, LargeBinary
 from sqlmodel import Field, Relationship, SQLModel
 
 from src.core.config import Settings
@@ -11,10 +12,19 @@ if TYPE_CHECKING:
 default_schema = Settings.DEFAULT_SCHEMA
 
 
-class Subbasins(SQLModel, table=True):
+class SubbasinBase(SQLModel):
     """
-    not currently in use, will be used later should we want to emit events
-    associated with basins / subbasins.
+    identifies a subbasin by name, used when alerts target subbasins
+    """
+
+    sub_basin_name: str = Field(nullable=False)
+
+
+class Subbasins(SubbasinBase, table=True):
+    """
+    groups of basins, used to target / describe alerts by subbasin.  Subbasins
+    can be nested using parent_subbasin_id, every ancestor / descendant pair
+    is stored in the subbasin_closure table (see Subbasin_Closure).
 
     :param SQLModel: inherits from SQLModel
     :type SQLModel: SQLModel
@@ -27,10 +37,42 @@ class Subbasins(SQLModel, table=True):
     # metadata = meta
     # TODO: rename this to subbasin_id in migration file
     subbasin_id: Optional[int] = Field(default=None, primary_key=True)
-    sub_basin_name: str = Field(nullable=False)
+    parent_subbasin_id: Optional[int] = Field(
+        default=None, foreign_key=f"{default_schema}.subbasins.subbasin_id"
+    )
     basins: List["Basins"] = Relationship(back_populates="subbasins")
 
 
+class Subbasin_Closure(SQLModel, table=True):
+    """
+    the closure of the subbasin hierarchy, a record for every subbasin and
+    each of its ancestors, including a record linking each subbasin to
+    itself with a depth of 0.  Expanding a subbasin to all the basins below
+    it, or finding every subbasin a basin is in, is a single indexed join
+    rather than walking the parent links.  Rebuilt from parent_subbasin_id
+    by crud_subbasins.rebuild_closure.
+    """
+
+    __tablename__ = "subbasin_closure"
+    __table_args__ = (
+        # roll ups, the ancestors of a subbasin
+        Index("ix_subbasin_closure_descendant_id", "descendant_id"),
+        {
+            "schema": default_schema,
+            "comment": "Every ancestor / descendant pair of the subbasin hierarchy",
+        },
+    )
+
+    ancestor_id: int = Field(
+        foreign_key=f"{default_schema}.subbasins.subbasin_id", primary_key=True
+    )
+    descendant_id: int = Field(
+        foreign_key=f"{default_schema}.subbasins.subbasin_id", primary_key=True
+    )
+    # number of levels between the ancestor and the descendant
+    depth: int = Field(nullable=False)
+
+
 class BasinBase(SQLModel):
     """
     starting point for basin data, used for both read and write
@@ -66,7 +108,11 @@ class Basins(BasinsRead, table=True):
     :type table: bool, optional
     """
 
-    __table_args__ = {"schema": default_schema}
+    __table_args__ = (
+        # subbasins are expanded to their basins through this column
+        Index("ix_basins_subbasins_id", "subbasins_id"),
+        {"schema": default_schema},
+    )
     # __tablename__ = f"{default_schema}.basins"
 
     subbasins_id: Optional[int] = Field(
@@ -78,3 +124,48 @@ class Basins(BasinsRead, table=True):
     basin_cap_links: List["Cap_Event_Areas"] = Relationship(back_populates="cap_area_basin")
     basin_cap_hist_links: List["Cap_Event_Areas_History"] = Relationship(back_populates="basins")
     basin_alert_hist_links: List["Alert_Area_History"] = Relationship(back_populates="basins")
+
+
+class Basin_Geometry(SQLModel, table=True):
+    """
+    the boundary of a basin, loaded from a GeoJSON file by a migration.  The
+    geometry is stored as well known binary (WKB) in lon / lat (EPSG:4326),
+    the bounding box is stored so the boundaries that could intersect an area
+    can be found without reading the geometry.
+    """
+
+    __tablename__ = "basin_geometry"
+    __table_args__ = {
+        "schema": default_schema,
+        "comment": "Full resolution basin boundaries (WKB, EPSG:4326)",
+    }
+
+    basin_id: int = Field(
+        foreign_key=f"{default_schema}.basins.basin_id", primary_key=True
+    )
+    geometry: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    min_x: float = Field(nullable=False)
+    min_y: float = Field(nullable=False)
+    max_x: float = Field(nullable=False)
+    max_y: float = Field(nullable=False)
+
+
+class Basin_Geometry_Simplified(SQLModel, table=True):
+    """
+    a basin boundary simplified at one of the BASIN_GEOMETRY_TOLERANCES, so
+    the maps / cap messages never simplify the boundaries when they are
+    requested
+    """
+
+    __tablename__ = "basin_geometry_simplified"
+    __table_args__ = {
+        "schema": default_schema,
+        "comment": "Basin boundaries pre-simplified at several tolerances",
+    }
+
+    basin_id: int = Field(
+        foreign_key=f"{default_schema}.basin_geometry.basin_id", primary_key=True
+    )
+    # the simplification tolerance in degrees
+    tolerance: float = Field(primary_key=True)
+    geometry: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
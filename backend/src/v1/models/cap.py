@@ -1,6 +1,7 @@
 import datetime
 from typing import TYPE_CHECKING, List, Optional
 
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 
 from src.core.config import Settings
@@ -118,7 +119,15 @@ class Cap_Event_History(SQLModel, table=True):
     :type table: bool, optional
     """
 
-    __table_args__ = {"schema": default_schema}
+    __table_args__ = (
+        # the cap event history timeline of an alert, newest first
+        Index(
+            "ix_cap_event_history_alert_id_cap_event_hist_created_date",
+            "alert_id",
+            "cap_event_hist_created_date",
+        ),
+        {"schema": default_schema},
+    )
 
     cap_event_id: int = Field(
         default=None, foreign_key=f"{default_schema}.cap_event.cap_event_id"
@@ -167,6 +176,27 @@ class Cap_Event_Areas_History(SQLModel, table=True):
     )
 
 
+class Cap_Event_Areas_History_Read(SQLModel):
+    cap_event_area_history_id: int
+    basins: Optional["Basins"] | None = None
+
+
+class Cap_Event_History_Read(SQLModel):
+    """
+    a snapshot of a cap event, as it was before it was updated / cancelled,
+    with the basins it covered at the time
+    """
+
+    cap_event_history_id: int
+    cap_event_id: int
+    alert_id: int
+    cap_event_updated_date: datetime.datetime
+    cap_event_hist_created_date: datetime.datetime
+    cap_event_status: Optional["Cap_Event_Status"] | None = None
+    alert_levels: Optional["Alert_Levels_Read"] | None = None
+    cap_event_areas_hist: List["Cap_Event_Areas_History_Read"] = []
+
+
 class Cap_Event_Status(SQLModel, table=True):
     __table_args__ = {"schema": default_schema}
 
@@ -189,4 +219,8 @@ class Cap_Comparison(SQLModel):
 
     alert_level: "Alert_Levels_Base" = ...
     basins: List["BasinBase"]
+    # the ids of the basins, in the same order, when the comparison is
+    # generated from an alert.  The alert's basins have already been resolved
+    # against the database, the cap event areas are written with these ids.
+    basin_ids: List[int] = []
     # cap_event_id: Optional[int] = None
@@ -0,0 +1,313 @@
+"""
+An Atom feed of the active (not cancelled) cap events, with an entry for each
+cap event that links to its CAP 1.2 message, see cap_xml.
+
+The feed is polled by every consumer of the warnings, so it's kept pre-rendered
+in memory and served without touching the database:
+
+* each entry is rendered once and kept with the document key of its cap
+  event, see cap_xml.document_key
+* when a session that has written to the cap events / alerts commits, the feed
+  is marked stale (see the session event listeners below).  The next request
+  queries the ids / updated dates of the active cap events, renders the
+  entries whose keys changed, drops the entries of cancelled cap events and
+  re-assembles the feed from the rendered entries.
+* every revalidate_interval seconds the same check is done even if the feed
+  hasn't been marked stale, to pick up changes made by other replicas.
+
+https://www.rfc-editor.org/rfc/rfc4287
+"""
+
+import datetime
+import hashlib
+import logging
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from typing import Iterable
+
+import sqlalchemy
+import sqlalchemy.orm
+from sqlmodel import Session
+
+from src.core.config import Configuration
+from src.v1.crud import crud_cap
+from src.v1.crud.geometry_cache import geometry_cache
+from src.v1.models import alerts as alerts_models
+from src.v1.models import cap as cap_models
+from src.v1.renderers import cap_xml
+from src.v1.renderers.cap_xml import sub_element
+
+LOGGER = logging.getLogger(__name__)
+
+ATOM_NAMESPACE = "http://www.w3.org/2005/Atom"
+ATOM_MEDIA_TYPE = "application/atom+xml"
+FEED_TITLE = "Active River Forecast Centre Warnings"
+
+# writes to any of these through the orm mark the feed stale
+FEED_MODELS = (
+    alerts_models.Alerts,
+    cap_models.Cap_Event,
+    cap_models.Cap_Event_Areas,
+)
+
+
+def atom_datetime(date: datetime.datetime) -> str:
+    """
+    :return: the date in the RFC 3339 format atom requires
+    :rtype: str
+    """
+    return cap_xml.as_utc(date).isoformat(timespec="seconds")
+
+
+def feed_id() -> str:
+    """
+    :return: the permanent identifier of the feed, derived from the sender
+    :rtype: str
+    """
+    return uuid.uuid5(uuid.NAMESPACE_URL, f"{Configuration.CAP_SENDER}/cap").urn
+
+
+def entry_id(cap_event_id: int) -> str:
+    """
+    :param cap_event_id: the id of the cap event
+    :type cap_event_id: int
+    :return: the permanent identifier of the feed entry for the cap event,
+        doesn't change when the cap event is updated
+    :rtype: str
+    """
+    return uuid.uuid5(
+        uuid.NAMESPACE_URL, f"{Configuration.CAP_SENDER}/cap/{cap_event_id}"
+    ).urn
+
+
+def entry_updated(
+    cap_event: cap_models.Cap_Event, alert: alerts_models.Alerts
+) -> datetime.datetime:
+    """
+    :return: when the content of the cap event's entry last changed, the
+        later of when the cap event and its alert were updated
+    :rtype: datetime.datetime
+    """
+    return max(
+        cap_xml.as_utc(cap_event.cap_event_updated_date),
+        cap_xml.as_utc(alert.alert_updated),
+    )
+
+
+def render_entry(cap_event: cap_models.Cap_Event, alert: alerts_models.Alerts) -> bytes:
+    """
+    :param cap_event: the cap event with its areas, alert level and status
+        loaded, see crud_cap.get_cap_messages
+    :type cap_event: cap_models.Cap_Event
+    :param alert: the alert the cap event was created for
+    :type alert: alerts_models.Alerts
+    :return: the <entry> element for the cap event, utf-8 encoded without an
+        xml declaration so it can be embedded in the feed
+    :rtype: bytes
+    """
+    alert_level = cap_event.alert_level.alert_level
+    entry = ET.Element("entry")
+    sub_element(entry, "id", entry_id(cap_event.cap_event_id))
+    sub_element(
+        entry, "title", cap_xml.headline(alert_level, cap_xml.area_names(cap_event))
+    )
+    sub_element(entry, "updated", atom_datetime(entry_updated(cap_event, alert)))
+    # relative to the feed, resolves to the cap message route
+    ET.SubElement(
+        entry,
+        "link",
+        rel="alternate",
+        type=cap_xml.CAP_MEDIA_TYPE,
+        href=f"{cap_event.cap_event_id}.xml",
+    )
+    ET.SubElement(entry, "category", term=alert_level)
+    sub_element(entry, "summary", alert.alert_description)
+    return ET.tostring(entry, encoding="utf-8")
+
+
+def render_feed(entries: Iterable[tuple[datetime.datetime, bytes]]) -> bytes:
+    """
+    :param entries: when each entry was updated, and the rendered entry
+    :type entries: Iterable[tuple[datetime.datetime, bytes]]
+    :return: the feed, with the entries ordered newest first
+    :rtype: bytes
+    """
+    ordered = sorted(entries, key=lambda entry: entry[0], reverse=True)
+    updated = ordered[0][0] if ordered else datetime.datetime.now(datetime.UTC)
+
+    feed = ET.Element("feed", xmlns=ATOM_NAMESPACE)
+    sub_element(feed, "id", feed_id())
+    sub_element(feed, "title", FEED_TITLE)
+    sub_element(feed, "updated", atom_datetime(updated))
+    author = sub_element(feed, "author")
+    sub_element(author, "name", Configuration.CAP_SENDER_NAME)
+    ET.SubElement(feed, "link", rel="self", type=ATOM_MEDIA_TYPE, href="feed")
+    closing_tag = b"</feed>"
+    header = ET.tostring(feed, encoding="utf-8", xml_declaration=True)
+    return (
+        header[: -len(closing_tag)]
+        + b"".join(body for entry_updated, body in ordered)
+        + closing_tag
+    )
+
+
+class CapFeed:
+    """
+    The pre-rendered feed of the active cap events for this replica.  The
+    rendered entries are kept between refreshes so only the entries of the cap
+    events that changed are rendered, see the module docstring.
+    """
+
+    def __init__(self, revalidate_interval: int = 30):
+        """
+        :param revalidate_interval: number of seconds between checks of the
+            database for changes made by other replicas, 0 checks on every
+            request
+        :type revalidate_interval: int
+        """
+        self.revalidate_interval = revalidate_interval
+        self.stale = True
+        self.checked_at = None
+        # cap event id -> (document key, entry updated, rendered entry)
+        self._entries: dict[int, tuple[str, datetime.datetime, bytes]] = {}
+        # (rendered feed, etag), replaced as a whole so readers never see a
+        # body with the etag of another version
+        self._document: tuple[bytes, str] | None = None
+        self._lock = threading.Lock()
+
+        self.checks = 0
+        self.builds = 0
+        self.entries_rendered = 0
+
+    def get(self, session: Session) -> tuple[bytes, str]:
+        """
+        returns the feed, refreshing it using the supplied session if it's
+        stale or due to be revalidated
+
+        :param session: database session used if the feed needs refreshing
+        :type session: Session
+        :return: the rendered feed and its etag
+        :rtype: tuple[bytes, str]
+        """
+        document = self._current()
+        if document is not None:
+            return document
+
+        with self._lock:
+            document = self._current()
+            if document is None:
+                document = self._refresh(session)
+            return document
+
+    def _current(self) -> tuple[bytes, str] | None:
+        if self.stale or self._revalidate_due():
+            return None
+        return self._document
+
+    def _revalidate_due(self) -> bool:
+        return (
+            self.checked_at is None
+            or (time.monotonic() - self.checked_at) >= self.revalidate_interval
+        )
+
+    def _refresh(self, session: Session) -> tuple[bytes, str]:
+        # cleared before querying so a commit made while refreshing marks the
+        # feed stale again, and restored if the refresh fails so the current
+        # document isn't served as if it had been checked
+        self.stale = False
+        self.checked_at = time.monotonic()
+        self.checks += 1
+        try:
+            return self._rebuild(session)
+        except BaseException:
+            self.stale = True
+            raise
+
+    def _rebuild(self, session: Session) -> tuple[bytes, str]:
+        geometry_digest = geometry_cache.get(session).digest
+        keys = {
+            cap_event_id: cap_xml.document_key(cap_event_id, *updated, geometry_digest)
+            for cap_event_id, *updated in (
+                crud_cap.get_active_cap_event_versions(session)
+            )
+        }
+        entries = {
+            cap_event_id: entry
+            for cap_event_id, entry in self._entries.items()
+            if keys.get(cap_event_id) == entry[0]
+        }
+        changed = [cap_event_id for cap_event_id in keys if cap_event_id not in entries]
+        if changed:
+            for cap_event, alert in crud_cap.get_cap_messages(session, changed):
+                entries[cap_event.cap_event_id] = (
+                    keys[cap_event.cap_event_id],
+                    entry_updated(cap_event, alert),
+                    render_entry(cap_event, alert),
+                )
+            self.entries_rendered += len(changed)
+
+        if self._document is None or entries.keys() != self._entries.keys() or changed:
+            body = render_feed(
+                (updated, entry) for key, updated, entry in entries.values()
+            )
+            etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+            self._entries = entries
+            self._document = (body, etag)
+            self.builds += 1
+            LOGGER.debug(
+                f"cap feed rebuilt with {len(entries)} entries, "
+                + f"{len(changed)} rendered"
+            )
+        return self._document
+
+    def invalidate(self):
+        """
+        marks the feed stale, the next call to get checks the database for
+        changed cap events
+        """
+        self.stale = True
+        LOGGER.debug("cap feed marked stale")
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._document = None
+            self.stale = True
+
+    def stats(self) -> dict:
+        """
+        :return: the number of entries in the feed and how often the feed has
+            been checked / rebuilt
+        :rtype: dict
+        """
+        return {
+            "entries": len(self._entries),
+            "stale": self.stale,
+            "checks": self.checks,
+            "builds": self.builds,
+            "entries_rendered": self.entries_rendered,
+        }
+
+
+cap_feed = CapFeed(revalidate_interval=Configuration.CAP_FEED_REVALIDATE_INTERVAL)
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_flush")
+def flag_cap_feed_changes(session, flush_context):
+    for record in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(record, FEED_MODELS):
+            session.info["cap_feed_changed"] = True
+            return
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_commit")
+def invalidate_on_commit(session):
+    if session.info.pop("cap_feed_changed", False):
+        cap_feed.invalidate()
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "after_rollback")
+def clear_flag_on_rollback(session):
+    session.info.pop("cap_feed_changed", None)
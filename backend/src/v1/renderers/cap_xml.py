@@ -0,0 +1,369 @@
+"""
+Renders cap events as Common Alerting Protocol (CAP 1.2) messages.
+
+Each cap event is published as its own message, an <alert> with a single
+<info> for the event's alert level and an <area> for each basin.  The message
+type follows the status of the cap event (ALERT / UPDATE / CANCEL), updates
+and cancels reference the earlier messages for the same cap event, which are
+identified by the dates recorded in the cap event history.
+
+When the boundary of a basin has been loaded its <area> includes the boundary
+as <polygon>s, pre-simplified at the CAP_AREA_TOLERANCE, see geometry_cache.
+
+A message only changes when its cap event or alert is updated, or when the
+boundaries are reloaded by a migration, so rendered messages are cached by a
+key derived from those two dates and the digest of the boundaries, see
+document_key.
+
+http://docs.oasis-open.org/emergency/cap/v1.2/CAP-v1.2.html
+"""
+
+import datetime
+import hashlib
+import logging
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from typing import List
+
+from sqlmodel import Session
+
+from src.core.config import Configuration
+from src.v1.crud import crud_cap
+from src.v1.crud.geometry_cache import geometry_cache
+from src.v1.models import alerts as alerts_models
+from src.v1.models import cap as cap_models
+
+LOGGER = logging.getLogger(__name__)
+
+CAP_NAMESPACE = "urn:oasis:names:tc:emergency:cap:1.2"
+CAP_MEDIA_TYPE = "application/cap+xml"
+# included in the document keys, change it when the rendered output changes so
+# clients don't keep messages rendered by an older version
+RENDERER_VERSION = 2
+
+MSG_TYPES = {"ALERT": "Alert", "UPDATE": "Update", "CANCEL": "Cancel"}
+# urgency / severity / certainty of each alert level
+ALERT_LEVEL_CODES = {
+    "High Streamflow Advisory": ("Future", "Minor", "Possible"),
+    "Flood Watch": ("Expected", "Moderate", "Likely"),
+    "Flood Warning": ("Immediate", "Severe", "Likely"),
+}
+UNKNOWN_CODES = ("Unknown", "Unknown", "Unknown")
+HEADLINE_LENGTH = 160
+
+
+def as_utc(date: datetime.datetime) -> datetime.datetime:
+    """
+    :param date: a date from the database, naive dates are utc
+    :type date: datetime.datetime
+    :rtype: datetime.datetime
+    """
+    if date.tzinfo is None:
+        return date.replace(tzinfo=datetime.timezone.utc)
+    return date.astimezone(datetime.timezone.utc)
+
+
+def cap_datetime(date: datetime.datetime) -> str:
+    """
+    :return: the date in the format cap requires, seconds precision with the
+        utc offset written as -00:00
+    :rtype: str
+    """
+    return as_utc(date).strftime("%Y-%m-%dT%H:%M:%S-00:00")
+
+
+def message_identifier(cap_event_id: int, cap_event_updated: datetime.datetime) -> str:
+    """
+    :param cap_event_id: the id of the cap event
+    :type cap_event_id: int
+    :param cap_event_updated: when the version of the cap event was last updated
+    :type cap_event_updated: datetime.datetime
+    :return: the identifier of the cap message for a version of a cap event,
+        unique for the sender
+    :rtype: str
+    """
+    version = as_utc(cap_event_updated).strftime("%Y%m%dT%H%M%S%f")
+    return f"{Configuration.CAP_SENDER}-{cap_event_id}-{version}"
+
+
+def document_key(
+    cap_event_id: int,
+    cap_event_updated: datetime.datetime,
+    alert_updated: datetime.datetime,
+    geometry_digest: str,
+) -> str:
+    """
+    :param cap_event_id: the id of the cap event
+    :type cap_event_id: int
+    :param cap_event_updated: when the cap event was last updated
+    :type cap_event_updated: datetime.datetime
+    :param alert_updated: when the cap event's alert was last updated
+    :type alert_updated: datetime.datetime
+    :param geometry_digest: the digest of the basin boundaries the <polygon>s
+        are rendered from, see geometry_cache
+    :type geometry_digest: str
+    :return: a key that identifies the content of the message, calculated
+        without rendering it.  Also used as the message's etag.
+    :rtype: str
+    """
+    version = ":".join(
+        [
+            str(RENDERER_VERSION),
+            str(cap_event_id),
+            as_utc(cap_event_updated).isoformat(),
+            as_utc(alert_updated).isoformat(),
+            geometry_digest,
+        ]
+    )
+    return hashlib.sha256(version.encode("utf-8")).hexdigest()[:32]
+
+
+def sub_element(parent: ET.Element, tag: str, text: str | None = None) -> ET.Element:
+    element = ET.SubElement(parent, tag)
+    if text is not None:
+        element.text = text
+    return element
+
+
+def headline(alert_level: str, basin_names: List[str]) -> str:
+    """
+    :param alert_level: the alert level of the cap event
+    :type alert_level: str
+    :param basin_names: the names of the basins the cap event covers
+    :type basin_names: List[str]
+    :return: the headline of the cap event, the alert level and basins,
+        truncated to the length cap recommends
+    :rtype: str
+    """
+    text = f"{alert_level} - {', '.join(basin_names)}"
+    if len(text) > HEADLINE_LENGTH:
+        text = text[: HEADLINE_LENGTH - 3] + "..."
+    return text
+
+
+def area_names(cap_event: cap_models.Cap_Event) -> List[str]:
+    """
+    :param cap_event: a cap event with its areas loaded
+    :type cap_event: cap_models.Cap_Event
+    :return: the sorted names of the basins the cap event covers
+    :rtype: List[str]
+    """
+    return sorted(
+        event_area.cap_area_basin.basin_name for event_area in cap_event.event_areas
+    )
+
+
+def render_cap_event(
+    cap_event: cap_models.Cap_Event,
+    alert: alerts_models.Alerts,
+    previous_versions: List[datetime.datetime] | None = None,
+    polygons: dict[int, List[str]] | None = None,
+) -> bytes:
+    """
+    :param cap_event: the cap event with its areas, alert level and status
+        loaded, see crud_cap.get_cap_messages
+    :type cap_event: cap_models.Cap_Event
+    :param alert: the alert the cap event was created for
+    :type alert: alerts_models.Alerts
+    :param previous_versions: the updated dates of the earlier versions of the
+        cap event, see crud_cap.get_previous_cap_versions
+    :type previous_versions: List[datetime.datetime], optional
+    :param polygons: basin id -> the cap polygons of the basin's boundary,
+        see BasinGeometries.cap_polygons
+    :type polygons: dict[int, List[str]], optional
+    :return: the cap message, utf-8 encoded
+    :rtype: bytes
+    """
+    status = cap_event.cap_event_status.cap_event_status
+    alert_level = cap_event.alert_level.alert_level
+    basin_names = area_names(cap_event)
+
+    root = ET.Element("alert", xmlns=CAP_NAMESPACE)
+    sub_element(
+        root,
+        "identifier",
+        message_identifier(cap_event.cap_event_id, cap_event.cap_event_updated_date),
+    )
+    sub_element(root, "sender", Configuration.CAP_SENDER)
+    sub_element(root, "sent", cap_datetime(cap_event.cap_event_updated_date))
+    sub_element(root, "status", "Actual")
+    sub_element(root, "msgType", MSG_TYPES.get(status, "Alert"))
+    sub_element(root, "scope", "Public")
+
+    current = as_utc(cap_event.cap_event_updated_date)
+    references = [
+        ",".join(
+            [
+                Configuration.CAP_SENDER,
+                message_identifier(cap_event.cap_event_id, version),
+                cap_datetime(version),
+            ]
+        )
+        for version in previous_versions or []
+        if as_utc(version) < current
+    ]
+    if references and status != "ALERT":
+        sub_element(root, "references", " ".join(references))
+
+    info = sub_element(root, "info")
+    urgency, severity, certainty = ALERT_LEVEL_CODES.get(alert_level, UNKNOWN_CODES)
+    sub_element(info, "language", "en-CA")
+    sub_element(info, "category", "Met")
+    sub_element(info, "event", alert_level)
+    sub_element(info, "urgency", urgency)
+    sub_element(info, "severity", severity)
+    sub_element(info, "certainty", certainty)
+    sub_element(info, "senderName", Configuration.CAP_SENDER_NAME)
+    sub_element(info, "headline", headline(alert_level, basin_names))
+    sub_element(info, "description", alert.alert_description)
+    if alert.additional_information:
+        sub_element(info, "instruction", alert.additional_information)
+    for value_name, value in [
+        ("hydrologicalConditions", alert.alert_hydro_conditions),
+        ("meteorologicalConditions", alert.alert_meteorological_conditions),
+    ]:
+        if value:
+            parameter = sub_element(info, "parameter")
+            sub_element(parameter, "valueName", value_name)
+            sub_element(parameter, "value", value)
+    basin_ids = {
+        event_area.cap_area_basin.basin_name: event_area.basin_id
+        for event_area in cap_event.event_areas
+    }
+    for basin_name in basin_names:
+        area = sub_element(info, "area")
+        sub_element(area, "areaDesc", basin_name)
+        for polygon in (polygons or {}).get(basin_ids[basin_name], []):
+            sub_element(area, "polygon", polygon)
+
+    return ET.tostring(root, encoding="utf-8", xml_declaration=True)
+
+
+class CapDocumentCache:
+    """
+    A bounded, thread safe, least recently used cache of rendered cap
+    messages, keyed by document_key.  The keys identify the content, a new
+    version of a cap event / alert or of the boundaries gets a new key, so
+    entries never need to be invalidated, the versions that are no longer
+    requested are evicted.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        """
+        :param maxsize: the maximum number of messages to cache, 0 disables
+            the cache
+        :type maxsize: int
+        """
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> bytes | None:
+        """
+        :param key: the document key of the message
+        :type key: str
+        :return: the rendered message, None if it isn't cached
+        :rtype: bytes | None
+        """
+        if not self.maxsize:
+            return None
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: str, body: bytes) -> bytes:
+        """
+        :param key: the document key of the message
+        :type key: str
+        :param body: the rendered message
+        :type body: bytes
+        :return: the rendered message
+        :rtype: bytes
+        """
+        if not self.maxsize:
+            return body
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return body
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        :return: the size of the cache and the hit / miss / eviction counters
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+cap_documents = CapDocumentCache(maxsize=Configuration.CAP_DOCUMENT_CACHE_SIZE)
+
+
+def render_cap_messages(
+    session: Session,
+    versions: List[tuple[int, datetime.datetime, datetime.datetime]],
+    cache: CapDocumentCache = cap_documents,
+) -> List[tuple[str, bytes]]:
+    """
+    returns the cap messages for a list of cap events.  Only the cap events
+    whose messages aren't already cached are loaded and rendered, along with
+    their earlier versions, in a fixed number of queries.
+
+    :param session: a database session
+    :type session: Session
+    :param versions: the id and updated dates of each cap event / alert, see
+        crud_cap.get_cap_event_version / get_active_cap_event_versions
+    :type versions: List[tuple[int, datetime.datetime, datetime.datetime]]
+    :param cache: the cache of rendered messages
+    :type cache: CapDocumentCache
+    :return: the document key and rendered message for each cap event
+    :rtype: List[tuple[str, bytes]]
+    """
+    geometries = geometry_cache.get(session)
+    keys = [document_key(*version, geometries.digest) for version in versions]
+    bodies = {key: cache.get(key) for key in keys}
+    missing = {
+        cap_event_id: key
+        for (cap_event_id, *updated), key in zip(versions, keys)
+        if bodies[key] is None
+    }
+    if missing:
+        cap_event_ids = list(missing)
+        previous_versions = crud_cap.get_previous_cap_versions(session, cap_event_ids)
+        polygons = geometries.cap_polygons
+        for cap_event, alert in crud_cap.get_cap_messages(session, cap_event_ids):
+            key = missing[cap_event.cap_event_id]
+            bodies[key] = cache.put(
+                key,
+                render_cap_event(
+                    cap_event,
+                    alert,
+                    previous_versions[cap_event.cap_event_id],
+                    polygons=polygons,
+                ),
+            )
+        LOGGER.debug(f"rendered {len(missing)} cap messages")
+    return [(key, bodies[key]) for key in keys]
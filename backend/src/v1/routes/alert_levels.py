@@ -1,12 +1,14 @@
 import logging
 from typing import Any, List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Query
 from sqlmodel import Session
 
 from src.db import session
-from src.v1.crud import crud_alerts
+from src.v1.crud.reference_cache import reference_cache
 from src.v1.models import alerts as alerts_models
+from src.v1.routes.conditional import etag_matches, not_modified
+from src.v1.routes.serializers import trusted_json_response
 
 router = APIRouter()
 LOGGER = logging.getLogger(__name__)
@@ -14,11 +16,21 @@ LOGGER = logging.getLogger(__name__)
 
 @router.get("/", response_model=List[alerts_models.Alert_Levels_Read])
 def read_alert_levels(
-    db: Session = Depends(session.get_db), skip: int = 0, limit: int = 100
+    db: Session = Depends(session.get_db),
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
+    if_none_match: str | None = Header(default=None),
 ) -> Any:
     """
-    Retrieve existing alert levels used to define individual alerts.
+    Retrieve existing alert levels used to define individual alerts.  Served
+    from the reference data cache, supports conditional requests using the
+    ETag / If-None-Match headers.
     """
-    alerts = crud_alerts.get_alert_levels(db)
-    LOGGER.info(f"alerts: {alerts}")
-    return alerts
+    reference_data = reference_cache.get(db)
+    etag = f'"{reference_data.alert_levels_digest}-{skip}-{limit}"'
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    alert_levels = reference_data.alert_levels[skip : skip + limit]
+    LOGGER.debug(f"alert levels: {alert_levels}")
+    # the cached rows are sent without being validated again
+    return trusted_json_response(alert_levels, headers={"ETag": etag})
@@ -1,57 +1,261 @@
+import datetime
 import logging
-from typing import Any, List
+from typing import Any, Callable, List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from pydantic import TypeAdapter
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from src.db import session
+from src.db import async_session, session
 from src.oidc import oidcAuthorize
-from src.v1.crud import crud_alerts, crud_cap
+from src.v1.crud import crud_alerts, crud_cap, crud_history, crud_read_model
 from src.v1.models import alerts as alerts_models
 from src.v1.models import auth_model
 from src.v1.models import cap as cap_models
+from src.v1.routes.conditional import etag_matches, not_modified
+from src.v1.routes.response_cache import alert_responses, json_response
+from src.v1.routes.serializers import (
+    alert_history_list_adapter,
+    cap_event_history_list_adapter,
+    trusted_json_response,
+    validated_json_response,
+)
 
 # from src.v1.repository.basin_repository import basinRepository
 router = APIRouter()
+# the alert list / alert read routes, main.py registers read_router, or
+# async_read_router when DB_ASYNC_ENABLED is set.  The write routes always
+# use the sync session.
+read_router = APIRouter()
+async_read_router = APIRouter()
 LOGGER = logging.getLogger(__name__)
 
 
+def unknown_reference_data_exception(
+    err: crud_alerts.UnknownReferenceDataError,
+) -> HTTPException:
+    """
+    :return: a 422 response that lists the basin names, subbasin names and
+        alert levels that could not be found
+    :rtype: HTTPException
+    """
+    return HTTPException(
+        status_code=422,
+        detail={
+            "message": "alert references unknown basins, subbasins or alert levels",
+            "unknown_basins": err.basin_names,
+            "unknown_subbasins": err.subbasin_names,
+            "unknown_alert_levels": err.alert_levels,
+        },
+    )
+
+
+def alert_not_found_exception(alert_id: int) -> HTTPException:
+    """
+    :return: a 404 response for an alert id that doesn't exist
+    :rtype: HTTPException
+    """
+    return HTTPException(status_code=404, detail=f"alert {alert_id} not found")
+
+
+def next_page(
+    read_models: List[alerts_models.Alert_Read_Model], limit: int
+) -> Response:
+    """
+    the alert list is retrieved with one more than the limit to determine if
+    there is a next page, when there is the extra alert is dropped and the
+    X-Next-Cursor header is set
+
+    :return: the serialized alerts for the current page, the read model
+        documents are already in the shape of the response model so they are
+        sent without being validated again
+    :rtype: Response
+    """
+    headers = {}
+    if len(read_models) > limit:
+        read_models = read_models[:limit]
+        headers["X-Next-Cursor"] = crud_alerts.encode_alert_cursor(read_models[-1])
+    LOGGER.debug(f"number of alerts: {len(read_models)}")
+    return trusted_json_response(
+        [read_model.alert for read_model in read_models], headers=headers
+    )
+
+
+def cached_alert_response(
+    kind: str,
+    alert_id: int,
+    alert_updated: datetime.datetime,
+    if_none_match: str | None,
+) -> Response | None:
+    """
+    :param kind: the read model column the response is rendered from, alert or
+        cap_events
+    :type kind: str
+    :return: a 304 if the client's copy is current, the cached body if the
+        response has already been rendered, otherwise None
+    :rtype: Response | None
+    """
+    etag = alert_responses.etag(kind, alert_id, alert_updated)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    body = alert_responses.get(kind, alert_id, alert_updated)
+    if body is not None:
+        return json_response(body, etag)
+    return None
+
+
+def render_alert_response(
+    kind: str, read_model: alerts_models.Alert_Read_Model
+) -> Response:
+    """
+    renders the response from the read model and caches it
+
+    :param kind: the read model column to render, alert or cap_events
+    :type kind: str
+    :return: the rendered response
+    :rtype: Response
+    """
+    alert_id, alert_updated = read_model.alert_id, read_model.alert_updated
+    body = alert_responses.put(
+        kind, alert_id, alert_updated, getattr(read_model, kind)
+    )
+    return json_response(body, alert_responses.etag(kind, alert_id, alert_updated))
+
+
 # get all the alerts
-@router.get("/", response_model=List[alerts_models.Alert_Basins])
+@read_router.get("/", response_model=List[alerts_models.Alert_Basins])
 def read_alerts(
-    db: Session = Depends(session.get_db), skip: int = 0, limit: int = 100
+    db: Session = Depends(session.get_db),
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: str | None = None,
+    alert_status: List[str] | None = Query(default=None),
+    basin: List[str] | None = Query(default=None),
+    alert_level: List[str] | None = Query(default=None),
+    updated_after: datetime.datetime | None = None,
+    updated_before: datetime.datetime | None = None,
 ) -> Any:
     """
-    Retrieve existing alerts.
+    Retrieve existing alerts, newest first.
+
+    Results are paginated, when more alerts exist the response includes an
+    X-Next-Cursor header.  Send its value back as the cursor parameter to
+    get the next page.  The filters can be repeated to match any of several
+    values, ex: ?basin=Skeena&basin=Liard
     """
     LOGGER.debug("incomming alert list request")
-    alerts = crud_alerts.get_alerts(db)
-    LOGGER.debug(f"alerts: {alerts}")
-    for alert in alerts:
-        LOGGER.info(f"alerts: {alert}")
-        LOGGER.info(f"alerts: {alert.alert_links}")
-        for alert_link in alert.alert_links:
-            LOGGER.debug(f"alerts: {alert_link.alert_level}")
-            LOGGER.debug(f"basin: {alert_link.basin}")
-    return alerts
+    # the alerts are read from the read model, already serialized with
+    # their basins / alert levels
+    try:
+        read_models = crud_read_model.get_alerts(
+            db,
+            limit=limit + 1,
+            cursor=cursor,
+            alert_status=alert_status,
+            basin_names=basin,
+            alert_levels=alert_level,
+            updated_after=updated_after,
+            updated_before=updated_before,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return next_page(read_models, limit)
 
 
 # get a specific alert
-@router.get("/{alert_id}", response_model=alerts_models.Alert_Basins)
+@read_router.get("/{alert_id}", response_model=alerts_models.Alert_Basins)
 def read_alert(
     alert_id: int,
     session: Session = Depends(session.get_db),
     skip: int = 0,
     limit: int = 100,
+    if_none_match: str | None = Header(default=None),
 ) -> Any:
     """
-    Retrieve a specific alert
+    Retrieve a specific alert.  Supports conditional requests using the
+    ETag / If-None-Match headers.
     """
     LOGGER.debug(f"alert_id: {alert_id}")
-    LOGGER.debug(f"session is type: {type(session)}")
-    alert = crud_alerts.get_alert(session, alert_id=alert_id)
-    LOGGER.debug(f"alert from DB: {alert}")
-    return alert
+    # only the alert's timestamp is read when the client's copy is current
+    # or the response is cached
+    alert_updated = crud_read_model.get_alert_updated(session, alert_id=alert_id)
+    if alert_updated is None:
+        raise alert_not_found_exception(alert_id)
+    response = cached_alert_response(
+        "alert", alert_id, alert_updated, if_none_match
+    )
+    if response is None:
+        read_model = crud_read_model.get_alert(session, alert_id=alert_id)
+        LOGGER.debug(f"alert from DB: {read_model}")
+        if read_model is None:
+            raise alert_not_found_exception(alert_id)
+        response = render_alert_response("alert", read_model)
+    return response
+
+
+@async_read_router.get("/", response_model=List[alerts_models.Alert_Basins])
+async def read_alerts_async(
+    db: AsyncSession = Depends(async_session.get_async_db),
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: str | None = None,
+    alert_status: List[str] | None = Query(default=None),
+    basin: List[str] | None = Query(default=None),
+    alert_level: List[str] | None = Query(default=None),
+    updated_after: datetime.datetime | None = None,
+    updated_before: datetime.datetime | None = None,
+) -> Any:
+    """
+    Retrieve existing alerts, newest first.
+
+    Results are paginated, when more alerts exist the response includes an
+    X-Next-Cursor header.  Send its value back as the cursor parameter to
+    get the next page.  The filters can be repeated to match any of several
+    values, ex: ?basin=Skeena&basin=Liard
+    """
+    try:
+        read_models = await crud_read_model.get_alerts_async(
+            db,
+            limit=limit + 1,
+            cursor=cursor,
+            alert_status=alert_status,
+            basin_names=basin,
+            alert_levels=alert_level,
+            updated_after=updated_after,
+            updated_before=updated_before,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return next_page(read_models, limit)
+
+
+@async_read_router.get("/{alert_id}", response_model=alerts_models.Alert_Basins)
+async def read_alert_async(
+    alert_id: int,
+    session: AsyncSession = Depends(async_session.get_async_db),
+    skip: int = 0,
+    limit: int = 100,
+    if_none_match: str | None = Header(default=None),
+) -> Any:
+    """
+    Retrieve a specific alert.  Supports conditional requests using the
+    ETag / If-None-Match headers.
+    """
+    alert_updated = await crud_read_model.get_alert_updated_async(
+        session, alert_id=alert_id
+    )
+    if alert_updated is None:
+        raise alert_not_found_exception(alert_id)
+    response = cached_alert_response(
+        "alert", alert_id, alert_updated, if_none_match
+    )
+    if response is None:
+        read_model = await crud_read_model.get_alert_async(
+            session, alert_id=alert_id
+        )
+        if read_model is None:
+            raise alert_not_found_exception(alert_id)
+        response = render_alert_response("alert", read_model)
+    return response
 
 
 # create an alert
@@ -67,11 +271,21 @@ def create_alert(
     token=Depends(oidcAuthorize.get_current_user),
 ):
     LOGGER.debug(f"token: {token}")
-    written_alert = crud_alerts.create_alert(session=session, alert=alert)
+    try:
+        alert = crud_alerts.expand_subbasin_links(session, alert)
+        alert = crud_alerts.expand_area_bboxes(session, alert)
+        written_alert = crud_alerts.create_alert(session=session, alert=alert)
+    except crud_alerts.UnknownReferenceDataError as err:
+        raise unknown_reference_data_exception(err)
     caps = crud_cap.create_cap_event(session=session, alert=written_alert)
     # not doing anything with the caps at this point
     LOGGER.debug(f"cap created from the alert: {caps}")
-    # session.commit()
+
+    # load the basins / alert levels for the response, then commit so the
+    # connection is released before the response is serialized
+    written_alert = crud_alerts.get_alert(session, alert_id=written_alert.alert_id)
+    session.commit()
+    alert_responses.invalidate(written_alert.alert_id)
     return written_alert
 
 
@@ -107,8 +321,20 @@ def update_alert(
     LOGGER.debug(f"token: {token}")
     LOGGER.debug(f"alertid: {alert_id}")
 
+    # resolve the basins / alert levels before anything is written
+    try:
+        alert = crud_alerts.expand_subbasin_links(session, alert)
+        alert = crud_alerts.expand_area_bboxes(session, alert)
+        basin_lookup, alert_level_lookup = crud_alerts.resolve_alert_links(
+            session, alert
+        )
+    except crud_alerts.UnknownReferenceDataError as err:
+        raise unknown_reference_data_exception(err)
+
     # get the alert from the database that is going to be updated
     current_status_alert = crud_alerts.get_alert(session, alert_id=alert_id)
+    if current_status_alert is None:
+        raise alert_not_found_exception(alert_id)
     LOGGER.debug(f"current description: {current_status_alert}")
     LOGGER.debug(f"incomming description: {alert.alert_description}")
 
@@ -117,7 +343,11 @@ def update_alert(
 
     # update the alert with the new data
     updated_alert = crud_alerts.update_alert(
-        session=session, alert_id=alert_id, updated_alert=alert
+        session=session,
+        alert_id=alert_id,
+        updated_alert=alert,
+        basin_lookup=basin_lookup,
+        alert_level_lookup=alert_level_lookup,
     )
     LOGGER.debug(f"updated_alert: {updated_alert}")
 
@@ -127,16 +357,20 @@ def update_alert(
     session.add(updated_alert)
     session.flush()
 
-    # record the current state of the cap events that are relted to the alert that
-    # is being updated.
-    crud_cap.record_history(session, updated_alert)
-
-    # update cap events.  This operation will break the caps into three categories
+    # record the current state of the cap events that are related to the alert
+    # that is being updated, then update the cap events.  The caps are broken
+    # into three categories
     #  - new caps (for the addition of a new alert level associated with the alert)
     #  - updated caps (existing alert levels with areas added or removed)
     #  - cancels (for alert levels that no longer have areas associated with them,
     #             OR if the alert itself has been set to 'CANCEL')
-    crud_cap.update_cap_event(session, updated_alert)
+    crud_cap.reconcile_caps(session, updated_alert)
+
+    # load the basins / alert levels for the response, then commit so the
+    # connection is released before the response is serialized
+    updated_alert = crud_alerts.get_alert(session, alert_id=alert_id)
+    session.commit()
+    alert_responses.invalidate(alert_id)
     return updated_alert
 
 
@@ -146,7 +380,114 @@ def get_caps_for_alert(
     session: Session = Depends(session.get_db),
     skip: int = 0,
     limit: int = 100,
+    if_none_match: str | None = Header(default=None),
 ):
+    """
+    Retrieve the cap events for an alert.  Supports conditional requests using
+    the ETag / If-None-Match headers.
+    """
     LOGGER.debug(f"alert_id: {alert_id}")
-    caps = crud_cap.get_cap_events_for_alert(session=session, alert_id=alert_id)
-    return caps
+    alert_updated = crud_read_model.get_alert_updated(session, alert_id=alert_id)
+    if alert_updated is None:
+        return []
+    response = cached_alert_response(
+        "cap_events", alert_id, alert_updated, if_none_match
+    )
+    if response is None:
+        read_model = crud_read_model.get_alert(session, alert_id=alert_id)
+        response = render_alert_response("cap_events", read_model)
+    return response
+
+
+def history_page(
+    adapter: TypeAdapter, records: list, limit: int, cursor_key: Callable
+) -> Response:
+    """
+    the history is retrieved with one more than the limit to determine if
+    there is a next page, when there is the extra snapshot is dropped and the
+    X-Next-Cursor header is set
+
+    :param adapter: the type adapter for the response model
+    :type adapter: TypeAdapter
+    :param records: the history snapshots
+    :type records: list
+    :param limit: the page size
+    :type limit: int
+    :param cursor_key: returns the created time / id of a snapshot
+    :type cursor_key: Callable
+    :rtype: Response
+    """
+    headers = {}
+    if len(records) > limit:
+        records = records[:limit]
+        headers["X-Next-Cursor"] = crud_history.encode_history_cursor(
+            *cursor_key(records[-1])
+        )
+    return validated_json_response(adapter, records, headers=headers)
+
+
+@router.get(
+    "/{alert_id}/history", response_model=List[alerts_models.Alert_History_Read]
+)
+def read_alert_history(
+    alert_id: int,
+    session: Session = Depends(session.get_db),
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: str | None = None,
+):
+    """
+    Retrieve the history of an alert, newest first.  Each snapshot is the
+    alert as it was before an update, with its basins and alert levels.
+
+    Results are paginated, when more snapshots exist the response includes an
+    X-Next-Cursor header.  Send its value back as the cursor parameter to get
+    the next page.
+    """
+    if crud_read_model.get_alert_updated(session, alert_id=alert_id) is None:
+        raise alert_not_found_exception(alert_id)
+    try:
+        history = crud_history.get_alert_history(
+            session, alert_id=alert_id, limit=limit + 1, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return history_page(
+        alert_history_list_adapter,
+        history,
+        limit,
+        lambda snapshot: (snapshot.alert_history_created, snapshot.alert_history_id),
+    )
+
+
+@router.get(
+    "/{alert_id}/caps/history",
+    response_model=List[cap_models.Cap_Event_History_Read],
+)
+def read_cap_history(
+    alert_id: int,
+    session: Session = Depends(session.get_db),
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: str | None = None,
+):
+    """
+    Retrieve the history of the cap events for an alert, newest first.  Each
+    snapshot is a cap event as it was before it was updated / cancelled, with
+    its basins.  Paginated the same way as the alert history.
+    """
+    if crud_read_model.get_alert_updated(session, alert_id=alert_id) is None:
+        raise alert_not_found_exception(alert_id)
+    try:
+        history = crud_history.get_cap_history(
+            session, alert_id=alert_id, limit=limit + 1, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return history_page(
+        cap_event_history_list_adapter,
+        history,
+        limit,
+        lambda snapshot: (
+            snapshot.cap_event_hist_created_date,
+            snapshot.cap_event_history_id,
+        ),
+    )
@@ -1,22 +1,120 @@
 import logging
 from typing import Any, List
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlmodel import Session
 
 import src.v1.models.alerts as alerts
 from src.db import session
+from src.v1.crud.geometry_cache import geometry_cache
+from src.v1.crud.reference_cache import reference_cache
+from src.v1.routes.conditional import etag_matches, not_modified
+from src.v1.routes.serializers import trusted_json_response
 
 router = APIRouter()
 LOGGER = logging.getLogger(__name__)
 
+GEOJSON_MEDIA_TYPE = "application/geo+json"
+
 
 @router.get("/", response_model=List[alerts.Basins])
 def read_basins(
-    db: Session = Depends(session.get_db), skip: int = 0, limit: int = 100
+    db: Session = Depends(session.get_db),
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
+    if_none_match: str | None = Header(default=None),
+) -> Any:
+    """
+    Retrieve basins.  Served from the reference data cache, supports
+    conditional requests using the ETag / If-None-Match headers.
+    """
+    reference_data = reference_cache.get(db)
+    etag = f'"{reference_data.basins_digest}-{skip}-{limit}"'
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    # the cached rows are sent without being validated again
+    return trusted_json_response(
+        reference_data.basins[skip : skip + limit], headers={"ETag": etag}
+    )
+
+
+def parse_bbox(bbox: str) -> tuple[float, float, float, float]:
+    """
+    :param bbox: a bounding box, "min lon,min lat,max lon,max lat"
+    :type bbox: str
+    :raises HTTPException: 400 if the bounding box isn't 4 numbers
+    :rtype: tuple[float, float, float, float]
+    """
+    try:
+        min_x, min_y, max_x, max_y = (float(value) for value in bbox.split(","))
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"invalid bbox: {bbox}, expected min_lon,min_lat,max_lon,max_lat",
+        )
+    return min_x, min_y, max_x, max_y
+
+
+@router.get("/lookup", response_model=List[alerts.BasinsRead])
+def lookup_basins(
+    db: Session = Depends(session.get_db),
+    lat: float | None = Query(default=None, ge=-90, le=90),
+    lon: float | None = Query(default=None, ge=-180, le=180),
+    bbox: str | None = None,
 ) -> Any:
     """
-    Retrieve basins.
+    Find the basins at a point (lat / lon) or that overlap a bounding box
+    (bbox=min_lon,min_lat,max_lon,max_lat).  Answered from the in memory
+    spatial index of the basin boundaries, basins without a boundary are
+    never returned.
+    """
+    geometries = geometry_cache.get(db)
+    if bbox is None and lat is not None and lon is not None:
+        basin_ids = geometries.basins_at_point(lon, lat)
+    elif bbox is not None and lat is None and lon is None:
+        basin_ids = geometries.basins_in_bbox(parse_bbox(bbox))
+    else:
+        raise HTTPException(
+            status_code=400, detail="specify either lat and lon, or bbox"
+        )
+    return trusted_json_response(
+        [
+            {"basin_id": basin_id, "basin_name": geometries.basin_names[basin_id]}
+            for basin_id in basin_ids
+        ]
+    )
+
+
+@router.get(
+    "/{basin_id}/geometry",
+    response_class=Response,
+    responses={200: {"content": {GEOJSON_MEDIA_TYPE: {}}}},
+)
+def read_basin_geometry(
+    basin_id: int,
+    db: Session = Depends(session.get_db),
+    tolerance: float | None = Query(default=None, ge=0),
+    if_none_match: str | None = Header(default=None),
+):
+    """
+    Retrieve the boundary of a basin as a GeoJSON feature.  The boundary is
+    pre-simplified, the largest of the available tolerances that is no more
+    than the requested tolerance (degrees) is returned, full resolution if the
+    tolerance is omitted.  The tolerance used is returned in the
+    X-Geometry-Tolerance header.  Supports conditional requests using the
+    ETag / If-None-Match headers.
     """
-    basins = db.exec(select(alerts.Basins)).all()
-    return basins
+    geometries = geometry_cache.get(db)
+    if basin_id not in geometries.geometries:
+        raise HTTPException(
+            status_code=404, detail=f"no boundary for the basin with id {basin_id}"
+        )
+    tolerance = geometries.resolve_tolerance(tolerance)
+    etag = f'"{geometries.digest}-{basin_id}-{tolerance}"'
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return Response(
+        content=geometries.geojson[(basin_id, tolerance)],
+        media_type=GEOJSON_MEDIA_TYPE,
+        headers={"ETag": etag, "X-Geometry-Tolerance": str(tolerance)},
+    )
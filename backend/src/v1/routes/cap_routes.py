@@ -1,24 +1,113 @@
 import logging
 from typing import Any, List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from src.db import session
+from src.db import async_session, session
 from src.v1.crud import crud_cap
+from src.v1.crud.geometry_cache import geometry_cache
 from src.v1.models import cap as cap_models
+from src.v1.renderers import cap_feed, cap_xml
+from src.v1.routes.conditional import etag_matches, not_modified
+from src.v1.routes.serializers import cap_event_list_adapter, validated_json_response
 
 router = APIRouter()
+# the cap event list route, main.py registers read_router, or async_read_router
+# when DB_ASYNC_ENABLED is set
+read_router = APIRouter()
+async_read_router = APIRouter()
 LOGGER = logging.getLogger(__name__)
 
-@router.get("/", response_model=List[cap_models.Cap_Event_And_Areas])
+
+@read_router.get("/", response_model=List[cap_models.Cap_Event_And_Areas])
 def get_caps(
-    db: Session = Depends(session.get_db), skip: int = 0, limit: int = 100
+    db: Session = Depends(session.get_db),
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
 ) -> Any:
     """
-    Retrieve existing alert levels used to define individual alerts.
+    Retrieve the cap events, newest first, with their alert level, status and
+    the basins they cover.
+    """
+    caps = crud_cap.get_cap_events(db, skip=skip, limit=limit)
+    LOGGER.debug(f"caps: {caps}")
+    return validated_json_response(cap_event_list_adapter, caps)
+
+
+@async_read_router.get("/", response_model=List[cap_models.Cap_Event_And_Areas])
+async def get_caps_async(
+    db: AsyncSession = Depends(async_session.get_async_db),
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
+) -> Any:
+    """
+    Retrieve the cap events, newest first, with their alert level, status and
+    the basins they cover.
+    """
+    caps = await crud_cap.get_cap_events_async(db, skip=skip, limit=limit)
+    LOGGER.debug(f"caps: {caps}")
+    return validated_json_response(cap_event_list_adapter, caps)
+
+
+@router.get(
+    "/feed",
+    response_class=Response,
+    responses={200: {"content": {cap_feed.ATOM_MEDIA_TYPE: {}}}},
+)
+def read_cap_feed(
+    db: Session = Depends(session.get_primary_db),
+    if_none_match: str | None = Header(default=None),
+):
+    """
+    Atom feed of the active cap events, with a link to the CAP 1.2 message of
+    each event.  Supports conditional requests using the ETag / If-None-Match
+    headers.
+    """
+    # pre-rendered, the database is only queried after cap events / alerts
+    # have been changed.  Refreshed from the primary, a replica that is behind
+    # would leave out the changes that marked the feed stale.
+    body, etag = cap_feed.cap_feed.get(db)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return Response(
+        content=body, media_type=cap_feed.ATOM_MEDIA_TYPE, headers={"ETag": etag}
+    )
+
+
+@router.get(
+    "/{cap_event_id}.xml",
+    response_class=Response,
+    responses={200: {"content": {cap_xml.CAP_MEDIA_TYPE: {}}}},
+)
+def read_cap_message(
+    cap_event_id: int,
+    db: Session = Depends(session.get_db),
+    if_none_match: str | None = Header(default=None),
+):
+    """
+    Retrieve the CAP 1.2 message for a cap event.  Supports conditional
+    requests using the ETag / If-None-Match headers.
     """
-    caps = crud_cap.get_cap_events(db)
-    LOGGER.info(f"caps: {caps}")
-    return caps
+    # the message is identified by when the cap event / alert were last
+    # updated and by the boundaries, a cached or unchanged message is returned
+    # without loading them
+    version = crud_cap.get_cap_event_version(db, cap_event_id)
+    if version is None:
+        raise HTTPException(
+            status_code=404, detail=f"cap event with id {cap_event_id} not found"
+        )
+    geometry_digest = geometry_cache.get(db).digest
+    etag = f'"{cap_xml.document_key(*version, geometry_digest)}"'
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
 
+    [(key, body)] = cap_xml.render_cap_messages(db, [version])
+    # keyed by the boundaries render_cap_messages used, in case they were
+    # reloaded after the etag was checked
+    return Response(
+        content=body,
+        media_type=cap_xml.CAP_MEDIA_TYPE,
+        headers={"ETag": f'"{key}"'},
+    )
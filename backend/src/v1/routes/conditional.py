@@ -0,0 +1,44 @@
+import logging
+
+from fastapi import Response
+
+LOGGER = logging.getLogger(__name__)
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    compares the value of an If-None-Match request header with the current
+    etag of a resource, using the weak comparison that RFC 9110 requires for
+    If-None-Match.
+
+    :param if_none_match: the value of the If-None-Match header
+    :type if_none_match: str | None
+    :param etag: the current etag of the resource (quoted)
+    :type etag: str
+    :return: True if the client's copy is current and a 304 can be returned
+    :rtype: bool
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    etag = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        if candidate.strip().removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str, cache_control: str | None = None) -> Response:
+    """
+    :param etag: the etag of the resource
+    :type etag: str
+    :param cache_control: optional Cache-Control header value
+    :type cache_control: str, optional
+    :return: an empty 304 response
+    :rtype: Response
+    """
+    headers = {"ETag": etag}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return Response(status_code=304, headers=headers)
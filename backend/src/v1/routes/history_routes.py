@@ -0,0 +1,147 @@
+import csv
+import datetime
+import io
+import logging
+from enum import Enum
+from typing import Callable, Generator
+
+import orjson
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+from sqlmodel import Session
+
+from src.db import session
+from src.v1.crud import crud_history
+
+router = APIRouter()
+LOGGER = logging.getLogger(__name__)
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+
+def ndjson_lines(rows) -> Generator[bytes, None, None]:
+    """
+    :param rows: the history rows, mappings of column name to value
+    :yield: each row as a line of json
+    :rtype: Generator[bytes, None, None]
+    """
+    for row in rows:
+        yield orjson.dumps(dict(row)) + b"\n"
+
+
+def csv_lines(
+    rows, batch_size: int = crud_history.EXPORT_BATCH_SIZE
+) -> Generator[str, None, None]:
+    """
+    :param rows: the history rows, mappings of column name to value
+    :param batch_size: number of rows written to each chunk of the response
+    :type batch_size: int
+    :yield: chunks of csv, the first with the header row
+    :rtype: Generator[str, None, None]
+    """
+    buffer = io.StringIO()
+    writer = None
+    for count, row in enumerate(rows, start=1):
+        if writer is None:
+            writer = csv.writer(buffer)
+            writer.writerow(row.keys())
+        writer.writerow(
+            value.isoformat() if isinstance(value, datetime.datetime) else value
+            for value in row.values()
+        )
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_history(
+    db_engine, query: Select, export_format: ExportFormat, file_name: str
+) -> StreamingResponse:
+    """
+    streams the rows returned by an export query, the rows are read from the
+    database in batches as the response is sent so the memory used doesn't
+    depend on the number of rows
+
+    :param db_engine: the engine to read the history with, the session used
+        for the export is opened / closed as the response is streamed
+    :type db_engine: sqlalchemy.Engine
+    :param query: one of the crud_history export queries
+    :type query: Select
+    :param export_format: the format of the file
+    :type export_format: ExportFormat
+    :param file_name: name of the file, without the extension
+    :type file_name: str
+    :rtype: StreamingResponse
+    """
+    serialize: Callable = (
+        csv_lines if export_format == ExportFormat.csv else ndjson_lines
+    )
+
+    def content():
+        with Session(db_engine) as db:
+            yield from serialize(crud_history.stream_history(db, query))
+
+    return StreamingResponse(
+        content(),
+        media_type=MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="{file_name}.{export_format.value}"'
+            )
+        },
+    )
+
+
+@router.get("/alerts", response_class=StreamingResponse)
+def export_alert_history(
+    db_engine=Depends(session.get_read_engine),
+    export_format: ExportFormat = Query(default=ExportFormat.ndjson, alias="format"),
+    alert_id: int | None = None,
+    created_after: datetime.datetime | None = None,
+    created_before: datetime.datetime | None = None,
+):
+    """
+    Export the alert history, one record per history snapshot / basin with the
+    basin's alert level, as newline delimited json or csv.  The history can be
+    limited to a single alert, and to when the snapshots were created.
+    """
+    query = crud_history.build_alert_history_export_query(
+        alert_id=alert_id,
+        created_after=created_after,
+        created_before=created_before,
+    )
+    return export_history(db_engine, query, export_format, "alert_history")
+
+
+@router.get("/caps", response_class=StreamingResponse)
+def export_cap_history(
+    db_engine=Depends(session.get_read_engine),
+    export_format: ExportFormat = Query(default=ExportFormat.ndjson, alias="format"),
+    alert_id: int | None = None,
+    created_after: datetime.datetime | None = None,
+    created_before: datetime.datetime | None = None,
+):
+    """
+    Export the cap event history, one record per history snapshot / basin, as
+    newline delimited json or csv.  The history can be limited to the cap
+    events of a single alert, and to when the snapshots were created.
+    """
+    query = crud_history.build_cap_history_export_query(
+        alert_id=alert_id,
+        created_after=created_after,
+        created_before=created_before,
+    )
+    return export_history(db_engine, query, export_format, "cap_event_history")
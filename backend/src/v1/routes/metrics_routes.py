@@ -0,0 +1,69 @@
+import logging
+from typing import Any, List
+
+from fastapi import APIRouter, Depends
+
+from src.db import metrics
+from src.oidc import oidcAuthorize
+from src.v1.renderers.cap_feed import cap_feed
+from src.v1.renderers.cap_xml import cap_documents
+from src.v1.routes.response_cache import alert_responses
+
+router = APIRouter()
+LOGGER = logging.getLogger(__name__)
+
+
+@router.get("/db_pool", response_model=List[dict])
+def read_db_pool_metrics(
+    is_authorized: bool = Depends(oidcAuthorize.authorize),
+) -> Any:
+    """
+    Connection pool metrics for this replica, one entry for each database
+    engine (sync, and async when DB_ASYNC_ENABLED is set).  Used to size the
+    DB_POOL_SIZE / DB_MAX_OVERFLOW settings.
+    """
+    return [pool.stats() for pool in metrics.pool_metrics.values()]
+
+
+@router.get("/transactions", response_model=List[dict])
+def read_transaction_metrics(
+    is_authorized: bool = Depends(oidcAuthorize.authorize),
+) -> Any:
+    """
+    Number of request transactions, how many were rolled back and how long
+    they took, for each route that uses the database session.
+    """
+    return metrics.transaction_metrics.stats()
+
+
+@router.get("/response_cache", response_model=dict)
+def read_response_cache_metrics(
+    is_authorized: bool = Depends(oidcAuthorize.authorize),
+) -> Any:
+    """
+    Size and hit / miss counts of the cache of rendered alert / cap event
+    responses for this replica.
+    """
+    return alert_responses.stats()
+
+
+@router.get("/cap_documents", response_model=dict)
+def read_cap_document_cache_metrics(
+    is_authorized: bool = Depends(oidcAuthorize.authorize),
+) -> Any:
+    """
+    Size and hit / miss counts of the cache of rendered CAP messages for this
+    replica.
+    """
+    return cap_documents.stats()
+
+
+@router.get("/cap_feed", response_model=dict)
+def read_cap_feed_metrics(
+    is_authorized: bool = Depends(oidcAuthorize.authorize),
+) -> Any:
+    """
+    Number of entries in the pre-rendered cap feed for this replica, and how
+    often it has been checked against the database / rebuilt.
+    """
+    return cap_feed.stats()
@@ -0,0 +1,145 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import orjson
+from fastapi import Response
+
+from src.core.config import Configuration
+
+LOGGER = logging.getLogger(__name__)
+
+
+class AlertResponseCache:
+    """
+    A bounded, thread safe, least recently used cache of the json response
+    bodies for an alert (GET /alerts/{alert_id}) and its cap events
+    (GET /alerts/{alert_id}/caps), rendered once with orjson.
+
+    An entry is only used while the alert's alert_updated is the same as when
+    it was rendered.  Every edit of an alert / its cap events updates
+    alert_updated, so entries rendered by another replica's writes are never
+    served stale.  The write routes also invalidate the entries for the alert
+    they've changed so they don't take up space.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        """
+        :param maxsize: the maximum number of responses to cache, 0 disables
+            the cache
+        :type maxsize: int
+        """
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def etag(kind: str, alert_id: int, alert_updated: datetime) -> str:
+        """
+        :param kind: the response, alert or caps
+        :type kind: str
+        :param alert_id: the id of the alert
+        :type alert_id: int
+        :param alert_updated: when the alert was last updated
+        :type alert_updated: datetime
+        :return: the etag for the response (quoted), calculated without
+            rendering it so a 304 can be returned without reading the alert
+        :rtype: str
+        """
+        version = f"{kind}:{alert_id}:{alert_updated.isoformat()}"
+        return f'"{hashlib.sha256(version.encode("utf-8")).hexdigest()[:32]}"'
+
+    def get(self, kind: str, alert_id: int, alert_updated: datetime) -> bytes | None:
+        """
+        :return: the rendered response body, or None if it isn't cached or was
+            rendered for a different alert_updated
+        :rtype: bytes | None
+        """
+        if not self.maxsize:
+            return None
+        key = (kind, alert_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != alert_updated:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(
+        self, kind: str, alert_id: int, alert_updated: datetime, content
+    ) -> bytes:
+        """
+        renders the content and adds it to the cache
+
+        :param content: the json serializable response content
+        :return: the rendered response body
+        :rtype: bytes
+        """
+        body = orjson.dumps(content)
+        if not self.maxsize:
+            return body
+        key = (kind, alert_id)
+        with self._lock:
+            self._entries[key] = (alert_updated, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return body
+
+    def invalidate(self, alert_id: int):
+        """
+        removes the responses for an alert that has been created / updated
+
+        :param alert_id: the id of the alert
+        :type alert_id: int
+        """
+        with self._lock:
+            stale = [key for key in self._entries if key[1] == alert_id]
+            for key in stale:
+                del self._entries[key]
+        LOGGER.debug(f"invalidated {len(stale)} responses for alert {alert_id}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        :return: the size of the cache and the hit / miss / eviction counters
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def json_response(body: bytes, etag: str) -> Response:
+    """
+    :param body: a rendered json body
+    :type body: bytes
+    :param etag: the etag of the body
+    :type etag: str
+    :return: a 200 response that sends the body as is, without validating /
+        serializing it again
+    :rtype: Response
+    """
+    return Response(
+        content=body, media_type="application/json", headers={"ETag": etag}
+    )
+
+
+alert_responses = AlertResponseCache(maxsize=Configuration.ALERT_RESPONSE_CACHE_SIZE)
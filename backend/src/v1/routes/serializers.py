@@ -0,0 +1,64 @@
+"""
+Fast paths for rendering the list responses.
+
+When a route returns records, FastAPI validates them against the
+response_model, dumps the validated models back to python objects and then
+encodes those to json, walking the data three times.  The routes below return
+a Response directly instead, which FastAPI sends as is:
+
+    * trusted_json_response - data that was already produced by the response
+      model (alert read model documents, cached reference data) is encoded
+      with orjson without being validated again
+    * validated_json_response - orm records are validated once, with a
+      TypeAdapter built at import, and dumped straight to json bytes by
+      pydantic
+
+The routes keep their response_model, it's still used for the OpenAPI schema.
+See benchmarks/bench_serialization.py for the difference.
+"""
+
+import logging
+from typing import Any, List
+
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+
+from src.v1.models import alerts as alerts_models
+from src.v1.models import cap as cap_models
+
+LOGGER = logging.getLogger(__name__)
+
+alert_list_adapter = TypeAdapter(List[alerts_models.Alert_Basins])
+cap_event_list_adapter = TypeAdapter(List[cap_models.Cap_Event_And_Areas])
+alert_history_list_adapter = TypeAdapter(List[alerts_models.Alert_History_Read])
+cap_event_history_list_adapter = TypeAdapter(List[cap_models.Cap_Event_History_Read])
+
+
+def trusted_json_response(content: Any, headers: dict | None = None) -> Response:
+    """
+    :param content: json serializable content that already matches the
+        route's response model
+    :param headers: additional response headers
+    :type headers: dict, optional
+    :return: the content encoded with orjson
+    :rtype: Response
+    """
+    return ORJSONResponse(content, headers=headers)
+
+
+def validated_json_response(
+    adapter: TypeAdapter, records: Any, headers: dict | None = None
+) -> Response:
+    """
+    :param adapter: the type adapter for the route's response model
+    :type adapter: TypeAdapter
+    :param records: the orm records returned by the crud functions, their
+        relationships should be eagerly loaded
+    :param headers: additional response headers
+    :type headers: dict, optional
+    :return: the records validated by the adapter and encoded as json
+    :rtype: Response
+    """
+    body = adapter.dump_json(adapter.validate_python(records, from_attributes=True))
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,86 @@
+import logging
+from typing import Any, List
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlmodel import Session
+
+from src.db import session
+from src.v1.crud.hierarchy_cache import hierarchy_cache
+from src.v1.routes.conditional import etag_matches, not_modified
+from src.v1.routes.serializers import trusted_json_response
+
+router = APIRouter()
+LOGGER = logging.getLogger(__name__)
+
+
+@router.get("/")
+def read_subbasins(
+    db: Session = Depends(session.get_db),
+    if_none_match: str | None = Header(default=None),
+) -> Any:
+    """
+    Retrieve the subbasin hierarchy, every subbasin with its parent and the
+    ids of all the basins below it.  Served from the hierarchy cache, supports
+    conditional requests using the ETag / If-None-Match headers.
+    """
+    hierarchy = hierarchy_cache.get(db)
+    etag = f'"{hierarchy.digest}"'
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return trusted_json_response(
+        [
+            {
+                **subbasin,
+                "basin_ids": hierarchy.expand([subbasin["subbasin_id"]]),
+            }
+            for subbasin in hierarchy.subbasins
+        ],
+        headers={"ETag": etag},
+    )
+
+
+@router.get("/rollup")
+def rollup_basins(
+    db: Session = Depends(session.get_db),
+    basin_id: List[int] = Query(default=[]),
+) -> Any:
+    """
+    Roll basins up to the largest subbasins whose basins are all in the list,
+    returns those subbasins and the basins that aren't in one of them.
+    """
+    hierarchy = hierarchy_cache.get(db)
+    subbasin_ids, basin_ids = hierarchy.roll_up(basin_id)
+    return trusted_json_response(
+        {
+            "subbasins": [
+                {
+                    "subbasin_id": subbasin_id,
+                    "sub_basin_name": hierarchy.subbasin_id_to_name[subbasin_id],
+                }
+                for subbasin_id in subbasin_ids
+            ],
+            "basin_ids": basin_ids,
+        }
+    )
+
+
+@router.get("/{subbasin_id}/basins")
+def read_subbasin_basins(
+    subbasin_id: int,
+    db: Session = Depends(session.get_db),
+) -> Any:
+    """
+    Retrieve all the basins in a subbasin, including the basins of the
+    subbasins nested inside it.
+    """
+    hierarchy = hierarchy_cache.get(db)
+    if subbasin_id not in hierarchy.subbasin_id_to_name:
+        raise HTTPException(
+            status_code=404, detail=f"subbasin {subbasin_id} not found"
+        )
+    return trusted_json_response(
+        [
+            {"basin_id": basin_id, "basin_name": hierarchy.basin_names[basin_id]}
+            for basin_id in hierarchy.expand([subbasin_id])
+        ]
+    )
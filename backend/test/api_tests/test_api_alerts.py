@@ -1,3 +1,4 @@
+import copy
 import datetime
 import json
 import logging
@@ -16,6 +17,7 @@ from src.core.config import Configuration
 from src.types import AlertDataDict
 from src.v1.models import alerts as alert_model
 from src.v1.models import cap as cap_models
+from src.v1.routes.response_cache import alert_responses
 
 LOGGER = logging.getLogger(__name__)
 
@@ -61,6 +63,106 @@ def test_get_alerts(db_with_alert, test_client_fixture, alert_dict):
     assert len(alert_dict["alert_links"]) == len(alert_record["alert_links"])
 
 
+def test_get_alerts_query_count(db_with_alert, test_client_fixture):
+    """
+    the alert list endpoint should issue a fixed number of queries, no matter
+    how many alerts / alert areas are in the database
+    """
+    client = test_client_fixture
+    prefix = Configuration.API_V1_STR
+    session = db_with_alert
+
+    def count_queries():
+        session.expire_all()
+        with db_helpers.QueryCounter(session.get_bind()) as counter:
+            response = client.get(f"{prefix}/alerts/")
+        assert response.status_code == 200
+        return counter.count
+
+    query_count_before = count_queries()
+
+    for basin_names in [["Liard", "Peace", "Stikine"], ["Skagit"]]:
+        alert = alert_helpers.create_fake_alert(
+            [
+                {"alert_level": "Flood Warning", "basin_names": basin_names},
+                {"alert_level": "Flood Watch", "basin_names": ["Okanagan"]},
+            ]
+        )
+        crud_alerts.create_alert(session=session, alert=alert)
+    session.flush()
+
+    assert count_queries() == query_count_before
+
+
+def test_get_alerts_pagination_and_filters(db_test_connection, test_client_fixture):
+    """
+    pages through the alert list using the cursor, and verifies the server side
+    filters
+    """
+    client = test_client_fixture
+    prefix = Configuration.API_V1_STR
+    session = db_test_connection
+    created_after = datetime.datetime.utcnow()
+
+    alert_specs = [
+        ("active", "Flood Watch", ["Skagit", "Liard"]),
+        ("active", "Flood Warning", ["Peace"]),
+        ("cancelled", "Flood Watch", ["Skagit"]),
+        ("active", "High Streamflow Advisory", ["Okanagan"]),
+        ("active", "Flood Warning", ["Skagit", "Boundary"]),
+    ]
+    created_ids = []
+    for alert_status, alert_level, basin_names in alert_specs:
+        alert = alert_helpers.create_fake_alert(
+            [{"alert_level": alert_level, "basin_names": basin_names}]
+        )
+        alert.alert_status = alert_status
+        alert_db = crud_alerts.create_alert(session=session, alert=alert)
+        created_ids.append(alert_db.alert_id)
+    session.commit()
+
+    # page through the alerts 2 at a time
+    params = {"limit": 2, "updated_after": created_after.isoformat()}
+    pages = []
+    while True:
+        response = client.get(f"{prefix}/alerts/", params=params)
+        assert response.status_code == 200
+        pages.append([alert["alert_id"] for alert in response.json()])
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if not next_cursor:
+            break
+        params["cursor"] = next_cursor
+    LOGGER.debug(f"pages: {pages}")
+    assert [len(page) for page in pages] == [2, 2, 1]
+    paged_ids = [alert_id for page in pages for alert_id in page]
+    assert sorted(paged_ids) == sorted(created_ids)
+    # newest first
+    assert paged_ids == sorted(created_ids, reverse=True)
+
+    def get_ids(**filters):
+        filters["updated_after"] = created_after.isoformat()
+        response = client.get(f"{prefix}/alerts/", params=filters)
+        assert response.status_code == 200
+        return sorted([alert["alert_id"] for alert in response.json()])
+
+    assert get_ids(basin="Skagit") == sorted(
+        [created_ids[0], created_ids[2], created_ids[4]]
+    )
+    assert get_ids(basin=["Peace", "Okanagan"]) == sorted(
+        [created_ids[1], created_ids[3]]
+    )
+    assert get_ids(alert_level="Flood Warning") == sorted(
+        [created_ids[1], created_ids[4]]
+    )
+    assert get_ids(alert_status="cancelled") == [created_ids[2]]
+    assert get_ids(alert_status="active", basin="Skagit", alert_level="Flood Watch") == [
+        created_ids[0]
+    ]
+
+    response = client.get(f"{prefix}/alerts/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
 def test_alert(test_client_fixture, db_with_alert, alert_dict):
     client = test_client_fixture
 
@@ -111,6 +213,33 @@ def test_alert_post(test_client_fixture, alert_dict):
     # TODO: assert the data created is the same as the data sent
 
 
+def test_alert_post_unknown_basin(test_client_fixture, alert_dict):
+    """
+    posting an alert that references a basin that doesn't exist should be
+    rejected with a 422 that lists the unknown basin
+    """
+    client = test_client_fixture
+    prefix = Configuration.API_V1_STR
+
+    alert_dict = copy.deepcopy(alert_dict)
+    alert_dict["alert_links"][0]["basin"]["basin_name"] = "Not A Basin"
+    response = client.post(f"{prefix}/alerts/", json=alert_dict)
+    LOGGER.debug(f"response: {response.json()}")
+    assert response.status_code == 422
+    assert response.json()["detail"]["unknown_basins"] == ["Not A Basin"]
+    assert response.json()["detail"]["unknown_alert_levels"] == []
+
+
+def test_alert_not_found(test_client_fixture, alert_dict):
+    client = test_client_fixture
+    prefix = Configuration.API_V1_STR
+
+    response = client.get(f"{prefix}/alerts/999999")
+    assert response.status_code == 404
+    response = client.patch(f"{prefix}/alerts/999999/", json=alert_dict)
+    assert response.status_code == 404
+
+
 def test_alert_patch(test_client_fixture, alert_dict, db_with_alert, mock_access_token):
     """
     The fixture db_with_alert ensure that the database includes the alert that
@@ -238,6 +367,78 @@ def test_get_alert_levels(
         assert alert_level["alert_level"] in alert_level_strs
 
 
+@pytest.mark.parametrize("path", ["basins", "alert_levels"])
+def test_reference_data_etag(test_client_fixture, db_test_connection, path):
+    """
+    the reference data end points should return an etag, and a 304 without a
+    body when the client's copy is current
+    """
+    client = test_client_fixture
+    prefix = Configuration.API_V1_STR
+    response = client.get(f"{prefix}/{path}/")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert len(response.json()) > 0
+
+    with db_helpers.QueryCounter(db_test_connection.get_bind()) as counter:
+        response = client.get(f"{prefix}/{path}/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert counter.count == 0
+
+    # different page is a different representation
+    response = client.get(
+        f"{prefix}/{path}/", params={"limit": 1}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.parametrize("path", ["", "/caps"])
+def test_alert_response_cache(
+    test_client_fixture, db_with_alert, alert_dict, mock_access_token, path
+):
+    """
+    the alert / cap event responses are rendered once and cached, return an
+    etag, and a 304 when the client's copy is current.  Editing the alert
+    changes the etag.
+    """
+    client = test_client_fixture
+    prefix = Configuration.API_V1_STR
+    alert_id = client.get(f"{prefix}/alerts/").json()[0]["alert_id"]
+    endpoint_path = f"{prefix}/alerts/{alert_id}{path}"
+
+    response = client.get(endpoint_path)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    body = response.json()
+
+    hits = alert_responses.stats()["hits"]
+    response = client.get(endpoint_path)
+    assert response.json() == body
+    assert response.headers["ETag"] == etag
+    assert alert_responses.stats()["hits"] == hits + 1
+
+    # only the alert's timestamp is read to answer a conditional request
+    with db_helpers.QueryCounter(db_with_alert.get_bind()) as counter:
+        response = client.get(endpoint_path, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert counter.count == 1
+
+    alert_dict["alert_description"] = "testing the response cache"
+    alert_dict["author_name"] = mock_access_token["display_name"]
+    alert_dict["alert_links"] = alert_dict["alert_links"][1:]
+    response = client.patch(f"{prefix}/alerts/{alert_id}/", json=alert_dict)
+    assert response.status_code == 200
+
+    response = client.get(endpoint_path, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json() != body
+
+
 @pytest.mark.parametrize(
     "existing_alert_list",
     [
@@ -748,3 +949,87 @@ def test_alert_update_cap_history(
             cleanup.cleanup(alert_id=written_original_alert["alert_id"])
 
             session.commit()
+
+
+def test_alert_history_timeline(test_client_fixture: fastapi.testclient):
+    client = test_client_fixture
+    prefix = Configuration.API_V1_STR
+    versions = [
+        [{"alert_level": "High Streamflow Advisory", "basin_names": ["Skeena"]}],
+        [
+            {"alert_level": "High Streamflow Advisory", "basin_names": ["Skeena"]},
+            {"alert_level": "Flood Watch", "basin_names": ["Stikine"]},
+        ],
+        [{"alert_level": "Flood Warning", "basin_names": ["Stikine", "Liard"]}],
+    ]
+    response = client.post(
+        f"{prefix}/alerts/",
+        json=alert_helpers.create_fake_alert(versions[0]).model_dump(),
+    )
+    assert response.status_code == 201
+    alert_id = response.json()["alert_id"]
+
+    response = client.get(f"{prefix}/alerts/{alert_id}/history")
+    assert response.status_code == 200
+    assert response.json() == []
+
+    # each update writes a snapshot of the alert as it was before the update
+    for version in versions[1:]:
+        update = alert_helpers.create_update_model(alert_list=version)
+        response = client.patch(f"{prefix}/alerts/{alert_id}/", json=update.model_dump())
+        assert response.status_code == 200
+
+    snapshots = []
+    cursor = None
+    while True:
+        params = {"limit": 1}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(f"{prefix}/alerts/{alert_id}/history", params=params)
+        assert response.status_code == 200
+        assert len(response.json()) == 1
+        snapshots.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    # newest first, the snapshot before the last update is the second version
+    assert len(snapshots) == 2
+    for snapshot, version in zip(snapshots, reversed(versions[:2])):
+        assert snapshot["alert_id"] == alert_id
+        assert sorted(
+            (link["alert_levels"]["alert_level"], link["basins"]["basin_name"])
+            for link in snapshot["alert_history_links"]
+        ) == sorted(
+            (alert_level["alert_level"], basin_name)
+            for alert_level in version
+            for basin_name in alert_level["basin_names"]
+        )
+
+    # the last update cancelled both cap events of the second version
+    response = client.get(f"{prefix}/alerts/{alert_id}/caps/history")
+    assert response.status_code == 200
+    cap_snapshots = response.json()
+    assert cap_snapshots
+    created = [snapshot["cap_event_hist_created_date"] for snapshot in cap_snapshots]
+    assert created == sorted(created, reverse=True)
+    for snapshot in cap_snapshots:
+        assert snapshot["alert_id"] == alert_id
+        assert snapshot["cap_event_status"]["cap_event_status"]
+        assert snapshot["cap_event_areas_hist"]
+        assert all(
+            area["basins"]["basin_name"] for area in snapshot["cap_event_areas_hist"]
+        )
+
+
+@pytest.mark.parametrize("path", ["history", "caps/history"])
+def test_alert_history_errors(db_with_alert, test_client_fixture, path):
+    prefix = Configuration.API_V1_STR
+    response = test_client_fixture.get(f"{prefix}/alerts/999999/{path}")
+    assert response.status_code == 404
+
+    alert_id = test_client_fixture.get(f"{prefix}/alerts/").json()[0]["alert_id"]
+    response = test_client_fixture.get(
+        f"{prefix}/alerts/{alert_id}/{path}", params={"cursor": "not a cursor"}
+    )
+    assert response.status_code == 400
@@ -0,0 +1,76 @@
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from helpers.db_helpers import create_async_test_engine
+from src.db import async_session
+from src.v1.crud.reference_cache import reference_cache
+from src.v1.routes import alert_routes, cap_routes
+
+pytest.importorskip("aiosqlite")
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+
+LOGGER = logging.getLogger(__name__)
+
+
+@pytest.fixture(scope="function")
+def async_routes_client(basin_data, alert_level_data):
+    """
+    an app with the alert / cap read routes registered as they are when
+    DB_ASYNC_ENABLED is set, backed by an in memory aiosqlite database
+    """
+    app = FastAPI()
+    app.include_router(alert_routes.async_read_router, prefix="/alerts")
+    app.include_router(cap_routes.async_read_router, prefix="/cap")
+
+    # the database is created by the first request, it has to be created in
+    # the event loop that the test client runs the app in
+    test_db = {}
+
+    async def get_async_db():
+        if "engine" not in test_db:
+            test_db["engine"], test_db["alert_id"] = await create_async_test_engine(
+                basin_data,
+                alert_level_data,
+                [{"alert_level": "Flood Watch", "basin_names": ["Skeena", "Peace"]}],
+            )
+        async with AsyncSession(test_db["engine"]) as session:
+            yield session
+
+    app.dependency_overrides[async_session.get_async_db] = get_async_db
+    with TestClient(app) as client:
+        yield client, test_db
+
+    reference_cache.invalidate()
+
+
+def test_async_read_routes(async_routes_client):
+    client, test_db = async_routes_client
+
+    response = client.get("/alerts/", params={"basin": "Peace"})
+    assert response.status_code == 200
+    alerts = response.json()
+    assert [alert["alert_id"] for alert in alerts] == [test_db["alert_id"]]
+    assert sorted(
+        alert_link["basin"]["basin_name"] for alert_link in alerts[0]["alert_links"]
+    ) == ["Peace", "Skeena"]
+
+    response = client.get(f"/alerts/{test_db['alert_id']}")
+    assert response.status_code == 200
+    assert response.json()["alert_id"] == test_db["alert_id"]
+    response = client.get(
+        f"/alerts/{test_db['alert_id']}",
+        headers={"If-None-Match": response.headers["ETag"]},
+    )
+    assert response.status_code == 304
+
+    response = client.get("/alerts/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+    response = client.get("/cap/")
+    assert response.status_code == 200
+    caps = response.json()
+    assert len(caps) == 1
+    assert caps[0]["alert_level"]["alert_level"] == "Flood Watch"
+    assert len(caps[0]["event_areas"]) == 2
@@ -0,0 +1,80 @@
+import copy
+import logging
+
+import orjson
+from fixtures.geometry_fixtures import boundary_centre
+from src.core.config import Configuration
+from src.v1.crud.geometry_cache import geometry_cache
+
+LOGGER = logging.getLogger(__name__)
+
+
+def test_get_basin_geometry(test_client_with_basin_geometry):
+    client, session = test_client_with_basin_geometry
+    prefix = Configuration.API_V1_STR
+    geometries = geometry_cache.get(session)
+    basin_id = next(iter(geometries.geometries))
+
+    response = client.get(f"{prefix}/basins/{basin_id}/geometry")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/geo+json"
+    assert float(response.headers["X-Geometry-Tolerance"]) == 0
+    feature = orjson.loads(response.content)
+    assert feature["type"] == "Feature"
+    assert feature["properties"]["basin_id"] == basin_id
+    assert feature["properties"]["basin_name"] == geometries.basin_names[basin_id]
+    full_resolution = len(feature["geometry"]["coordinates"][0])
+
+    # a tolerance between the pre-simplified tolerances is rounded down
+    tolerance = max(Configuration.BASIN_GEOMETRY_TOLERANCES)
+    response = client.get(
+        f"{prefix}/basins/{basin_id}/geometry", params={"tolerance": tolerance * 1.5}
+    )
+    assert float(response.headers["X-Geometry-Tolerance"]) == tolerance
+    feature = orjson.loads(response.content)
+    assert len(feature["geometry"]["coordinates"][0]) < full_resolution
+
+    etag = response.headers["ETag"]
+    response = client.get(
+        f"{prefix}/basins/{basin_id}/geometry",
+        params={"tolerance": tolerance},
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 304
+
+    response = client.get(f"{prefix}/basins/999999/geometry")
+    assert response.status_code == 404
+
+
+def test_lookup_basins(test_client_with_basin_geometry, basin_data, alert_dict):
+    client, session = test_client_with_basin_geometry
+    prefix = Configuration.API_V1_STR
+    lon, lat = boundary_centre(0)
+    next_lon, next_lat = boundary_centre(1)
+    first, second = (basin["basin_name"] for basin in basin_data[:2])
+
+    response = client.get(f"{prefix}/basins/lookup", params={"lat": lat, "lon": lon})
+    assert response.status_code == 200
+    assert [basin["basin_name"] for basin in response.json()] == [first]
+
+    bbox = f"{lon},{lat - 0.1},{next_lon},{lat + 0.1}"
+    response = client.get(f"{prefix}/basins/lookup", params={"bbox": bbox})
+    assert [basin["basin_name"] for basin in response.json()] == [first, second]
+
+    for params in [{"lat": lat}, {"bbox": bbox, "lat": lat}, {"bbox": "1,2,3"}]:
+        response = client.get(f"{prefix}/basins/lookup", params=params)
+        assert response.status_code == 400
+
+    # the alert's bounding box is expanded into alert links
+    alert_dict = copy.deepcopy(alert_dict)
+    alert_dict["alert_area_bboxes"] = [
+        {
+            "bbox": [lon, lat - 0.1, next_lon, lat + 0.1],
+            "alert_level": {"alert_level": "Flood Watch"},
+        }
+    ]
+    response = client.post(f"{prefix}/alerts/", json=alert_dict)
+    assert response.status_code == 201
+    alert_links = response.json()["alert_links"]
+    basin_names = {alert_link["basin"]["basin_name"] for alert_link in alert_links}
+    assert {first, second} <= basin_names
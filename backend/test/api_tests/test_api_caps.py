@@ -1,9 +1,14 @@
 import logging
 import pprint
+from xml.etree import ElementTree
 
 import src.v1.models.alerts as alert_models
+from helpers.db_helpers import QueryCounter
 from sqlmodel import Session, select
 from src.core.config import Configuration
+from src.v1.crud import crud_cap
+from src.v1.models import cap as cap_models
+from src.v1.renderers import cap_feed, cap_xml
 
 LOGGER = logging.getLogger(__name__)
 
@@ -84,3 +89,89 @@ def test_get_caps(db_with_alert: Session, test_client_with_alert_and_cap, alert_
                 )
 
 
+def test_get_caps_serialized(test_client_with_alert_and_cap):
+    client, session = test_client_with_alert_and_cap
+    prefix = Configuration.API_V1_STR
+
+    response = client.get(f"{prefix}/cap/", params={"limit": 1000})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+
+    # the caps are serialized with the type adapter rather than the
+    # response_model, the response should be the same
+    cap_events = crud_cap.get_cap_events(session, limit=1000)
+    expected = [
+        cap_models.Cap_Event_And_Areas.model_validate(cap_event).model_dump(
+            mode="json"
+        )
+        for cap_event in cap_events
+    ]
+    assert response.json() == expected
+
+
+def test_get_cap_message(test_client_with_alert_and_cap):
+    client, session = test_client_with_alert_and_cap
+    prefix = Configuration.API_V1_STR
+    cap_xml.cap_documents.clear()
+
+    cap_event = crud_cap.get_cap_events(session, limit=1)[0]
+    response = client.get(f"{prefix}/cap/{cap_event.cap_event_id}.xml")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == cap_xml.CAP_MEDIA_TYPE
+    etag = response.headers["ETag"]
+
+    namespace = {"cap": cap_xml.CAP_NAMESPACE}
+    message = ElementTree.fromstring(response.content)
+    assert message.tag == f"{{{cap_xml.CAP_NAMESPACE}}}alert"
+    assert message.findtext("cap:msgType", namespaces=namespace) == "Alert"
+    assert message.findtext("cap:info/cap:event", namespaces=namespace) == (
+        cap_event.alert_level.alert_level
+    )
+    assert sorted(
+        area.text
+        for area in message.findall("cap:info/cap:area/cap:areaDesc", namespace)
+    ) == sorted(
+        event_area.cap_area_basin.basin_name for event_area in cap_event.event_areas
+    )
+
+    # the second request is served from the cache
+    response = client.get(f"{prefix}/cap/{cap_event.cap_event_id}.xml")
+    assert response.headers["ETag"] == etag
+    assert cap_xml.cap_documents.stats()["hits"] == 1
+
+    response = client.get(
+        f"{prefix}/cap/{cap_event.cap_event_id}.xml",
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 304
+
+    response = client.get(f"{prefix}/cap/999999.xml")
+    assert response.status_code == 404
+
+
+def test_get_cap_feed(test_client_with_alert_and_cap):
+    client, session = test_client_with_alert_and_cap
+    prefix = Configuration.API_V1_STR
+    cap_feed.cap_feed.clear()
+
+    response = client.get(f"{prefix}/cap/feed")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == cap_feed.ATOM_MEDIA_TYPE
+    etag = response.headers["ETag"]
+
+    namespace = {"atom": cap_feed.ATOM_NAMESPACE}
+    feed = ElementTree.fromstring(response.content)
+    entries = feed.findall("atom:entry", namespace)
+    assert len(entries) == len(crud_cap.get_active_cap_event_versions(session))
+    link = entries[0].find("atom:link", namespace)
+    assert link.get("type") == cap_xml.CAP_MEDIA_TYPE
+    assert link.get("href").endswith(".xml")
+
+    # polls don't query the database
+    with QueryCounter(session.get_bind()) as counter:
+        response = client.get(f"{prefix}/cap/feed")
+        assert response.headers["ETag"] == etag
+        response = client.get(f"{prefix}/cap/feed", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+    assert counter.count == 0
+    assert cap_feed.cap_feed.stats()["builds"] == 1
@@ -0,0 +1,188 @@
+import csv
+import datetime
+import io
+import logging
+import tracemalloc
+
+import orjson
+import pytest
+import sqlalchemy
+import sqlmodel
+import src.db.session
+from fastapi.testclient import TestClient
+from src.core.config import Configuration
+from src.main import app
+from src.v1.crud import crud_history
+from src.v1.models import alerts as alerts_models
+from src.v1.models import basins as basins_model
+from src.v1.models import cap as cap_models
+from src.v1.routes import history_routes
+
+LOGGER = logging.getLogger(__name__)
+
+ALERT_COUNT = 20
+SNAPSHOTS_PER_ALERT = 1000
+BASINS_PER_SNAPSHOT = 5
+# 20 alerts * 1000 snapshots * 5 basins = 100k exported rows
+EXPORT_ROWS = ALERT_COUNT * SNAPSHOTS_PER_ALERT * BASINS_PER_SNAPSHOT
+# peak memory allowed while exporting, the export peaks at ~3MB, loading the
+# rows into a list instead peaks at over 100MB
+MEMORY_CEILING = 10 * 1024 * 1024
+START_DATE = datetime.datetime(2024, 1, 1)
+
+
+@pytest.fixture(scope="module")
+def history_engine(tmp_path_factory, basin_data, alert_level_data):
+    """
+    a separate sqlite database with 100k rows of synthetic alert history, one
+    snapshot an hour for each alert, and a cap event history snapshot for each
+    alert
+    """
+    engine = sqlalchemy.create_engine(
+        f"sqlite:///{tmp_path_factory.mktemp('history') / 'history.db'}",
+        execution_options={"schema_translate_map": {"py_api": None}},
+    )
+    sqlmodel.SQLModel.metadata.create_all(engine)
+    basin_count = len(basin_data)
+    with engine.begin() as conn:
+        conn.execute(
+            sqlalchemy.insert(basins_model.Basins),
+            [{"basin_name": basin["basin_name"]} for basin in basin_data],
+        )
+        conn.execute(
+            sqlalchemy.insert(alerts_models.Alert_Levels),
+            [{"alert_level": level["alert_level"]} for level in alert_level_data],
+        )
+        conn.execute(
+            sqlalchemy.insert(cap_models.Cap_Event_Status),
+            [{"cap_event_status": "ALERT"}],
+        )
+        history_id = 0
+        for alert_id in range(1, ALERT_COUNT + 1):
+            snapshots = []
+            areas = []
+            for snapshot in range(SNAPSHOTS_PER_ALERT):
+                history_id += 1
+                created = START_DATE + datetime.timedelta(hours=snapshot)
+                snapshots.append(
+                    {
+                        "alert_history_id": history_id,
+                        "alert_id": alert_id,
+                        "alert_description": f"alert {alert_id} snapshot {snapshot}",
+                        "alert_hydro_conditions": "hydro conditions",
+                        "alert_meteorological_conditions": "met conditions",
+                        "additional_information": "additional information",
+                        "author_name": "test",
+                        "alert_status": "active",
+                        "alert_updated": created,
+                        "alert_history_created": created,
+                    }
+                )
+                areas.extend(
+                    {
+                        "alert_history_id": history_id,
+                        "basin_id": (snapshot + offset) % basin_count + 1,
+                        "alert_level_id": offset % len(alert_level_data) + 1,
+                    }
+                    for offset in range(BASINS_PER_SNAPSHOT)
+                )
+            conn.execute(sqlalchemy.insert(alerts_models.Alert_History), snapshots)
+            conn.execute(sqlalchemy.insert(alerts_models.Alert_Area_History), areas)
+
+            conn.execute(
+                sqlalchemy.insert(cap_models.Cap_Event_History),
+                [
+                    {
+                        "cap_event_history_id": alert_id,
+                        "cap_event_id": alert_id,
+                        "alert_id": alert_id,
+                        "alert_level": 1,
+                        "cap_event_status_id": 1,
+                        "cap_event_updated_date": START_DATE,
+                        "cap_event_hist_created_date": START_DATE,
+                    }
+                ],
+            )
+            conn.execute(
+                sqlalchemy.insert(cap_models.Cap_Event_Areas_History),
+                [
+                    {"cap_event_history_id": alert_id, "basin_id": basin_id}
+                    for basin_id in [1, 2]
+                ],
+            )
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="function")
+def history_client(history_engine):
+    app.dependency_overrides[src.db.session.get_read_engine] = lambda: history_engine
+    yield TestClient(app)
+    app.dependency_overrides = {}
+
+
+def test_export_memory_ceiling(history_engine):
+    query = crud_history.build_alert_history_export_query()
+    line_count = 0
+    tracemalloc.start()
+    try:
+        with sqlmodel.Session(history_engine) as db:
+            for line in history_routes.ndjson_lines(
+                crud_history.stream_history(db, query)
+            ):
+                line_count += 1
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    LOGGER.debug(f"exported {line_count} rows, peak memory: {peak} bytes")
+    assert line_count == EXPORT_ROWS
+    assert peak < MEMORY_CEILING
+
+
+def test_export_alert_history_ndjson(history_client):
+    prefix = Configuration.API_V1_STR
+    response = history_client.get(
+        f"{prefix}/history/alerts",
+        params={
+            "alert_id": 3,
+            "created_after": (START_DATE + datetime.timedelta(hours=10)).isoformat(),
+            "created_before": (START_DATE + datetime.timedelta(hours=20)).isoformat(),
+        },
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert "alert_history.ndjson" in response.headers["content-disposition"]
+
+    records = [orjson.loads(line) for line in response.text.splitlines()]
+    assert len(records) == 10 * BASINS_PER_SNAPSHOT
+    assert {record["alert_id"] for record in records} == {3}
+    assert records[0]["alert_description"] == "alert 3 snapshot 10"
+    assert records[0]["basin_name"] is not None
+    assert records[0]["alert_level"] is not None
+    # oldest first
+    history_ids = [record["alert_history_id"] for record in records]
+    assert history_ids == sorted(history_ids)
+
+
+def test_export_alert_history_csv(history_client):
+    prefix = Configuration.API_V1_STR
+    response = history_client.get(
+        f"{prefix}/history/alerts", params={"format": "csv", "alert_id": 1}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == SNAPSHOTS_PER_ALERT * BASINS_PER_SNAPSHOT
+    assert rows[0]["alert_history_created"] == START_DATE.isoformat()
+
+
+def test_export_cap_history(history_client):
+    prefix = Configuration.API_V1_STR
+    response = history_client.get(f"{prefix}/history/caps", params={"alert_id": 2})
+    assert response.status_code == 200
+
+    records = [orjson.loads(line) for line in response.text.splitlines()]
+    assert [record["basin_id"] for record in records] == [1, 2]
+    assert {record["cap_event_status"] for record in records} == {"ALERT"}
+    assert records[0]["cap_event_id"] == 2
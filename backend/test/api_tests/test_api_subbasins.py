@@ -0,0 +1,63 @@
+import copy
+import logging
+
+from src.core.config import Configuration
+
+LOGGER = logging.getLogger(__name__)
+
+
+def test_read_subbasins(test_client_with_subbasins, basin_data):
+    client, session, subbasins = test_client_with_subbasins
+    prefix = Configuration.API_V1_STR
+    north = subbasins["North"].subbasin_id
+
+    response = client.get(f"{prefix}/subbasins/")
+    assert response.status_code == 200
+    by_name = {subbasin["sub_basin_name"]: subbasin for subbasin in response.json()}
+    assert by_name["North East"]["parent_subbasin_id"] == north
+    assert len(by_name["North"]["basin_ids"]) == 3
+
+    response = client.get(
+        f"{prefix}/subbasins/", headers={"If-None-Match": response.headers["ETag"]}
+    )
+    assert response.status_code == 304
+
+    response = client.get(f"{prefix}/subbasins/{north}/basins")
+    assert response.status_code == 200
+    assert {basin["basin_name"] for basin in response.json()} == {
+        basin["basin_name"] for basin in basin_data[:3]
+    }
+    response = client.get(f"{prefix}/subbasins/999999/basins")
+    assert response.status_code == 404
+
+    basin_ids = by_name["North"]["basin_ids"] + by_name["South"]["basin_ids"][:1]
+    response = client.get(f"{prefix}/subbasins/rollup", params={"basin_id": basin_ids})
+    assert response.json() == {
+        "subbasins": [{"subbasin_id": north, "sub_basin_name": "North"}],
+        "basin_ids": by_name["South"]["basin_ids"][:1],
+    }
+
+
+def test_create_alert_for_subbasin(test_client_with_subbasins, basin_data, alert_dict):
+    client, session, subbasins = test_client_with_subbasins
+    prefix = Configuration.API_V1_STR
+
+    alert_dict = copy.deepcopy(alert_dict)
+    alert_dict["alert_subbasin_links"] = [
+        {
+            "subbasin": {"sub_basin_name": "South"},
+            "alert_level": {"alert_level": "Flood Watch"},
+        }
+    ]
+    response = client.post(f"{prefix}/alerts/", json=alert_dict)
+    assert response.status_code == 201
+    basin_names = {
+        alert_link["basin"]["basin_name"]
+        for alert_link in response.json()["alert_links"]
+    }
+    assert {basin["basin_name"] for basin in basin_data[3:5]} <= basin_names
+
+    alert_dict["alert_subbasin_links"][0]["subbasin"]["sub_basin_name"] = "Nowhere"
+    response = client.post(f"{prefix}/alerts/", json=alert_dict)
+    assert response.status_code == 422
+    assert response.json()["detail"]["unknown_subbasins"] == ["Nowhere"]
@@ -0,0 +1,44 @@
+import datetime
+import logging
+
+from src.v1.routes.response_cache import AlertResponseCache
+
+LOGGER = logging.getLogger(__name__)
+
+UPDATED = datetime.datetime(2024, 5, 1, 12, 30)
+
+
+def test_response_cache_keyed_by_alert_updated():
+    cache = AlertResponseCache(maxsize=10)
+    body = cache.put("alert", 1, UPDATED, {"alert_id": 1})
+    assert body == b'{"alert_id":1}'
+    assert cache.get("alert", 1, UPDATED) == body
+    assert cache.get("cap_events", 1, UPDATED) is None
+
+    # rendered before the alert was updated
+    updated_later = UPDATED + datetime.timedelta(seconds=1)
+    assert cache.get("alert", 1, updated_later) is None
+    assert cache.etag("alert", 1, UPDATED) != cache.etag("alert", 1, updated_later)
+    assert cache.etag("alert", 1, UPDATED) != cache.etag("cap_events", 1, UPDATED)
+
+    cache.put("cap_events", 1, UPDATED, [])
+    cache.put("alert", 2, UPDATED, {"alert_id": 2})
+    cache.invalidate(1)
+    assert cache.stats()["size"] == 1
+    assert cache.get("alert", 2, UPDATED) is not None
+
+
+def test_response_cache_eviction():
+    cache = AlertResponseCache(maxsize=2)
+    for alert_id in range(3):
+        cache.put("alert", alert_id, UPDATED, {"alert_id": alert_id})
+    assert cache.get("alert", 0, UPDATED) is None
+    assert cache.get("alert", 2, UPDATED) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_response_cache_disabled():
+    cache = AlertResponseCache(maxsize=0)
+    assert cache.put("alert", 1, UPDATED, {"alert_id": 1}) == b'{"alert_id":1}'
+    assert cache.get("alert", 1, UPDATED) is None
+    assert cache.stats()["size"] == 0
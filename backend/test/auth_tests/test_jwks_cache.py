@@ -0,0 +1,123 @@
+import asyncio
+import logging
+
+import pytest
+from src.oidc import oidcAuthorize
+from src.oidc.jwks_cache import JWKSCache
+
+LOGGER = logging.getLogger(__name__)
+
+
+def test_keys_cached(stub_jwks_server, signing_key):
+    """
+    once the keys have been retrieved, subsequent lookups should not go back
+    to the server
+    """
+    cache = JWKSCache(wellknown_url=stub_jwks_server.wellknown_url)
+
+    async def lookups():
+        for _ in range(10):
+            key = await cache.get_key(signing_key.kid)
+            assert key["kid"] == signing_key.kid
+
+    asyncio.run(lookups())
+    assert stub_jwks_server.request_counts == {"wellknown": 1, "jwks": 1}
+    assert cache.fetch_count == 1
+
+
+def test_ttl_expiry_refreshes(stub_jwks_server, signing_key):
+    cache = JWKSCache(wellknown_url=stub_jwks_server.wellknown_url, ttl=0)
+
+    async def lookups():
+        await cache.get_key(signing_key.kid)
+        await cache.get_key(signing_key.kid)
+
+    asyncio.run(lookups())
+    assert cache.fetch_count == 2
+
+
+def test_unknown_kid_refresh(stub_jwks_server, signing_key, rotated_signing_key):
+    """
+    a token signed with a kid that isn't cached should trigger a refresh of the
+    key set, and keys that are no longer published are reported to the
+    rotation listeners
+    """
+    cache = JWKSCache(
+        wellknown_url=stub_jwks_server.wellknown_url, min_refresh_interval=0
+    )
+    removed = []
+    cache.add_rotation_listener(removed.extend)
+
+    asyncio.run(cache.get_key(signing_key.kid))
+
+    # rotate the keys on the server
+    stub_jwks_server.keys = [rotated_signing_key]
+    key = asyncio.run(cache.get_key(rotated_signing_key.kid))
+    assert key["kid"] == rotated_signing_key.kid
+    assert cache.fetch_count == 2
+    assert removed == [signing_key.kid]
+
+    # kid that doesn't exist anywhere
+    with pytest.raises(KeyError):
+        asyncio.run(cache.get_key("not-a-real-kid"))
+
+
+def test_unknown_kid_refresh_rate_limited(stub_jwks_server, signing_key):
+    cache = JWKSCache(
+        wellknown_url=stub_jwks_server.wellknown_url, min_refresh_interval=3600
+    )
+    asyncio.run(cache.get_key(signing_key.kid))
+    for _ in range(5):
+        with pytest.raises(KeyError):
+            asyncio.run(cache.get_key("not-a-real-kid"))
+    assert cache.fetch_count == 1
+
+
+def test_single_flight_refresh(stub_jwks_server, signing_key):
+    """
+    concurrent requests against a cold cache should share a single fetch
+    """
+    cache = JWKSCache(wellknown_url=stub_jwks_server.wellknown_url)
+
+    async def concurrent_lookups():
+        return await asyncio.gather(
+            *[cache.get_key(signing_key.kid) for _ in range(25)]
+        )
+
+    keys = asyncio.run(concurrent_lookups())
+    assert len(keys) == 25
+    assert stub_jwks_server.request_counts == {"wellknown": 1, "jwks": 1}
+
+
+def test_verify_token_uses_cache(
+    stub_jwks_server, stub_jwks_cache, signing_key, token_claims
+):
+    """
+    validating tokens through verify_token should only hit the jwks server
+    on the first request
+    """
+    token = signing_key.sign(token_claims)
+
+    async def validate():
+        users = []
+        for _ in range(3):
+            users.append(await oidcAuthorize.verify_token(f"Bearer {token}"))
+        return users
+
+    users = asyncio.run(validate())
+    for user in users:
+        assert user["display_name"] == token_claims["display_name"]
+    assert stub_jwks_server.request_counts == {"wellknown": 1, "jwks": 1}
+
+
+def test_verify_token_bad_signature(
+    stub_jwks_cache, signing_key, rotated_signing_key, token_claims
+):
+    """
+    a token signed by a key other than the published key with the same kid
+    should be rejected
+    """
+    token = rotated_signing_key.sign(token_claims, kid=signing_key.kid)
+
+    with pytest.raises(oidcAuthorize.InvalidAuthorization):
+        asyncio.run(oidcAuthorize.verify_token(f"Bearer {token}"))
@@ -0,0 +1,88 @@
+import logging
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from jose import jwt
+from src.oidc import oidcAuthorize
+from src.v1.models import auth_model
+
+LOGGER = logging.getLogger(__name__)
+
+
+@pytest.fixture(scope="function")
+def decode_counter(monkeypatch):
+    """
+    wraps jwt.decode so the tests can count how many times a token is decoded /
+    verified
+    """
+    calls = []
+    original_decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(1)
+        return original_decode(*args, **kwargs)
+
+    monkeypatch.setattr(jwt, "decode", counting_decode)
+    yield calls
+
+
+@pytest.fixture(scope="function")
+def auth_client(stub_jwks_cache):
+    """
+    a minimal app with a route that has the same auth dependencies as the
+    create / update alert routes
+    """
+    app = FastAPI()
+
+    @app.post("/write")
+    async def write_route(
+        is_authorized: bool = Depends(oidcAuthorize.authorize),
+        token=Depends(oidcAuthorize.get_current_user),
+        principal: auth_model.Principal = Depends(
+            oidcAuthorize.get_verified_principal
+        ),
+    ):
+        return {
+            "is_authorized": is_authorized,
+            "display_name": token["display_name"],
+            "verification_seconds": principal.verification_seconds,
+        }
+
+    yield TestClient(app)
+
+
+def test_token_verified_once_per_request(
+    auth_client, decode_counter, signing_key, token_claims
+):
+    token = signing_key.sign(token_claims)
+    response = auth_client.post("/write", headers={"Authorization": f"Bearer {token}"})
+    LOGGER.debug(f"response: {response.json()}")
+
+    assert response.status_code == 200
+    assert response.json()["is_authorized"]
+    assert response.json()["display_name"] == token_claims["display_name"]
+    assert len(decode_counter) == 1
+
+    # second request with the same token is served from the token cache
+    response = auth_client.post("/write", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert len(decode_counter) == 1
+
+
+def test_missing_role_not_authorized(
+    auth_client, decode_counter, signing_key, token_claims
+):
+    token_claims["client_roles"] = ["user"]
+    token = signing_key.sign(token_claims)
+    response = auth_client.post("/write", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 401
+    assert len(decode_counter) == 1
+
+
+def test_invalid_token_rejected(auth_client, signing_key, token_claims):
+    token_claims["aud"] = "some-other-client"
+    token = signing_key.sign(token_claims)
+    response = auth_client.post("/write", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import threading
+import time
+
+from src.oidc import oidcAuthorize
+from src.oidc.token_cache import VerifiedTokenCache
+
+LOGGER = logging.getLogger(__name__)
+
+
+def payload(exp_offset: int = 300) -> dict:
+    return {"exp": int(time.time()) + exp_offset, "display_name": "test"}
+
+
+def test_hit_and_miss_counters():
+    cache = VerifiedTokenCache(maxsize=10)
+    assert cache.get("token-a") is None
+    cache.put("token-a", payload(), kid="kid1")
+    assert cache.get("token-a")["display_name"] == "test"
+    assert cache.stats() == {
+        "size": 1,
+        "maxsize": 10,
+        "hits": 1,
+        "misses": 1,
+        "evictions": 0,
+    }
+
+
+def test_lru_bounded():
+    cache = VerifiedTokenCache(maxsize=3)
+    for token in ["a", "b", "c"]:
+        cache.put(token, payload(), kid="kid1")
+    # touch a so b becomes the least recently used
+    assert cache.get("a") is not None
+    cache.put("d", payload(), kid="kid1")
+
+    assert cache.get("b") is None
+    for token in ["a", "c", "d"]:
+        assert cache.get(token) is not None
+    assert cache.stats()["size"] == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_tokens_evicted():
+    cache = VerifiedTokenCache(maxsize=10)
+    # already expired tokens are never cached
+    cache.put("expired", payload(exp_offset=-1), kid="kid1")
+    assert cache.stats()["size"] == 0
+
+    cache.put("expiring", payload(exp_offset=1), kid="kid1")
+    assert cache.get("expiring") is not None
+    time.sleep(1.1)
+    assert cache.get("expiring") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_rotated_kid_evicted():
+    cache = VerifiedTokenCache(maxsize=10)
+    cache.put("token-a", payload(), kid="kid1")
+    cache.put("token-b", payload(), kid="kid2")
+    cache.evict_kids({"kid1"})
+    assert cache.get("token-a") is None
+    assert cache.get("token-b") is not None
+
+
+def test_disabled_cache():
+    cache = VerifiedTokenCache(maxsize=0)
+    cache.put("token-a", payload(), kid="kid1")
+    assert cache.get("token-a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_thread_safe():
+    cache = VerifiedTokenCache(maxsize=50)
+
+    def worker(thread_num):
+        for cnt in range(500):
+            token = f"token-{thread_num}-{cnt % 60}"
+            if cache.get(token) is None:
+                cache.put(token, payload(), kid="kid1")
+
+    threads = [threading.Thread(target=worker, args=(num,)) for num in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert stats["size"] <= 50
+    assert stats["hits"] + stats["misses"] == 8 * 500
+
+
+def test_key_rotation_evicts_verified_tokens(
+    stub_jwks_server, stub_jwks_cache, signing_key, rotated_signing_key, token_claims
+):
+    """
+    when the signing key is removed from the published key set, tokens that
+    were verified with it should no longer be served from the cache
+    """
+    token = signing_key.sign(token_claims)
+    asyncio.run(oidcAuthorize.verify_token(f"Bearer {token}"))
+    assert oidcAuthorize.token_cache.get(token) is not None
+
+    # rotate the keys, and force a refresh of the key set
+    stub_jwks_server.keys = [rotated_signing_key]
+    asyncio.run(stub_jwks_cache.refresh(force=True))
+    assert oidcAuthorize.token_cache.get(token) is None
@@ -27,6 +27,9 @@ pytest_plugins = [
     "fixtures.alert_fixtures",
     "fixtures.data_fixtures",
     "fixtures.cap_fixtures",
+    "fixtures.auth_fixtures",
+    "fixtures.geometry_fixtures",
+    "fixtures.hierarchy_fixtures",
 ]
 
 
@@ -225,6 +228,7 @@ def test_app_with_auth(db_test_connection, mock_access_token):
         return token
 
     app.dependency_overrides[src.db.session.get_db] = get_db
+    app.dependency_overrides[src.db.session.get_primary_db] = get_db
     app.dependency_overrides[oidcAuthorize.authorize] = lambda: authorize()
     app.dependency_overrides[oidcAuthorize.get_current_user] = (
         lambda: get_current_user()
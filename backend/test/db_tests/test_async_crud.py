@@ -0,0 +1,69 @@
+import asyncio
+import logging
+
+import pytest
+from helpers.db_helpers import create_async_test_engine
+from src.v1.crud import crud_cap
+from src.v1.crud.reference_cache import reference_cache
+from src.v1.models import cap as cap_models
+
+pytest.importorskip("aiosqlite")
+from sqlmodel.ext.asyncio.session import AsyncSession  # noqa: E402
+
+LOGGER = logging.getLogger(__name__)
+
+ALERT_LEVELS = [
+    {"alert_level": "High Streamflow Advisory", "basin_names": ["Skeena", "Liard"]},
+    {"alert_level": "Flood Warning", "basin_names": ["Stikine"]},
+]
+
+
+@pytest.fixture(scope="function")
+def run_with_async_session(basin_data, alert_level_data):
+    """
+    runs a coroutine that receives an async session, and the id of an alert,
+    against a freshly seeded in memory aiosqlite database
+    """
+
+    def run(test_coroutine):
+        async def runner():
+            engine, alert_id = await create_async_test_engine(
+                basin_data, alert_level_data, ALERT_LEVELS
+            )
+            # the records are read by a new session, nothing is in the identity
+            # map so everything the tests access has to be eagerly loaded
+            async with AsyncSession(engine) as session:
+                result = await test_coroutine(session, alert_id)
+            await engine.dispose()
+            return result
+
+        try:
+            return asyncio.run(runner())
+        finally:
+            # the cache was loaded from the aiosqlite database
+            reference_cache.invalidate()
+
+    yield run
+
+
+def test_get_cap_events_async(run_with_async_session):
+    async def read(session, alert_id):
+        return await crud_cap.get_cap_events_async(session, limit=10)
+
+    cap_events = run_with_async_session(read)
+    cap_state = {
+        cap_event.alert_level.alert_level: (
+            cap_event.cap_event_status.cap_event_status,
+            sorted(area.cap_area_basin.basin_name for area in cap_event.event_areas),
+        )
+        for cap_event in cap_events
+    }
+    assert cap_state == {
+        "High Streamflow Advisory": ("ALERT", ["Liard", "Skeena"]),
+        "Flood Warning": ("ALERT", ["Stikine"]),
+    }
+    serialized = [
+        cap_models.Cap_Event_And_Areas.model_validate(cap_event)
+        for cap_event in cap_events
+    ]
+    assert sum(len(cap_event.event_areas) for cap_event in serialized) == 3
@@ -2,6 +2,8 @@ import logging
 from typing import Dict, List, TypedDict
 
 import pytest
+from hypothesis import given
+from hypothesis import strategies as st
 from sqlmodel import Session, select
 from src.v1.crud import crud_cap
 from src.v1.models import alerts as alerts_models
@@ -296,6 +298,112 @@ def test_cap_delta_adds(existing_cap_dict, new_caps_dict, create_list):
     assert equal
 
 
+def test_cap_delta_basin_order_ignored():
+    """
+    the same basins in a different order is not a change to the cap
+    """
+    existing_cap_comp = cap_comp_from_dict({"Level1": ["basin1", "basin2", "basin3"]})
+    new_cap_comp = cap_comp_from_dict({"Level1": ["basin3", "basin1", "basin2"]})
+    delta_obj = crud_cap.CapDelta(
+        existing_cap_struct=existing_cap_comp,
+        new_cap_struct=new_cap_comp,
+        incomming_alert_status=alerts_models.AlertStatus.active,
+    )
+    assert delta_obj.existing_digest == delta_obj.new_digest
+    assert delta_obj.deltas == []
+    assert delta_obj.getUpdates() == []
+
+
+# alert level -> list of basin names, with hundreds of possible basins
+cap_dicts = st.dictionaries(
+    keys=st.sampled_from(["Level1", "Level2", "Level3", "Level4"]),
+    values=st.lists(
+        st.integers(min_value=1, max_value=400).map(lambda num: f"basin{num}"),
+        min_size=1,
+        max_size=50,
+        unique=True,
+    ),
+)
+
+
+@given(existing_cap_dict=cap_dicts, new_caps_dict=cap_dicts, data=st.data())
+def test_cap_delta_properties(existing_cap_dict, new_caps_dict, data):
+    """
+    for any existing / new cap state:
+    * applying the creates, updates and cancels to the existing state produces
+      the new state
+    * a level is only ever in one of creates, updates or cancels
+    * shuffling the basins of the new state doesn't change the delta
+    """
+    delta_obj = crud_cap.CapDelta(
+        existing_cap_struct=cap_comp_from_dict(existing_cap_dict),
+        new_cap_struct=cap_comp_from_dict(new_caps_dict),
+        incomming_alert_status=alerts_models.AlertStatus.active,
+    )
+    creates = cap_comp_to_levels(delta_obj.getCreates())
+    updates = cap_comp_to_levels(delta_obj.getUpdates())
+    cancels = cap_comp_to_levels(delta_obj.getCancels())
+
+    applied = {
+        alert_level: set(basins) for alert_level, basins in existing_cap_dict.items()
+    }
+    for alert_level in cancels:
+        del applied[alert_level]
+    applied.update(updates)
+    applied.update(creates)
+    assert applied == {
+        alert_level: set(basins) for alert_level, basins in new_caps_dict.items()
+    }
+
+    assert not set(creates) & set(updates)
+    assert not set(creates) & set(cancels)
+    assert not set(updates) & set(cancels)
+    assert set(creates) <= set(new_caps_dict) - set(existing_cap_dict)
+    assert set(cancels) <= set(existing_cap_dict)
+
+    shuffled_dict = {
+        alert_level: data.draw(st.permutations(basins))
+        for alert_level, basins in new_caps_dict.items()
+    }
+    shuffled_delta = crud_cap.CapDelta(
+        existing_cap_struct=cap_comp_from_dict(existing_cap_dict),
+        new_cap_struct=cap_comp_from_dict(shuffled_dict),
+        incomming_alert_status=alerts_models.AlertStatus.active,
+    )
+    assert shuffled_delta.new_digest == delta_obj.new_digest
+    assert sorted(shuffled_delta.deltas) == sorted(delta_obj.deltas)
+
+
+@given(existing_cap_dict=cap_dicts, new_caps_dict=cap_dicts)
+def test_cap_delta_cancelled_properties(existing_cap_dict, new_caps_dict):
+    """
+    when the alert is cancelled every existing cap is cancelled, and nothing is
+    updated
+    """
+    delta_obj = crud_cap.CapDelta(
+        existing_cap_struct=cap_comp_from_dict(existing_cap_dict),
+        new_cap_struct=cap_comp_from_dict(new_caps_dict),
+        incomming_alert_status=alerts_models.AlertStatus.cancelled,
+    )
+    assert delta_obj.getUpdates() == []
+    assert cap_comp_to_levels(delta_obj.getCancels()) == {
+        alert_level: set(basins) for alert_level, basins in existing_cap_dict.items()
+    }
+
+
+def cap_comp_to_levels(
+    cap_comp: List[caps_models.Cap_Comparison],
+) -> Dict[str, set]:
+    """
+    :return: the basin names for each alert level in the cap comparison objects
+    :rtype: Dict[str, set]
+    """
+    return {
+        cap.alert_level.alert_level: {basin.basin_name for basin in cap.basins}
+        for cap in cap_comp
+    }
+
+
 def cap_comp_from_dict(cap_comp_dict) -> List[caps_models.Cap_Comparison]:
     """
     create a cap comparison object from a dictionary
@@ -3,6 +3,7 @@ import logging
 from typing import List
 
 import pytest
+from helpers.db_helpers import QueryCounter
 from helpers.alert_helpers import (
     AlertAreaLevel_to_AlertDataDict,
     create_alertlvl_basin_dict,
@@ -131,6 +132,54 @@ def test_create_alert(db_test_connection: Session, alert_basin_write_data):
         assert areas_lvl_exists
 
 
+def test_resolve_basins_and_levels(db_test_connection: Session):
+    """
+    resolving the basins and alert levels for an alert should take one query
+    per table, regardless of how many links the alert has
+    """
+    session = db_test_connection
+    basin_names = ["Skeena", "Liard", "Stikine", "Peace", "Okanagan"]
+    alert_levels = ["Flood Watch", "Flood Warning", "High Streamflow Advisory"]
+    alert = create_fake_alert(
+        [
+            {"alert_level": alert_level, "basin_names": basin_names}
+            for alert_level in alert_levels
+        ]
+    )
+
+    with QueryCounter(session.get_bind()) as counter:
+        basin_lookup, alert_level_lookup = crud_alerts.resolve_alert_links(
+            session, alert
+        )
+    assert counter.count == 2
+    assert sorted(basin_lookup.keys()) == sorted(basin_names)
+    assert sorted(alert_level_lookup.keys()) == sorted(alert_levels)
+    for basin_name, basin in basin_lookup.items():
+        assert basin.basin_name == basin_name
+
+
+def test_create_alert_unknown_basin(db_test_connection: Session):
+    """
+    an alert that references basins / alert levels that don't exist should
+    fail before anything is written, reporting all the unknown names
+    """
+    session = db_test_connection
+    alert = create_fake_alert(
+        [
+            {"alert_level": "Flood Watch", "basin_names": ["Skeena", "Not A Basin"]},
+            {"alert_level": "Not A Level", "basin_names": ["Liard"]},
+        ]
+    )
+    with pytest.raises(crud_alerts.UnknownReferenceDataError) as err:
+        crud_alerts.create_alert(session=session, alert=alert)
+    assert err.value.basin_names == ["Not A Basin"]
+    assert err.value.alert_levels == ["Not A Level"]
+    assert alert.alert_description not in [
+        alert_db.alert_description
+        for alert_db in session.exec(select(alerts_models.Alerts)).all()
+    ]
+
+
 def test_get_alerts(db_with_alert: Session):
     session = db_with_alert
     alerts = crud_alerts.get_alerts(session=session)
@@ -138,6 +187,41 @@ def test_get_alerts(db_with_alert: Session):
     assert len(alerts) >= 1
 
 
+def test_get_alerts_query_count(db_with_alert: Session):
+    """
+    retrieving the alerts and walking the basin / alert level relationships
+    should take the same number of queries regardless of how many alerts
+    exist in the database
+    """
+    session = db_with_alert
+
+    def count_queries():
+        session.expire_all()
+        with QueryCounter(session.get_bind()) as counter:
+            alerts = crud_alerts.get_alerts(session=session)
+            for alert in alerts:
+                for alert_link in alert.alert_links:
+                    LOGGER.debug(
+                        f"{alert_link.basin.basin_name} "
+                        + f"{alert_link.alert_level.alert_level}"
+                    )
+        return counter.count
+
+    query_count_before = count_queries()
+
+    # add more alerts, with a different set of basins / alert levels
+    for basin_names in [["Skeena", "Liard"], ["Stikine"], ["Peace", "Skeena"]]:
+        alert = create_fake_alert(
+            [{"alert_level": "Flood Watch", "basin_names": basin_names}]
+        )
+        crud_alerts.create_alert(session=session, alert=alert)
+    session.flush()
+
+    query_count_after = count_queries()
+    assert query_count_before == query_count_after
+    assert query_count_after <= 2
+
+
 def test_get_alert(db_with_alert: Session):
     session = db_with_alert
     alerts_list = crud_alerts.get_alerts(session=session)
@@ -147,6 +231,50 @@ def test_get_alert(db_with_alert: Session):
     assert alert_single.alert_id == alert_id
 
 
+def test_update_alert_areas_bulk(db_test_connection: Session):
+    """
+    changes to the basins / alert levels of an alert are applied with a single
+    delete and a single insert, however many links change
+    """
+    session = db_test_connection
+    basin_names = ["Skeena", "Liard", "Stikine", "Peace", "Okanagan", "Skagit"]
+    alert = create_fake_alert(
+        [
+            {"alert_level": "Flood Watch", "basin_names": basin_names},
+            {"alert_level": "Flood Warning", "basin_names": basin_names[:3]},
+        ]
+    )
+    alert_db = crud_alerts.create_alert(session=session, alert=alert)
+    session.flush()
+
+    # drop the flood warnings, and add high streamflow advisories
+    updated_alert = create_fake_alert(
+        [
+            {"alert_level": "Flood Watch", "basin_names": basin_names},
+            {"alert_level": "High Streamflow Advisory", "basin_names": basin_names[3:]},
+        ]
+    )
+    with QueryCounter(session.get_bind()) as counter:
+        updated_record = crud_alerts.update_alert(
+            session=session, alert_id=alert_db.alert_id, updated_alert=updated_alert
+        )
+    statements = [statement.split()[0].upper() for statement in counter.statements]
+    assert statements.count("DELETE") == 1
+    assert statements.count("INSERT") == 1
+
+    basin_levels = sorted(
+        (alert_link.basin.basin_name, alert_link.alert_level.alert_level)
+        for alert_link in updated_record.alert_links
+    )
+    assert basin_levels == sorted(
+        [(basin_name, "Flood Watch") for basin_name in basin_names]
+        + [(basin_name, "High Streamflow Advisory") for basin_name in basin_names[3:]]
+    )
+    assert crud_alerts.is_alert_equal(
+        updated_record, updated_alert, core_atributes_only=True
+    )
+
+
 def test_update_alert_parameter(
     db_with_alert: Session, alert_data_only: alerts_models.Alerts
 ):
@@ -483,6 +611,49 @@ def test_alert_history(
         )
 
 
+def test_alert_history_snapshot(db_test_connection: Session):
+    """
+    the history snapshot is copied with one insert per table, however many
+    basins the alert covers, and matches the state of the alert in the orm
+    """
+    session = db_test_connection
+    basin_names = [
+        basin.basin_name for basin in session.exec(select(basins_model.Basins)).all()
+    ]
+    alert_levels = [
+        alert_level.alert_level
+        for alert_level in session.exec(select(alerts_models.Alert_Levels)).all()
+    ]
+    alert = create_fake_alert(
+        [
+            {"alert_level": alert_level, "basin_names": basin_names}
+            for alert_level in alert_levels
+        ]
+    )
+    alert_db = crud_alerts.create_alert(session=session, alert=alert)
+
+    with QueryCounter(session.get_bind()) as counter:
+        history_id = crud_alerts.create_history_record(session=session, alert=alert_db)
+    statements = [statement.split()[0].upper() for statement in counter.statements]
+    assert statements == ["INSERT", "INSERT"]
+
+    history_record = session.get(alerts_models.Alert_History, history_id)
+    for column in crud_alerts.ALERT_HISTORY_COLUMNS:
+        assert getattr(history_record, column) == getattr(alert_db, column)
+
+    history_links = sorted(
+        (area_hist.basin_id, area_hist.alert_level_id)
+        for area_hist in history_record.alert_history_links
+    )
+    alert_links = sorted(
+        (alert_link.basin_id, alert_link.alert_level_id)
+        for alert_link in alert_db.alert_links
+    )
+    assert len(alert_links) == len(basin_names) * len(alert_levels)
+    assert history_links == alert_links
+    session.rollback()
+
+
 def test_delete_alert_link(db_with_alert, alert_dict, alert_basin_write):
     session = db_with_alert
     # alert_basin_write.__annotations__
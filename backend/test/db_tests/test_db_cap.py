@@ -1,11 +1,13 @@
 import logging
+import re
 import typing
 
 import pytest
 from helpers.alert_helpers import create_fake_alert, update_fake_alert
+from helpers.db_helpers import QueryCounter
 from sqlmodel import Session, select
 from src.types import AlertDataDict
-from src.v1.crud import crud_alerts, crud_cap
+from src.v1.crud import crud_alerts, crud_cap, reference_cache
 from src.v1.models import alerts as alerts_models
 from src.v1.models import basins as basin_models
 from src.v1.models import cap as cap_models
@@ -88,6 +90,31 @@ def test_create_cap_event(
             assert event_area.cap_area_basin.basin_name in alert_basins
 
 
+def test_create_cap_event_basins_not_cached(
+    db_with_alert_and_data: typing.Tuple[typing.Any, typing.Any],
+    monkeypatch,
+):
+    """
+    The reference cache is per process and can be behind the database, the
+    cap event areas are written with the basin ids already resolved for the
+    alert rather than looking the names up in the cache.
+    """
+    session = db_with_alert_and_data[0]
+    alert_data = db_with_alert_and_data[1]
+
+    reference_data = reference_cache.reference_cache.get(session)
+    monkeypatch.setattr(reference_data, "basin_name_to_id", {})
+
+    caps = crud_cap.create_cap_event(session=session, alert=alert_data)
+    session.flush()
+
+    alert_basin_ids = {link.basin_id for link in alert_data.alert_links}
+    cap_basin_ids = {
+        event_area.basin_id for cap in caps for event_area in cap.event_areas
+    }
+    assert cap_basin_ids == alert_basin_ids
+
+
 def test_get_cap_event(db_with_alert_and_caps, alert_dict):
     LOGGER.debug(f"db_with_alert_and_caps: {db_with_alert_and_caps}")
     # session = db_with_alert_and_caps[0]
@@ -589,6 +616,146 @@ def test_update_cap_for_alert(
 
         # Once implement cancel need to add to this logic
 
+    # areas reloaded after their objects were garbage collected aren't known to
+    # have been created in this transaction, the rollback leaves them in the
+    # identity map of the shared session
+    session.rollback()
+    session.expunge_all()
+
+
+def test_reconcile_caps(db_test_connection: Session):
+    """
+    editing an alert so that one alert level is updated, one is cancelled and
+    one is created.  The existing cap events should only be queried once, and
+    the history should record the state of the updated / cancelled caps before
+    they were changed.
+    """
+    session = db_test_connection
+    test_setup_dict = pre_test_setup(
+        session=session,
+        existing_alert_list=[
+            {"alert_level": "High Streamflow Advisory", "basin_names": ["Skeena", "Liard"]},
+            {"alert_level": "Flood Watch", "basin_names": ["Stikine"]},
+        ],
+        incomming_alert_list=[
+            {"alert_level": "High Streamflow Advisory", "basin_names": ["Skeena", "Peace"]},
+            {"alert_level": "Flood Warning", "basin_names": ["Okanagan"]},
+        ],
+    )
+    alert = test_setup_dict["incomming_alert"]
+    basin_count = len(session.exec(select(basin_models.Basins)).all())
+
+    with QueryCounter(session.get_bind()) as counter:
+        crud_cap.reconcile_caps(session, alert)
+    cap_event_selects = [
+        statement
+        for statement in counter.statements
+        if re.search(r"^\s*SELECT.*\sFROM\s+(\w+\.)?cap_event\s", statement, re.S)
+    ]
+    assert len(cap_event_selects) == 1
+
+    cap_events = crud_cap.get_cap_events_for_alert(session, alert.alert_id)
+    cap_state = {
+        cap_event.alert_level.alert_level: (
+            cap_event.cap_event_status.cap_event_status,
+            sorted(area.cap_area_basin.basin_name for area in cap_event.event_areas),
+        )
+        for cap_event in cap_events
+    }
+    assert cap_state == {
+        "High Streamflow Advisory": ("UPDATE", ["Peace", "Skeena"]),
+        "Flood Watch": ("CANCEL", ["Stikine"]),
+        "Flood Warning": ("ALERT", ["Okanagan"]),
+    }
+
+    # updating the caps used to insert duplicate basin records
+    assert len(session.exec(select(basin_models.Basins)).all()) == basin_count
+
+    history = session.exec(
+        select(cap_models.Cap_Event_History).where(
+            cap_models.Cap_Event_History.alert_id == alert.alert_id
+        )
+    ).all()
+    history_state = {
+        history_record.alert_levels.alert_level: (
+            history_record.cap_event_status.cap_event_status,
+            sorted(
+                area_hist.basins.basin_name
+                for area_hist in history_record.cap_event_areas_hist
+            ),
+        )
+        for history_record in history
+    }
+    assert history_state == {
+        "High Streamflow Advisory": ("ALERT", ["Liard", "Skeena"]),
+        "Flood Watch": ("ALERT", ["Stikine"]),
+    }
+    session.rollback()
+
+
+def test_cap_history_snapshot(db_test_connection: Session):
+    """
+    the cap event history is copied with one insert per table, however many
+    cap events / basins change, and matches the state of the caps in the orm
+    """
+    session = db_test_connection
+    basin_names = [
+        basin.basin_name for basin in session.exec(select(basin_models.Basins)).all()
+    ]
+    test_setup_dict = pre_test_setup(
+        session=session,
+        existing_alert_list=[
+            {"alert_level": "High Streamflow Advisory", "basin_names": basin_names},
+            {"alert_level": "Flood Watch", "basin_names": basin_names[:10]},
+        ],
+        incomming_alert_list=[
+            {"alert_level": "High Streamflow Advisory", "basin_names": basin_names[1:]},
+        ],
+    )
+    alert = test_setup_dict["incomming_alert"]
+    cap_events = crud_cap.get_cap_events_for_alert(session, alert.alert_id)
+
+    with QueryCounter(session.get_bind()) as counter:
+        crud_cap.record_history(session, alert)
+    history_inserts = [
+        statement
+        for statement in counter.statements
+        if statement.split()[0].upper() == "INSERT"
+    ]
+    assert len(history_inserts) == 2
+
+    history = session.exec(
+        select(cap_models.Cap_Event_History).where(
+            cap_models.Cap_Event_History.alert_id == alert.alert_id
+        )
+    ).all()
+    history_state = {
+        history_record.cap_event_id: (
+            history_record.alert_id,
+            history_record.cap_event_updated_date,
+            history_record.alert_level,
+            history_record.cap_event_status_id,
+            sorted(area_hist.basin_id for area_hist in history_record.cap_event_areas_hist),
+        )
+        for history_record in history
+    }
+    # compare with the values stored for the caps, rather than the in memory
+    # values, sqlite doesn't store the timezone
+    for cap_event in cap_events:
+        session.expire(cap_event)
+    cap_state = {
+        cap_event.cap_event_id: (
+            cap_event.alert_id,
+            cap_event.cap_event_updated_date,
+            cap_event.alert_level_id,
+            cap_event.cap_event_status_id,
+            sorted(area.basin_id for area in cap_event.event_areas),
+        )
+        for cap_event in cap_events
+    }
+    # both caps changed, one update and one cancel
+    assert len(history_state) == 2
+    assert history_state == cap_state
     session.rollback()
 
 
@@ -0,0 +1,136 @@
+import logging
+from xml.etree import ElementTree
+
+import pytest
+import sqlalchemy
+import sqlmodel
+from helpers.db_helpers import QueryCounter
+from sqlalchemy import create_engine
+from src.v1.crud import crud_alerts, crud_cap
+from src.v1.models import alerts as alerts_models
+from src.v1.renderers import cap_feed
+
+LOGGER = logging.getLogger(__name__)
+
+NAMESPACE = {"atom": cap_feed.ATOM_NAMESPACE}
+
+
+def entry_ids(body: bytes) -> set[str]:
+    feed = ElementTree.fromstring(body)
+    return {
+        entry.findtext("atom:id", namespaces=NAMESPACE)
+        for entry in feed.findall("atom:entry", NAMESPACE)
+    }
+
+
+@pytest.fixture(scope="function")
+def memory_session():
+    """
+    a session on an empty in memory database, used to commit alerts without
+    touching the shared test database
+    """
+    engine = create_engine(
+        "sqlite://",
+        execution_options={"schema_translate_map": {"py_api": None}},
+    )
+    sqlmodel.SQLModel.metadata.create_all(engine)
+    with sqlmodel.Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def test_feed_refreshed_incrementally(db_with_alert_and_caps, alert_basin_write):
+    session, alert, caps = db_with_alert_and_caps
+    feed = cap_feed.CapFeed(revalidate_interval=3600)
+    body, etag = feed.get(session)
+    active_count = len(crud_cap.get_active_cap_event_versions(session))
+    assert len(entry_ids(body)) == active_count
+    assert {cap_feed.entry_id(cap_event.cap_event_id) for cap_event in caps} <= (
+        entry_ids(body)
+    )
+
+    # polls are served from memory until the feed is marked stale
+    with QueryCounter(session.get_bind()) as counter:
+        assert feed.get(session) == (body, etag)
+    assert counter.count == 0
+
+    # nothing changed, the feed is checked but not rebuilt
+    feed.invalidate()
+    assert feed.get(session) == (body, etag)
+    assert feed.checks == 2
+    assert feed.builds == 1
+
+    # drop the first alert level, its cap event is cancelled
+    dropped_level = alert_basin_write.alert_links[0].alert_level.alert_level
+    alert_basin_write.alert_links = [
+        alert_link
+        for alert_link in alert_basin_write.alert_links
+        if alert_link.alert_level.alert_level != dropped_level
+    ]
+    updated_alert = crud_alerts.update_alert(
+        session, alert_id=alert.alert_id, updated_alert=alert_basin_write
+    )
+    crud_cap.reconcile_caps(session, updated_alert)
+    cap_events = crud_cap.get_cap_events_by_level(
+        crud_cap.get_cap_events_for_alert(session, alert.alert_id)
+    )
+    cancelled = cap_events.pop(dropped_level)
+
+    rendered = feed.entries_rendered
+    feed.invalidate()
+    updated_body, updated_etag = feed.get(session)
+    assert updated_etag != etag
+    assert cap_feed.entry_id(cancelled.cap_event_id) not in entry_ids(updated_body)
+    assert len(entry_ids(updated_body)) == active_count - 1
+    # only the entries of the updated alert's cap events are rendered again
+    assert feed.entries_rendered - rendered == len(cap_events)
+
+
+def test_feed_stays_stale_if_refresh_fails(memory_session, monkeypatch):
+    session = memory_session
+    feed = cap_feed.CapFeed(revalidate_interval=3600)
+    body, etag = feed.get(session)
+
+    def unavailable(session):
+        raise sqlalchemy.exc.OperationalError("select", {}, Exception("down"))
+
+    feed.invalidate()
+    monkeypatch.setattr(crud_cap, "get_active_cap_event_versions", unavailable)
+    with pytest.raises(sqlalchemy.exc.OperationalError):
+        feed.get(session)
+    assert feed.stale
+
+    monkeypatch.undo()
+    assert feed.get(session) == (body, etag)
+    assert not feed.stale
+
+
+def test_feed_invalidated_on_commit(memory_session: sqlmodel.Session):
+    session = memory_session
+    feed = cap_feed.cap_feed
+    feed.stale = False
+
+    session.add(
+        alerts_models.Alerts(
+            alert_description="description",
+            alert_hydro_conditions="hydro",
+            alert_meteorological_conditions="met",
+            author_name="author",
+            alert_status="active",
+        )
+    )
+    session.flush()
+    session.rollback()
+    assert not feed.stale
+
+    session.add(
+        alerts_models.Alerts(
+            alert_description="description",
+            alert_hydro_conditions="hydro",
+            alert_meteorological_conditions="met",
+            author_name="author",
+            alert_status="active",
+        )
+    )
+    session.commit()
+    assert feed.stale
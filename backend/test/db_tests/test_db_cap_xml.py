@@ -0,0 +1,77 @@
+import logging
+from xml.etree import ElementTree
+
+from src.v1.crud import crud_alerts, crud_cap
+from src.v1.renderers import cap_xml
+
+LOGGER = logging.getLogger(__name__)
+
+NAMESPACE = {"cap": cap_xml.CAP_NAMESPACE}
+
+
+def render(session, cap_event_id: int) -> ElementTree.Element:
+    cache = cap_xml.CapDocumentCache(maxsize=10)
+    version = crud_cap.get_cap_event_version(session, cap_event_id)
+    [(key, body)] = cap_xml.render_cap_messages(session, [version], cache=cache)
+    return ElementTree.fromstring(body)
+
+
+def test_cap_message_references(db_with_alert_and_caps, alert_basin_write):
+    session, alert, caps = db_with_alert_and_caps
+    messages = {
+        cap_event.alert_level.alert_level: render(session, cap_event.cap_event_id)
+        for cap_event in crud_cap.get_cap_events_for_alert(session, alert.alert_id)
+    }
+    original_identifiers = {
+        alert_level: message.findtext("cap:identifier", namespaces=NAMESPACE)
+        for alert_level, message in messages.items()
+    }
+    for message in messages.values():
+        assert message.findtext("cap:msgType", namespaces=NAMESPACE) == "Alert"
+        assert message.find("cap:references", NAMESPACE) is None
+
+    # drop the first alert level, its cap event is cancelled
+    dropped_level = alert_basin_write.alert_links[0].alert_level.alert_level
+    alert_basin_write.alert_links = [
+        alert_link
+        for alert_link in alert_basin_write.alert_links
+        if alert_link.alert_level.alert_level != dropped_level
+    ]
+    updated_alert = crud_alerts.update_alert(
+        session, alert_id=alert.alert_id, updated_alert=alert_basin_write
+    )
+    crud_cap.reconcile_caps(session, updated_alert)
+
+    cap_events = crud_cap.get_cap_events_for_alert(session, alert.alert_id)
+    cancelled = crud_cap.get_cap_events_by_level(cap_events)[dropped_level]
+    message = render(session, cancelled.cap_event_id)
+    assert message.findtext("cap:msgType", namespaces=NAMESPACE) == "Cancel"
+    # the cancel is a new message that references the original alert
+    identifier = message.findtext("cap:identifier", namespaces=NAMESPACE)
+    assert identifier != original_identifiers[dropped_level]
+    references = message.findtext("cap:references", namespaces=NAMESPACE)
+    assert original_identifiers[dropped_level] in references.split(",")
+
+
+def test_cap_document_key(db_with_alert_and_caps):
+    session, alert, caps = db_with_alert_and_caps
+    cap_event = caps[0]
+    geometry_digest = "boundaries"
+    key = cap_xml.document_key(
+        cap_event.cap_event_id,
+        cap_event.cap_event_updated_date,
+        alert.alert_updated,
+        geometry_digest,
+    )
+    version = crud_cap.get_cap_event_version(session, cap_event.cap_event_id)
+    assert cap_xml.document_key(*version, geometry_digest) == key
+
+    # a new version of the cap event / alert / boundaries is a different document
+    later = cap_event.cap_event_updated_date.replace(year=2100)
+    cap_event_id = cap_event.cap_event_id
+    assert (
+        cap_xml.document_key(cap_event_id, later, alert.alert_updated, geometry_digest)
+        != key
+    )
+    assert cap_xml.document_key(cap_event_id, version[1], later, geometry_digest) != key
+    assert cap_xml.document_key(*version, "reloaded boundaries") != key
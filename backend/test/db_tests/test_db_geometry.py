@@ -0,0 +1,160 @@
+import logging
+from xml.etree import ElementTree
+
+import shapely
+from fixtures.geometry_fixtures import boundary_centre
+from helpers.db_helpers import QueryCounter
+from sqlmodel import select
+from src.core.config import Configuration
+from src.v1.crud import crud_alerts, crud_cap, crud_geometry
+from src.v1.crud.geometry_cache import FULL_RESOLUTION, geometry_cache
+from src.v1.models import alerts as alerts_models
+from src.v1.models import basins as basins_models
+from src.v1.renderers import cap_xml
+
+LOGGER = logging.getLogger(__name__)
+
+NAMESPACE = {"cap": cap_xml.CAP_NAMESPACE}
+
+
+def test_load_basin_geometry(db_with_basin_geometry, basin_boundaries):
+    session = db_with_basin_geometry
+    boundaries = session.exec(select(basins_models.Basin_Geometry)).all()
+    assert len(boundaries) == len(basin_boundaries["features"])
+    boundary = boundaries[0]
+    geometry = shapely.from_wkb(boundary.geometry)
+    assert (boundary.min_x, boundary.min_y, boundary.max_x, boundary.max_y) == (
+        geometry.bounds
+    )
+
+    simplified = session.exec(
+        select(basins_models.Basin_Geometry_Simplified)
+        .where(basins_models.Basin_Geometry_Simplified.basin_id == boundary.basin_id)
+        .order_by(basins_models.Basin_Geometry_Simplified.tolerance)
+    ).all()
+    assert [record.tolerance for record in simplified] == sorted(
+        Configuration.BASIN_GEOMETRY_TOLERANCES
+    )
+    # coarser tolerances have fewer vertices
+    vertex_counts = [shapely.get_num_coordinates(geometry)] + [
+        shapely.get_num_coordinates(shapely.from_wkb(record.geometry))
+        for record in simplified
+    ]
+    assert vertex_counts == sorted(vertex_counts, reverse=True)
+    assert vertex_counts[-1] < vertex_counts[0]
+
+
+def test_geometry_cache(db_with_basin_geometry):
+    session = db_with_basin_geometry
+    geometries = geometry_cache.get(session)
+    with QueryCounter(session.get_bind()) as counter:
+        assert geometry_cache.get(session) is geometries
+    assert counter.count == 0
+
+    smallest, *others, largest = sorted(Configuration.BASIN_GEOMETRY_TOLERANCES)
+    assert geometries.tolerances[0] == FULL_RESOLUTION
+    assert geometries.resolve_tolerance(None) == FULL_RESOLUTION
+    assert geometries.resolve_tolerance(smallest / 2) == FULL_RESOLUTION
+    assert geometries.resolve_tolerance(smallest) == smallest
+    assert geometries.resolve_tolerance(largest * 10) == largest
+
+    basin_id = next(iter(geometries.geometries))
+    [polygon] = geometries.cap_polygons[basin_id]
+    pairs = polygon.split(" ")
+    assert pairs[0] == pairs[-1]
+    lat, lon = (float(value) for value in pairs[0].split(","))
+    centroid = geometries.geometry(basin_id, FULL_RESOLUTION).centroid
+    assert abs(lat - centroid.y) < 1 and abs(lon - centroid.x) < 1
+
+    # the last basin's boundary is made of two polygons
+    assert max(len(polygons) for polygons in geometries.cap_polygons.values()) == 2
+
+
+def test_cap_message_polygons(db_with_alert_and_caps, db_with_basin_geometry):
+    session, alert, caps = db_with_alert_and_caps
+    cap_event = caps[0]
+    version = crud_cap.get_cap_event_version(session, cap_event.cap_event_id)
+    cache = cap_xml.CapDocumentCache(maxsize=10)
+    [(key, body)] = cap_xml.render_cap_messages(session, [version], cache=cache)
+
+    areas = ElementTree.fromstring(body).findall("cap:info/cap:area", NAMESPACE)
+    assert len(areas) == len(cap_event.event_areas)
+    for area in areas:
+        assert area.findtext("cap:polygon", namespaces=NAMESPACE)
+
+
+def test_cap_message_key_includes_boundaries(db_with_alert_and_caps, basin_boundaries):
+    session, alert, caps = db_with_alert_and_caps
+    cap_event = caps[0]
+    version = crud_cap.get_cap_event_version(session, cap_event.cap_event_id)
+    cache = cap_xml.CapDocumentCache(maxsize=10)
+    geometry_cache.invalidate()
+    try:
+        [(key, body)] = cap_xml.render_cap_messages(session, [version], cache=cache)
+        assert b"polygon" not in body
+
+        # reloading the boundaries is a new version of the message, the
+        # message rendered without them isn't served from the cache
+        crud_geometry.load_geojson(session, basin_boundaries)
+        geometry_cache.invalidate()
+        [(reloaded_key, body)] = cap_xml.render_cap_messages(
+            session, [version], cache=cache
+        )
+        assert reloaded_key != key
+        assert b"polygon" in body
+    finally:
+        geometry_cache.invalidate()
+
+
+def test_basin_lookup(db_with_basin_geometry, basin_data):
+    session = db_with_basin_geometry
+    geometries = geometry_cache.get(session)
+    basin_ids = {name: basin_id for basin_id, name in geometries.basin_names.items()}
+    first, second = (basin_ids[basin["basin_name"]] for basin in basin_data[:2])
+
+    lon, lat = boundary_centre(0)
+    assert geometries.basins_at_point(lon, lat) == [first]
+    assert geometries.basins_at_point(0, 0) == []
+
+    next_lon, next_lat = boundary_centre(1)
+    assert geometries.basins_in_bbox((lon, lat - 0.1, next_lon, lat + 0.1)) == [
+        first,
+        second,
+    ]
+    # the gap between the two boundaries
+    gap = (lon + next_lon) / 2
+    gap_bbox = (gap - 0.1, lat - 0.1, gap + 0.1, lat + 0.1)
+    assert geometries.basins_in_bbox(gap_bbox) == []
+
+
+def test_expand_area_bboxes(db_with_basin_geometry, basin_data):
+    session = db_with_basin_geometry
+    first, second = (basin["basin_name"] for basin in basin_data[:2])
+    lon, lat = boundary_centre(0)
+    next_lon, next_lat = boundary_centre(1)
+    alert = alerts_models.Alert_Basins_Write(
+        alert_description="description",
+        alert_hydro_conditions="hydro",
+        alert_meteorological_conditions="met",
+        additional_information="additional",
+        author_name="author",
+        alert_status="active",
+        alert_links=[
+            {
+                "basin": {"basin_name": first},
+                "alert_level": {"alert_level": "Flood Warning"},
+            }
+        ],
+        alert_area_bboxes=[
+            {
+                "bbox": (lon, lat - 0.1, next_lon, lat + 0.1),
+                "alert_level": {"alert_level": "Flood Watch"},
+            }
+        ],
+    )
+    expanded = crud_alerts.expand_area_bboxes(session, alert)
+    assert expanded.alert_area_bboxes == []
+    assert {
+        link.basin.basin_name: link.alert_level.alert_level
+        for link in expanded.alert_links
+    } == {first: "Flood Warning", second: "Flood Watch"}
@@ -0,0 +1,110 @@
+import logging
+
+from helpers.db_helpers import QueryCounter
+from sqlmodel import Session
+from src.v1.crud import crud_alerts, crud_cap, crud_read_model
+from src.v1.models import alerts as alerts_models
+from src.v1.models import cap as cap_models
+
+LOGGER = logging.getLogger(__name__)
+
+
+def expected_documents(session: Session, alert_id: int) -> tuple[dict, list[dict]]:
+    """
+    :return: the alert / cap events serialized from the normalized tables
+    :rtype: tuple[dict, list[dict]]
+    """
+    session.expire_all()
+    alert = crud_alerts.get_alert(session, alert_id=alert_id)
+    cap_events = crud_cap.get_cap_events_for_alert(session, alert_id=alert_id)
+    return (
+        alerts_models.Alert_Basins.model_validate(alert).model_dump(mode="json"),
+        [
+            cap_models.Cap_Event_And_Areas.model_validate(cap_event).model_dump(
+                mode="json"
+            )
+            for cap_event in cap_events
+        ],
+    )
+
+
+def test_read_model_created(db_with_alert_and_caps):
+    session, alert, caps = db_with_alert_and_caps
+    assert alert.alert_id in session.info[crud_read_model.STALE_ALERTS_KEY]
+
+    read_model = crud_read_model.get_alert(session, alert_id=alert.alert_id)
+    assert crud_read_model.STALE_ALERTS_KEY not in session.info
+
+    alert_doc, cap_docs = expected_documents(session, alert.alert_id)
+    assert read_model.alert == alert_doc
+    assert read_model.cap_events == cap_docs
+    assert len(read_model.cap_events) == len(caps)
+    assert read_model.alert_status == alert.alert_status
+
+
+def test_read_model_updated(db_with_alert_and_caps, alert_basin_write):
+    session, alert, caps = db_with_alert_and_caps
+    crud_read_model.refresh_stale_alerts(session)
+
+    # drop the first alert level, its cap event is cancelled
+    dropped_level = alert_basin_write.alert_links[0].alert_level.alert_level
+    alert_basin_write.alert_links = [
+        alert_link
+        for alert_link in alert_basin_write.alert_links
+        if alert_link.alert_level.alert_level != dropped_level
+    ]
+    alert_basin_write.alert_description = "updated description"
+    updated_alert = crud_alerts.update_alert(
+        session, alert_id=alert.alert_id, updated_alert=alert_basin_write
+    )
+    crud_cap.reconcile_caps(session, updated_alert)
+
+    read_model = crud_read_model.get_alert(session, alert_id=alert.alert_id)
+    alert_doc, cap_docs = expected_documents(session, alert.alert_id)
+    assert read_model.alert == alert_doc
+    assert read_model.alert["alert_description"] == "updated description"
+    assert dropped_level not in [
+        alert_link["alert_level"]["alert_level"]
+        for alert_link in read_model.alert["alert_links"]
+    ]
+    assert read_model.cap_events == cap_docs
+
+
+def test_read_model_list_filters(db_with_alert_and_caps, alert_basin_write):
+    session, alert, caps = db_with_alert_and_caps
+    basin_name = alert_basin_write.alert_links[0].basin.basin_name
+
+    read_models = crud_read_model.get_alerts(session, basin_names=[basin_name])
+    assert alert.alert_id in [read_model.alert_id for read_model in read_models]
+
+    read_models = crud_read_model.get_alerts(session, alert_status=["not a status"])
+    assert read_models == []
+
+    # the list is a single query against the read model
+    with QueryCounter(session.get_bind()) as counter:
+        crud_read_model.get_alerts(session, limit=10)
+    assert counter.count == 1
+
+
+def test_read_model_refreshed_once(db_with_alert_and_caps, monkeypatch):
+    session, alert, caps = db_with_alert_and_caps
+    refreshes = []
+    refresh = crud_read_model.refresh_alert_read_models
+
+    def record_refresh(session, alert_ids):
+        refreshes.append(sorted(alert_ids))
+        refresh(session, alert_ids)
+
+    monkeypatch.setattr(crud_read_model, "refresh_alert_read_models", record_refresh)
+
+    # the alert and its caps were both written, the read model is built once
+    crud_read_model.refresh_stale_alerts(session)
+    crud_read_model.refresh_stale_alerts(session)
+    assert refreshes == [[alert.alert_id]]
+
+
+def test_read_model_stale_discarded_on_rollback(db_with_alert_and_caps):
+    session, alert, caps = db_with_alert_and_caps
+    assert crud_read_model.STALE_ALERTS_KEY in session.info
+    session.rollback()
+    assert crud_read_model.STALE_ALERTS_KEY not in session.info
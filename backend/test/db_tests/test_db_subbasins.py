@@ -0,0 +1,114 @@
+import logging
+
+import pytest
+from helpers.db_helpers import QueryCounter
+from sqlmodel import select
+from src.v1.crud import crud_alerts, crud_subbasins
+from src.v1.crud.hierarchy_cache import hierarchy_cache
+from src.v1.models import alerts as alerts_models
+from src.v1.models import basins as basins_models
+
+LOGGER = logging.getLogger(__name__)
+
+
+def test_build_closure():
+    closure = crud_subbasins.build_closure({1: None, 2: 1, 3: 2, 4: None})
+    assert sorted(closure) == [
+        (1, 1, 0),
+        (1, 2, 1),
+        (1, 3, 2),
+        (2, 2, 0),
+        (2, 3, 1),
+        (3, 3, 0),
+        (4, 4, 0),
+    ]
+    with pytest.raises(ValueError):
+        crud_subbasins.build_closure({1: 2, 2: 1})
+    with pytest.raises(ValueError):
+        crud_subbasins.build_closure({1: 5})
+
+
+def test_subbasin_closure(db_with_subbasins, basin_data):
+    session, subbasins = db_with_subbasins
+    north = subbasins["North"].subbasin_id
+    north_east = subbasins["North East"].subbasin_id
+
+    closure = session.exec(
+        select(basins_models.Subbasin_Closure).where(
+            basins_models.Subbasin_Closure.descendant_id == north_east
+        )
+    ).all()
+    assert sorted(
+        (record.ancestor_id, record.depth) for record in closure
+    ) == sorted([(north_east, 0), (north, 1)])
+
+    # the basins of the nested subbasins in one statement
+    with QueryCounter(session.get_bind()) as counter:
+        basins = crud_subbasins.get_basins_in_subbasins(session, [north])
+    assert counter.count == 1
+    assert {basin.basin_name for basin in basins} == {
+        basin["basin_name"] for basin in basin_data[:3]
+    }
+
+
+def test_hierarchy_cache(db_with_subbasins, basin_data):
+    session, subbasins = db_with_subbasins
+    hierarchy = hierarchy_cache.get(session)
+    with QueryCounter(session.get_bind()) as counter:
+        assert hierarchy_cache.get(session) is hierarchy
+    assert counter.count == 0
+
+    basin_ids = {name: basin_id for basin_id, name in hierarchy.basin_names.items()}
+    first, second, third, fourth, fifth = (
+        basin_ids[basin["basin_name"]] for basin in basin_data[:5]
+    )
+    north = subbasins["North"].subbasin_id
+    north_east = subbasins["North East"].subbasin_id
+    north_west = subbasins["North West"].subbasin_id
+    south = subbasins["South"].subbasin_id
+
+    assert hierarchy.expand([north]) == sorted([first, second, third])
+    assert hierarchy.expand([north_west, south]) == sorted([third, fourth, fifth])
+    assert hierarchy.subbasins_of(first) == [north_east, north]
+    assert hierarchy.subbasins_of(fourth) == [south]
+
+    # all of north, rolled up to north rather than north east / north west
+    assert hierarchy.roll_up([first, second, third, fourth]) == ([north], [fourth])
+    assert hierarchy.roll_up([first, second]) == ([north_east], [])
+    assert hierarchy.roll_up([first, fourth]) == ([], sorted([first, fourth]))
+
+
+def test_expand_subbasin_links(db_with_subbasins, basin_data):
+    session, subbasins = db_with_subbasins
+    first, second, third = (basin["basin_name"] for basin in basin_data[:3])
+    alert = alerts_models.Alert_Basins_Write(
+        alert_description="description",
+        alert_hydro_conditions="hydro",
+        alert_meteorological_conditions="met",
+        additional_information="additional",
+        author_name="author",
+        alert_status="active",
+        alert_links=[
+            {
+                "basin": {"basin_name": first},
+                "alert_level": {"alert_level": "Flood Warning"},
+            }
+        ],
+        alert_subbasin_links=[
+            {
+                "subbasin": {"sub_basin_name": "North"},
+                "alert_level": {"alert_level": "Flood Watch"},
+            }
+        ],
+    )
+    expanded = crud_alerts.expand_subbasin_links(session, alert)
+    assert expanded.alert_subbasin_links == []
+    assert {
+        link.basin.basin_name: link.alert_level.alert_level
+        for link in expanded.alert_links
+    } == {first: "Flood Warning", second: "Flood Watch", third: "Flood Watch"}
+
+    alert.alert_subbasin_links[0].subbasin.sub_basin_name = "Not A Subbasin"
+    with pytest.raises(crud_alerts.UnknownReferenceDataError) as err:
+        crud_alerts.expand_subbasin_links(session, alert)
+    assert err.value.subbasin_names == ["Not A Subbasin"]
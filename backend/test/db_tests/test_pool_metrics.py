@@ -0,0 +1,99 @@
+import logging
+
+import pytest
+import sqlalchemy
+from fastapi.testclient import TestClient
+from src.db import metrics
+from src.main import app
+
+LOGGER = logging.getLogger(__name__)
+
+
+@pytest.fixture(scope="function")
+def pool_engine(tmp_path):
+    """
+    a sqlite engine with an instrumented pool of a single connection
+    """
+    engine = sqlalchemy.create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=metrics.InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+        pool_pre_ping=True,
+    )
+    pool_metrics = metrics.instrument(engine, "test")
+    yield engine, pool_metrics
+    engine.dispose()
+    metrics.pool_metrics.pop("test", None)
+
+
+def test_checkout_metrics(pool_engine):
+    engine, pool_metrics = pool_engine
+    with engine.connect() as conn:
+        conn.execute(sqlalchemy.text("select 1"))
+        stats = pool_metrics.stats()
+        assert stats["in_use"] == 1
+        assert stats["checkouts"] == 1
+        assert stats["connects"] == 1
+
+        # the only connection is in use, the second checkout times out
+        with pytest.raises(sqlalchemy.exc.TimeoutError):
+            engine.connect()
+
+    stats = pool_metrics.stats()
+    assert stats["in_use"] == 0
+    assert stats["idle"] == 1
+    assert stats["checkout_timeouts"] == 1
+    assert stats["checkout_wait_max_ms"] >= 100
+
+    # connections are reused, not reopened
+    with engine.connect() as conn:
+        conn.execute(sqlalchemy.text("select 1"))
+    stats = pool_metrics.stats()
+    assert stats["checkouts"] == 2
+    assert stats["connects"] == 1
+
+
+def test_invalidation_metrics(pool_engine):
+    engine, pool_metrics = pool_engine
+    with engine.connect() as conn:
+        # the same exception the pool raises when a pre-ping fails
+        conn.invalidate(sqlalchemy.exc.InvalidatePoolError())
+    with engine.connect() as conn:
+        conn.invalidate(ValueError("connection broken"))
+
+    stats = pool_metrics.stats()
+    assert stats["pre_ping_failures"] == 1
+    assert stats["invalidations"] == 1
+    assert stats["connects"] == 2
+
+
+def test_metrics_survive_dispose(pool_engine):
+    engine, pool_metrics = pool_engine
+    engine.dispose()
+    with engine.connect() as conn:
+        conn.execute(sqlalchemy.text("select 1"))
+    assert engine.pool.metrics is pool_metrics
+    assert pool_metrics.stats()["checkouts"] == 1
+
+
+def test_checkout_wait_p95(pool_engine):
+    engine, pool_metrics = pool_engine
+    for wait in range(1, 11):
+        pool_metrics.record_checkout_wait(wait / 1000)
+    # the 95th percentile of 10 samples is the largest one
+    assert pool_metrics.stats()["checkout_wait_p95_ms"] == 10
+
+
+def test_db_pool_route_requires_auth():
+    response = TestClient(app).get("/api/v1/metrics/db_pool")
+    assert response.status_code in (401, 403)
+
+
+def test_db_pool_route(pool_engine, test_client_fixture):
+    response = test_client_fixture.get("/api/v1/metrics/db_pool")
+    assert response.status_code == 200
+    names = [pool["name"] for pool in response.json()]
+    assert "sync" in names
+    assert "test" in names
@@ -0,0 +1,97 @@
+import logging
+import time
+
+import pytest
+import sqlalchemy
+import sqlmodel
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+from src.core.config import Configuration
+from src.db import session
+from src.v1.models import basins as basins_model
+
+LOGGER = logging.getLogger(__name__)
+
+
+@pytest.fixture(scope="function")
+def replica_client(tmp_path, monkeypatch):
+    """
+    an app that uses the real session.get_db, with the primary and replica
+    engines replaced by two separate sqlite databases.  Nothing is replicated
+    between them, so the database a request was sent to can be told from
+    what it returns.
+    """
+    engines = {}
+    for name in ["primary", "replica"]:
+        engines[name] = sqlalchemy.create_engine(
+            f"sqlite:///{tmp_path / f'{name}.db'}",
+            execution_options={"schema_translate_map": {"py_api": None}},
+        )
+        sqlmodel.SQLModel.metadata.create_all(engines[name])
+    monkeypatch.setattr(session, "engine", engines["primary"])
+    monkeypatch.setattr(session, "replica_engine", engines["replica"])
+    monkeypatch.setattr(Configuration, "READ_YOUR_WRITES_WINDOW", 10)
+
+    app = FastAPI()
+
+    @app.post("/basins/{basin_id}")
+    def add_basin(basin_id: int, db: Session = Depends(session.get_db)):
+        db.add(basins_model.Basins(basin_id=basin_id, basin_name=f"basin {basin_id}"))
+        return {"basin_id": basin_id}
+
+    @app.get("/basins/")
+    def get_basins(db: Session = Depends(session.get_db)):
+        return [basin.basin_id for basin in db.exec(select(basins_model.Basins))]
+
+    @app.get("/primary/basins/")
+    def get_primary_basins(db: Session = Depends(session.get_primary_db)):
+        return [basin.basin_id for basin in db.exec(select(basins_model.Basins))]
+
+    yield TestClient(app), engines
+    for engine in engines.values():
+        engine.dispose()
+
+
+def test_reads_use_replica(replica_client):
+    client, engines = replica_client
+    with Session(engines["replica"]) as db:
+        db.add(basins_model.Basins(basin_id=5, basin_name="replicated"))
+        db.commit()
+
+    response = client.get("/basins/")
+    assert response.json() == [5]
+    assert session.READ_PRIMARY_COOKIE not in response.cookies
+
+
+def test_read_your_writes(replica_client):
+    client, engines = replica_client
+    response = client.post("/basins/1")
+    assert response.status_code == 200
+    assert session.READ_PRIMARY_COOKIE in response.cookies
+
+    # the client that wrote reads from the primary
+    assert client.get("/basins/").json() == [1]
+
+    # other clients read from the replica, which hasn't caught up
+    assert TestClient(client.app).get("/basins/").json() == []
+
+    # and so does the client once the window has passed
+    client.cookies.set(session.READ_PRIMARY_COOKIE, str(int(time.time()) - 1))
+    assert client.get("/basins/").json() == []
+
+
+def test_no_replica(replica_client, monkeypatch):
+    client, engines = replica_client
+    monkeypatch.setattr(session, "replica_engine", None)
+    response = client.post("/basins/1")
+    assert session.READ_PRIMARY_COOKIE not in response.cookies
+    assert client.get("/basins/").json() == [1]
+
+
+def test_primary_reads(replica_client):
+    client, engines = replica_client
+    client.post("/basins/1")
+
+    # read from the primary without the read your writes cookie
+    assert TestClient(client.app).get("/primary/basins/").json() == [1]
@@ -0,0 +1,127 @@
+import logging
+
+import pytest
+import sqlmodel
+from helpers.db_helpers import QueryCounter
+from sqlalchemy import create_engine
+from src.v1.crud import crud_alerts, crud_cap, reference_cache
+from src.v1.models import alerts as alerts_models
+from src.v1.models import cap as cap_models
+
+LOGGER = logging.getLogger(__name__)
+
+
+@pytest.fixture(scope="function")
+def memory_session():
+    """
+    a session on an empty in memory database, used for tests that need to
+    commit changes to the reference tables without touching the shared test
+    database
+    """
+    engine = create_engine(
+        "sqlite://",
+        execution_options={"schema_translate_map": {"py_api": None}},
+    )
+    sqlmodel.SQLModel.metadata.create_all(engine)
+    with sqlmodel.Session(engine) as session:
+        yield session
+    engine.dispose()
+    # the cache may have been loaded from the in memory database
+    reference_cache.reference_cache.invalidate()
+
+
+def test_lookups_served_from_cache(db_test_connection: sqlmodel.Session):
+    session = db_test_connection
+    reference_data = reference_cache.reference_cache.get(session)
+    assert "Skeena" in reference_data.basin_name_to_id
+    assert set(reference_data.cap_event_status_to_id.keys()) >= {
+        "ALERT",
+        "UPDATE",
+        "CANCEL",
+    }
+    basin_id = reference_data.basin_name_to_id["Skeena"]
+    assert reference_data.basin_id_to_name[basin_id] == "Skeena"
+
+    with QueryCounter(session.get_bind()) as counter:
+        alert_level = crud_alerts.get_alert_level(session, "Flood Watch")
+        cap_status = crud_cap.get_cap_event_status(session, "CANCEL")
+        missing = crud_alerts.get_alert_level(session, "not a level")
+    assert counter.count == 0
+
+    assert alert_level.alert_level == "Flood Watch"
+    assert alert_level in session
+    assert cap_status.cap_event_status == "CANCEL"
+    assert missing is None
+    with pytest.raises(LookupError):
+        crud_cap.get_cap_event_status(session, "not a status")
+
+
+def test_invalidated_on_commit(memory_session: sqlmodel.Session):
+    session = memory_session
+    cache = reference_cache.reference_cache
+    cache.invalidate()
+    assert cache.get(session).alert_level_to_id == {}
+    version = cache.version
+
+    session.add(alerts_models.Alert_Levels(alert_level="Flood Watch"))
+    session.flush()
+    # not visible to other sessions until committed
+    assert cache.snapshot is not None
+
+    session.commit()
+    assert cache.snapshot is None
+    reference_data = cache.get(session)
+    assert "Flood Watch" in reference_data.alert_level_to_id
+    assert reference_data.version > version
+
+
+def test_other_writes_dont_invalidate(memory_session: sqlmodel.Session):
+    session = memory_session
+    cache = reference_cache.reference_cache
+    cache.get(session)
+    session.add(cap_models.Cap_Event_Status(cap_event_status="ALERT"))
+    session.rollback()
+    session.add(
+        alerts_models.Alerts(
+            alert_description="description",
+            alert_hydro_conditions="hydro",
+            alert_meteorological_conditions="met",
+            author_name="author",
+            alert_status="active",
+        )
+    )
+    session.commit()
+    assert cache.snapshot is not None
+
+
+def test_revalidated_on_migration(memory_session: sqlmodel.Session, monkeypatch):
+    session = memory_session
+    cache = reference_cache.ReferenceDataCache(revalidate_interval=0)
+    cache.get(session)
+    cache.get(session)
+    assert cache.load_count == 1
+
+    # a migration changes the alembic revision
+    monkeypatch.setattr(
+        reference_cache, "get_schema_version", lambda session: "V99"
+    )
+    reference_data = cache.get(session)
+    assert cache.load_count == 2
+    assert reference_data.schema_version == "V99"
+
+
+def test_schema_version_doesnt_flush(memory_session: sqlmodel.Session):
+    session = memory_session
+    # a pending record that can't be written, the error belongs to the caller
+    invalid_level = alerts_models.Alert_Levels(alert_level=None)
+    session.add(invalid_level)
+
+    # the test database has no alembic version table
+    assert reference_cache.get_schema_version(session) is None
+    assert invalid_level in session.new
+    # the transaction is still usable
+    with session.no_autoflush:
+        assert session.exec(sqlmodel.select(alerts_models.Alert_Levels)).all() == []
+
+    session.expunge(invalid_level)
+    assert reference_cache.get_schema_version(session) is None
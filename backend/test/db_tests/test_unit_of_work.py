@@ -0,0 +1,103 @@
+import logging
+
+import pytest
+import sqlalchemy
+import sqlmodel
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+from src import main
+from src.db import metrics, session
+from src.v1.models import basins as basins_model
+
+LOGGER = logging.getLogger(__name__)
+
+
+@pytest.fixture(scope="function")
+def uow_client(tmp_path):
+    """
+    an app with routes that write through the session.get_db unit of work,
+    backed by a sqlite database, with the database exception handlers from
+    the main app
+    """
+    engine = sqlalchemy.create_engine(
+        f"sqlite:///{tmp_path / 'uow.db'}",
+        execution_options={"schema_translate_map": {"py_api": None}},
+    )
+    sqlmodel.SQLModel.metadata.create_all(engine)
+    app = FastAPI()
+    app.add_exception_handler(
+        sqlalchemy.exc.IntegrityError, main.integrity_error_handler
+    )
+    app.add_exception_handler(
+        sqlalchemy.exc.OperationalError, main.operational_error_handler
+    )
+
+    @app.post("/basins/{basin_id}")
+    def add_basin(
+        basin_id: int, fail: bool = False, db: Session = Depends(session.get_db)
+    ):
+        db.add(basins_model.Basins(basin_id=basin_id, basin_name=f"basin {basin_id}"))
+        db.flush()
+        if fail:
+            raise HTTPException(status_code=400, detail="rejected")
+        return {"basin_id": basin_id}
+
+    @app.get("/unavailable")
+    def unavailable(db: Session = Depends(session.get_db)):
+        raise sqlalchemy.exc.OperationalError("select 1", {}, Exception("gone"))
+
+    def get_test_db(request: Request):
+        yield from session.unit_of_work(engine, session.route_name(request))
+
+    app.dependency_overrides[session.get_db] = get_test_db
+    metrics.transaction_metrics.reset()
+    yield TestClient(app), engine
+    metrics.transaction_metrics.reset()
+    engine.dispose()
+
+
+def basin_ids(engine) -> list[int]:
+    with Session(engine) as db:
+        return [basin.basin_id for basin in db.exec(select(basins_model.Basins))]
+
+
+def test_unit_of_work_commits(uow_client):
+    client, engine = uow_client
+    response = client.post("/basins/1")
+    assert response.status_code == 200
+    assert basin_ids(engine) == [1]
+
+
+def test_unit_of_work_rolls_back(uow_client):
+    client, engine = uow_client
+    response = client.post("/basins/1", params={"fail": True})
+    assert response.status_code == 400
+    assert basin_ids(engine) == []
+
+
+def test_unit_of_work_error_status(uow_client):
+    client, engine = uow_client
+    assert client.post("/basins/1").status_code == 200
+
+    # duplicate primary key
+    response = client.post("/basins/1")
+    assert response.status_code == 409
+
+    response = client.get("/unavailable")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    assert basin_ids(engine) == [1]
+
+
+def test_transaction_metrics(uow_client):
+    client, engine = uow_client
+    client.post("/basins/1")
+    client.post("/basins/2", params={"fail": True})
+
+    stats = {
+        route_stats["route"]: route_stats
+        for route_stats in metrics.transaction_metrics.stats()
+    }
+    assert stats["POST /basins/{basin_id}"]["count"] == 2
+    assert stats["POST /basins/{basin_id}"]["rolled_back"] == 1
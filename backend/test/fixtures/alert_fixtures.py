@@ -179,6 +179,7 @@ def test_client_with_alert_and_cap(
 
     LOGGER.debug("here")
     test_app_with_auth.dependency_overrides[src.db.session.get_db] = get_db
+    test_app_with_auth.dependency_overrides[src.db.session.get_primary_db] = get_db
     # query does NOT return the alert object that aligns with the alert_dict
     yield [TestClient(test_app_with_auth), session]
     session.rollback()
@@ -0,0 +1,151 @@
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Generator
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+LOGGER = logging.getLogger(__name__)
+
+TEST_AUDIENCE = "hydrological-alerting-5261"
+
+
+class SigningKey:
+    """
+    an rsa key pair used to sign test tokens, and the public json web key
+    that the stub jwks server publishes for it.
+    """
+
+    def __init__(self, kid: str):
+        self.kid = kid
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.private_pem = private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+        public_pem = private_key.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        self.public_jwk = jwk.construct(public_pem, algorithm="RS256").to_dict()
+        self.public_jwk["kid"] = kid
+        self.public_jwk["use"] = "sig"
+
+    def sign(self, claims: dict, kid: str | None = None) -> str:
+        """
+        :param kid: overrides the kid in the header of the token, used to
+            simulate a token signed by a different key
+        """
+        return jwt.encode(
+            claims,
+            self.private_pem,
+            algorithm="RS256",
+            headers={"kid": kid or self.kid},
+        )
+
+
+class StubJWKSServer:
+    """
+    a minimal local http server that publishes a well known document and a
+    json web key set, counting the requests made to each.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.request_counts = {"wellknown": 0, "jwks": 0}
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.endswith("openid-configuration"):
+                    stub.request_counts["wellknown"] += 1
+                    body = {"jwks_uri": f"{stub.base_url}/certs"}
+                elif self.path.endswith("/certs"):
+                    stub.request_counts["jwks"] += 1
+                    body = {"keys": [key.public_jwk for key in stub.keys]}
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                LOGGER.debug(format % args)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.wellknown_url = f"{self.base_url}/.well-known/openid-configuration"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture(scope="session")
+def signing_key() -> Generator[SigningKey, None, None]:
+    yield SigningKey(kid="test-key-1")
+
+
+@pytest.fixture(scope="session")
+def rotated_signing_key() -> Generator[SigningKey, None, None]:
+    yield SigningKey(kid="test-key-2")
+
+
+@pytest.fixture(scope="function")
+def stub_jwks_server(signing_key) -> Generator[StubJWKSServer, None, None]:
+    server = StubJWKSServer()
+    server.keys = [signing_key]
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(scope="function")
+def token_claims(mock_access_token) -> Generator[dict, None, None]:
+    """
+    the claims from the mock access token, with an expiry in the future so that
+    it passes validation.
+    """
+    claims = dict(mock_access_token)
+    now = int(time.time())
+    claims["iat"] = now
+    claims["auth_time"] = now
+    claims["exp"] = now + 300
+    claims["aud"] = TEST_AUDIENCE
+    yield claims
+
+
+@pytest.fixture(scope="function")
+def stub_jwks_cache(stub_jwks_server, token_claims, monkeypatch):
+    """
+    points the oidc module at the stub jwks server, with an empty token cache,
+    and configures the client id to match the audience of the test tokens
+    """
+    # imported here so the fixture module doesn't depend on app config at load
+    from src.core.config import Configuration
+    from src.oidc import oidcAuthorize
+    from src.oidc.jwks_cache import JWKSCache
+    from src.oidc.token_cache import VerifiedTokenCache
+
+    cache = JWKSCache(wellknown_url=stub_jwks_server.wellknown_url)
+    token_cache = VerifiedTokenCache(maxsize=10)
+    cache.add_rotation_listener(token_cache.evict_kids)
+    monkeypatch.setattr(oidcAuthorize, "jwks_cache", cache)
+    monkeypatch.setattr(oidcAuthorize, "token_cache", token_cache)
+    monkeypatch.setattr(Configuration, "OIDC_CLIENT_ID", token_claims["aud"])
+    yield cache
@@ -0,0 +1,87 @@
+import logging
+from typing import Generator
+
+import pytest
+import shapely.geometry
+import sqlmodel
+import src.db.session
+from fastapi.testclient import TestClient
+from src.v1.crud import crud_geometry
+from src.v1.crud.geometry_cache import geometry_cache
+
+LOGGER = logging.getLogger(__name__)
+
+# the test boundaries are circles laid out on a grid, spaced so they don't
+# overlap
+GRID_COLUMNS = 6
+GRID_SPACING = 2.0
+BOUNDARY_RADIUS = 0.8
+GRID_ORIGIN = (-135.0, 49.0)
+
+
+def boundary_centre(index: int) -> tuple[float, float]:
+    """
+    :param index: the position of the basin in the basin data
+    :type index: int
+    :return: the lon / lat of the centre of the basin's test boundary
+    :rtype: tuple[float, float]
+    """
+    return (
+        GRID_ORIGIN[0] + (index % GRID_COLUMNS) * GRID_SPACING,
+        GRID_ORIGIN[1] + (index // GRID_COLUMNS) * GRID_SPACING,
+    )
+
+
+@pytest.fixture(scope="session")
+def basin_boundaries(basin_data) -> dict:
+    """
+    synthetic boundaries for every basin, a finely segmented circle so the
+    simplification has something to remove.  The last basin is made of two
+    circles, to test multi polygons.
+    """
+    features = []
+    for index, basin in enumerate(basin_data):
+        lon, lat = boundary_centre(index)
+        geometry = shapely.geometry.Point(lon, lat).buffer(
+            BOUNDARY_RADIUS, quad_segs=64
+        )
+        if index == len(basin_data) - 1:
+            geometry = shapely.geometry.MultiPolygon(
+                [
+                    shapely.geometry.Point(lon - 0.4, lat).buffer(0.3, quad_segs=64),
+                    shapely.geometry.Point(lon + 0.4, lat).buffer(0.3, quad_segs=64),
+                ]
+            )
+        features.append(
+            {
+                "type": "Feature",
+                "properties": {"basin_name": basin["basin_name"]},
+                "geometry": shapely.geometry.mapping(geometry),
+            }
+        )
+    return {"type": "FeatureCollection", "features": features}
+
+
+@pytest.fixture(scope="function")
+def db_with_basin_geometry(db_test_connection: sqlmodel.Session, basin_boundaries):
+    session = db_test_connection
+    geometry_cache.invalidate()
+    crud_geometry.load_geojson(session, basin_boundaries)
+    yield session
+    session.rollback()
+    geometry_cache.invalidate()
+
+
+@pytest.fixture(scope="function")
+def test_client_with_basin_geometry(
+    test_app_with_auth, db_with_basin_geometry, monkeypatch
+):
+    session = db_with_basin_geometry
+
+    def get_db() -> Generator[sqlmodel.Session, None, None]:
+        monkeypatch.setattr(session, "commit", lambda: None)
+        yield session
+
+    test_app_with_auth.dependency_overrides[src.db.session.get_db] = get_db
+    yield [TestClient(test_app_with_auth), session]
+    test_app_with_auth.dependency_overrides = {}
@@ -0,0 +1,70 @@
+import logging
+from typing import Generator
+
+import pytest
+import sqlmodel
+import src.db.session
+from fastapi.testclient import TestClient
+from src.v1.crud import crud_subbasins
+from src.v1.crud.hierarchy_cache import hierarchy_cache
+from src.v1.models import basins as basins_models
+
+LOGGER = logging.getLogger(__name__)
+
+# subbasin name -> (parent subbasin name, positions of its basins in the basin
+# data).  North is made of North East and North West, South is on its own.
+TEST_SUBBASINS = {
+    "North": (None, []),
+    "North East": ("North", [0, 1]),
+    "North West": ("North", [2]),
+    "South": (None, [3, 4]),
+}
+
+
+@pytest.fixture(scope="function")
+def db_with_subbasins(db_test_connection: sqlmodel.Session, basin_data):
+    """
+    adds the TEST_SUBBASINS, assigns the basins to them and builds the closure
+
+    :yield: the session, and a dictionary of the subbasin records keyed by name
+    """
+    session = db_test_connection
+    hierarchy_cache.invalidate()
+    subbasins = {}
+    for name, (parent_name, basin_positions) in TEST_SUBBASINS.items():
+        subbasin = basins_models.Subbasins(
+            sub_basin_name=name,
+            parent_subbasin_id=(
+                subbasins[parent_name].subbasin_id if parent_name else None
+            ),
+        )
+        session.add(subbasin)
+        session.flush()
+        subbasins[name] = subbasin
+        basin_names = [
+            basin_data[position]["basin_name"] for position in basin_positions
+        ]
+        basins = session.exec(
+            sqlmodel.select(basins_models.Basins).where(
+                basins_models.Basins.basin_name.in_(basin_names)
+            )
+        ).all()
+        for basin in basins:
+            basin.subbasins_id = subbasin.subbasin_id
+    crud_subbasins.rebuild_closure(session)
+    yield session, subbasins
+    session.rollback()
+    hierarchy_cache.invalidate()
+
+
+@pytest.fixture(scope="function")
+def test_client_with_subbasins(test_app_with_auth, db_with_subbasins, monkeypatch):
+    session, subbasins = db_with_subbasins
+
+    def get_db() -> Generator[sqlmodel.Session, None, None]:
+        monkeypatch.setattr(session, "commit", lambda: None)
+        yield session
+
+    test_app_with_auth.dependency_overrides[src.db.session.get_db] = get_db
+    yield [TestClient(test_app_with_auth), session, subbasins]
+    test_app_with_auth.dependency_overrides = {}
@@ -1,12 +1,95 @@
 import logging
 
+import sqlmodel
 import src.v1.models.alerts as alerts_models
+import src.v1.models.basins as basins_model
 import src.v1.models.cap as cap_models
+from helpers.alert_helpers import create_fake_alert
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
 from sqlmodel import select
+from src.v1.crud import crud_alerts, crud_cap
+from src.v1.crud.reference_cache import reference_cache
 
 LOGGER = logging.getLogger(__name__)
 
 
+class QueryCounter:
+    """
+    context manager that counts the sql statements that are sent to the
+    database through the supplied engine, used to verify that code paths
+    issue a fixed number of queries.
+
+    with QueryCounter(engine) as counter:
+        ...
+    counter.count
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *args):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+        LOGGER.debug(f"statements executed: {self.count}")
+
+
+async def create_async_test_engine(
+    basin_data, alert_level_data, alert_list: list[dict]
+):
+    """
+    creates an in memory aiosqlite database with the lookup tables and an
+    alert with caps, the data is loaded with the sync crud functions.  Must be
+    called from the event loop that will use the engine.
+
+    :return: the async engine and the id of the alert that was created
+    :rtype: tuple[AsyncEngine, int]
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    def seed(session: sqlmodel.Session) -> int:
+        for basin in basin_data:
+            session.add(basins_model.Basins(basin_name=basin["basin_name"]))
+        for alert_level in alert_level_data:
+            session.add(
+                alerts_models.Alert_Levels(alert_level=alert_level["alert_level"])
+            )
+        for cap_status in ["ALERT", "UPDATE", "CANCEL"]:
+            session.add(cap_models.Cap_Event_Status(cap_event_status=cap_status))
+        session.flush()
+
+        # the reference cache has to be loaded from this database, the caller
+        # should invalidate it again once it's done
+        reference_cache.invalidate()
+        alert = crud_alerts.create_alert(session, create_fake_alert(alert_list))
+        crud_cap.create_cap_event(session, alert)
+        session.commit()
+        return alert.alert_id
+
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
+        poolclass=StaticPool,
+        execution_options={"schema_translate_map": {"py_api": None}},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(sqlmodel.SQLModel.metadata.create_all)
+    async with AsyncSession(engine) as session:
+        alert_id = await session.run_sync(seed)
+    return engine, alert_id
+
+
 class db_cleanup:
 
     def __init__(self, session):
@@ -25,8 +108,21 @@ class db_cleanup:
         self.delete_cap_event_history(alert_id=alert_id)
         self.delete_cap_events(alert_id=alert_id)
         self.delete_alert_history(alert_id=alert_id)
+        self.delete_alert_read_model(alert_id=alert_id)
         self.delete_alerts(alert_id=alert_id)
 
+    def delete_alert_read_model(self, alert_id: int):
+        """
+        deletes the read model record for the alert id
+
+        :param alert_id: the alert id that needs to be cleaned from the database
+        :type alert_id: int
+        """
+        read_model = self.session.get(alerts_models.Alert_Read_Model, alert_id)
+        if read_model is not None:
+            self.session.delete(read_model)
+            self.session.flush()
+
     def delete_alerts(self, alert_id: int):
         """
         deletes all the alert records, and the alert area records that are
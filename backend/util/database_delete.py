@@ -38,10 +38,10 @@ sys.path.append(rootPath2Add)
 
 # now add the helper functions
 import helpers.db_helpers
+import sqlmodel
 import src.db.session
 
-session_gen = src.db.session.get_db()
-session = next(session_gen)
+session = sqlmodel.Session(src.db.session.engine)
 victor_the_cleaner = helpers.db_helpers.db_cleanup(session)
 
 alert_ids_delete = [229, 115]
@@ -0,0 +1,11 @@
+#!/bin/bash
+# Run by the postgres image the first time the primary database is
+# initialized (docker-compose.replica.yml).  Creates the role the replica
+# streams the WAL with, and allows it to connect for replication.
+set -e
+
+psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname postgres <<-EOSQL
+    CREATE ROLE replicator WITH REPLICATION LOGIN PASSWORD '$REPLICATION_PASSWORD';
+EOSQL
+
+echo "host replication replicator all scram-sha-256" >> "$PGDATA/pg_hba.conf"
@@ -1,6 +1,6 @@
 import { Injectable } from '@angular/core';
-import { Observable, catchError, of, switchMap, throwError } from 'rxjs';
-import { HttpClient } from '@angular/common/http';
+import { EMPTY, Observable, catchError, expand, of, reduce, switchMap, throwError } from 'rxjs';
+import { HttpClient, HttpParams, HttpResponse } from '@angular/common/http';
 import { Alert, AlertCreate } from '../types/alert';
 
 
@@ -9,6 +9,8 @@ import { Alert, AlertCreate } from '../types/alert';
 })
 export class AlertsService {
   alerts: Alert[] = [];
+  // the largest page the api returns
+  alertsPageSize = 1000;
 
   constructor(private http: HttpClient) { }
 
@@ -19,10 +21,25 @@ export class AlertsService {
     return this.http.get<any>(url);
   }
 
+  // the alert list is paginated, follows the X-Next-Cursor header until all
+  // the pages have been retrieved
   getAlerts(): Observable<Alert[]> {
-    let url = "/api/v1/alerts/";
+    return this.getAlertsPage().pipe(
+      expand((response) => {
+        let cursor = response.headers.get('X-Next-Cursor');
+        return cursor ? this.getAlertsPage(cursor) : EMPTY;
+      }),
+      reduce((alerts: Alert[], response) => alerts.concat(response.body ?? []), [])
+    );
+  }
 
-    return this.http.get<any>(url);
+  getAlertsPage(cursor?: string): Observable<HttpResponse<Alert[]>> {
+    let url = "/api/v1/alerts/";
+    let params = new HttpParams().set('limit', this.alertsPageSize);
+    if (cursor) {
+      params = params.set('cursor', cursor);
+    }
+    return this.http.get<Alert[]>(url, { params: params, observe: 'response' });
   }
 
   // todo: define a type for the alertData